@@ -1,11 +1,39 @@
 # Core module for noise analysis
-from .audio_processor import AudioProcessor
-from .background_tasks import AudioProcessingTaskManager
+from .audio_processor import AudioProcessor, WholeFileAccumulator
+from .audio_source import (
+    AudioSource,
+    ArraySource,
+    SoundFileSource,
+    TdmsSource,
+    TdmsGroupSource,
+    audio_duration,
+    open_audio_source
+)
+from .background_tasks import AudioProcessingTaskManager, SessionSink
+from .ingestion import (
+    ChannelPipeline,
+    ChannelOutput,
+    FileAnalysis,
+    IngestionScheduler,
+    analyze_file
+)
 from .connection_manager import ConnectionManager
-from .file_monitor import AudioFileMonitor
+from .file_monitor import AudioFileMonitor, FileSettleTracker
+from .work_queue import DurableWorkQueue, WorkItem
+from .ingestion_ledger import IngestionLedger, file_fingerprint
+from .result_cache import ResultCache, file_content_hash, result_cache_key, PROCESSING_VERSION
 from .tdms_converter import TDMSConverter
 from .dose_calculator import DoseCalculator, DoseStandard, DoseProfile
-from .time_history_processor import TimeHistoryProcessor, SecondMetrics, aggregate_session_metrics
+from .filter_bank import FilterBank, get_filter_bank
+from .time_history_processor import (
+    TimeHistoryProcessor,
+    SecondMetrics,
+    aggregate_session_metrics,
+    second_metrics_from_frame,
+    TimeShard,
+    plan_time_shards
+)
+from .metrics_store import SecondMetricsStore
 from .summary_processor import (
     SummaryProcessor, 
     AggregatedMetrics, 
@@ -27,19 +55,50 @@ from .session_manager import (
 from .event_detector import EventDetector, EventInfo, TriggerType, SlidingWindowCalculator
 from .ring_buffer import RingBuffer, MultiChannelRingBuffer
 from .event_processor import EventProcessor, BatchEventProcessor
+from .event_audio_writer import EventAudioWriter
+from .audio_codec import AudioCodec, EncodeBudget, get_audio_codec, register_audio_codec
 
 __all__ = [
     'AudioProcessor',
+    'WholeFileAccumulator',
+    'AudioSource',
+    'ArraySource',
+    'SoundFileSource',
+    'TdmsSource',
+    'TdmsGroupSource',
+    'audio_duration',
+    'open_audio_source',
     'AudioProcessingTaskManager',
+    'SessionSink',
+    'ChannelPipeline',
+    'ChannelOutput',
+    'FileAnalysis',
+    'IngestionScheduler',
+    'analyze_file',
     'ConnectionManager',
     'AudioFileMonitor',
+    'FileSettleTracker',
+    'DurableWorkQueue',
+    'WorkItem',
+    'IngestionLedger',
+    'file_fingerprint',
+    'ResultCache',
+    'result_cache_key',
+    'file_content_hash',
+    'PROCESSING_VERSION',
     'TDMSConverter',
     'DoseCalculator',
     'DoseStandard',
     'DoseProfile',
+    'FilterBank',
+    'get_filter_bank',
     'TimeHistoryProcessor',
     'SecondMetrics',
     'aggregate_session_metrics',
+    'second_metrics_from_frame',
+    'TimeShard',
+    'plan_time_shards',
+    'SecondMetricsStore',
     # Summary Processor
     'SummaryProcessor',
     'AggregatedMetrics',
@@ -62,4 +121,9 @@ __all__ = [
     'MultiChannelRingBuffer',
     'EventProcessor',
     'BatchEventProcessor',
+    'EventAudioWriter',
+    'AudioCodec',
+    'EncodeBudget',
+    'get_audio_codec',
+    'register_audio_codec',
 ]
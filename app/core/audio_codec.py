@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+事件音频编码器
+可插拔的事件音频存储格式（WAV / 24-bit PCM / FLAC 无损压缩），
+以及编码耗时预算：主编码器超出预算时临时切换到更快的备用编码器
+"""
+
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+import soundfile as sf
+
+from app.utils import logger
+
+
+@dataclass(frozen=True)
+class AudioCodec:
+    """
+    事件音频编码器
+
+    Attributes:
+        name: 编码器名称
+        format: soundfile 文件格式 ('WAV' / 'FLAC' ...)
+        subtype: soundfile 样本格式 ('PCM_16' / 'PCM_24' / 'FLOAT' ...)
+        extension: 文件扩展名
+        compression_level: 压缩等级 (0~1，仅 FLAC 等压缩格式有效，None 为 libsndfile 默认值)
+    """
+    name: str
+    format: str
+    subtype: str
+    extension: str
+    compression_level: Optional[float] = None
+
+    def write(self, filepath: Union[str, Path], audio: np.ndarray, sample_rate: int) -> str:
+        """
+        编码并写入文件
+
+        Args:
+            filepath: 不含扩展名的输出路径
+            audio: 音频数据 (范围 -1~1)
+            sample_rate: 采样率
+
+        Returns:
+            str: 写入的文件路径
+        """
+        path = f"{filepath}{self.extension}"
+        kwargs = {}
+        if self.compression_level is not None:
+            kwargs['compression_level'] = self.compression_level
+        sf.write(path, audio, sample_rate, format=self.format, subtype=self.subtype, **kwargs)
+        return path
+
+
+AUDIO_CODECS: Dict[str, AudioCodec] = {}
+
+
+def register_audio_codec(codec: AudioCodec) -> AudioCodec:
+    """注册编码器（同名覆盖）"""
+    AUDIO_CODECS[codec.name] = codec
+    return codec
+
+
+def get_audio_codec(codec: Union[str, AudioCodec]) -> AudioCodec:
+    """按名称获取编码器，传入 AudioCodec 时直接返回"""
+    if isinstance(codec, AudioCodec):
+        return codec
+    try:
+        return AUDIO_CODECS[codec]
+    except KeyError:
+        raise ValueError(f"Unknown audio codec: {codec}, available: {list(AUDIO_CODECS)}") from None
+
+
+# 'wav' 与原 sf.write 默认格式一致 (16-bit PCM)
+register_audio_codec(AudioCodec("wav", "WAV", "PCM_16", ".wav"))
+register_audio_codec(AudioCodec("wav_float", "WAV", "FLOAT", ".wav"))
+register_audio_codec(AudioCodec("wav_pcm24", "WAV", "PCM_24", ".wav"))
+register_audio_codec(AudioCodec("flac", "FLAC", "PCM_24", ".flac"))
+register_audio_codec(AudioCodec("flac16", "FLAC", "PCM_16", ".flac"))
+
+
+class EncodeBudget:
+    """
+    编码耗时预算
+
+    每段音频编码后记录耗时，主编码器单次耗时超过 budget_ms 时，
+    之后的 probe_interval 段音频改用备用编码器，然后再次尝试主编码器
+    """
+
+    def __init__(self,
+                 codec: Union[str, AudioCodec] = "flac",
+                 fallback_codec: Union[str, AudioCodec] = "wav_pcm24",
+                 budget_ms: Optional[float] = None,
+                 probe_interval: int = 20):
+        """
+        Args:
+            codec: 主编码器
+            fallback_codec: 超出预算时使用的备用编码器
+            budget_ms: 单段音频的编码耗时预算 (毫秒)，None 表示不限制
+            probe_interval: 切换到备用编码器后，再次尝试主编码器前的音频段数
+        """
+        self.codec = get_audio_codec(codec)
+        self.fallback_codec = get_audio_codec(fallback_codec)
+        self.budget_ms = budget_ms
+        self.probe_interval = max(1, int(probe_interval))
+
+        self._lock = threading.Lock()
+        self._fallback_remaining = 0
+        self._encoded: Dict[str, int] = {}
+        self._over_budget = 0
+        self._total_encode_s = 0.0
+        self._max_encode_s = 0.0
+
+    def select(self) -> AudioCodec:
+        """选择本段音频使用的编码器"""
+        with self._lock:
+            if self._fallback_remaining > 0:
+                self._fallback_remaining -= 1
+                return self.fallback_codec
+            return self.codec
+
+    def record(self, codec: AudioCodec, encode_s: float):
+        """记录一次编码耗时"""
+        with self._lock:
+            self._encoded[codec.name] = self._encoded.get(codec.name, 0) + 1
+            self._total_encode_s += encode_s
+            self._max_encode_s = max(self._max_encode_s, encode_s)
+
+            if (self.budget_ms is not None and codec is self.codec
+                    and codec is not self.fallback_codec
+                    and encode_s * 1000 > self.budget_ms):
+                self._over_budget += 1
+                self._fallback_remaining = self.probe_interval
+                logger.warning(f"Audio codec '{codec.name}' took {encode_s * 1000:.1f}ms "
+                               f"(budget {self.budget_ms}ms), using '{self.fallback_codec.name}' "
+                               f"for the next {self.probe_interval} clips")
+
+    def get_stats(self) -> Dict:
+        """获取编码统计信息"""
+        with self._lock:
+            total = sum(self._encoded.values())
+            return {
+                'codec': self.codec.name,
+                'fallback_codec': self.fallback_codec.name,
+                'budget_ms': self.budget_ms,
+                'encoded': dict(self._encoded),
+                'over_budget': self._over_budget,
+                'avg_encode_ms': round(self._total_encode_s / total * 1000, 2) if total else 0.0,
+                'max_encode_ms': round(self._max_encode_s * 1000, 2),
+            }
@@ -26,8 +26,17 @@ from acoustics.standards.iec_61672_1_2013 import (
     average
 )
 import warnings
+from typing import Optional
 
 from app.core.dose_calculator import DoseCalculator, DoseStandard
+from app.core.time_history_processor import TimeHistoryProcessor
+
+# Column labels of the legacy per-band result dataframes
+LEGACY_BAND_LABELS = [
+    "63 Hz", "125 Hz", "250 Hz", "500 Hz", "1000 Hz", "2000 Hz",
+    "4000 Hz", "8000 Hz", "16000 Hz"
+]
+
 
 class AudioProcessor:
     """Process audio files and calculate noise metrics"""
@@ -101,46 +110,8 @@ class AudioProcessor:
         
         # Create result dataframes
         freq_kurtosises_df = pd.DataFrame(
-            dict(
-                zip([
-                    "63 Hz", "125 Hz", "250 Hz", "500 Hz", "1000 Hz", "2000 Hz",
-                    "4000 Hz", "8000 Hz", "16000 Hz"
-                ],
-                    seq(freq_kurtosises).map(lambda x: [x]))))
-                    
-        freq_SPLs_df = pd.DataFrame(
-            dict(
-                zip([
-                    "63 Hz", "125 Hz", "250 Hz", "500 Hz", "1000 Hz", "2000 Hz",
-                    "4000 Hz", "8000 Hz", "16000 Hz"
-                ], freq_SPLs)))
-        
-        # Calculate noise dose for different standards
-        duration_s = s.duration
-        dose_results = DoseCalculator.calculate_multi_standard(LAeq, duration_s)
-        
-        # Extract dose percentages
-        dose_niosh = dose_results["NIOSH"]["dose_pct"]
-        dose_osha_pel = dose_results["OSHA_PEL"]["dose_pct"]
-        dose_osha_hca = dose_results["OSHA_HCA"]["dose_pct"]
-        dose_eu_iso = dose_results["EU_ISO"]["dose_pct"]
-        
-        # Calculate TWA for each standard
-        profile_niosh = DoseCalculator.get_profile("NIOSH")
-        profile_osha_pel = DoseCalculator.get_profile("OSHA_PEL")
-        profile_osha_hca = DoseCalculator.get_profile("OSHA_HCA")
-        profile_eu_iso = DoseCalculator.get_profile("EU_ISO")
-        
-        twa_niosh = DoseCalculator.calculate_twa(dose_niosh, profile_niosh)
-        twa_osha_pel = DoseCalculator.calculate_twa(dose_osha_pel, profile_osha_pel)
-        twa_osha_hca = DoseCalculator.calculate_twa(dose_osha_hca, profile_osha_hca)
-        twa_eu_iso = DoseCalculator.calculate_twa(dose_eu_iso, profile_eu_iso)
-        
-        # Calculate LEX,8h
-        lex_niosh = DoseCalculator.calculate_lex(dose_niosh, profile_niosh)
-        lex_osha_pel = DoseCalculator.calculate_lex(dose_osha_pel, profile_osha_pel)
-        lex_osha_hca = DoseCalculator.calculate_lex(dose_osha_hca, profile_osha_hca)
-        lex_eu_iso = DoseCalculator.calculate_lex(dose_eu_iso, profile_eu_iso)
+            dict(zip(LEGACY_BAND_LABELS, seq(freq_kurtosises).map(lambda x: [x]))))
+        freq_SPLs_df = pd.DataFrame(dict(zip(LEGACY_BAND_LABELS, freq_SPLs)))
         
         # Return all metrics
         return {
@@ -159,19 +130,152 @@ class AudioProcessor:
             "sampling_rate": s.fs,
             "duration": s.duration,
             "channels": s.channels,
-            # Dose metrics
-            "dose_niosh": dose_niosh,
-            "dose_osha_pel": dose_osha_pel,
-            "dose_osha_hca": dose_osha_hca,
-            "dose_eu_iso": dose_eu_iso,
-            # TWA metrics
-            "twa_niosh": twa_niosh,
-            "twa_osha_pel": twa_osha_pel,
-            "twa_osha_hca": twa_osha_hca,
-            "twa_eu_iso": twa_eu_iso,
-            # LEX metrics
-            "lex_niosh": lex_niosh,
-            "lex_osha_pel": lex_osha_pel,
-            "lex_osha_hca": lex_osha_hca,
-            "lex_eu_iso": lex_eu_iso,
-        }
\ No newline at end of file
+            # Dose / TWA / LEX metrics
+            **self.dose_metrics(LAeq, s.duration),
+        }
+    
+    @staticmethod
+    def dose_metrics(laeq: float, duration_s: float) -> dict:
+        """Calculate dose, TWA and LEX,8h for all standards
+        
+        Args:
+            laeq (float): A-weighted equivalent level of the whole file (dBA)
+            duration_s (float): Duration in seconds
+            
+        Returns:
+            dict: dose_*/twa_*/lex_* keys for NIOSH, OSHA_PEL, OSHA_HCA and EU_ISO
+        """
+        dose_results = DoseCalculator.calculate_multi_standard(laeq, duration_s)
+        
+        metrics = {}
+        for standard, suffix in (("NIOSH", "niosh"), ("OSHA_PEL", "osha_pel"),
+                                 ("OSHA_HCA", "osha_hca"), ("EU_ISO", "eu_iso")):
+            dose = dose_results[standard]["dose_pct"]
+            profile = DoseCalculator.get_profile(standard)
+            metrics[f"dose_{suffix}"] = dose
+            metrics[f"twa_{suffix}"] = DoseCalculator.calculate_twa(dose, profile)
+            metrics[f"lex_{suffix}"] = DoseCalculator.calculate_lex(dose, profile)
+        return metrics
+
+
+class WholeFileAccumulator:
+    """Accumulate whole-file metrics from streamed, already filtered blocks
+    
+    Fed by TimeHistoryProcessor.process_block() with the Z/A/C signals and the
+    1/3 octave bands it has already computed, so a file is decoded and filtered
+    once for both the per-second time history and the legacy whole-file result.
+    Only energy sums, raw moments (S1-S4) and peaks are kept, plus the 125 ms
+    block averages still open at a block boundary for the band kurtosis.
+    """
+    
+    BAND_AVERAGING_TIME = 0.125
+    
+    def __init__(self, sample_rate: int, reference_pressure: float = 20e-6):
+        self.sample_rate = int(sample_rate)
+        self.reference_pressure = reference_pressure
+        self._band_window = int(np.floor(self.BAND_AVERAGING_TIME * self.sample_rate))
+        self.reset()
+    
+    def reset(self):
+        """Clear all accumulated sums"""
+        self.n_samples = 0
+        # Raw moments S1-S4 and absolute peak per weighting
+        self._moments = {w: np.zeros(4) for w in "ZAC"}
+        self._peaks = {w: 0.0 for w in "ZAC"}
+        # Per band: energy sum, moments of the 125 ms block averages, open block tail
+        n_bands = len(LEGACY_BAND_LABELS)
+        self._band_energy = np.zeros(n_bands)
+        self._band_available = [True] * n_bands
+        self._band_block_moments = np.zeros((n_bands, 5))
+        self._band_tails = [np.empty(0) for _ in range(n_bands)]
+    
+    @staticmethod
+    def _raw_moments(x: np.ndarray) -> np.ndarray:
+        x2 = x * x
+        return np.array([np.sum(x), np.sum(x2), np.sum(x2 * x), np.sum(x2 * x2)])
+    
+    def update(self, data: np.ndarray, a_weighted: np.ndarray, c_weighted: np.ndarray,
+               band_data: list):
+        """Add one block of Z, A and C weighted samples and its 9 band signals"""
+        if len(data) == 0:
+            return
+        
+        self.n_samples += len(data)
+        for weighting, values in (("Z", data), ("A", a_weighted), ("C", c_weighted)):
+            self._moments[weighting] += self._raw_moments(values)
+            self._peaks[weighting] = max(self._peaks[weighting], float(np.max(np.abs(values))))
+        
+        for i, band in enumerate(band_data):
+            if band is None:
+                self._band_available[i] = False
+                continue
+            self._band_energy[i] += np.sum(band * band)
+            
+            # 125 ms averages over the whole file (blocks may span data blocks)
+            samples = np.concatenate([self._band_tails[i], band])
+            n_blocks = len(samples) // self._band_window if self._band_window > 0 else 0
+            split = n_blocks * self._band_window
+            if n_blocks > 0:
+                means = samples[:split].reshape(n_blocks, self._band_window).mean(axis=1)
+                self._band_block_moments[i] += np.concatenate(([n_blocks], self._raw_moments(means)))
+            self._band_tails[i] = samples[split:]
+    
+    def _level(self, energy: float, n: int) -> float:
+        return float(10.0 * np.log10(energy / n / self.reference_pressure ** 2))
+    
+    def _peak_level(self, peak: float) -> float:
+        return float(20.0 * np.log10(peak / self.reference_pressure))
+    
+    @staticmethod
+    def _kurtosis(n: int, moments: np.ndarray) -> Optional[float]:
+        return TimeHistoryProcessor.calculate_kurtosis_from_moments(n, *moments)
+    
+    def get_results(self) -> dict:
+        """Whole-file metrics in the AudioProcessor.process_wav_file() format
+        
+        "frequency_spl" holds the equivalent level of each band over the whole
+        file. The "signal" entry is not included.
+        
+        Returns:
+            dict: Dictionary containing all noise metrics
+        """
+        if self.n_samples == 0:
+            raise ValueError("No audio has been accumulated")
+        
+        n = self.n_samples
+        duration = n / self.sample_rate
+        
+        freq_kurtosises = []
+        freq_SPLs = []
+        for i in range(len(LEGACY_BAND_LABELS)):
+            if not self._band_available[i]:
+                freq_kurtosises.append(None)
+                freq_SPLs.append(None)
+                continue
+            n_blocks = int(self._band_block_moments[i][0])
+            band_kurtosis = self._kurtosis(n_blocks, self._band_block_moments[i][1:])
+            freq_kurtosises.append(round(band_kurtosis, 2) if band_kurtosis is not None else None)
+            freq_SPLs.append(self._level(self._band_energy[i], n))
+        
+        LAeq = self._level(self._moments["A"][1], n)
+        
+        return {
+            "frequency_kurtosis": pd.DataFrame(
+                dict(zip(LEGACY_BAND_LABELS, seq(freq_kurtosises).map(lambda x: [x])))),
+            "frequency_spl": pd.DataFrame(
+                dict(zip(LEGACY_BAND_LABELS, seq(freq_SPLs).map(lambda x: [x])))),
+            "total_kurtosis": self._kurtosis(n, self._moments["Z"]),
+            "a_weighted_kurtosis": self._kurtosis(n, self._moments["A"]),
+            "c_weighted_kurtosis": self._kurtosis(n, self._moments["C"]),
+            "leq": self._level(self._moments["Z"][1], n),
+            "laeq": LAeq,
+            "lceq": self._level(self._moments["C"][1], n),
+            "peak_spl": self._peak_level(self._peaks["Z"]),
+            "peak_aspl": self._peak_level(self._peaks["A"]),
+            "peak_cspl": self._peak_level(self._peaks["C"]),
+            "sampling_rate": self.sample_rate,
+            "duration": duration,
+            "channels": 1,
+            # Dose / TWA / LEX metrics
+            **AudioProcessor.dose_metrics(LAeq, duration),
+        }
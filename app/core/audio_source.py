@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+流式音频数据源
+按固定长度（默认1秒）逐块读取 WAV/FLAC (soundfile) 及 TDMS (nptdms) 文件，
+内存占用与文件时长无关，替代 librosa.load 一次性解码整个文件
+"""
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+from app.core.tdms_converter import TdmsChannelReader, TdmsGroupReader
+from app.utils import logger
+
+
+class AudioSource(ABC):
+    """
+    音频数据源基类
+
+    blocks() 按顺序产生单声道 float32 数据块（与 librosa.load(sr=None) 的结果一致），
+    除最后一块外长度均为 block_size，可从任意样本位置开始读取；支持 with 语句自动关闭
+    """
+
+    sample_rate: int = 0
+    n_samples: int = 0
+
+    @property
+    def duration(self) -> float:
+        return self.n_samples / self.sample_rate if self.sample_rate else 0.0
+
+    @abstractmethod
+    def blocks(self, block_size: Optional[int] = None, start: int = 0) -> Iterator[np.ndarray]:
+        """
+        逐块读取音频（子类实现）
+
+        Args:
+            block_size: 每块样本数，默认1秒
+            start: 起始样本位置
+        """
+
+    def read_all(self) -> np.ndarray:
+        """读取全部音频（仅用于短文件）"""
+        blocks = list(self.blocks())
+        return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> "AudioSource":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ArraySource(AudioSource):
+    """内存中的音频数组"""
+
+    def __init__(self, data: np.ndarray, sample_rate: int):
+        self.data = np.asarray(data)
+        self.sample_rate = int(sample_rate)
+        self.n_samples = len(self.data)
+
+    def blocks(self, block_size: Optional[int] = None, start: int = 0) -> Iterator[np.ndarray]:
+        block_size = int(block_size or self.sample_rate)
+        for offset in range(int(start), self.n_samples, block_size):
+            yield self.data[offset:offset + block_size]
+
+
+class SoundFileSource(AudioSource):
+    """soundfile 支持的音频文件（WAV/FLAC/OGG ...），多声道取平均混为单声道"""
+
+    def __init__(self, file_path: str):
+        self.file_path = str(file_path)
+        self._file = sf.SoundFile(self.file_path)
+        self.sample_rate = int(self._file.samplerate)
+        self.n_samples = int(self._file.frames)
+        self.channels = int(self._file.channels)
+
+    def blocks(self, block_size: Optional[int] = None, start: int = 0) -> Iterator[np.ndarray]:
+        block_size = int(block_size or self.sample_rate)
+        self._file.seek(min(int(start), self.n_samples))
+        for block in self._file.blocks(blocksize=block_size, dtype='float32', always_2d=True):
+            yield block[:, 0] if self.channels == 1 else np.mean(block, axis=1)
+
+    def close(self):
+        self._file.close()
+
+
+class TdmsSource(AudioSource):
+    """TDMS 文件中的单个通道（归一化方式与 TDMS 转 WAV 一致）"""
+
+    def __init__(self, file_path: str, sampling_rate: int = 44100,
+                 group_index: int = 0, channel_index: int = 0, scale: Optional[float] = None):
+        self.file_path = str(file_path)
+        self._reader = TdmsChannelReader(file_path, sampling_rate, group_index, channel_index,
+                                         scale=scale).open()
+        self.sample_rate = self._reader.sample_rate
+        self.n_samples = self._reader.n_samples
+
+    @property
+    def scale(self) -> float:
+        """归一化系数（浮点通道首次访问时扫描整个通道）"""
+        return self._reader.scale
+
+    def blocks(self, block_size: Optional[int] = None, start: int = 0) -> Iterator[np.ndarray]:
+        return self._reader.blocks(block_size, start)
+
+    def close(self):
+        self._reader.close()
+
+
+class TdmsGroupSource(AudioSource):
+    """
+    TDMS 文件中一个组的全部通道，一次遍历文件读取所有通道
+
+    channel_blocks() 每次产生各通道的数据块列表；blocks() 仅产生第一个通道（与 TdmsSource 一致）
+    """
+
+    def __init__(self, file_path: str, sampling_rate: int = 44100, group_index: int = 0):
+        self.file_path = str(file_path)
+        self._reader = TdmsGroupReader(file_path, sampling_rate, group_index).open()
+        self.sample_rate = self._reader.sample_rate
+        self.n_samples = self._reader.n_samples
+        self.channel_names = self._reader.channel_names
+
+    @property
+    def channels(self) -> int:
+        return len(self.channel_names)
+
+    def channel_blocks(self, block_size: Optional[int] = None) -> Iterator[List[np.ndarray]]:
+        """逐块读取所有通道，每次产生 [通道1数据块, 通道2数据块, ...]"""
+        return self._reader.channel_blocks(block_size or self.sample_rate)
+
+    def blocks(self, block_size: Optional[int] = None, start: int = 0) -> Iterator[np.ndarray]:
+        if not start:
+            for blocks in self.channel_blocks(block_size):
+                if len(blocks[0]) == 0:
+                    return
+                yield blocks[0]
+            return
+
+        # 段数据只能顺序读取：丢弃 start 之前的样本，其后重新按 block_size 分块
+        block_size = int(block_size or self.sample_rate)
+        skip = int(start)
+        pending = np.zeros(0, dtype=np.float32)
+        for blocks in self.channel_blocks(block_size):
+            block = blocks[0]
+            if len(block) == 0:
+                break
+            if skip >= len(block):
+                skip -= len(block)
+                continue
+            pending = np.concatenate([pending, block[skip:]])
+            skip = 0
+            while len(pending) >= block_size:
+                yield pending[:block_size]
+                pending = pending[block_size:]
+        if len(pending):
+            yield pending
+
+    def close(self):
+        self._reader.close()
+
+
+def _load_with_librosa(file_path: str) -> ArraySource:
+    """soundfile 无法读取的格式退回 librosa 整体解码"""
+    import librosa
+    import warnings
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        y, sr = librosa.load(file_path, sr=None)
+    return ArraySource(y, sr)
+
+
+def audio_duration(file_path: str, sampling_rate: int = 44100) -> float:
+    """
+    音频时长（秒），只读取文件头（TDMS 读取元数据，多通道取最长的通道）
+
+    Args:
+        file_path: 音频文件路径
+        sampling_rate: TDMS 通道没有采样率属性时使用的默认采样率
+    """
+    if Path(file_path).suffix.lower() == ".tdms":
+        with TdmsGroupSource(file_path, sampling_rate) as source:
+            return source.duration
+    try:
+        return float(sf.info(str(file_path)).duration)
+    except Exception:
+        import librosa
+        return float(librosa.get_duration(path=str(file_path)))
+
+
+def open_audio_source(file_path: str, sampling_rate: int = 44100,
+                      all_channels: bool = False) -> AudioSource:
+    """
+    按文件类型打开流式音频数据源
+
+    Args:
+        file_path: 音频文件路径（.tdms 或 soundfile 支持的格式）
+        sampling_rate: TDMS 通道没有采样率属性时使用的默认采样率
+        all_channels: TDMS 文件是否读取组内全部通道（返回 TdmsGroupSource）
+
+    Returns:
+        AudioSource: 数据源，使用 with 语句或 close() 释放文件
+    """
+    if Path(file_path).suffix.lower() == ".tdms":
+        if all_channels:
+            return TdmsGroupSource(file_path, sampling_rate)
+        return TdmsSource(file_path, sampling_rate)
+
+    try:
+        return SoundFileSource(file_path)
+    except Exception as e:
+        logger.warning(f"soundfile cannot stream {file_path} ({e}), decoding whole file with librosa")
+        try:
+            return _load_with_librosa(file_path)
+        except Exception as load_error:
+            raise RuntimeError(f"Failed to load audio file {file_path}: {str(load_error)}")
@@ -2,44 +2,70 @@
 Background tasks for audio processing with TimeHistory support
 """
 import asyncio
-from typing import Callable, List, Optional
+import math
+import threading
+from typing import Callable, Dict, List, Optional
 from pathlib import Path
-from datetime import datetime
-import concurrent.futures
-import os
+from datetime import datetime, timedelta
 
 from app.utils import logger
-from app.core.audio_processor import AudioProcessor
+from app.core.audio_source import audio_duration
 from app.core.file_monitor import AudioFileMonitor
-from app.core.tdms_converter import TDMSConverter
-from app.core.time_history_processor import TimeHistoryProcessor, aggregate_session_metrics
-from app.core.summary_processor import SummaryProcessor, AggregatedMetrics
+from app.core.ingestion import FileAnalysis, IngestionScheduler, analyze_file
+from app.core.ingestion_ledger import IngestionLedger, is_temporary_file
+from app.core.result_cache import ResultCache
+from app.core.work_queue import DurableWorkQueue, WorkItem
+from app.core.summary_processor import (
+    AggregatedMetrics, AggregationLevel, MultiLevelAggregator
+)
 from app.core.session_manager import SessionManager, SessionConfig, SessionState, session_registry
 from app.core.dose_calculator import DoseStandard
-from app.core.event_processor import EventProcessor
 from app.core.event_detector import EventInfo
 from app.database import DatabaseManager
 from app.models import ProcessingResultSchema
 
 
+# 持久化的汇总级别（逐级汇聚：1 分钟 -> 15 分钟 -> 1 小时，对应 time_history_1min / _15min / _1h 表）
+ROLLUP_LEVELS = (AggregationLevel.MINUTE, AggregationLevel.FIFTEEN_MINUTES, AggregationLevel.HOUR)
+
+
 class AudioProcessingTaskManager:
     """Manage audio processing background tasks with TimeHistory support"""
 
-    def __init__(self, watch_directory: str = "./audio_files"):
+    def __init__(self, watch_directory: str = "./audio_files", max_workers: Optional[int] = None,
+                 cache_dir: Optional[str] = "./Database/result_cache",
+                 db_manager: Optional[DatabaseManager] = None):
+        """
+        Args:
+            watch_directory: 监控目录
+            max_workers: 并行处理文件的工作进程数，默认 CPU 核数；
+                0 表示在队列消费线程中逐个处理（不使用进程池）
+            cache_dir: 计算结果缓存目录，内容相同的文件再次放入时直接回放缓存结果；None 表示不使用缓存
+            db_manager: 数据库管理器，默认使用 ./Database/noise_info.db
+        """
         self.watch_directory = watch_directory
         self.audio_monitor = AudioFileMonitor(watch_directory, [".tdms"])
-        self.audio_processor = AudioProcessor()
-        self.tdms_converter = TDMSConverter()
-        self.time_history_processor = TimeHistoryProcessor()
-        self.summary_processor = SummaryProcessor(aggregation_seconds=60)  # 1分钟汇聚
         self._current_minute_metrics: Optional[AggregatedMetrics] = None
-        self.event_processor: Optional[EventProcessor] = None
-        self.db_manager = DatabaseManager()
+        self.db_manager = db_manager if db_manager is not None else DatabaseManager()
         self.is_monitoring = False
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # 文件入库调度器（开始监控时创建）
+        self.max_workers = max_workers
+        self.scheduler: Optional[IngestionScheduler] = None
+        self.result_cache: Optional[ResultCache] = ResultCache(cache_dir) if cache_dir else None
+        # 持久化入库队列：文件监控写入，消费线程取出处理（开始监控时创建）
+        self.work_queue: Optional[DurableWorkQueue] = None
+        self._queue_consumer: Optional[threading.Thread] = None
+        self._stop_consuming = threading.Event()
+        # 文件入库记录：启动时跳过已处理的文件（开始监控时创建）
+        self.ledger: Optional[IngestionLedger] = None
         
         # Current session
         self.current_session: Optional[SessionManager] = None
+        # 多通道文件中附加通道（第2个及以后）的会话，按通道名索引
+        self.channel_sessions: Dict[str, SessionManager] = {}
+        # 各会话下一个文件第一秒的最早时间戳（按提交顺序分配，见 _assign_start_time）
+        self._next_start_times: Dict[str, datetime] = {}
+        self._start_time_lock = threading.Lock()
         self.auto_create_session = True  # 自动为每个文件创建会话
         self.enable_event_detection = True  # 启用事件检测
 
@@ -53,9 +79,48 @@ class AudioProcessingTaskManager:
             self.is_monitoring = True
             logger.info(
                 f"Starting audio file monitoring in {self.watch_directory}")
+            
+            if self.max_workers != 0 and self.scheduler is None:
+                self.scheduler = IngestionScheduler(max_workers=self.max_workers)
+                logger.info(f"Ingestion scheduler started with {self.scheduler.max_workers} workers")
+            
+            # 持久化队列：先恢复上次中断的文件，再启动消费线程
+            self.ledger = IngestionLedger(self.db_manager)
+            self.work_queue = DurableWorkQueue(self.db_manager)
+            self.work_queue.recover()
+            self._stop_consuming.clear()
+            self._queue_consumer = threading.Thread(
+                target=self._consume_work_queue, name="ingestion-queue-consumer", daemon=True)
+            self._queue_consumer.start()
 
-            # Start file monitoring
+            # Start file monitoring (files are queued once completely written)
             self.audio_monitor.start_monitoring(self._on_audio_file_detected)
+            
+            # 监控启动后扫描目录：服务停止期间写入的文件只要未处理过就加入队列
+            self.scan_backlog()
+    
+    def scan_backlog(self) -> List[str]:
+        """
+        扫描监控目录，将未处理（或处理后内容已变化）的文件加入入库队列
+        
+        Returns:
+            List[str]: 新加入队列的文件
+        """
+        if self.work_queue is None:
+            return []
+        try:
+            pending = self.ledger.scan_directory(self.watch_directory, self.audio_monitor.file_extensions)
+        except Exception as e:
+            logger.error(f"Error scanning {self.watch_directory} for unprocessed files: {e}")
+            return []
+        return [file_path for file_path in pending if self._queue_audio_file(file_path)]
+    
+    def _queue_audio_file(self, file_path: str) -> bool:
+        """文件加入持久化队列并更新入库记录"""
+        queued = self.work_queue.put(file_path)
+        if queued:
+            self.ledger.mark_queued(file_path)
+        return queued
 
     async def stop_monitoring(self):
         """Stop monitoring audio files"""
@@ -64,12 +129,24 @@ class AudioProcessingTaskManager:
             logger.info("Stopping audio file monitoring")
             self.audio_monitor.stop_monitoring()
             
+            # 停止从队列取文件，未取出的文件保留在队列中，下次启动时处理
+            self._stop_consuming.set()
+            if self.work_queue:
+                self.work_queue.wake()
+            if self._queue_consumer:
+                self._queue_consumer.join()
+                self._queue_consumer = None
+            
+            # 处理完已提交的文件后再停止会话
+            if self.scheduler:
+                self.scheduler.shutdown(wait=True)
+                self.scheduler = None
+            
             # Stop current session if exists
             if self.current_session and self.current_session.state == SessionState.RUNNING:
                 self.current_session.stop()
                 self._save_session_summary()
-            
-            self.executor.shutdown(wait=True)
+            self._stop_channel_sessions()
     
     def create_session(self, profile: DoseStandard = DoseStandard.NIOSH,
                        device_id: Optional[str] = None,
@@ -86,9 +163,11 @@ class AudioProcessingTaskManager:
             SessionManager: 会话管理器实例
         """
         # Stop existing session if running
+        self.wait_for_ingestion()
         if self.current_session and self.current_session.state == SessionState.RUNNING:
             self.current_session.stop()
             self._save_session_summary()
+        self._stop_channel_sessions()
         
         # Create new session
         config = SessionConfig(
@@ -107,8 +186,12 @@ class AudioProcessingTaskManager:
         if not self.current_session:
             return None
         
+        self.wait_for_ingestion()
         self.current_session.stop()
         summary = self._save_session_summary()
+        self._stop_channel_sessions()
+        with self._start_time_lock:
+            self._next_start_times.pop(self.current_session.session_id, None)
         
         return summary
     
@@ -123,61 +206,249 @@ class AudioProcessingTaskManager:
         logger.info(f"New audio file detected: {file_path}")
         # Check if this is a temporary WAV file created during TDMS conversion
         # We only want to process original files, not temporary conversion files
-        file_path_obj = Path(file_path)
-        if file_path_obj.name.startswith("temp_") or "_converted" in file_path_obj.name:
+        if is_temporary_file(file_path):
             logger.info(f"Skipping temporary file: {file_path}")
             return
         
-        # Process the audio file asynchronously using thread pool
+        # 监控中：只写入持久化队列，由消费线程处理（不阻塞文件监控）；
+        # 已处理且内容未变化的文件不再加入
+        if self.work_queue:
+            if not self.ledger.needs_ingestion(file_path):
+                logger.info(f"Skipping already ingested file: {file_path}")
+                return
+            self._queue_audio_file(file_path)
+            return
+        
+        # 分发到进程池并行处理，结果由调度器的写入线程按会话顺序保存
+        if self.scheduler:
+            self._submit_audio_file(file_path)
+            return
+        
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         loop.run_until_complete(self._process_audio_file(file_path))
         loop.close()
 
+    def _consume_work_queue(self):
+        """
+        队列消费线程：按加入顺序取出文件
+        
+        使用进程池时，同时处理中的文件数不超过工作进程数的2倍，其余文件留在持久化队列中；
+        不使用进程池时在本线程中逐个处理
+        """
+        limit = self.scheduler.max_workers * 2 if self.scheduler else 1
+        slots = threading.BoundedSemaphore(limit)
+        
+        while not self._stop_consuming.is_set():
+            if not slots.acquire(timeout=0.5):
+                continue
+            item = self.work_queue.get(timeout=0.5)
+            if item is None:
+                slots.release()
+                continue
+            self._dispatch_work_item(item, slots.release)
+    
+    def _dispatch_work_item(self, item: WorkItem, release: Callable[[], None]):
+        """处理队列中的一个文件，完成后更新队列状态及入库记录并释放处理名额"""
+        def finish(error: Optional[BaseException] = None, outputs: Optional[List[tuple]] = None):
+            try:
+                if error is None:
+                    self.work_queue.done(item)
+                    self._mark_ledger_finished(item.file_path, outputs)
+                else:
+                    self.work_queue.failed(item, error)
+                    self.ledger.mark_failed(item.file_path, error)
+            except Exception as e:
+                logger.error(f"Error updating ingestion queue for {item.file_path}: {e}")
+            finally:
+                release()
+        
+        try:
+            self.ledger.mark_started(item.file_path)
+        except Exception as e:
+            logger.error(f"Error updating ingestion ledger for {item.file_path}: {e}")
+        
+        if self.scheduler:
+            self._submit_audio_file(item.file_path, on_done=finish)
+            return
+        
+        loop = asyncio.new_event_loop()
+        try:
+            outputs = loop.run_until_complete(self._ingest_audio_file(item.file_path))
+        except Exception as e:
+            logger.error(f"Error processing audio file {item.file_path}: {str(e)}")
+            finish(e)
+        else:
+            finish(None, outputs)
+        finally:
+            loop.close()
+    
+    def _mark_ledger_finished(self, file_path: str, outputs: Optional[List[tuple]]):
+        """记录文件处理完成（音频时长取各通道中最长的）"""
+        durations = [results['duration'] for _, _, results in outputs or []
+                     if results and results.get('duration') is not None]
+        session_id = outputs[0][1].session_id if outputs else None
+        self.ledger.mark_finished(file_path, max(durations) if durations else None, session_id)
+
     async def _process_audio_file(self, file_path: str):
         """Process audio file asynchronously with TimeHistory support"""
-        wav_file_path = None
         try:
-            logger.info(f"Processing audio file: {file_path}")
-            
-            # Create or get session
-            session = self._get_or_create_session(file_path)
-            
-            # Check file extension
-            file_ext = Path(file_path).suffix.lower()
-            # If it's a TDMS file, convert it to WAV first
-            if file_ext == ".tdms":
-                logger.info(f"Converting TDMS file to WAV: {file_path}")
-                wav_file_path = self.tdms_converter.convert_tdms_to_wav(
-                    file_path)
-                processing_file_path = wav_file_path
-            else:
-                processing_file_path = file_path
-            
-            # Process the audio file with TimeHistory (per-second processing)
-            await self._process_with_timehistory(processing_file_path, session)
-            
-            # Also process the audio file for overall metrics (legacy)
-            results = self.audio_processor.process_wav_file(processing_file_path)
-            
-            # Save overall processing result
-            await self._save_processing_result(file_path, results, session.session_id)
-            
-            logger.info(f"Finished processing audio file: {file_path}")
-            
+            await self._ingest_audio_file(file_path)
         except Exception as e:
             logger.error(f"Error processing audio file {file_path}: {str(e)}")
             import traceback
             logger.error(traceback.format_exc())
+    
+    async def _ingest_audio_file(self, file_path: str) -> List[tuple]:
+        """
+        在当前线程中处理文件并保存结果（出错时抛出异常）
+        
+        Returns:
+            List[tuple]: 每个通道的 (channel_name, session, results)
+        """
+        logger.info(f"Processing audio file: {file_path}")
+        
+        # Create or get session
+        session = self._get_or_create_session(file_path)
+        
+        # Process the audio file with TimeHistory (per-second processing);
+        # overall metrics (legacy) are accumulated in the same pass.
+        # WAV/FLAC and TDMS files are streamed in 1 s blocks, all TDMS channels at once
+        outputs = await self._process_with_timehistory(file_path, session)
+        self.db_manager.flush_time_history()
+        
+        # Save overall processing result (one per channel)
+        for channel_name, channel_session, results in outputs:
+            if results is None:
+                continue
+            await self._save_processing_result(
+                file_path, results, channel_session.session_id, device_id=channel_name)
+        
+        logger.info(f"Finished processing audio file: {file_path}")
+        return outputs
+    
+    def _submit_audio_file(self, file_path: str,
+                           on_done: Optional[Callable[..., None]] = None):
+        """
+        提交文件到入库调度器
+        
+        文件在工作进程中由 analyze_file 计算（不访问数据库），结果经调度器的写入线程
+        按会话的提交顺序回放到会话并保存到数据库
+        
+        Args:
+            file_path: 文件路径
+            on_done: 保存完成（参数为 None 及各通道输出）或失败（参数为异常）后在写入线程中调用
+        """
+        finish = on_done or (lambda error, outputs=None: None)
+        
+        def on_result(analysis: FileAnalysis):
+            try:
+                outputs = self._apply_file_analysis(analysis, session)
+            except Exception as e:
+                finish(e)
+                raise
+            finish(None, outputs)
+        
+        def on_error(error: BaseException):
+            logger.error(f"Error processing audio file {file_path}: {str(error)}")
+            finish(error)
+        
+        try:
+            session = self._get_or_create_session(file_path)
+            self.scheduler.submit(
+                session.session_id, analyze_file, file_path,
+                session_id=session.session_id,
+                enable_event_detection=self.enable_event_detection,
+                result_cache=self.result_cache,
+                start_time=self._assign_start_time(session.session_id, file_path),
+                content_hash=self._known_content_hash(file_path),
+                on_result=on_result,
+                on_error=on_error
+            )
+            logger.info(f"Submitted audio file for processing: {file_path}")
+        except Exception as e:
+            logger.error(f"Error submitting audio file {file_path}: {str(e)}")
+            finish(e)
+    
+    def _apply_file_analysis(self, analysis: FileAnalysis, session: SessionManager) -> List[tuple]:
+        """
+        保存工作进程的计算结果（在调度器的写入线程中调用）
+        
+        Returns:
+            List[tuple]: 每个通道的 (channel_name, session, results)
+        """
+        self._record_content_hash(analysis)
+        outputs = []
+        for index, output in enumerate(analysis.channels):
+            sink = self._create_session_sink(index, output.channel_name, session, analysis.file_path)
+            output.replay(sink)
+            outputs.append((output.channel_name, sink.session, output.results))
+        self.db_manager.flush_time_history()
+        
+        loop = asyncio.new_event_loop()
+        try:
+            for channel_name, channel_session, results in outputs:
+                if results is None:
+                    continue
+                loop.run_until_complete(self._save_processing_result(
+                    analysis.file_path, results, channel_session.session_id, device_id=channel_name))
         finally:
-            # Clean up temporary WAV file if it was created
-            if wav_file_path and os.path.exists(wav_file_path):
-                try:
-                    os.remove(wav_file_path)
-                    logger.info(f"Deleted temporary WAV file: {wav_file_path}")
-                except Exception as e:
-                    logger.error(
-                        f"Error deleting temporary WAV file {wav_file_path}: {e}")
+            loop.close()
+        
+        logger.info(f"Finished processing audio file: {analysis.file_path} "
+                    f"({'replayed from cache' if analysis.cached else 'computed'} in {analysis.elapsed_s:.1f}s)")
+        return outputs
+    
+    def _known_content_hash(self, file_path: str) -> Optional[str]:
+        """入库记录中已保存的内容哈希（文件未变化时工作进程不必再读取整个文件计算）"""
+        if self.ledger is None or self.result_cache is None:
+            return None
+        try:
+            return self.ledger.known_content_hash(file_path)
+        except Exception as e:
+            logger.warning(f"Cannot read content hash of {file_path} from ingestion ledger: {e}")
+            return None
+    
+    def _record_content_hash(self, analysis: FileAnalysis):
+        """将工作进程计算的内容哈希保存到入库记录"""
+        if self.ledger is None or not analysis.content_hash:
+            return
+        try:
+            self.ledger.record_content_hash(analysis.file_path, analysis.content_hash)
+        except Exception as e:
+            logger.warning(f"Cannot record content hash of {analysis.file_path}: {e}")
+    
+    def _assign_start_time(self, session_id: str, file_path: str) -> datetime:
+        """
+        按提交顺序为会话中的文件分配第一秒的时间戳
+        
+        取当前时间与同一会话上一个文件结束时间中较晚者：同一会话的文件在不同工作进程中并行计算
+        （或由缓存回放）时，各文件的逐秒时间戳仍按提交顺序前后衔接、互不重叠。
+        文件时长只读取文件头得到，无法读取时按 0 秒计（文件随后在工作进程中计算失败）。
+        """
+        try:
+            seconds = math.ceil(audio_duration(file_path))
+        except Exception as e:
+            logger.warning(f"Cannot read duration of {file_path}: {e}")
+            seconds = 0
+        with self._start_time_lock:
+            start_time = datetime.utcnow()
+            previous_end = self._next_start_times.get(session_id)
+            if previous_end is not None and previous_end > start_time:
+                start_time = previous_end
+            self._next_start_times[session_id] = start_time + timedelta(seconds=seconds)
+        return start_time
+    
+    def wait_for_ingestion(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待已提交的文件全部处理并保存完成
+        
+        Returns:
+            bool: 超时前全部完成时为 True
+        """
+        if self.scheduler is None:
+            return True
+        return self.scheduler.wait(timeout)
     
     def _get_or_create_session(self, file_path: str) -> SessionManager:
         """获取或创建会话"""
@@ -198,81 +469,65 @@ class AudioProcessingTaskManager:
         else:
             raise RuntimeError("No active session and auto_create_session is disabled")
     
-    async def _process_with_timehistory(self, file_path: str, session: SessionManager):
-        """使用时间历程处理器按秒处理音频，同时检测事件"""
-        import librosa
-        import warnings
-        from acoustics import Signal
+    def _get_or_create_channel_session(self, channel_name: str, file_path: str) -> SessionManager:
+        """获取或创建多通道文件中附加通道的会话（设备ID为通道名）"""
+        session = self.channel_sessions.get(channel_name)
+        if session and session.state == SessionState.RUNNING:
+            return session
         
-        logger.info(f"Processing with TimeHistory: {file_path}")
+        config = SessionConfig(
+            profile=self.current_session.config.profile if self.current_session else DoseStandard.NIOSH,
+            device_id=channel_name,
+            notes=f"Auto-created session for channel {channel_name} of file: {Path(file_path).name}"
+        )
+        session = session_registry.create_session(config=config)
+        session.start()
+        self.channel_sessions[channel_name] = session
+        logger.info(f"Auto-created session {session.session_id} for channel {channel_name}")
+        return session
+    
+    def _stop_channel_sessions(self):
+        """停止附加通道的会话并保存摘要"""
+        for session in self.channel_sessions.values():
+            if session.state == SessionState.RUNNING:
+                session.stop()
+                self._save_session_summary(session)
+        self.channel_sessions.clear()
+    
+    async def _process_with_timehistory(self, file_path: str, session: SessionManager) -> List[tuple]:
+        """
+        使用时间历程处理器按秒处理音频，同时检测事件
         
-        # Load audio file
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", UserWarning)
-            y, sr = librosa.load(file_path, sr=None)
+        音频按1秒数据块流式读取（TDMS 直接读取通道数据），内存占用与文件时长无关；
+        音频只解码、滤波一次：整文件指标（原 AudioProcessor.process_wav_file 的结果）
+        由 WholeFileAccumulator 复用每秒已滤波的信号累加得到。
+        多通道 TDMS 文件一次遍历读取全部通道，每个通道由独立的 ChannelPipeline 处理
+        （第一个通道使用当前会话，其余通道使用以通道名为设备ID的会话），
+        每秒的结果直接写入会话及数据库。
         
-        signal = Signal(y, sr)
+        Returns:
+            List[tuple]: 每个通道的 (通道名, 会话, 整文件指标)，单通道文件的通道名为 None
+        """
+        logger.info(f"Processing with TimeHistory: {file_path}")
         
-        # Initialize event processor if enabled
-        if self.enable_event_detection:
-            self.event_processor = EventProcessor(
-                sample_rate=sr,
-                output_dir="./audio_events",
-                enable_audio_save=True
-            )
-            self.event_processor.start(session.session_id)
-            self.event_processor.add_event_callback(self._on_event_detected)
-            logger.info(f"Event detection started for session {session.session_id}")
-        
-        # Process per second
-        def on_second_processed(metrics):
-            """Callback for each second processed"""
-            # Update session
-            session.process_second(metrics)
-            
-            # Save to database (async)
-            try:
-                self._save_time_history_record(session.session_id, metrics)
-            except Exception as e:
-                logger.error(f"Error saving time history: {e}")
-            
-            # Aggregate to minute level using SummaryProcessor
-            try:
-                minute_metrics = self.summary_processor.add_second_metrics(metrics)
-                if minute_metrics is not None:
-                    # 保存分钟级汇聚结果
-                    self._current_minute_metrics = minute_metrics
-                    self._save_aggregated_metrics(session.session_id, minute_metrics)
-                    logger.info(f"Aggregated 1-minute metrics for session {session.session_id}, "
-                               f"LAeq={minute_metrics.LAeq}, beta={minute_metrics.beta_kurtosis}")
-            except Exception as e:
-                logger.error(f"Error in summary aggregation: {e}")
-        
-        # Set callback and process
-        self.time_history_processor.callback = on_second_processed
-        start_time = datetime.utcnow()
-        time_history = self.time_history_processor.process_signal_per_second(
-            signal, start_time=start_time)
-        
-        # Flush remaining seconds in buffer
-        remaining_minute = self.summary_processor.flush_remaining()
-        if remaining_minute is not None:
-            self._current_minute_metrics = remaining_minute
-            self._save_aggregated_metrics(session.session_id, remaining_minute)
-            logger.info(f"Flushed remaining minute metrics for session {session.session_id}")
-        
-        logger.info(f"Processed {len(time_history)} seconds for session {session.session_id}")
-        
-        # Stop event processor and get detected events
-        if self.event_processor:
-            events = self.event_processor.stop()
-            logger.info(f"Event detection complete: {len(events)} events detected")
-            
-            # Update session summary with event count
-            if self.current_session:
-                self.current_session.metrics.event_count = len(events)
-            
-            self.event_processor = None
+        analysis = analyze_file(
+            file_path,
+            session_id=session.session_id,
+            enable_event_detection=self.enable_event_detection,
+            sink_factory=lambda index, name: self._create_session_sink(index, name, session, file_path),
+            result_cache=self.result_cache,
+            start_time=self._assign_start_time(session.session_id, file_path),
+            content_hash=self._known_content_hash(file_path)
+        )
+        self._record_content_hash(analysis)
+        return [(sink.channel_name, sink.session, sink.results) for sink in analysis.channels]
+    
+    def _create_session_sink(self, index: int, channel_name: Optional[str],
+                             session: SessionManager, file_path: str) -> "SessionSink":
+        """创建通道输出端：第一个通道使用给定会话，其余通道使用以通道名为设备ID的会话"""
+        if index > 0:
+            session = self._get_or_create_channel_session(channel_name, file_path)
+        return SessionSink(self, session, channel_name)
     
     def _on_event_detected(self, event_info: EventInfo):
         """事件检测回调"""
@@ -300,29 +555,35 @@ class AudioProcessingTaskManager:
         except Exception as e:
             logger.error(f"Error saving event: {e}")
     
-    def _save_aggregated_metrics(self, session_id: str, metrics: AggregatedMetrics):
-        """保存时段汇聚结果到数据库"""
+    def _create_rollup_aggregator(self, sink: "SessionSink") -> MultiLevelAggregator:
+        """创建输出端的逐级汇聚器，各级别完成的时段写入对应的汇总表"""
+        aggregator = MultiLevelAggregator(align_to_clock=True)
+        for level in ROLLUP_LEVELS:
+            aggregator.add_level(
+                level,
+                callback=lambda metrics, level=level: self._save_aggregated_metrics(
+                    sink.session_id, metrics, level=level, device_id=sink.channel_name))
+        return aggregator
+    
+    def _save_aggregated_metrics(self, session_id: str, metrics: AggregatedMetrics,
+                                 level: AggregationLevel = AggregationLevel.MINUTE,
+                                 device_id: Optional[str] = None):
+        """保存时段汇聚结果到汇总表（同一时段已有记录时合并）"""
         try:
-            # 将 AggregatedMetrics 转换为字典保存
-            # 这里可以扩展数据库模型来专门存储分钟级数据
-            # 目前先记录日志，后续可以根据需要存储到专用表
-            logger.info(
-                f"Aggregated metrics saved for session {session_id}: "
-                f"duration={metrics.duration_s}s, "
-                f"LAeq={metrics.LAeq}, beta_kurtosis={metrics.beta_kurtosis}, "
-                f"valid={metrics.valid_flag}"
-            )
+            self.db_manager.save_rollup(level.value, session_id, metrics, device_id=device_id)
         except Exception as e:
             logger.error(f"Error saving aggregated metrics: {e}")
     
-    def _save_time_history_record(self, session_id: str, metrics):
-        """保存单条时间历程记录到数据库"""
+    def _save_time_history_record(self, session_id: str, metrics, device_id: Optional[str] = None):
+        """将单条时间历程记录加入数据库写缓冲（批量写入，文件或会话结束时立即写入）"""
         try:
-            self.db_manager.save_time_history(
+            self.db_manager.append_time_history(
                 session_id=session_id,
                 timestamp_utc=metrics.timestamp,
                 laeq=metrics.LAeq,
                 lceq=metrics.LCeq,
+                lzeq=metrics.LZeq,
+                lafmax=metrics.LAFmax,
                 lzpeak=metrics.LZpeak or 0.0,
                 lcpeak=metrics.LCpeak or 0.0,
                 dose_fracs={
@@ -332,7 +593,7 @@ class AudioProcessingTaskManager:
                     "EU_ISO": metrics.dose_frac_eu_iso,
                 },
                 duration_s=metrics.duration_s,
-                device_id=None,
+                device_id=device_id,
                 wearing_state=metrics.wearing_state,
                 overload_flag=metrics.overload_flag,
                 underrange_flag=metrics.underrange_flag,
@@ -371,8 +632,9 @@ class AudioProcessingTaskManager:
         except Exception as e:
             logger.error(f"Error in _save_time_history_record: {e}")
     
-    async def _save_processing_result(self, file_path: str, results: dict, session_id: str):
-        """保存处理结果到数据库"""
+    async def _save_processing_result(self, file_path: str, results: dict, session_id: str,
+                                      device_id: Optional[str] = None):
+        """保存处理结果到数据库（多通道文件的每个通道以通道名作为 device_id 分别保存）"""
         # Convert DataFrames to dictionaries for JSON serialization
         frequency_spl_dict = {}
         frequency_kurtosis_dict = {}
@@ -426,22 +688,29 @@ class AudioProcessingTaskManager:
         self.db_manager.save_processing_result(
             file_path=file_path, 
             metrics=metrics_dict,
-            session_id=session_id
+            session_id=session_id,
+            device_id=device_id
         )
     
-    def _save_session_summary(self) -> Optional[dict]:
-        """保存会话摘要到数据库"""
-        if not self.current_session:
+    def _save_session_summary(self, session: Optional[SessionManager] = None) -> Optional[dict]:
+        """保存会话摘要到数据库（默认为当前会话）"""
+        session = session or self.current_session
+        if not session:
             return None
         
         try:
-            summary = self.current_session.get_summary()
+            self.db_manager.flush_time_history()
+        except Exception as e:
+            logger.error(f"Error flushing time history for session {session.session_id}: {e}")
+        
+        try:
+            summary = session.get_summary()
             metrics = summary.get('metrics', {})
             profile_summary = summary.get('profile_summary', {})
             
             self.db_manager.save_session_summary(
-                session_id=self.current_session.session_id,
-                profile_name=self.current_session.config.profile.value,
+                session_id=session.session_id,
+                profile_name=session.config.profile.value,
                 start_time=datetime.fromisoformat(metrics.get('start_time')) if metrics.get('start_time') else datetime.utcnow(),
                 end_time=datetime.fromisoformat(metrics.get('end_time')) if metrics.get('end_time') else None,
                 total_duration_h=profile_summary.get('total_duration_h', 0),
@@ -455,7 +724,7 @@ class AudioProcessingTaskManager:
                 underrange_count=metrics.get('underrange_count', 0),
             )
             
-            logger.info(f"Saved session summary for {self.current_session.session_id}")
+            logger.info(f"Saved session summary for {session.session_id}")
             return summary
             
         except Exception as e:
@@ -463,3 +732,67 @@ class AudioProcessingTaskManager:
             import traceback
             logger.error(traceback.format_exc())
             return None
+
+
+class SessionSink:
+    """
+    ChannelPipeline 的输出端：将每秒指标、分钟汇聚及事件写入会话和数据库
+    
+    监控线程中直接处理文件时由流水线实时调用；进程池处理时由写入线程回放 ChannelOutput 调用
+    """
+    
+    def __init__(self, manager: AudioProcessingTaskManager, session: SessionManager,
+                 channel_name: Optional[str] = None):
+        """
+        Args:
+            manager: 任务管理器（负责数据库保存）
+            session: 该通道的会话
+            channel_name: 通道名（用作 device_id），单通道文件为 None
+        """
+        self.manager = manager
+        self.session = session
+        self.channel_name = channel_name
+        self.results: Optional[dict] = None
+        # 1 分钟 / 15 分钟 / 1 小时汇总（文件结束时输出未完成时段的部分结果，由数据库按时段合并）
+        self.rollups = manager._create_rollup_aggregator(self)
+    
+    @property
+    def session_id(self) -> str:
+        return self.session.session_id
+    
+    def on_second(self, metrics):
+        # Update session
+        self.session.process_second(metrics)
+        
+        # Save to database
+        try:
+            self.manager._save_time_history_record(self.session_id, metrics, device_id=self.channel_name)
+        except Exception as e:
+            logger.error(f"Error saving time history: {e}")
+        
+        try:
+            self.rollups.process_second(metrics)
+        except Exception as e:
+            logger.error(f"Error in rollup aggregation: {e}")
+    
+    def on_minute(self, metrics: AggregatedMetrics):
+        # 最新的分钟汇聚（汇总表由 on_second 的逐级汇聚写入）
+        self.manager._current_minute_metrics = metrics
+        logger.info(f"Aggregated 1-minute metrics for session {self.session_id}, "
+                    f"LAeq={metrics.LAeq}, beta={metrics.beta_kurtosis}")
+    
+    def on_event(self, event_info: EventInfo):
+        # 工作进程中检测到的事件记录的是提交时的会话ID，附加通道需改为该通道的会话
+        event_info.session_id = self.session_id
+        self.manager._on_event_detected(event_info)
+    
+    def on_finish(self, event_count: int, results: Optional[dict]):
+        try:
+            self.rollups.flush_all()
+        except Exception as e:
+            logger.error(f"Error flushing rollup aggregation: {e}")
+        
+        # Update session summary with event count
+        if self.manager.enable_event_detection:
+            self.session.metrics.event_count = event_count
+        self.results = results
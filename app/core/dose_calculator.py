@@ -194,7 +194,30 @@ class DoseCalculator:
         dose_increment = 100.0 * (duration_h / p.reference_duration) * (2 ** exponent)
         
         return dose_increment
-    
+
+    @classmethod
+    def calculate_dose_increments(cls, laeq: np.ndarray, duration_s: float,
+                                  profile) -> np.ndarray:
+        """
+        批量计算剂量增量（calculate_dose_increment 的向量化版本）
+
+        Args:
+            laeq: A计权等效声级数组 (dBA)
+            duration_s: 每个时间段的持续时间 (秒)
+            profile: DoseProfile, DoseStandard, or str
+
+        Returns:
+            np.ndarray: 每个时间段的剂量增量 (%)
+        """
+        p = cls._resolve_profile(profile)
+        laeq = np.asarray(laeq, dtype=np.float64)
+
+        duration_h = duration_s / 3600.0
+        exponent = (laeq - p.criterion_level) / p.exchange_rate
+        dose = 100.0 * (duration_h / p.reference_duration) * np.power(2.0, exponent)
+
+        return np.where(laeq < p.threshold, 0.0, dose)
+
     @classmethod
     def calculate_total_dose(cls, measurements: List[Tuple[float, float]], 
                              profile: DoseProfile) -> float:
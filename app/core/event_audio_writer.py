@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+事件音频异步写入器
+有界队列 + 后台线程编码并写入事件音频，避免磁盘IO阻塞事件检测与秒级处理；
+提供背压统计，队列满时按策略丢弃 (drop) 或在调用线程同步写入 (spill)；
+默认以 FLAC 无损压缩保存，可配置编码器及编码耗时预算
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+
+from app.core.audio_codec import AudioCodec, EncodeBudget
+from app.core.event_detector import EventInfo
+from app.core.ring_buffer import write_event_audio_file
+from app.utils import logger
+
+
+@dataclass
+class EventAudioJob:
+    """待写入的事件音频"""
+    event_info: EventInfo
+    audio: np.ndarray
+    sample_rate: int
+    output_dir: str
+    pretrigger_length: int = 0
+    on_done: Optional[Callable[[EventInfo], None]] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class EventAudioWriter:
+    """
+    事件音频异步写入器
+
+    - submit() 将事件音频放入有界队列，由后台线程写入文件
+    - 写入完成后设置 EventInfo.audio_file_path，再调用 on_done 回调
+      （回调在写入线程中执行；丢弃时 audio_file_path 为 None，回调仍会调用）
+    - 队列满时：
+        'drop'  丢弃该事件音频
+        'spill' 在调用线程中同步写入
+    - 编码单段音频耗时超过 encode_budget_ms 时，后续若干段改用 fallback_codec
+    """
+
+    POLICY_DROP = "drop"
+    POLICY_SPILL = "spill"
+
+    def __init__(self,
+                 max_queue_size: int = 32,
+                 overflow_policy: str = POLICY_SPILL,
+                 codec: Union[str, AudioCodec] = "flac",
+                 fallback_codec: Union[str, AudioCodec] = "wav_pcm24",
+                 encode_budget_ms: Optional[float] = None):
+        """
+        初始化写入器
+
+        Args:
+            max_queue_size: 队列最大长度
+            overflow_policy: 队列满时的处理策略，'drop' 或 'spill'
+            codec: 事件音频编码器，默认 FLAC (24-bit 无损)
+            fallback_codec: 超出编码耗时预算时使用的编码器
+            encode_budget_ms: 单段音频的编码耗时预算 (毫秒)，None 表示不限制
+        """
+        if overflow_policy not in (self.POLICY_DROP, self.POLICY_SPILL):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.encode_budget = EncodeBudget(codec, fallback_codec, encode_budget_ms)
+
+        self._queue: "queue.Queue[Optional[EventAudioJob]]" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._stop_requested = False
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._submitted = 0
+        self._written = 0
+        self._dropped = 0
+        self._spilled = 0
+        self._failed = 0
+        self._high_watermark = 0
+        self._total_write_s = 0.0
+        self._max_write_s = 0.0
+        self._total_wait_s = 0.0
+        self._max_wait_s = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动后台写入线程（上一次 stop() 超时、旧线程仍在写入时不会再启动新线程）"""
+        if self.is_running:
+            return
+        self._stop_requested = False
+        self._thread = threading.Thread(target=self._run, name="EventAudioWriter", daemon=True)
+        self._thread.start()
+        logger.info(f"EventAudioWriter started: max_queue_size={self.max_queue_size}, "
+                    f"policy={self.overflow_policy}, codec={self.encode_budget.codec.name}")
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """
+        写完队列中剩余的音频后停止后台线程
+
+        Args:
+            timeout: 等待线程结束的最长时间 (秒)，None 表示一直等待
+
+        Returns:
+            bool: 线程是否已结束；超时时保留线程引用（is_running 仍为 True），可再次调用 stop()
+        """
+        if not self.is_running:
+            self._thread = None
+            return True
+        if not self._stop_requested:
+            self._stop_requested = True
+            self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"EventAudioWriter still writing after {timeout}s, "
+                           f"{self._queue.qsize()} clip(s) pending: {self.get_stats()}")
+            return False
+        self._thread = None
+        logger.info(f"EventAudioWriter stopped: {self.get_stats()}")
+        return True
+
+    def flush(self):
+        """等待队列中的音频全部写入"""
+        if self.is_running:
+            self._queue.join()
+
+    def submit(self,
+               event_info: EventInfo,
+               audio: np.ndarray,
+               sample_rate: int,
+               output_dir: str,
+               pretrigger_length: int = 0,
+               on_done: Optional[Callable[[EventInfo], None]] = None) -> bool:
+        """
+        提交事件音频
+
+        Args:
+            event_info: 事件信息，写入完成后设置其 audio_file_path
+            audio: 事件音频（写入器持有该数组，调用方不应再修改）
+            sample_rate: 采样率
+            output_dir: 输出目录
+            pretrigger_length: pre-trigger 样本数
+            on_done: 写入完成（或丢弃）后的回调
+
+        Returns:
+            bool: 是否已写入或进入队列（被丢弃时返回 False）
+        """
+        job = EventAudioJob(event_info, audio, sample_rate, output_dir, pretrigger_length, on_done)
+
+        with self._stats_lock:
+            self._submitted += 1
+
+        if not self.is_running:
+            # 未启动时直接同步写入
+            self._write(job)
+            return True
+
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            if self.overflow_policy == self.POLICY_DROP:
+                with self._stats_lock:
+                    self._dropped += 1
+                logger.warning(f"Event audio queue full, dropping clip for {event_info.event_id}")
+                event_info.audio_file_path = None
+                self._notify(job)
+                return False
+
+            with self._stats_lock:
+                self._spilled += 1
+            logger.warning(f"Event audio queue full, writing clip for {event_info.event_id} synchronously")
+            self._write(job)
+            return True
+
+        with self._stats_lock:
+            self._high_watermark = max(self._high_watermark, self._queue.qsize())
+        return True
+
+    def _run(self):
+        """后台写入线程"""
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._write(job)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, job: EventAudioJob):
+        """写入单个事件音频并回调"""
+        started = time.monotonic()
+        wait_s = started - job.enqueued_at
+        codec = self.encode_budget.select()
+        try:
+            job.event_info.audio_file_path = write_event_audio_file(
+                job.event_info.event_id,
+                job.audio,
+                job.sample_rate,
+                job.output_dir,
+                job.pretrigger_length,
+                codec
+            )
+            write_s = time.monotonic() - started
+            self.encode_budget.record(codec, write_s)
+            with self._stats_lock:
+                self._written += 1
+                self._total_write_s += write_s
+                self._max_write_s = max(self._max_write_s, write_s)
+                self._total_wait_s += wait_s
+                self._max_wait_s = max(self._max_wait_s, wait_s)
+        except Exception as e:
+            job.event_info.audio_file_path = None
+            with self._stats_lock:
+                self._failed += 1
+            logger.error(f"Failed to save event audio for {job.event_info.event_id}: {e}")
+
+        self._notify(job)
+
+    @staticmethod
+    def _notify(job: EventAudioJob):
+        if job.on_done is None:
+            return
+        try:
+            job.on_done(job.event_info)
+        except Exception as e:
+            logger.error(f"Event audio callback error: {e}")
+
+    def get_stats(self) -> Dict:
+        """获取写入及背压统计信息"""
+        with self._stats_lock:
+            written = self._written
+            return {
+                'is_running': self.is_running,
+                'policy': self.overflow_policy,
+                'queue_size': self._queue.qsize(),
+                'max_queue_size': self.max_queue_size,
+                'high_watermark': self._high_watermark,
+                'submitted': self._submitted,
+                'written': written,
+                'dropped': self._dropped,
+                'spilled': self._spilled,
+                'failed': self._failed,
+                'avg_write_ms': round(self._total_write_s / written * 1000, 2) if written else 0.0,
+                'max_write_ms': round(self._max_write_s * 1000, 2),
+                'avg_queue_wait_ms': round(self._total_wait_s / written * 1000, 2) if written else 0.0,
+                'max_queue_wait_ms': round(self._max_wait_s * 1000, 2),
+                'encoding': self.encode_budget.get_stats(),
+            }
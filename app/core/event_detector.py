@@ -73,21 +73,41 @@ class EventInfo:
 
 
 class SlidingWindowCalculator:
-    """滑动窗口计算器 - 用于计算LZeq_125等"""
+    """
+    滑动窗口计算器 - 用于计算LZeq_125等
+    
+    以环形数组保存窗口内样本的平方值并维护滑动平方和，单样本更新为 O(1)；
+    每经过一个窗口长度的样本重新精确求和一次，消除浮点累加误差（漂移）。
+    process_block() 基于分段累加和一次性计算整个数据块的声级序列。
+    """
     
-    def __init__(self, window_duration_s: float = 0.125, sample_rate: int = 48000):
+    # process_block 中累加和分段长度，限制 cumsum 的数值误差
+    BLOCK_SEGMENT_SAMPLES = 65536
+    
+    def __init__(self, window_duration_s: float = 0.125, sample_rate: int = 48000,
+                 reference_pressure: float = 20e-6):
         """
         初始化滑动窗口计算器
         
         Args:
             window_duration_s: 窗口时长（秒），默认125ms
             sample_rate: 采样率
+            reference_pressure: 参考声压 (Pa)，默认 20 μPa
         """
         self.window_duration_s = window_duration_s
         self.sample_rate = sample_rate
-        self.window_samples = int(window_duration_s * sample_rate)
-        self.buffer = deque(maxlen=self.window_samples)
+        # 窗口至少 1 个样本（采样率极低时 int() 可能为 0）
+        self.window_samples = max(1, int(window_duration_s * sample_rate))
+        self.reference_pressure = reference_pressure
         
+        self._squares = np.zeros(self.window_samples)
+        self.reset()
+    
+    def _level_from_sum(self, sum_sq: float) -> float:
+        """由窗口平方和计算等效声级 Leq = 10 * log10( (1/n) * sum(p_i^2) / p0^2 )"""
+        mean_sq = sum_sq / self.window_samples
+        return 10 * np.log10(mean_sq / self.reference_pressure ** 2) if mean_sq > 0 else 0
+    
     def add_sample(self, sample: float) -> Optional[float]:
         """
         添加样本并返回当前窗口的等效声级
@@ -98,25 +118,90 @@ class SlidingWindowCalculator:
         Returns:
             float: 当前窗口的Leq (dB)，如果窗口未满则返回None
         """
-        self.buffer.append(sample)
+        sq = float(sample) * float(sample)
         
-        if len(self.buffer) < self.window_samples:
+        if self._count == self.window_samples:
+            self._sum_sq -= self._squares[self._pos]
+        else:
+            self._count += 1
+        self._squares[self._pos] = sq
+        self._sum_sq += sq
+        self._pos = (self._pos + 1) % self.window_samples
+        
+        # 漂移校正：每个窗口长度重新精确求和
+        self._since_resync += 1
+        if self._since_resync >= self.window_samples:
+            self._sum_sq = float(np.sum(self._squares[:self._count]))
+            self._since_resync = 0
+        
+        if self._count < self.window_samples:
             return None
         
-        # 计算窗口内的等效声级
-        # Leq = 10 * log10( (1/n) * sum(p_i^2) / p0^2 )
-        samples = np.array(self.buffer)
-        p_rms = np.sqrt(np.mean(samples ** 2))
+        return self._level_from_sum(max(self._sum_sq, 0.0))
+    
+    def _window_tail(self) -> np.ndarray:
+        """按时间顺序返回窗口内已有样本的平方值"""
+        if self._count < self.window_samples:
+            return self._squares[:self._count]
+        return np.concatenate((self._squares[self._pos:], self._squares[:self._pos]))
+    
+    def process_block(self, samples: np.ndarray) -> np.ndarray:
+        """
+        批量添加样本，返回每个样本对应的窗口等效声级
         
-        # 参考声压 20 μPa
-        p0 = 20e-6
-        leq_db = 20 * np.log10(p_rms / p0) if p_rms > 0 else 0
+        与逐个调用 add_sample 的结果一致，窗口未满的位置为 NaN。
         
-        return leq_db
+        Args:
+            samples: 声压样本 (Pa)
+            
+        Returns:
+            np.ndarray: 每个样本时刻的Leq (dB)
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        levels = np.empty(len(samples))
+        window = self.window_samples
+        
+        for seg_start in range(0, len(samples), self.BLOCK_SEGMENT_SAMPLES):
+            seg = samples[seg_start:seg_start + self.BLOCK_SEGMENT_SAMPLES]
+            tail = self._window_tail()
+            squares = np.concatenate((tail, seg * seg))
+            
+            # 以窗口尾部为起点的分段累加和
+            csum = np.empty(len(squares) + 1)
+            csum[0] = 0.0
+            np.cumsum(squares, out=csum[1:])
+            
+            # 第 k 个新样本在 squares 中的位置为 len(tail) + k
+            end = np.arange(len(tail) + 1, len(squares) + 1)
+            begin = end - window
+            valid = begin >= 0
+            sums = np.zeros(len(seg))
+            sums[valid] = csum[end[valid]] - csum[begin[valid]]
+            
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean_sq = np.maximum(sums, 0.0) / window
+                seg_levels = np.where(mean_sq > 0,
+                                      10 * np.log10(mean_sq / self.reference_pressure ** 2), 0.0)
+            seg_levels[~valid] = np.nan
+            levels[seg_start:seg_start + len(seg)] = seg_levels
+            
+            # 更新窗口状态（精确重算平方和）
+            new_tail = squares[-window:]
+            self._count = len(new_tail)
+            self._squares[:self._count] = new_tail
+            self._pos = self._count % window
+            self._sum_sq = float(np.sum(new_tail))
+            self._since_resync = 0
+        
+        return levels
     
     def reset(self):
         """重置缓冲区"""
-        self.buffer.clear()
+        self._squares[:] = 0.0
+        self._pos = 0
+        self._count = 0
+        self._sum_sq = 0.0
+        self._since_resync = 0
 
 
 class EventDetector:
@@ -280,6 +365,123 @@ class EventDetector:
         
         return None
     
+    def _sample_time(self, start_time: datetime, index: int) -> datetime:
+        """数据块内第 index 个样本的时间"""
+        return start_time + timedelta(seconds=index / self.sample_rate)
+    
+    def _peak_levels(self, samples: np.ndarray) -> np.ndarray:
+        """逐样本峰值声级，样本为0时记为0（与 process_sample 一致）"""
+        magnitude = np.abs(samples)
+        with np.errstate(divide='ignore'):
+            levels = 20 * np.log10(magnitude / self.reference_pressure)
+        return np.where(magnitude != 0, levels, 0.0)
+    
+    def _slope_trace(self, lzeq: np.ndarray) -> np.ndarray:
+        """
+        计算50ms斜率序列并更新斜率历史
+        
+        slope = 当前 LZeq_125 - (slope_window_samples - 1) 个有效值之前的 LZeq_125，
+        历史不足时为 NaN
+        """
+        slope = np.full(len(lzeq), np.nan)
+        valid_idx = np.flatnonzero(~np.isnan(lzeq))
+        if len(valid_idx) == 0:
+            return slope
+        
+        history = np.fromiter(self.leq_history, dtype=np.float64, count=len(self.leq_history))
+        sequence = np.concatenate((history, lzeq[valid_idx]))
+        lag = self.slope_window_samples - 1
+        
+        positions = np.arange(len(history), len(sequence))
+        has_slope = positions >= lag
+        slope[valid_idx[has_slope]] = sequence[positions[has_slope]] - sequence[positions[has_slope] - lag]
+        
+        self.leq_history.clear()
+        self.leq_history.extend(sequence[-self.slope_window_samples:])
+        return slope
+    
+    def process_block(self,
+                      samples_z: np.ndarray,
+                      samples_c: np.ndarray,
+                      start_time: datetime,
+                      session_id: str = "default") -> List[EventInfo]:
+        """
+        批量处理数据块（向量化）
+        
+        使用 NumPy 一次计算 LZeq_125、峰值及斜率序列，通过 np.flatnonzero 找出触发/结束位置，
+        去抖动与事件状态机只在这些位置上运行。结果与逐样本调用 process_sample 一致，
+        第 i 个样本的时间为 start_time + i / sample_rate。
+        
+        Args:
+            samples_z: Z计权声压样本 (Pa)
+            samples_c: C计权声压样本 (Pa)
+            start_time: 数据块第一个样本的时间
+            session_id: 会话ID
+            
+        Returns:
+            List[EventInfo]: 在该数据块内结束的事件
+        """
+        samples_z = np.asarray(samples_z, dtype=np.float64)
+        samples_c = np.asarray(samples_c, dtype=np.float64)
+        n = len(samples_z)
+        if n == 0:
+            return []
+        
+        lzeq = self.leq_125_calculator.process_block(samples_z)
+        lzpeak = self._peak_levels(samples_z)
+        lcpeak = self._peak_levels(samples_c)
+        slope = self._slope_trace(lzeq)
+        
+        # 触发条件（窗口未满时 LZeq_125 按0处理）与结束条件（滞后10dB）
+        with np.errstate(invalid='ignore'):
+            trigger_mask = ((lcpeak >= self.peak_threshold)
+                            | (np.nan_to_num(lzeq, nan=0.0) >= self.leq_threshold)
+                            | (slope >= self.slope_threshold))
+            end_mask = lzeq < self.leq_threshold - 10
+        trigger_idx = np.flatnonzero(trigger_mask)
+        end_idx = np.flatnonzero(end_mask)
+        
+        completed: List[EventInfo] = []
+        i = 0
+        while i < n:
+            if not self.is_in_event:
+                # 下一个满足去抖动条件的触发点
+                k = np.searchsorted(trigger_idx, i)
+                if self.last_event_time is not None and k < len(trigger_idx):
+                    elapsed = (self.last_event_time - start_time).total_seconds() + self.debounce_s
+                    earliest = max(int(np.floor(elapsed * self.sample_rate)) - 1, i)
+                    k = np.searchsorted(trigger_idx, earliest)
+                while k < len(trigger_idx) and not self._check_debounce(
+                        self._sample_time(start_time, trigger_idx[k])):
+                    k += 1
+                if k >= len(trigger_idx):
+                    break
+                
+                t = int(trigger_idx[k])
+                _, trigger_type = self._detect_trigger(
+                    lzeq[t] if not np.isnan(lzeq[t]) else 0,
+                    lcpeak[t],
+                    slope[t] if not np.isnan(slope[t]) else None
+                )
+                self._start_event(self._sample_time(start_time, t), session_id,
+                                  trigger_type, float(lzpeak[t]), float(lcpeak[t]))
+                i = t + 1
+            else:
+                # 事件中：更新峰值直到结束点（含结束样本）
+                k = np.searchsorted(end_idx, i)
+                stop = int(end_idx[k]) + 1 if k < len(end_idx) else n
+                if stop > i:
+                    self._update_event(float(np.max(lzpeak[i:stop])), float(np.max(lcpeak[i:stop])))
+                if k >= len(end_idx):
+                    break
+                
+                event_info = self._end_event(self._sample_time(start_time, stop - 1))
+                if event_info:
+                    completed.append(event_info)
+                i = stop
+        
+        return completed
+    
     def _start_event(self,
                      start_time: datetime,
                      session_id: str,
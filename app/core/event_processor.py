@@ -10,17 +10,21 @@
 """
 
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Callable
 from pathlib import Path
 import threading
 import queue
 
 from acoustics import Signal
+from scipy.signal import lfilter
 from scipy.stats import kurtosis
 
+from app.core.audio_source import AudioSource, open_audio_source
 from app.core.event_detector import EventDetector, EventInfo, TriggerType
+from app.core.filter_bank import FilterBank
 from app.core.ring_buffer import RingBuffer
+from app.core.event_audio_writer import EventAudioWriter
 from app.utils import logger
 
 
@@ -41,7 +45,9 @@ class EventProcessor:
                  peak_threshold: float = 130.0,
                  debounce_s: float = 0.5,
                  output_dir: str = "./audio_events",
-                 enable_audio_save: bool = True):
+                 enable_audio_save: bool = True,
+                 audio_writer: Optional[EventAudioWriter] = None,
+                 audio_codec: str = "flac"):
         """
         初始化事件处理器
         
@@ -52,6 +58,8 @@ class EventProcessor:
             debounce_s: 去抖动时间 (秒)
             output_dir: 事件音频输出目录
             enable_audio_save: 是否保存事件音频
+            audio_writer: 事件音频异步写入器，默认创建独立的写入器；多个处理器可共享同一写入器
+            audio_codec: 默认写入器使用的编码器（'flac' / 'wav_pcm24' / 'wav' ...），传入 audio_writer 时忽略
         """
         self.sample_rate = sample_rate
         self.output_dir = output_dir
@@ -65,6 +73,11 @@ class EventProcessor:
             sample_rate=sample_rate
         )
         
+        # C计权滤波器（按采样率缓存设计，状态 zi 跨音频块保持），用于LCpeak触发；
+        # 事件检测只需要C计权，不使用 StreamingFilterBank（其A计权及频段滤波器状态在此无用）
+        self._c_weighting = FilterBank.for_sample_rate(sample_rate).c_weighting
+        self._reset_c_weighting()
+        
         # 创建环形缓冲区 (12秒缓冲，2秒pre-trigger，8秒post-trigger)
         self.ring_buffer = RingBuffer(
             sample_rate=sample_rate,
@@ -74,13 +87,21 @@ class EventProcessor:
             channels=1
         )
         
+        # 事件音频异步写入器
+        self._owns_audio_writer = audio_writer is None
+        self.audio_writer = audio_writer or EventAudioWriter(codec=audio_codec)
+        
         # 状态
         self.is_running = False
         self.session_id: Optional[str] = None
         
         # 事件收集
         self.events: List[EventInfo] = []
-        self.current_event_post_data: Optional[List[float]] = None
+        # 正在录制 post-trigger 音频的事件（录制数据写入 ring_buffer.capture）
+        self._recording_event: Optional[EventInfo] = None
+        # 当前正在检测的音频块（用于定位触发点）
+        self._chunk_data: Optional[np.ndarray] = None
+        self._chunk_start_time: Optional[datetime] = None
         
         # 回调
         self.event_callbacks: List[Callable[[EventInfo], None]] = []
@@ -99,6 +120,17 @@ class EventProcessor:
         """添加事件回调函数"""
         self.event_callbacks.append(callback)
     
+    def _reset_c_weighting(self):
+        """重置C计权滤波器状态（新的不连续信号开始时调用）"""
+        b, a = self._c_weighting
+        self._c_weighting_zi = np.zeros(max(len(a), len(b)) - 1)
+
+    def _weigh_c(self, data: np.ndarray) -> np.ndarray:
+        """C计权（延续上一块的状态）"""
+        b, a = self._c_weighting
+        out, self._c_weighting_zi = lfilter(b, a, data, zi=self._c_weighting_zi)
+        return out
+
     def start(self, session_id: str):
         """
         开始事件处理
@@ -109,7 +141,11 @@ class EventProcessor:
         self.is_running = True
         self.session_id = session_id
         self.events = []
+        self._recording_event = None
         self.ring_buffer.clear()
+        self._reset_c_weighting()
+        if self.enable_audio_save:
+            self.audio_writer.start()
         
         logger.info(f"EventProcessor started for session: {session_id}")
     
@@ -122,11 +158,21 @@ class EventProcessor:
         """
         self.is_running = False
         
-        # 强制结束当前事件
+        # 强制结束当前事件（强制结束的事件不保存音频）
         if self.event_detector.is_in_event:
-            event_info = self.event_detector.force_end_event(datetime.now())
-            if event_info:
-                self._finalize_event(event_info)
+            forced_event = self.event_detector.force_end_event(datetime.now())
+            if forced_event is not None and forced_event is self._recording_event:
+                self._finish_event_recording(save_audio=False)
+        
+        # 已结束但 post-trigger 尚未录满的事件：保存已录制部分
+        if self._recording_event is not None:
+            self._finish_event_recording()
+        
+        # 等待事件音频写入完成
+        if self._owns_audio_writer:
+            self.audio_writer.stop()
+        else:
+            self.audio_writer.flush()
         
         logger.info(f"EventProcessor stopped. Total events: {len(self.events)}")
         
@@ -151,98 +197,120 @@ class EventProcessor:
         if timestamp is None:
             timestamp = datetime.now()
         
+        audio_data = np.asarray(audio_data, dtype=np.float32)
+        
         # 写入环形缓冲区
-        self.ring_buffer.write(audio_data.astype(np.float32))
+        self.ring_buffer.write(audio_data)
         
-        # 如果正在记录事件后数据
-        if self.current_event_post_data is not None:
-            self.current_event_post_data.extend(audio_data.tolist())
-            
-            # 检查是否达到post-trigger时长
-            post_samples_needed = int(self.ring_buffer.posttrigger_s * self.sample_rate)
-            if len(self.current_event_post_data) >= post_samples_needed:
+        # 如果正在记录事件后数据，写入预分配的事件缓冲区
+        finished_event = None
+        if self._recording_event is not None:
+            self.ring_buffer.capture.write(audio_data)
+            if self._recording_ready():
                 # 事件录制完成
-                return self._finish_event_recording()
-        
-        # 处理每个样本进行事件检测
-        # 注意：这里简化为逐样本处理，实际应该使用滑动窗口
-        # 为简化实现，我们每隔一段时间检查一次
-        completed_event = None
-        for sample in audio_data:
-            event_info = self.event_detector.process_sample(
-                sample_z=sample,
-                sample_c=sample,  # 简化：假设C计权与Z计权相同
-                current_time=timestamp,
+                finished_event = self._finish_event_recording()
+        
+        # 整块向量化事件检测，第 i 个样本的时间为 timestamp + i / sample_rate
+        self._chunk_data = audio_data
+        self._chunk_start_time = timestamp
+        try:
+            completed_events = self.event_detector.process_block(
+                samples_z=audio_data,
+                samples_c=self._weigh_c(audio_data),
+                start_time=timestamp,
                 session_id=self.session_id or "default"
             )
-            if event_info:
-                completed_event = event_info
-                break
+        finally:
+            self._chunk_data = None
+            self._chunk_start_time = None
+        
+        # 事件在本块内结束且 post-trigger 已录满时完成录制
+        if finished_event is None and self._recording_ready():
+            finished_event = self._finish_event_recording()
         
-        return completed_event
+        if finished_event is not None:
+            return finished_event
+        return completed_events[-1] if completed_events else None
+    
+    def _recording_ready(self) -> bool:
+        """当前录制事件已结束且 post-trigger 数据已录满"""
+        return (self._recording_event is not None
+                and self._recording_event.end_time is not None
+                and self.ring_buffer.capture.is_complete)
     
     def _on_event_start(self, event_info: EventInfo):
         """事件开始回调"""
+        if self._recording_event is not None:
+            # 上一事件的 post-trigger 录制尚未完成，本事件已包含在其音频中
+            logger.debug(f"Event {event_info.event_id} falls inside the recording of "
+                         f"{self._recording_event.event_id}")
+            return
+        
         logger.info(f"Event started recording: {event_info.event_id}")
         
-        # 开始收集post-trigger数据
-        self.current_event_post_data = []
+        # 定位触发点在当前音频块中的位置，pre-trigger 取触发点之前的数据
+        chunk = self._chunk_data if self._chunk_data is not None else np.zeros(0, dtype=np.float32)
+        trigger_index = len(chunk)
+        if self._chunk_start_time is not None:
+            offset_s = (event_info.start_time - self._chunk_start_time).total_seconds()
+            trigger_index = min(max(int(round(offset_s * self.sample_rate)), 0), len(chunk))
+        
+        self.ring_buffer.begin_capture(trigger_offset=len(chunk) - trigger_index)
+        self.ring_buffer.capture.write(chunk[trigger_index:])
+        self._recording_event = event_info
     
     def _on_event_end(self, event_info: EventInfo):
         """事件结束回调"""
-        logger.info(f"Event ended: {event_info.event_id}, waiting for post-trigger data")
+        self.events.append(event_info)
+        
+        if event_info is self._recording_event:
+            logger.info(f"Event ended: {event_info.event_id}, waiting for post-trigger data")
+        else:
+            # 未单独录音的事件（位于其他事件的录音中）直接完成
+            logger.info(f"Event ended: {event_info.event_id}")
+            self._finalize_event(event_info)
         
         # 事件结束，但post-trigger数据收集可能还未完成
         # 等待_process_audio_chunk完成post-trigger收集
     
-    def _finish_event_recording(self) -> Optional[EventInfo]:
+    def _finish_event_recording(self, save_audio: bool = True) -> Optional[EventInfo]:
         """完成事件录制"""
-        if self.current_event_post_data is None:
-            return None
-        
-        # 获取当前事件信息
-        if not self.events:
-            self.current_event_post_data = None
+        event_info = self._recording_event
+        if event_info is None:
             return None
         
-        # 获取最后一个事件
-        event_info = self.events[-1]
-        
-        # 保存事件音频
-        if self.enable_audio_save and self.current_event_post_data:
-            try:
-                post_data = np.array(self.current_event_post_data[:self.ring_buffer.posttrigger_samples])
-                audio_path = self.ring_buffer.save_event_audio(
-                    event_id=event_info.event_id,
-                    posttrigger_data=post_data,
-                    output_dir=self.output_dir
-                )
-                event_info.audio_file_path = audio_path
-                logger.info(f"Event audio saved: {audio_path}")
-            except Exception as e:
-                logger.error(f"Failed to save event audio: {e}")
+        capture = self.ring_buffer.capture
         
         # 计算事件指标
         self._calculate_event_metrics(event_info)
         
-        # 清理
-        self.current_event_post_data = None
+        # 事件音频交给异步写入器，写入完成后设置 audio_file_path 并调用外部回调
+        if save_audio and self.enable_audio_save and capture.posttrigger_written > 0:
+            self.audio_writer.submit(
+                event_info,
+                capture.view().copy(),
+                self.sample_rate,
+                self.output_dir,
+                pretrigger_length=capture.pretrigger_length,
+                on_done=self._notify_event_callbacks
+            )
+        else:
+            self._notify_event_callbacks(event_info)
         
-        # 调用外部回调
-        for callback in self.event_callbacks:
-            try:
-                callback(event_info)
-            except Exception as e:
-                logger.error(f"Event callback error: {e}")
+        # 清理
+        capture.reset()
+        self._recording_event = None
         
         return event_info
     
     def _finalize_event(self, event_info: EventInfo):
-        """最终化事件（强制结束时调用）"""
-        event_info.audio_file_path = None  # 强制结束不保存音频
-        self.events.append(event_info)
-        
-        # 调用回调
+        """最终化没有独立事件音频的事件"""
+        event_info.audio_file_path = None
+        self._calculate_event_metrics(event_info)
+        self._notify_event_callbacks(event_info)
+    
+    def _notify_event_callbacks(self, event_info: EventInfo):
+        """调用外部事件回调（保存音频的事件在写入线程中回调）"""
         for callback in self.event_callbacks:
             try:
                 callback(event_info)
@@ -275,6 +343,7 @@ class EventProcessor:
             'session_id': self.session_id,
             'event_count': len(self.events),
             'buffer_info': self.ring_buffer.get_buffer_info(),
+            'audio_writer': self.audio_writer.get_stats(),
             'detector_stats': self.event_detector.get_stats(),
         }
 
@@ -311,15 +380,26 @@ class BatchEventProcessor:
         Returns:
             List[EventInfo]: 检测到的事件列表
         """
-        import librosa
-        import warnings
-        
         logger.info(f"Processing file for events: {file_path}")
         
-        # 加载音频
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", UserWarning)
-            y, sr = librosa.load(file_path, sr=None)
+        # 按1秒数据块流式读取音频
+        with open_audio_source(file_path) as source:
+            return self.process_source(source, session_id)
+    
+    def process_source(self,
+                       source: AudioSource,
+                       session_id: str = "default") -> List[EventInfo]:
+        """
+        处理音频数据源，检测事件
+        
+        Args:
+            source: 流式音频数据源
+            session_id: 会话ID
+            
+        Returns:
+            List[EventInfo]: 检测到的事件列表
+        """
+        sr = source.sample_rate
         
         # 创建事件处理器
         processor = EventProcessor(
@@ -332,14 +412,14 @@ class BatchEventProcessor:
         
         processor.start(session_id)
         
-        # 分段处理（每段1秒）
+        # 分段处理（每段1秒），各段时间戳按样本位置连续递增
         chunk_size = sr
-        for i in range(0, len(y), chunk_size):
-            chunk = y[i:i+chunk_size]
+        start_time = datetime.now()
+        for i, chunk in enumerate(source.blocks(chunk_size)):
             if len(chunk) < chunk_size:
                 chunk = np.pad(chunk, (0, chunk_size - len(chunk)))
             
-            timestamp = datetime.now()
+            timestamp = start_time + timedelta(seconds=i)
             processor.process_audio_chunk(chunk, timestamp)
         
         events = processor.stop()
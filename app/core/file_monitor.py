@@ -1,59 +1,181 @@
 """
 File monitoring module for watching audio files
+
+The watchdog thread only records file activity. A file is reported once it has
+settled: either a close-after-write event arrived, or its size and mtime did
+not change for ``settle_seconds``. Reporting happens on the tracker thread, so
+a slow callback never delays later filesystem events.
 """
 import os
+import threading
 import time
 from pathlib import Path
-from typing import Callable, Optional, List
+from typing import Callable, Dict, Optional, List, Tuple
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+from app.utils import logger
+
+
+class FileSettleTracker:
+    """Report files once they are completely written
+
+    ``touch`` records activity on a path (creation, modification, move). A
+    polling thread stats every tracked file and reports it when its size and
+    mtime have been stable for ``settle_seconds``. ``mark_closed`` (close after
+    write) reports the file on the next poll without waiting.
+    """
+
+    def __init__(self, on_settled: Callable[[str], None],
+                 settle_seconds: float = 2.0, poll_interval: float = 0.5):
+        """
+        Args:
+            on_settled: Called with the path of each settled file
+            settle_seconds: Time size and mtime must stay unchanged
+            poll_interval: Interval between stat checks
+        """
+        self.on_settled = on_settled
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        # path -> (size, mtime_ns, time the stat last changed, closed)
+        self._files: Dict[str, Tuple[int, int, float, bool]] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending(self) -> int:
+        """Number of files not settled yet"""
+        with self._lock:
+            return len(self._files)
+
+    def touch(self, path: str):
+        """Record activity on a file"""
+        with self._lock:
+            _, _, _, closed = self._files.get(path, (-1, -1, 0.0, False))
+            self._files[path] = (-1, -1, time.monotonic(), closed)
+
+    def refresh(self, path: str):
+        """Record activity on a file only if it is already tracked"""
+        with self._lock:
+            if path in self._files:
+                self._files[path] = (-1, -1, time.monotonic(), self._files[path][3])
+
+    def mark_closed(self, path: str):
+        """Record that a writer closed the file"""
+        with self._lock:
+            self._files[path] = (-1, -1, time.monotonic(), True)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="file-settle-tracker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self.poll()
+
+    def poll(self) -> List[str]:
+        """Check all tracked files once and report the settled ones"""
+        now = time.monotonic()
+        settled = []
+        with self._lock:
+            for path, (size, mtime_ns, changed_at, closed) in list(self._files.items()):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Removed or renamed before it settled
+                    del self._files[path]
+                    continue
+
+                if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                    self._files[path] = (stat.st_size, stat.st_mtime_ns, now, closed)
+                    if not closed:
+                        continue
+                elif not closed and now - changed_at < self.settle_seconds:
+                    continue
+
+                del self._files[path]
+                settled.append(path)
+
+        for path in settled:
+            try:
+                self.on_settled(path)
+            except Exception as e:
+                logger.error(f"Error handling settled file {path}: {e}")
+        return settled
+
 
 class AudioFileHandler(FileSystemEventHandler):
     """Handler for audio file events"""
-    def __init__(self, callback: Callable[[str], None], file_extensions: List[str] = None):
+    def __init__(self, callback: Callable[[str], None], file_extensions: List[str] = None,
+                 tracker: Optional[FileSettleTracker] = None):
         self.callback = callback
         self.file_extensions = file_extensions or [".wav"]
-    
+        self.tracker = tracker or FileSettleTracker(callback)
+
+    def _matches(self, path: str) -> bool:
+        return any(path.endswith(ext) for ext in self.file_extensions)
+
     def on_created(self, event):
         """Handle file creation events"""
-        if not event.is_directory:
-            # Check if file extension matches any of the watched extensions
-            for ext in self.file_extensions:
-                if event.src_path.endswith(ext):
-                    # Add small delay to ensure file is completely written
-                    time.sleep(0.1)
-                    self.callback(event.src_path)
-                    break
-    
+        if not event.is_directory and self._matches(event.src_path):
+            self.tracker.touch(event.src_path)
+
     def on_modified(self, event):
-        """Handle file modification events"""
-        pass
-        # if not event.is_directory:
-        #     # Check if file extension matches any of the watched extensions
-        #     for ext in self.file_extensions:
-        #         if event.src_path.endswith(ext):
-        #             self.callback(event.src_path)
-        #             break
+        """Handle file modification events (only files still being written are tracked)"""
+        if not event.is_directory and self._matches(event.src_path):
+            self.tracker.refresh(event.src_path)
+
+    def on_moved(self, event):
+        """Handle files renamed into a watched name (e.g. copy to temp name, then rename)"""
+        if not event.is_directory and self._matches(event.dest_path):
+            self.tracker.touch(event.dest_path)
+
+    def on_closed(self, event):
+        """Handle close-after-write events (inotify only)"""
+        if not event.is_directory and self._matches(event.src_path):
+            self.tracker.mark_closed(event.src_path)
 
 class AudioFileMonitor:
     """Monitor audio files in a directory"""
-    def __init__(self, watch_directory: str, file_extensions: List[str] = None):
+    def __init__(self, watch_directory: str, file_extensions: List[str] = None,
+                 settle_seconds: float = 2.0, poll_interval: float = 0.5):
         self.watch_directory = Path(watch_directory)
         self.file_extensions = file_extensions or [".wav"]
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
         self.observer = Observer()
         self.handler = None
-        
+
     def start_monitoring(self, callback: Callable[[str], None]):
-        """Start monitoring the directory for audio files"""
+        """Start monitoring the directory for audio files
+
+        ``callback`` is called on the tracker thread once per completely
+        written file; it should hand the path off (e.g. to a work queue).
+        """
         if not self.watch_directory.exists():
             raise FileNotFoundError(f"Directory {self.watch_directory} does not exist")
-        
-        self.handler = AudioFileHandler(callback, self.file_extensions)
+
+        tracker = FileSettleTracker(callback, self.settle_seconds, self.poll_interval)
+        # Observer threads cannot be restarted, create a new one on every start
+        self.observer = Observer()
+        self.handler = AudioFileHandler(callback, self.file_extensions, tracker)
         self.observer.schedule(self.handler, str(self.watch_directory), recursive=False)
+        tracker.start()
         self.observer.start()
-        
+
     def stop_monitoring(self):
         """Stop monitoring the directory"""
         self.observer.stop()
-        self.observer.join()
\ No newline at end of file
+        self.observer.join()
+        if self.handler:
+            self.handler.tracker.stop()
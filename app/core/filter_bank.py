@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+滤波器组
+按采样率一次性设计A/C计权滤波器及9个1/3倍频程频段滤波器（63Hz-16kHz）并缓存，
+避免每秒重复构造 acoustics.Signal 及重新设计IIR滤波器
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.signal import bilinear, lfilter, sosfilt
+from acoustics.signal import OctaveBand, bandpass_filter
+from acoustics.standards.iec_61672_1_2013 import WEIGHTING_SYSTEMS
+
+
+# 关心的9个1/3倍频程频段（对应 third_octaves() 索引 8, 11, ..., 32）
+BAND_NAMES = ['63Hz', '125Hz', '250Hz', '500Hz', '1kHz', '2kHz', '4kHz', '8kHz', '16kHz']
+BAND_CENTER_FREQUENCIES = np.array([63.0, 125.0, 250.0, 500.0, 1000.0, 2000.0, 4000.0, 8000.0, 16000.0])
+# SecondMetrics 中对应频段字段的前缀，如 freq_63hz_spl / freq_63hz_s1
+BAND_FIELD_PREFIXES = ['freq_63hz', 'freq_125hz', 'freq_250hz', 'freq_500hz', 'freq_1khz',
+                       'freq_2khz', 'freq_4khz', 'freq_8khz', 'freq_16khz']
+
+# 与 acoustics.Signal.third_octaves() 保持一致的带通滤波器阶数
+BAND_FILTER_ORDER = 8
+
+
+class FilterBank:
+    """
+    单一采样率下的滤波器组
+
+    滤波器系数与 acoustics 库完全一致：
+    - A/C计权: bilinear 变换得到 (b, a)，使用 lfilter
+    - 频段: Butterworth 带通 (sos)，使用 sosfilt；上限频率超过奈奎斯特频率的频段为 None
+    """
+
+    _cache: Dict[int, "FilterBank"] = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = int(sample_rate)
+
+        self.a_weighting = self._design_weighting("A")
+        self.c_weighting = self._design_weighting("C")
+
+        bands = OctaveBand(center=BAND_CENTER_FREQUENCIES, fraction=3)
+        nyquist = self.sample_rate / 2.0
+        self.band_sos: List[Optional[np.ndarray]] = []
+        for lower, upper in zip(bands.lower, bands.upper):
+            if upper < nyquist:
+                self.band_sos.append(bandpass_filter(lower, upper, self.sample_rate, order=BAND_FILTER_ORDER))
+            else:
+                self.band_sos.append(None)
+
+    @classmethod
+    def for_sample_rate(cls, sample_rate: int) -> "FilterBank":
+        """获取指定采样率的滤波器组（同一采样率只设计一次）"""
+        sample_rate = int(sample_rate)
+        bank = cls._cache.get(sample_rate)
+        if bank is None:
+            with cls._cache_lock:
+                bank = cls._cache.get(sample_rate)
+                if bank is None:
+                    bank = cls(sample_rate)
+                    cls._cache[sample_rate] = bank
+        return bank
+
+    def _design_weighting(self, weighting: str) -> Tuple[np.ndarray, np.ndarray]:
+        """设计计权滤波器，与 acoustics.Signal.weigh() 相同"""
+        num, den = WEIGHTING_SYSTEMS[weighting]()
+        return bilinear(num, den, self.sample_rate)
+
+    def weigh_a(self, data: np.ndarray) -> np.ndarray:
+        """A计权"""
+        b, a = self.a_weighting
+        return lfilter(b, a, data)
+
+    def weigh_c(self, data: np.ndarray) -> np.ndarray:
+        """C计权"""
+        b, a = self.c_weighting
+        return lfilter(b, a, data)
+
+    def filter_bands(self, data: np.ndarray) -> List[Optional[np.ndarray]]:
+        """对9个频段进行带通滤波，不可用的频段返回 None"""
+        return [sosfilt(sos, data) if sos is not None else None for sos in self.band_sos]
+
+
+def get_filter_bank(sample_rate: int) -> FilterBank:
+    """获取指定采样率的缓存滤波器组"""
+    return FilterBank.for_sample_rate(sample_rate)
+
+
+class StreamingFilterBank:
+    """
+    带状态的流式滤波器组
+
+    为A/C计权及每个频段保存滤波器状态 zi，连续的数据块（来自文件、socket或实时设备）
+    逐块送入时每个样本只滤波一次，结果与整段信号一次性滤波逐位一致。
+    每个会话/通道应使用独立的实例。
+    """
+
+    def __init__(self, sample_rate: int):
+        self.bank = FilterBank.for_sample_rate(sample_rate)
+        self.sample_rate = self.bank.sample_rate
+        self.reset()
+
+    @staticmethod
+    def _initial_lfilter_state(ba: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+        b, a = ba
+        return np.zeros(max(len(a), len(b)) - 1)
+
+    def reset(self):
+        """重置所有滤波器状态（新的不连续信号开始时调用）"""
+        self._zi_a = self._initial_lfilter_state(self.bank.a_weighting)
+        self._zi_c = self._initial_lfilter_state(self.bank.c_weighting)
+        self._zi_bands = [np.zeros((sos.shape[0], 2)) if sos is not None else None
+                          for sos in self.bank.band_sos]
+        self.samples_processed = 0
+
+    def weigh_a(self, data: np.ndarray) -> np.ndarray:
+        """A计权（延续上一块的状态）"""
+        b, a = self.bank.a_weighting
+        out, self._zi_a = lfilter(b, a, data, zi=self._zi_a)
+        return out
+
+    def weigh_c(self, data: np.ndarray) -> np.ndarray:
+        """C计权（延续上一块的状态）"""
+        b, a = self.bank.c_weighting
+        out, self._zi_c = lfilter(b, a, data, zi=self._zi_c)
+        return out
+
+    def filter_bands(self, data: np.ndarray) -> List[Optional[np.ndarray]]:
+        """9个频段带通滤波（延续上一块的状态）"""
+        outputs = []
+        for i, sos in enumerate(self.bank.band_sos):
+            if sos is None:
+                outputs.append(None)
+                continue
+            out, self._zi_bands[i] = sosfilt(sos, data, zi=self._zi_bands[i])
+            outputs.append(out)
+        return outputs
+
+    def process(self, data: np.ndarray) -> Tuple[np.ndarray, np.ndarray, List[Optional[np.ndarray]]]:
+        """
+        处理一个数据块
+
+        Returns:
+            (a_weighted, c_weighted, band_data)
+        """
+        data = np.asarray(data, dtype=np.float64)
+        result = (self.weigh_a(data), self.weigh_c(data), self.filter_bands(data))
+        self.samples_processed += len(data)
+        return result
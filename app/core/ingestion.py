@@ -0,0 +1,523 @@
+# -*- coding: utf-8 -*-
+"""
+文件入库调度
+analyze_file() 完成单个文件的全部计算（时间历程、分钟汇聚、事件检测、整文件指标），
+不访问数据库，可在子进程中运行；IngestionScheduler 将文件分发到进程池并行计算，
+计算结果经结果通道交给单一写入线程，按会话保持提交顺序写入数据库
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+import concurrent.futures
+import multiprocessing
+from collections import deque
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from app.utils import logger
+from app.core.audio_processor import WholeFileAccumulator
+from app.core.audio_source import TdmsGroupSource, open_audio_source
+from app.core.event_detector import EventInfo
+from app.core.event_processor import EventProcessor
+from app.core.metrics_store import SecondMetricsStore
+from app.core.result_cache import ResultCache, file_content_hash, result_cache_key
+from app.core.summary_processor import SummaryProcessor, AggregatedMetrics
+from app.core.time_history_processor import TimeHistoryProcessor
+
+
+@dataclass
+class ChannelOutput:
+    """
+    单个通道的计算结果（记录型输出端）
+
+    ChannelPipeline 的输出端接口：session_id 属性及 on_second / on_minute / on_event / on_finish
+    方法。子进程中以 ChannelOutput 记录全部输出，返回主进程后通过 replay() 交给写数据库的输出端。
+    秒级指标以 SecondMetricsStore 列式保存，跨进程传输只需序列化 NumPy 数组。
+    """
+    channel_name: Optional[str] = None
+    session_id: str = "default"
+    seconds: SecondMetricsStore = field(default_factory=lambda: SecondMetricsStore(chunk_size=600))
+    minutes: List[AggregatedMetrics] = field(default_factory=list)
+    events: List[EventInfo] = field(default_factory=list)
+    event_count: int = 0
+    results: Optional[dict] = None
+
+    def on_second(self, metrics):
+        self.seconds.append(metrics)
+
+    def on_minute(self, metrics: AggregatedMetrics):
+        self.minutes.append(metrics)
+
+    def on_event(self, event_info: EventInfo):
+        # 保存音频的事件在写入线程中回调
+        self.events.append(event_info)
+
+    def on_finish(self, event_count: int, results: Optional[dict]):
+        self.event_count = event_count
+        self.results = results
+
+    def replay(self, sink):
+        """按原顺序将记录的输出交给另一个输出端"""
+        for metrics in self.seconds:
+            sink.on_second(metrics)
+        for metrics in self.minutes:
+            sink.on_minute(metrics)
+        for event_info in self.events:
+            sink.on_event(event_info)
+        sink.on_finish(self.event_count, self.results)
+
+    @property
+    def start_time(self) -> Optional[datetime]:
+        """第一秒的时间戳"""
+        return self.seconds[0].timestamp if self.seconds else None
+
+    def shift_time(self, delta: timedelta):
+        """
+        将所有时间戳平移 delta（回放缓存结果时对齐到本次处理的开始时间），事件使用新的事件ID
+        """
+        self.seconds.shift_time(delta)
+        self.minutes = [replace(m, start_time=m.start_time + delta, end_time=m.end_time + delta)
+                        for m in self.minutes]
+        self.events = [
+            replace(e, event_id=f"EVT-{uuid.uuid4().hex[:12].upper()}",
+                    start_time=e.start_time + delta,
+                    end_time=e.end_time + delta if e.end_time else None)
+            for e in self.events
+        ]
+
+
+class _RecordingSink:
+    """将输出转发给输出端，同时记录到 ChannelOutput（用于写入结果缓存）"""
+
+    def __init__(self, sink, record: ChannelOutput):
+        self.sink = sink
+        self.record = record
+
+    @property
+    def session_id(self) -> str:
+        return self.sink.session_id
+
+    def on_second(self, metrics):
+        self.record.on_second(metrics)
+        self.sink.on_second(metrics)
+
+    def on_minute(self, metrics: AggregatedMetrics):
+        self.record.on_minute(metrics)
+        self.sink.on_minute(metrics)
+
+    def on_event(self, event_info: EventInfo):
+        self.record.on_event(event_info)
+        self.sink.on_event(event_info)
+
+    def on_finish(self, event_count: int, results: Optional[dict]):
+        self.record.on_finish(event_count, results)
+        self.sink.on_finish(event_count, results)
+
+
+@dataclass
+class FileAnalysis:
+    """单个文件的计算结果"""
+    file_path: str
+    sample_rate: int
+    channels: List[Any]
+    elapsed_s: float = 0.0
+    cached: bool = False  # 结果由缓存回放，未经过信号处理
+    content_hash: Optional[str] = None  # 整个文件的内容哈希（使用结果缓存时计算）
+
+
+class ChannelPipeline:
+    """
+    单通道处理流水线
+
+    每秒数据块依次进入：事件检测 -> 时间历程 (TimeHistoryProcessor) -> 分钟汇聚 (SummaryProcessor)，
+    同时由 WholeFileAccumulator 累加整文件指标，所有输出交给输出端 (sink)。
+    多通道文件的各通道使用独立的流水线，共享同一次文件读取及按采样率缓存的滤波器设计。
+    """
+
+    def __init__(self,
+                 sink,
+                 sample_rate: int,
+                 channel_name: Optional[str] = None,
+                 enable_event_detection: bool = True,
+                 event_output_dir: str = "./audio_events",
+                 time_history_processor: Optional[TimeHistoryProcessor] = None,
+                 summary_processor: Optional[SummaryProcessor] = None):
+        """
+        Args:
+            sink: 输出端（ChannelOutput 或写数据库的输出端），提供 session_id 属性
+            sample_rate: 采样率
+            channel_name: 通道名（用作 device_id），单通道文件为 None
+            enable_event_detection: 是否启用事件检测
+            event_output_dir: 事件音频输出目录
+            time_history_processor: 时间历程处理器，默认新建
+            summary_processor: 分钟汇聚处理器，默认新建
+        """
+        self.sink = sink
+        self.sample_rate = int(sample_rate)
+        self.channel_name = channel_name
+        self.enable_event_detection = enable_event_detection
+        self.event_output_dir = event_output_dir
+        self.time_history_processor = time_history_processor or TimeHistoryProcessor()
+        self.summary_processor = summary_processor or SummaryProcessor(aggregation_seconds=60)
+        self.accumulator = WholeFileAccumulator(sample_rate)
+        self.event_processor: Optional[EventProcessor] = None
+        self.seconds_processed = 0
+        self._start_time: Optional[datetime] = None
+
+    def start(self, start_time: datetime):
+        """开始处理一个文件"""
+        self._start_time = start_time
+        self.seconds_processed = 0
+        self.accumulator.reset()
+        self.time_history_processor.reset_stream()
+        self.time_history_processor.callback = self._on_second_processed
+
+        if self.enable_event_detection:
+            self.event_processor = EventProcessor(
+                sample_rate=self.sample_rate,
+                output_dir=self.event_output_dir,
+                enable_audio_save=True
+            )
+            self.event_processor.start(self.sink.session_id)
+            self.event_processor.add_event_callback(self.sink.on_event)
+            logger.info(f"Event detection started for session {self.sink.session_id}")
+
+    def process(self, block, second_idx: int):
+        """处理一秒数据块（空数据块表示该通道已结束）"""
+        if len(block) == 0:
+            return
+        timestamp = self._start_time + timedelta(seconds=second_idx)
+
+        if self.event_processor:
+            try:
+                self.event_processor.process_audio_chunk(block, timestamp)
+            except Exception as e:
+                logger.error(f"Error in event detection: {e}")
+
+        self.time_history_processor.process_block(
+            block, self.sample_rate, timestamp, accumulator=self.accumulator)
+        self.seconds_processed += 1
+
+    def _on_second_processed(self, metrics):
+        """Callback for each second processed"""
+        self.sink.on_second(metrics)
+
+        # Aggregate to minute level using SummaryProcessor
+        try:
+            minute_metrics = self.summary_processor.add_second_metrics(metrics)
+            if minute_metrics is not None:
+                self.sink.on_minute(minute_metrics)
+        except Exception as e:
+            logger.error(f"Error in summary aggregation: {e}")
+
+    def finish(self) -> Optional[dict]:
+        """
+        结束文件处理：输出剩余的分钟汇聚、停止事件检测
+
+        Returns:
+            Optional[dict]: 整文件指标，没有数据时为 None
+        """
+        # Flush remaining seconds in buffer
+        remaining_minute = self.summary_processor.flush_remaining()
+        if remaining_minute is not None:
+            self.sink.on_minute(remaining_minute)
+
+        logger.info(f"Processed {self.seconds_processed} seconds for session {self.sink.session_id}")
+
+        # Stop event processor and get detected events
+        event_count = 0
+        if self.event_processor:
+            events = self.event_processor.stop()
+            event_count = len(events)
+            logger.info(f"Event detection complete: {event_count} events detected")
+            self.event_processor = None
+
+        results = self.accumulator.get_results() if self.accumulator.n_samples else None
+        self.sink.on_finish(event_count, results)
+        return results
+
+
+def run_pipelines(channel_blocks: Iterable[List], pipelines: List[ChannelPipeline],
+                  start_time: Optional[datetime] = None):
+    """
+    将每秒的各通道数据块分发给对应通道的流水线
+
+    Args:
+        channel_blocks: 每次产生 [通道1数据块, 通道2数据块, ...]
+        pipelines: 各通道的处理流水线
+        start_time: 第一秒的时间戳，默认当前 UTC 时间（入库时由调度方按会话顺序分配）
+    """
+    start_time = start_time or datetime.utcnow()
+    for pipeline in pipelines:
+        pipeline.start(start_time)
+
+    try:
+        for second_idx, blocks in enumerate(channel_blocks):
+            for pipeline, block in zip(pipelines, blocks):
+                pipeline.process(block, second_idx)
+    finally:
+        for pipeline in pipelines:
+            pipeline.finish()
+
+
+def analyze_file(file_path: str,
+                 session_id: str = "default",
+                 enable_event_detection: bool = True,
+                 event_output_dir: str = "./audio_events",
+                 sink_factory: Optional[Callable[[int, Optional[str]], Any]] = None,
+                 result_cache: Optional[ResultCache] = None,
+                 start_time: Optional[datetime] = None,
+                 content_hash: Optional[str] = None) -> FileAnalysis:
+    """
+    计算单个文件的全部指标（不访问数据库，可在子进程中运行）
+
+    音频按1秒数据块流式读取，多通道 TDMS 文件一次遍历读取全部通道，
+    每个通道由独立的 ChannelPipeline 处理。
+    指定 result_cache 时先按文件内容哈希查找缓存，命中则将缓存结果平移到 start_time 后回放，不再计算。
+    内容哈希在打开解码器之前流式读取整个文件计算（未命中时解码紧接着读取同一文件，通常直接来自页缓存），
+    已知哈希（入库记录中保存的）时由 content_hash 传入，不再读取。
+
+    Args:
+        file_path: 音频文件路径
+        session_id: 事件检测使用的会话ID（记录型输出端）
+        enable_event_detection: 是否启用事件检测
+        event_output_dir: 事件音频输出目录
+        sink_factory: (通道序号, 通道名) -> 输出端；默认为每个通道创建 ChannelOutput 记录输出
+        result_cache: 计算结果缓存，None 表示不使用
+        start_time: 第一秒的时间戳。同一会话的文件并行计算时由提交方按提交顺序分配，
+            保证各文件的时间戳前后衔接、互不重叠；默认为调用时的当前 UTC 时间
+        content_hash: 已知的文件内容哈希 (file_content_hash)，None 时按需计算
+
+    Returns:
+        FileAnalysis: 各通道的输出端（单通道文件的通道名为 None）
+    """
+    started = time.perf_counter()
+    start_time = start_time or datetime.utcnow()
+    if result_cache is not None and content_hash is None:
+        content_hash = file_content_hash(file_path)
+
+    with open_audio_source(file_path, all_channels=True) as source:
+        sample_rate = source.sample_rate
+        cache_key = None
+        if result_cache is not None:
+            cache_key = result_cache_key(content_hash, sample_rate, enable_event_detection)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                sinks = _replay_cached(cached, session_id, sink_factory, start_time)
+                logger.info(f"Replayed cached results for {file_path}")
+                return FileAnalysis(file_path=str(file_path), sample_rate=sample_rate, channels=sinks,
+                                    elapsed_s=time.perf_counter() - started, cached=True,
+                                    content_hash=content_hash)
+
+        if isinstance(source, TdmsGroupSource) and source.channels > 1:
+            names = source.channel_names
+            channel_blocks = source.channel_blocks()
+        else:
+            names = [None]
+            channel_blocks = ([block] for block in source.blocks())
+
+        if sink_factory is None:
+            sinks = [ChannelOutput(channel_name=name, session_id=session_id) for name in names]
+        else:
+            sinks = [sink_factory(index, name) for index, name in enumerate(names)]
+
+        # 使用缓存且输出端不是 ChannelOutput 时，额外记录一份输出用于写入缓存
+        records = sinks
+        pipeline_sinks = sinks
+        if cache_key is not None and sink_factory is not None:
+            records = [ChannelOutput(channel_name=name, session_id=session_id) for name in names]
+            pipeline_sinks = [_RecordingSink(sink, record) for sink, record in zip(sinks, records)]
+
+        pipelines = [
+            ChannelPipeline(sink, sample_rate, channel_name=name,
+                            enable_event_detection=enable_event_detection,
+                            event_output_dir=event_output_dir)
+            for name, sink in zip(names, pipeline_sinks)
+        ]
+        run_pipelines(channel_blocks, pipelines, start_time)
+
+    if cache_key is not None:
+        try:
+            result_cache.put(cache_key, records)
+        except Exception as e:
+            logger.warning(f"Failed to cache results for {file_path}: {e}")
+
+    return FileAnalysis(file_path=str(file_path), sample_rate=sample_rate, channels=sinks,
+                        elapsed_s=time.perf_counter() - started, content_hash=content_hash)
+
+
+def _replay_cached(cached: List[ChannelOutput], session_id: str,
+                   sink_factory: Optional[Callable[[int, Optional[str]], Any]],
+                   start_time: datetime) -> List[Any]:
+    """缓存结果平移到 start_time 后交给输出端"""
+    start_times = [output.start_time for output in cached if output.start_time is not None]
+    delta = start_time - min(start_times) if start_times else timedelta(0)
+    for output in cached:
+        output.session_id = session_id
+        output.shift_time(delta)
+
+    if sink_factory is None:
+        return cached
+    sinks = []
+    for index, output in enumerate(cached):
+        sink = sink_factory(index, output.channel_name)
+        output.replay(sink)
+        sinks.append(sink)
+    return sinks
+
+
+@dataclass
+class _Job:
+    future: concurrent.futures.Future
+    on_result: Callable[[Any], None]
+    on_error: Optional[Callable[[BaseException], None]]
+
+
+class IngestionScheduler:
+    """
+    文件入库调度器
+
+    - 计算任务分发到进程池（默认 CPU 核数个进程），不受 GIL 限制
+    - 任务完成后经结果通道（队列）通知单一写入线程，写入线程调用 on_result 写数据库，
+      数据库写入始终在同一线程中串行进行
+    - 同一 order_key（会话）的结果严格按提交顺序交给 on_result：先提交的文件未完成时，
+      后提交文件的结果在写入线程中等待；不同会话之间互不阻塞
+    """
+
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 use_processes: bool = True,
+                 mp_context: Optional[str] = "spawn"):
+        """
+        Args:
+            max_workers: 并行计算的工作进程数，默认 CPU 核数
+            use_processes: False 时使用线程池（用于调试及测试）
+            mp_context: 进程启动方式，默认 spawn（服务进程中已有监控线程，fork 不安全）
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+        if use_processes:
+            context = multiprocessing.get_context(mp_context) if mp_context else None
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=context)
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="ingestion")
+
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending: Dict[Any, Deque[_Job]] = {}
+        self._outstanding = 0
+        self._results: "queue.Queue" = queue.Queue()
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0}
+        self._closed = False
+
+        self._writer = threading.Thread(target=self._writer_loop, name="ingestion-writer", daemon=True)
+        self._writer.start()
+
+    def submit(self, order_key: Any, fn: Callable, *args,
+               on_result: Callable[[Any], None],
+               on_error: Optional[Callable[[BaseException], None]] = None,
+               **kwargs) -> concurrent.futures.Future:
+        """
+        提交计算任务
+
+        Args:
+            order_key: 顺序键（会话ID），同一键的结果按提交顺序交给 on_result
+            fn: 计算函数（进程池模式下须为模块级函数，参数可序列化）
+            on_result: 在写入线程中处理计算结果
+            on_error: 在写入线程中处理计算异常，默认记录日志
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("IngestionScheduler has been shut down")
+            future = self._executor.submit(fn, *args, **kwargs)
+            self._pending.setdefault(order_key, deque()).append(_Job(future, on_result, on_error))
+            self._outstanding += 1
+            self._stats['submitted'] += 1
+        future.add_done_callback(lambda _: self._results.put(order_key))
+        return future
+
+    def _take_ready(self, order_key: Any) -> List[_Job]:
+        """取出该顺序键队首所有已完成的任务"""
+        ready = []
+        with self._lock:
+            jobs = self._pending.get(order_key)
+            while jobs and jobs[0].future.done():
+                ready.append(jobs.popleft())
+            if jobs is not None and not jobs:
+                del self._pending[order_key]
+        return ready
+
+    def _writer_loop(self):
+        """写入线程：按顺序处理已完成的任务"""
+        while True:
+            order_key = self._results.get()
+            if order_key is _STOP:
+                return
+            for job in self._take_ready(order_key):
+                self._apply(job)
+
+    def _apply(self, job: _Job):
+        try:
+            try:
+                result = job.future.result()
+            except BaseException as e:
+                with self._lock:
+                    self._stats['failed'] += 1
+                if job.on_error:
+                    job.on_error(e)
+                else:
+                    logger.error(f"Ingestion task failed: {e}")
+                return
+            job.on_result(result)
+            with self._lock:
+                self._stats['completed'] += 1
+        except Exception as e:
+            logger.error(f"Error applying ingestion result: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+        finally:
+            with self._idle:
+                self._outstanding -= 1
+                self._idle.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待所有已提交任务的结果处理完成
+
+        Returns:
+            bool: 超时前全部完成时为 True
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def shutdown(self, wait: bool = True):
+        """停止调度器（wait=True 时先处理完所有已提交任务）"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if wait:
+            self.wait()
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        self._results.put(_STOP)
+        if wait:
+            self._writer.join()
+
+    def get_stats(self) -> Dict:
+        """获取调度统计"""
+        with self._lock:
+            return {
+                **self._stats,
+                'pending': self._outstanding,
+                'max_workers': self.max_workers,
+                'use_processes': self.use_processes,
+            }
+
+
+_STOP = object()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+文件入库记录
+每个文件在 ingestion_ledger 表中保存一行（路径、大小、修改时间、文件指纹、内容哈希、状态及处理耗时），
+启动时扫描监控目录只将未处理的文件加入队列，并统计每个文件的处理吞吐量；
+其他路径下内容相同的文件（重新上传、复制到新的监控目录）照常入库，由结果缓存 (result_cache) 回放
+"""
+
+import hashlib
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.utils import logger
+
+
+# 已处理完成或无需处理的状态：文件大小及修改时间未变化时不再处理
+SETTLED_STATUSES = ("done", "failed")
+
+
+def is_temporary_file(file_path: str) -> bool:
+    """TDMS 转换过程中生成的临时文件"""
+    name = Path(file_path).name
+    return name.startswith("temp_") or "_converted" in name
+
+
+def file_fingerprint(file_path: str, sample_bytes: int = 1 << 20) -> str:
+    """
+    文件内容指纹：BLAKE2b(文件大小 + 开头 sample_bytes + 结尾 sample_bytes)
+
+    只读取文件首尾，大文件也可快速计算，仅作为文件是否变化的快速提示；
+    只有中间部分不同的文件指纹相同，不能用作计算结果缓存的键（缓存使用 file_content_hash）
+    """
+    size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(size.to_bytes(8, "little"))
+    with open(file_path, "rb") as f:
+        digest.update(f.read(sample_bytes))
+        if size > sample_bytes:
+            f.seek(max(sample_bytes, size - sample_bytes))
+            digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+
+class IngestionLedger:
+    """
+    文件入库记录
+
+    - needs_ingestion() 判断文件是否需要处理：大小及修改时间与已处理记录一致时跳过
+    - scan_directory() 启动时扫描目录，返回需要处理的文件（按修改时间排序）
+    - mark_queued() / mark_started() / mark_finished() / mark_failed() 更新状态并记录耗时
+    """
+
+    def __init__(self, db_manager):
+        """
+        Args:
+            db_manager: DatabaseManager 实例
+        """
+        self.db_manager = db_manager
+        # 文件开始处理时的单调时钟，用于计算处理耗时
+        self._started: Dict[str, float] = {}
+
+    def needs_ingestion(self, file_path: str) -> bool:
+        """
+        判断文件是否需要处理
+
+        Returns:
+            bool: 未处理过、处理后内容已变化或上次处理中断时为 True
+        """
+        file_path = str(file_path)
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return False
+
+        entry = self.db_manager.get_ledger_entry(file_path)
+        if entry is not None:
+            unchanged = (entry['file_size'] == stat.st_size and entry['file_mtime'] == stat.st_mtime)
+            if unchanged and entry['status'] in SETTLED_STATUSES:
+                return False
+            if unchanged and entry['fingerprint']:
+                # 上次运行中断（queued / processing），重新处理
+                return True
+
+        # 文件已变化：之前记录的内容哈希失效
+        self.db_manager.update_ledger_entry(
+            file_path, file_size=stat.st_size, file_mtime=stat.st_mtime,
+            fingerprint=file_fingerprint(file_path), content_hash=None)
+        return True
+
+    def record_content_hash(self, file_path: str, content_hash: Optional[str]):
+        """记录工作进程计算的整个文件内容哈希（file_content_hash，结果缓存的键）"""
+        if content_hash:
+            self.db_manager.update_ledger_entry(str(file_path), content_hash=content_hash)
+
+    def known_content_hash(self, file_path: str) -> Optional[str]:
+        """
+        已记录的内容哈希，文件再次处理时不必重新读取整个文件计算
+
+        Returns:
+            Optional[str]: 文件大小及修改时间与记录一致时为记录的哈希，否则为 None
+        """
+        file_path = str(file_path)
+        entry = self.db_manager.get_ledger_entry(file_path)
+        if entry is None or not entry['content_hash']:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        if entry['file_size'] != stat.st_size or entry['file_mtime'] != stat.st_mtime:
+            return None
+        return entry['content_hash']
+
+    def scan_directory(self, directory: str, extensions: Iterable[str]) -> List[str]:
+        """
+        扫描目录中需要处理的文件（不含子目录及临时文件）
+
+        Args:
+            directory: 目录
+            extensions: 文件扩展名，如 [".tdms"]
+
+        Returns:
+            List[str]: 需要处理的文件路径，按修改时间从早到晚排序
+        """
+        extensions = tuple(extensions)
+        candidates = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.endswith(extensions):
+                    continue
+                if is_temporary_file(entry.path):
+                    continue
+                candidates.append((entry.stat().st_mtime, entry.path))
+
+        pending = [path for _, path in sorted(candidates) if self.needs_ingestion(path)]
+        logger.info(f"Backlog scan of {directory}: {len(pending)} of {len(candidates)} files need ingestion")
+        return pending
+
+    def mark_queued(self, file_path: str):
+        """文件已加入入库队列"""
+        self.db_manager.update_ledger_entry(
+            str(file_path), status="queued", queued_at=datetime.now(), error=None)
+
+    def mark_started(self, file_path: str):
+        """文件开始处理"""
+        file_path = str(file_path)
+        self._started[file_path] = time.monotonic()
+        self.db_manager.update_ledger_entry(file_path, status="processing", started_at=datetime.now())
+
+    def mark_finished(self, file_path: str, audio_duration_s: Optional[float] = None,
+                      session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        文件处理完成，记录耗时及吞吐量
+
+        Args:
+            file_path: 文件路径
+            audio_duration_s: 音频时长（秒），用于计算实时倍率
+            session_id: 结果所属会话
+
+        Returns:
+            Dict[str, Any]: 更新后的记录
+        """
+        file_path = str(file_path)
+        fields: Dict[str, Any] = {
+            'status': "done", 'finished_at': datetime.now(), 'error': None,
+            'audio_duration_s': audio_duration_s,
+        }
+        if session_id is not None:
+            fields['session_id'] = session_id
+
+        started = self._started.pop(file_path, None)
+        if started is not None:
+            processing_s = time.monotonic() - started
+            fields['processing_s'] = processing_s
+            if processing_s > 0:
+                if audio_duration_s:
+                    fields['realtime_factor'] = audio_duration_s / processing_s
+                try:
+                    fields['mb_per_s'] = os.path.getsize(file_path) / 1e6 / processing_s
+                except OSError:
+                    pass
+
+        entry = self.db_manager.update_ledger_entry(file_path, **fields)
+        if entry['realtime_factor']:
+            logger.info(f"Ingested {file_path}: {entry['processing_s']:.1f}s, "
+                        f"{entry['realtime_factor']:.1f}x realtime, {entry['mb_per_s'] or 0:.1f} MB/s")
+        return entry
+
+    def mark_failed(self, file_path: str, error: BaseException):
+        """文件处理失败（文件内容变化前不再自动重试）"""
+        file_path = str(file_path)
+        self._started.pop(file_path, None)
+        self.db_manager.update_ledger_entry(
+            file_path, status="failed", finished_at=datetime.now(), error=str(error))
+
+    def get_summary(self) -> Dict[str, Any]:
+        """各状态文件数及已完成文件的总吞吐量"""
+        return self.db_manager.get_ledger_summary()
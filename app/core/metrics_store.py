@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+秒级指标列式存储
+按 SecondMetrics 字段预分配 NumPy 分块数组，替代逐秒保存 dataclass 对象的列表，
+每秒占用固定大小内存，支持 O(1) 追加及零拷贝导出 DataFrame / Arrow
+"""
+
+import typing
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from app.core.time_history_processor import SecondMetrics, SECOND_METRICS_FIELDS
+
+
+def _field_dtype(annotation) -> np.dtype:
+    """根据 SecondMetrics 字段类型确定列的 dtype（Optional[float] 以 NaN 表示 None）"""
+    if annotation is datetime:
+        return np.dtype('datetime64[us]')
+    if annotation is bool:
+        return np.dtype(bool)
+    if annotation is int:
+        return np.dtype(np.int64)
+    return np.dtype(np.float64)
+
+
+SECOND_METRICS_DTYPES: Dict[str, np.dtype] = {
+    name: _field_dtype(annotation)
+    for name, annotation in typing.get_type_hints(SecondMetrics).items()
+}
+
+
+class SecondMetricsStore:
+    """
+    SecondMetrics 列式存储
+
+    - 每个字段一列，按 chunk_size 行预分配分块，追加为 O(1)
+    - 每秒内存占用固定（约 80 个 8 字节字段），不保存 Python 对象
+    - to_frame() / to_arrow() 以视图方式导出，不复制数据
+    - 兼容原 List[SecondMetrics] 的用法：len()、迭代、下标访问均返回 SecondMetrics
+    """
+
+    def __init__(self, chunk_size: int = 3600):
+        """
+        Args:
+            chunk_size: 每个分块的行数（默认1小时）
+        """
+        self.chunk_size = int(chunk_size)
+        self._chunks: List[Dict[str, np.ndarray]] = []
+        self._chunk_rows: List[int] = []
+        self._length = 0
+
+    # ---------------------------------------------------------------- 写入
+
+    def _allocate_chunk(self, capacity: int) -> Dict[str, np.ndarray]:
+        chunk = {name: np.empty(capacity, dtype=dtype) for name, dtype in SECOND_METRICS_DTYPES.items()}
+        self._chunks.append(chunk)
+        self._chunk_rows.append(0)
+        return chunk
+
+    def _writable_chunk(self) -> int:
+        """返回可写入的分块下标，当前分块已满时分配新分块"""
+        if not self._chunks or self._chunk_rows[-1] >= len(self._chunks[-1]['LAeq']):
+            self._allocate_chunk(self.chunk_size)
+        return len(self._chunks) - 1
+
+    def append(self, metrics: SecondMetrics):
+        """追加一秒的指标"""
+        idx = self._writable_chunk()
+        chunk = self._chunks[idx]
+        row = self._chunk_rows[idx]
+
+        for name in SECOND_METRICS_FIELDS:
+            value = getattr(metrics, name)
+            if value is None:
+                value = np.nan
+            chunk[name][row] = value
+
+        self._chunk_rows[idx] = row + 1
+        self._length += 1
+
+    def extend(self, metrics_list: typing.Iterable[SecondMetrics]):
+        """追加多秒的指标"""
+        for metrics in metrics_list:
+            self.append(metrics)
+
+    def append_frame(self, frame: pd.DataFrame):
+        """
+        追加批量处理得到的列式结果（TimeHistoryProcessor.process_signal_batch 的输出）
+        """
+        n_rows = len(frame)
+        offset = 0
+        while offset < n_rows:
+            idx = self._writable_chunk()
+            chunk = self._chunks[idx]
+            row = self._chunk_rows[idx]
+            count = min(len(chunk['LAeq']) - row, n_rows - offset)
+
+            for name, dtype in SECOND_METRICS_DTYPES.items():
+                values = frame[name].to_numpy()[offset:offset + count]
+                if dtype == np.float64:
+                    values = pd.to_numeric(values, errors='coerce')
+                chunk[name][row:row + count] = values
+
+            self._chunk_rows[idx] = row + count
+            self._length += count
+            offset += count
+
+    def __getstate__(self):
+        """序列化时只保留已写入的行（跨进程传输不携带预分配的余量）"""
+        state = self.__dict__.copy()
+        state['_chunks'] = [
+            {name: column[:rows].copy() for name, column in chunk.items()}
+            for chunk, rows in zip(self._chunks, self._chunk_rows)
+        ]
+        return state
+
+    def shift_time(self, delta):
+        """将所有时间戳平移 delta（datetime.timedelta）"""
+        offset = np.timedelta64(int(delta / timedelta(microseconds=1)), 'us')
+        for chunk, rows in zip(self._chunks, self._chunk_rows):
+            chunk['timestamp'][:rows] += offset
+
+    def clear(self):
+        """清空存储"""
+        self._chunks.clear()
+        self._chunk_rows.clear()
+        self._length = 0
+
+    # ---------------------------------------------------------------- 读取
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def _row_to_metrics(self, chunk: Dict[str, np.ndarray], row: int) -> SecondMetrics:
+        values = {}
+        for name, dtype in SECOND_METRICS_DTYPES.items():
+            value = chunk[name][row]
+            if dtype == np.float64:
+                value = None if np.isnan(value) else float(value)
+            elif dtype == np.int64:
+                value = int(value)
+            elif dtype == np.bool_:
+                value = bool(value)
+            else:
+                value = value.astype(datetime)
+            values[name] = value
+        return SecondMetrics(**values)
+
+    def __iter__(self) -> Iterator[SecondMetrics]:
+        for chunk, rows in zip(self._chunks, self._chunk_rows):
+            for row in range(rows):
+                yield self._row_to_metrics(chunk, row)
+
+    def __getitem__(self, index: int) -> SecondMetrics:
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError("SecondMetricsStore index out of range")
+        for chunk, rows in zip(self._chunks, self._chunk_rows):
+            if index < rows:
+                return self._row_to_metrics(chunk, index)
+            index -= rows
+        raise IndexError("SecondMetricsStore index out of range")
+
+    def compact(self):
+        """
+        将所有分块合并为一个连续分块（保留 chunk_size 的写入余量）
+
+        合并后 column() / to_frame() 为零拷贝视图，直到写满余量后产生新的分块
+        """
+        if len(self._chunks) <= 1:
+            return
+
+        merged = {}
+        for name, dtype in SECOND_METRICS_DTYPES.items():
+            column = np.empty(self._length + self.chunk_size, dtype=dtype)
+            column[:self._length] = np.concatenate(
+                [chunk[name][:rows] for chunk, rows in zip(self._chunks, self._chunk_rows)])
+            merged[name] = column
+
+        self._chunks = [merged]
+        self._chunk_rows = [self._length]
+
+    def column(self, name: str) -> np.ndarray:
+        """获取单列数据（单分块时为只读视图）"""
+        if name not in SECOND_METRICS_DTYPES:
+            raise KeyError(name)
+        if not self._chunks:
+            return np.empty(0, dtype=SECOND_METRICS_DTYPES[name])
+        self.compact()
+        view = self._chunks[0][name][:self._length]
+        view.flags.writeable = False
+        return view
+
+    def to_frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        导出为 DataFrame（零拷贝，列为存储数组的只读视图）
+
+        Args:
+            columns: 需要导出的列，默认全部字段
+        """
+        columns = columns or SECOND_METRICS_FIELDS
+        return pd.DataFrame({name: self.column(name) for name in columns}, copy=False)
+
+    def to_arrow(self, columns: Optional[List[str]] = None):
+        """
+        导出为 pyarrow.Table（数值列按分块零拷贝，无需合并分块）
+
+        需要安装 pyarrow
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("pyarrow is required for SecondMetricsStore.to_arrow()") from e
+
+        columns = columns or SECOND_METRICS_FIELDS
+        arrays = {}
+        for name in columns:
+            if name not in SECOND_METRICS_DTYPES:
+                raise KeyError(name)
+            chunks = [pa.array(chunk[name][:rows])
+                      for chunk, rows in zip(self._chunks, self._chunk_rows) if rows > 0]
+            if chunks:
+                arrays[name] = pa.chunked_array(chunks)
+            else:
+                arrays[name] = pa.chunked_array([], type=pa.from_numpy_dtype(SECOND_METRICS_DTYPES[name]))
+        return pa.table(arrays)
+
+    @property
+    def nbytes(self) -> int:
+        """已分配的内存字节数"""
+        return sum(array.nbytes for chunk in self._chunks for array in chunk.values())
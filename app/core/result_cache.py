@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+按文件内容寻址的计算结果缓存
+以 文件内容哈希 + 采样率 + 处理版本 为键保存各通道的计算结果（列式秒级指标、分钟汇聚、事件、整文件指标），
+重复放入的相同录音直接回放缓存结果到新会话，不再经过信号处理
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from app.utils import logger
+
+
+# 处理版本：时间历程、汇聚、事件检测、整文件指标的计算方式或缓存键变化时递增，使旧缓存失效
+# 2: 缓存键改为整个文件的内容哈希（版本 1 的键只包含首尾采样，可能误命中）
+PROCESSING_VERSION = 2
+
+
+def file_content_hash(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    文件内容哈希：按块流式读取整个文件计算 BLAKE2b
+
+    用作计算结果缓存的键，任何字节不同的文件都不会命中同一缓存；
+    入库记录中只读取首尾的 file_fingerprint 仅用于快速判断文件是否变化
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def result_cache_key(content_hash: str, sample_rate: int, enable_event_detection: bool = True,
+                     version: int = PROCESSING_VERSION) -> str:
+    """
+    缓存键
+
+    Args:
+        content_hash: 文件内容哈希（file_content_hash）
+        sample_rate: 采样率
+        enable_event_detection: 是否启用事件检测（结果中是否包含事件）
+        version: 处理版本
+    """
+    events = "ev" if enable_event_detection else "noev"
+    return f"{content_hash}-{int(sample_rate)}-{events}-v{version}"
+
+
+class ResultCache:
+    """
+    计算结果缓存（每个键一个文件，保存 ChannelOutput 列表）
+
+    - 写入先写临时文件再原子替换，多个工作进程同时写入同一键时不会读到不完整的文件
+    - 读取失败（文件损坏、版本不兼容）视为未命中
+    - 对象可序列化，可随任务传给工作进程
+    """
+
+    def __init__(self, cache_dir: str = "./Database/result_cache"):
+        """
+        Args:
+            cache_dir: 缓存目录（首次写入时创建）
+        """
+        self.cache_dir = Path(cache_dir)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl"
+
+    def get(self, key: str) -> Optional[List]:
+        """
+        读取缓存
+
+        Returns:
+            Optional[List[ChannelOutput]]: 未命中时为 None
+        """
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable result cache entry {path}: {e}")
+            return None
+
+    def put(self, key: str, channels: List):
+        """写入缓存"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(channels, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def clear(self) -> int:
+        """
+        清空缓存
+
+        Returns:
+            int: 删除的条目数
+        """
+        removed = 0
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.pkl"):
+                path.unlink()
+                removed += 1
+        return removed
@@ -11,13 +11,129 @@
 
 import numpy as np
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
 from pathlib import Path
-import soundfile as sf
 
+from app.core.audio_codec import AudioCodec, get_audio_codec
 from app.utils import logger
 
 
+def write_event_audio_file(event_id: str,
+                           full_event_audio: np.ndarray,
+                           sample_rate: int,
+                           output_dir: str = "./audio_events",
+                           pretrigger_length: int = 0,
+                           codec: Union[str, AudioCodec] = "wav") -> str:
+    """
+    将事件音频编码写入文件
+    
+    Args:
+        event_id: 事件ID
+        full_event_audio: 事件音频（pre-trigger + post-trigger）
+        sample_rate: 采样率
+        output_dir: 输出目录
+        pretrigger_length: 其中 pre-trigger 的样本数（仅用于日志）
+        codec: 编码器名称或 AudioCodec，默认16-bit WAV
+        
+    Returns:
+        str: 保存的文件路径
+    """
+    # 创建输出目录
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    # 防止削波
+    max_val = np.max(np.abs(full_event_audio)) if len(full_event_audio) else 0.0
+    if max_val > 1.0:
+        full_event_audio = full_event_audio / max_val * 0.95
+        logger.warning(f"Event audio normalized due to clipping: {max_val:.2f}")
+    
+    # 编码保存
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filepath = get_audio_codec(codec).write(output_path / f"{event_id}_{timestamp}",
+                                            full_event_audio, sample_rate)
+    
+    logger.info(f"Event audio saved: {filepath} "
+               f"(pre={pretrigger_length/sample_rate:.2f}s, "
+               f"post={(len(full_event_audio) - pretrigger_length)/sample_rate:.2f}s)")
+    
+    return str(filepath)
+
+
+class EventCaptureBuffer:
+    """
+    预分配的事件录制缓冲区
+    
+    float32 数组一次性分配 pre-trigger + post-trigger 长度，触发时复制触发前数据，
+    之后按写入游标追加触发后数据，保存时直接取切片视图，无需列表扩展和重新拼接。
+    """
+    
+    def __init__(self, pretrigger_samples: int, posttrigger_samples: int, channels: int = 1):
+        """
+        Args:
+            pretrigger_samples: 触发前样本数
+            posttrigger_samples: 触发后样本数
+            channels: 通道数
+        """
+        self.pretrigger_samples = pretrigger_samples
+        self.posttrigger_samples = posttrigger_samples
+        self.channels = channels
+        
+        total = pretrigger_samples + posttrigger_samples
+        shape = total if channels == 1 else (total, channels)
+        self.buffer = np.zeros(shape, dtype=np.float32)
+        
+        self.reset()
+    
+    def reset(self):
+        """结束录制并复位游标"""
+        self.active = False
+        self.pretrigger_length = 0
+        self.cursor = 0
+    
+    def begin(self, pretrigger_data: np.ndarray):
+        """开始录制，写入触发前数据"""
+        length = min(len(pretrigger_data), self.pretrigger_samples)
+        self.buffer[:length] = pretrigger_data[len(pretrigger_data) - length:]
+        self.pretrigger_length = length
+        self.cursor = length
+        self.active = True
+    
+    def write(self, samples: np.ndarray) -> int:
+        """
+        追加触发后数据，超出 post-trigger 长度的部分被忽略
+        
+        Returns:
+            int: 实际写入的样本数
+        """
+        if not self.active:
+            return 0
+        count = min(len(samples), self.remaining)
+        if count > 0:
+            self.buffer[self.cursor:self.cursor + count] = samples[:count]
+            self.cursor += count
+        return count
+    
+    @property
+    def posttrigger_written(self) -> int:
+        """已录制的触发后样本数"""
+        return self.cursor - self.pretrigger_length
+    
+    @property
+    def remaining(self) -> int:
+        """尚需录制的触发后样本数"""
+        return self.posttrigger_samples - self.posttrigger_written
+    
+    @property
+    def is_complete(self) -> bool:
+        """触发后数据是否已录制完成"""
+        return self.active and self.remaining <= 0
+    
+    def view(self) -> np.ndarray:
+        """已录制的事件音频（切片视图）"""
+        return self.buffer[:self.cursor]
+
+
 class RingBuffer:
     """
     环形波形缓冲区
@@ -65,6 +181,9 @@ class RingBuffer:
         self.is_full = False
         self.total_written = 0
         
+        # 预分配的事件录制缓冲区 (pre-trigger + post-trigger)
+        self.capture = EventCaptureBuffer(self.pretrigger_samples, self.posttrigger_samples, channels)
+        
         logger.info(f"RingBuffer initialized: {buffer_duration_s}s buffer, "
                    f"{pretrigger_s}s pre-trigger, {posttrigger_s}s post-trigger, "
                    f"{sample_rate}Hz, {channels}ch")
@@ -108,28 +227,32 @@ class RingBuffer:
         
         return samples_to_write
     
-    def get_pretrigger_data(self) -> np.ndarray:
+    def get_pretrigger_data(self, end_offset: int = 0) -> np.ndarray:
         """
         获取触发前数据
         
+        Args:
+            end_offset: 触发点距离最新写入位置的样本数（触发点之后已写入的样本数），默认0
+        
         Returns:
             np.ndarray: pre-trigger 音频数据
         """
-        if self.write_index >= self.pretrigger_samples:
+        end_index = (self.write_index - end_offset) % self.buffer_size
+        if end_index >= self.pretrigger_samples:
             # 连续数据，直接切片
-            return self.buffer[self.write_index - self.pretrigger_samples:self.write_index]
+            return self.buffer[end_index - self.pretrigger_samples:end_index]
         else:
             # 环绕数据，需要拼接
-            first_part = self.pretrigger_samples - self.write_index
+            first_part = self.pretrigger_samples - end_index
             if self.channels == 1:
                 return np.concatenate([
                     self.buffer[self.buffer_size - first_part:],
-                    self.buffer[:self.write_index]
+                    self.buffer[:end_index]
                 ])
             else:
                 return np.concatenate([
                     self.buffer[self.buffer_size - first_part:, :],
-                    self.buffer[:self.write_index, :]
+                    self.buffer[:end_index, :]
                 ])
     
     def get_continuous_buffer(self) -> np.ndarray:
@@ -158,7 +281,8 @@ class RingBuffer:
     def save_event_audio(self,
                          event_id: str,
                          posttrigger_data: np.ndarray,
-                         output_dir: str = "./audio_events") -> str:
+                         output_dir: str = "./audio_events",
+                         codec: Union[str, AudioCodec] = "wav") -> str:
         """
         保存事件音频（pre-trigger + post-trigger）
         
@@ -166,6 +290,7 @@ class RingBuffer:
             event_id: 事件ID
             posttrigger_data: 触发后录制的音频数据
             output_dir: 输出目录
+            codec: 编码器名称或 AudioCodec
             
         Returns:
             str: 保存的文件路径
@@ -183,24 +308,44 @@ class RingBuffer:
         else:
             full_event_audio = np.concatenate([pretrigger_data, posttrigger_data], axis=0)
         
-        # 防止削波
-        max_val = np.max(np.abs(full_event_audio))
-        if max_val > 1.0:
-            full_event_audio = full_event_audio / max_val * 0.95
-            logger.warning(f"Event audio normalized due to clipping: {max_val:.2f}")
-        
-        # 保存为WAV
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{event_id}_{timestamp}.wav"
-        filepath = output_path / filename
-        
-        sf.write(str(filepath), full_event_audio, self.sample_rate)
+        return self._write_event_audio(event_id, full_event_audio, len(pretrigger_data), output_dir, codec)
+    
+    def begin_capture(self, trigger_offset: int = 0):
+        """
+        开始录制事件：将触发点之前的 pre-trigger 数据复制到预分配的事件缓冲区
         
-        logger.info(f"Event audio saved: {filepath} "
-                   f"(pre={len(pretrigger_data)/self.sample_rate:.2f}s, "
-                   f"post={len(posttrigger_data)/self.sample_rate:.2f}s)")
+        Args:
+            trigger_offset: 触发点之后已写入环形缓冲区的样本数
+        """
+        self.capture.begin(self.get_pretrigger_data(end_offset=trigger_offset))
+    
+    def save_captured_event_audio(self,
+                                  event_id: str,
+                                  output_dir: str = "./audio_events",
+                                  codec: Union[str, AudioCodec] = "wav") -> str:
+        """
+        保存事件缓冲区中已录制的事件音频（pre-trigger + post-trigger）
         
-        return str(filepath)
+        Args:
+            event_id: 事件ID
+            output_dir: 输出目录
+            codec: 编码器名称或 AudioCodec
+            
+        Returns:
+            str: 保存的文件路径
+        """
+        return self._write_event_audio(
+            event_id, self.capture.view(), self.capture.pretrigger_length, output_dir, codec)
+    
+    def _write_event_audio(self,
+                           event_id: str,
+                           full_event_audio: np.ndarray,
+                           pretrigger_length: int,
+                           output_dir: str,
+                           codec: Union[str, AudioCodec] = "wav") -> str:
+        """将事件音频编码写入文件"""
+        return write_event_audio_file(
+            event_id, full_event_audio, self.sample_rate, output_dir, pretrigger_length, codec)
     
     def get_buffer_info(self) -> dict:
         """获取缓冲区信息"""
@@ -228,6 +373,7 @@ class RingBuffer:
         self.write_index = 0
         self.is_full = False
         self.total_written = 0
+        self.capture.reset()
         
         logger.info("RingBuffer cleared")
 
@@ -294,7 +440,8 @@ class MultiChannelRingBuffer:
                          event_id: str,
                          posttrigger_data: np.ndarray,
                          channel: int = 0,
-                         output_dir: str = "./audio_events") -> str:
+                         output_dir: str = "./audio_events",
+                         codec: Union[str, AudioCodec] = "wav") -> str:
         """
         保存指定通道的事件音频
         
@@ -303,13 +450,14 @@ class MultiChannelRingBuffer:
             posttrigger_data: 触发后数据
             channel: 通道索引
             output_dir: 输出目录
+            codec: 编码器名称或 AudioCodec
             
         Returns:
             str: 保存的文件路径
         """
         if 0 <= channel < self.num_channels:
             return self.buffers[channel].save_event_audio(
-                event_id, posttrigger_data, output_dir
+                event_id, posttrigger_data, output_dir, codec
             )
         return ""
     
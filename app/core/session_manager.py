@@ -19,6 +19,7 @@ from threading import Lock
 
 from app.core.dose_calculator import DoseCalculator, DoseStandard
 from app.core.time_history_processor import SecondMetrics, aggregate_session_metrics
+from app.core.metrics_store import SecondMetricsStore
 from app.utils import logger
 
 
@@ -127,7 +128,8 @@ class SessionManager:
         self.config = config or SessionConfig()
         self.state = SessionState.IDLE
         self.metrics = SessionMetrics()
-        self.time_history: List[SecondMetrics] = []
+        # 列式存储每秒指标，每秒内存占用固定
+        self.time_history = SecondMetricsStore()
         
         self._lock = Lock()
         self._dose_calculator = DoseCalculator()
@@ -290,30 +292,26 @@ class SessionManager:
             return summary
     
     def get_time_history_df(self) -> Optional[Any]:
-        """获取时间历程DataFrame"""
-        if not self.time_history:
-            return None
-        
-        import pandas as pd
-        
-        data = []
-        for m in self.time_history:
-            data.append({
-                'timestamp': m.timestamp,
-                'LAeq': m.LAeq,
-                'LCeq': m.LCeq,
-                'LZeq': m.LZeq,
-                'LZpeak': m.LZpeak,
-                'dose_niosh': m.dose_frac_niosh,
-                'dose_osha_pel': m.dose_frac_osha_pel,
-                'dose_osha_hca': m.dose_frac_osha_hca,
-                'dose_eu_iso': m.dose_frac_eu_iso,
-                'overload': m.overload_flag,
-                'underrange': m.underrange_flag,
-                'wearing': m.wearing_state,
-            })
+        """获取时间历程DataFrame（列为存储数组的零拷贝视图）"""
+        with self._lock:
+            if not self.time_history:
+                return None
+            
+            frame = self.time_history.to_frame([
+                'timestamp', 'LAeq', 'LCeq', 'LZeq', 'LZpeak',
+                'dose_frac_niosh', 'dose_frac_osha_pel', 'dose_frac_osha_hca', 'dose_frac_eu_iso',
+                'overload_flag', 'underrange_flag', 'wearing_state',
+            ])
         
-        return pd.DataFrame(data)
+        return frame.rename(columns={
+            'dose_frac_niosh': 'dose_niosh',
+            'dose_frac_osha_pel': 'dose_osha_pel',
+            'dose_frac_osha_hca': 'dose_osha_hca',
+            'dose_frac_eu_iso': 'dose_eu_iso',
+            'overload_flag': 'overload',
+            'underrange_flag': 'underrange',
+            'wearing_state': 'wearing',
+        })
 
 
 class SessionRegistry:
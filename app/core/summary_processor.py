@@ -11,8 +11,8 @@
 """
 
 import numpy as np
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple, Callable
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple, Callable, Union
 from dataclasses import dataclass
 from enum import Enum
 
@@ -102,6 +102,53 @@ class AggregatedMetrics:
     overload_count: int = 0
     underrange_count: int = 0
     valid_seconds: int = 0         # 有效秒数
+    
+    # 与时钟对齐的时段起点（align_to_clock 时设置，用于按时段合并）
+    period_start: Optional[datetime] = None
+    LAFmax: Optional[float] = None
+    
+    # 能量和 E = Σ d_i·10^(L_i/10)（用于逐级汇聚：L = 10·log10(E / duration_s)）
+    LAeq_energy: float = 0.0
+    LCeq_energy: float = 0.0
+    LZeq_energy: float = 0.0
+    freq_63hz_energy: float = 0.0
+    freq_125hz_energy: float = 0.0
+    freq_250hz_energy: float = 0.0
+    freq_500hz_energy: float = 0.0
+    freq_1khz_energy: float = 0.0
+    freq_2khz_energy: float = 0.0
+    freq_4khz_energy: float = 0.0
+    freq_8khz_energy: float = 0.0
+    freq_16khz_energy: float = 0.0
+
+
+def energy_sum(values: List[Tuple[float, Optional[float]]]) -> float:
+    """
+    能量和 E = Σ d_i·10^(L_i/10)
+
+    Args:
+        values: [(时长 d_i, 声级 L_i), ...]，声级为 None 的项忽略
+    """
+    return float(sum(d * 10 ** (level / 10) for d, level in values if level is not None))
+
+
+def level_from_energy(energy: float, duration_s: float) -> Optional[float]:
+    """由能量和及时长计算等效声级 L = 10·log10(E / T)，无数据时返回 None"""
+    if not energy or not duration_s or energy <= 0 or duration_s <= 0:
+        return None
+    return 10 * np.log10(energy / duration_s)
+
+
+def period_index(timestamp: datetime, period_seconds: int) -> int:
+    """时间戳所在时段的序号（Unix 时间整除时段长度，无时区的时间按 UTC 处理）"""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp()) // int(period_seconds)
+
+
+def period_start_time(index: int, period_seconds: int) -> datetime:
+    """时段序号对应的起点（无时区的 UTC 时间）"""
+    return datetime.fromtimestamp(index * int(period_seconds), tz=timezone.utc).replace(tzinfo=None)
 
 
 class SummaryProcessor:
@@ -113,15 +160,21 @@ class SummaryProcessor:
     必须通过对秒级原始矩统计块 (S1-S4) 进行累加后重新计算。
     """
     
-    def __init__(self, aggregation_seconds: int = 60):
+    def __init__(self, aggregation_seconds: int = 60, align_to_clock: bool = False):
         """
         初始化汇聚处理器
         
         Args:
             aggregation_seconds: 汇聚时段长度（秒），默认 60 秒（1 分钟）
+            align_to_clock: 为 True 时按与时钟对齐的时段汇聚（如整分钟、整点），
+                数据进入新的时段时输出上一时段；默认每累计 aggregation_seconds 秒输出一次
         """
         self.aggregation_seconds = aggregation_seconds
-        self._buffer: List[SecondMetrics] = []
+        self.align_to_clock = align_to_clock
+        # 秒级数据 (SecondMetrics)，或逐级汇聚时较低级别的汇聚结果 (AggregatedMetrics)
+        self._buffer: List[Union[SecondMetrics, AggregatedMetrics]] = []
+        self._buffered_seconds = 0
+        self._period: Optional[int] = None
         self._callback: Optional[Callable[[AggregatedMetrics], None]] = None
         
         # 统计信息
@@ -142,13 +195,38 @@ class SummaryProcessor:
         Returns:
             AggregatedMetrics: 当积累到完整时段时返回汇聚结果，否则返回 None
         """
-        self._buffer.append(metrics)
-        self._total_processed_seconds += 1
+        return self._add(metrics, metrics.timestamp, 1)
+    
+    def add_aggregated_metrics(self, metrics: AggregatedMetrics) -> Optional[AggregatedMetrics]:
+        """
+        添加较低级别的汇聚结果（逐级汇聚，如 1 分钟 -> 15 分钟）
+        
+        能量和及原始矩统计量直接累加，结果与直接从秒级数据汇聚一致
+        
+        Args:
+            metrics: 较低级别的汇聚结果
+            
+        Returns:
+            AggregatedMetrics: 完成一个时段时返回汇聚结果，否则返回 None
+        """
+        return self._add(metrics, metrics.start_time, metrics.sample_count)
+    
+    def _add(self, item, timestamp: datetime, seconds: int) -> Optional[AggregatedMetrics]:
+        result = None
+        if self.align_to_clock:
+            period = period_index(timestamp, self.aggregation_seconds)
+            if self._buffer and period != self._period:
+                result = self._flush_buffer()
+            self._period = period
+        
+        self._buffer.append(item)
+        self._buffered_seconds += seconds
+        self._total_processed_seconds += seconds
         
         # 检查是否达到汇聚条件
-        if len(self._buffer) >= self.aggregation_seconds:
-            return self._flush_buffer()
-        return None
+        if not self.align_to_clock and self._buffered_seconds >= self.aggregation_seconds:
+            result = self._flush_buffer()
+        return result
     
     def flush_remaining(self) -> Optional[AggregatedMetrics]:
         """
@@ -175,10 +253,16 @@ class SummaryProcessor:
             return None
         
         # 计算汇聚结果
-        aggregated = self._aggregate_metrics(self._buffer)
+        if isinstance(self._buffer[0], AggregatedMetrics):
+            aggregated = self.merge_aggregated(self._buffer)
+        else:
+            aggregated = self._aggregate_metrics(self._buffer)
+        if self.align_to_clock:
+            aggregated.period_start = period_start_time(self._period, self.aggregation_seconds)
         
         # 清空缓冲区
         self._buffer = []
+        self._buffered_seconds = 0
         self._total_aggregated_windows += 1
         
         # 调用回调
@@ -249,6 +333,13 @@ class SummaryProcessor:
         lcpeak_values = [s.LCpeak for s in seconds_data if s.LCpeak is not None]
         LCpeak = max(lcpeak_values) if lcpeak_values else 0.0
         
+        lafmax_values = [s.LAFmax for s in seconds_data if s.LAFmax is not None]
+        LAFmax = max(lafmax_values) if lafmax_values else None
+        
+        # === 能量和（用于逐级汇聚） ===
+        def _energy(attr):
+            return energy_sum([(s.duration_s, getattr(s, attr)) for s in seconds_data])
+        
         # === 剂量累计 ===
         dose_frac_niosh = sum(s.dose_frac_niosh for s in seconds_data)
         dose_frac_osha_pel = sum(s.dose_frac_osha_pel for s in seconds_data)
@@ -319,6 +410,19 @@ class SummaryProcessor:
             end_time=end_time,
             duration_s=duration_s,
             sample_count=sample_count,
+            LAFmax=LAFmax,
+            LAeq_energy=_energy('LAeq'),
+            LCeq_energy=_energy('LCeq'),
+            LZeq_energy=_energy('LZeq'),
+            freq_63hz_energy=_energy('freq_63hz_spl'),
+            freq_125hz_energy=_energy('freq_125hz_spl'),
+            freq_250hz_energy=_energy('freq_250hz_spl'),
+            freq_500hz_energy=_energy('freq_500hz_spl'),
+            freq_1khz_energy=_energy('freq_1khz_spl'),
+            freq_2khz_energy=_energy('freq_2khz_spl'),
+            freq_4khz_energy=_energy('freq_4khz_spl'),
+            freq_8khz_energy=_energy('freq_8khz_spl'),
+            freq_16khz_energy=_energy('freq_16khz_spl'),
             LAeq=round(LAeq, 2),
             LCeq=round(LCeq, 2),
             LZeq=round(LZeq, 2),
@@ -370,6 +474,85 @@ class SummaryProcessor:
             valid_seconds=valid_seconds
         )
     
+    @staticmethod
+    def merge_aggregated(blocks: List[AggregatedMetrics]) -> AggregatedMetrics:
+        """
+        合并多个相邻时段的汇聚结果（逐级汇聚）
+        
+        - 能量和、剂量、原始矩统计量 (n, S1-S4) 及质量控制计数累加
+        - 声级由合并后的能量和重新计算，峰值取最大值
+        - 峰度由合并后的 S1-S4 重新计算（根据规范 4.X.6）
+        
+        Args:
+            blocks: 较低级别的汇聚结果
+            
+        Returns:
+            AggregatedMetrics: 合并后的时段指标
+        """
+        if not blocks:
+            raise ValueError("Empty aggregated blocks")
+        
+        def total(attr):
+            return sum(getattr(b, attr) or 0 for b in blocks)
+        
+        def maximum(attr):
+            values = [getattr(b, attr) for b in blocks if getattr(b, attr) is not None]
+            return max(values) if values else None
+        
+        def kurtosis(n, s1, s2, s3, s4):
+            return TimeHistoryProcessor.calculate_kurtosis_from_moments(
+                total(n), total(s1), total(s2), total(s3), total(s4))
+        
+        duration_s = total('duration_s')
+        sample_count = total('sample_count')
+        valid_seconds = total('valid_seconds')
+        
+        def level(attr):
+            value = level_from_energy(total(attr), duration_s)
+            return round(value, 2) if value is not None else None
+        
+        fields = {}
+        for band in ('63hz', '125hz', '250hz', '500hz', '1khz', '2khz', '4khz', '8khz', '16khz'):
+            prefix = f"freq_{band}"
+            for moment in ('n', 's1', 's2', 's3', 's4', 'energy'):
+                fields[f"{prefix}_{moment}"] = total(f"{prefix}_{moment}")
+            fields[f"{prefix}_spl"] = level(f"{prefix}_energy")
+            beta = kurtosis(*(f"{prefix}_{m}" for m in ('n', 's1', 's2', 's3', 's4')))
+            fields[f"{prefix}_kurtosis"] = round(beta, 2) if beta else None
+        
+        beta = kurtosis('n_samples', 'sum_x', 'sum_x2', 'sum_x3', 'sum_x4')
+        return AggregatedMetrics(
+            start_time=min(b.start_time for b in blocks),
+            end_time=max(b.end_time for b in blocks),
+            duration_s=duration_s,
+            sample_count=sample_count,
+            LAeq=level('LAeq_energy') or 0.0,
+            LCeq=level('LCeq_energy') or 0.0,
+            LZeq=level('LZeq_energy') or 0.0,
+            LZpeak=maximum('LZpeak') or 0.0,
+            LCpeak=maximum('LCpeak') or 0.0,
+            LAFmax=maximum('LAFmax'),
+            dose_frac_niosh=round(total('dose_frac_niosh'), 6),
+            dose_frac_osha_pel=round(total('dose_frac_osha_pel'), 6),
+            dose_frac_osha_hca=round(total('dose_frac_osha_hca'), 6),
+            dose_frac_eu_iso=round(total('dose_frac_eu_iso'), 6),
+            beta_kurtosis=round(beta, 4) if beta is not None else None,
+            n_samples=total('n_samples'),
+            sum_x=total('sum_x'),
+            sum_x2=total('sum_x2'),
+            sum_x3=total('sum_x3'),
+            sum_x4=total('sum_x4'),
+            LAeq_energy=total('LAeq_energy'),
+            LCeq_energy=total('LCeq_energy'),
+            LZeq_energy=total('LZeq_energy'),
+            valid_flag=valid_seconds >= (sample_count * 0.5),
+            artifact_flag=any(b.artifact_flag for b in blocks),
+            overload_count=total('overload_count'),
+            underrange_count=total('underrange_count'),
+            valid_seconds=valid_seconds,
+            **fields
+        )
+    
     @staticmethod
     def _energy_average(db_values: List[float]) -> float:
         """
@@ -414,63 +597,84 @@ class MultiLevelAggregator:
     """
     多级汇聚器
     
-    支持从秒级 → 分钟级 → 更高级别的逐级汇聚
+    逐级汇聚：秒级数据汇聚为最低级别，每个较高级别由相邻较低级别的汇聚结果合并得到
+    （如 1 分钟 -> 15 分钟 -> 1 小时）。各级别保存能量和及原始矩统计量 S1-S4，
+    逐级合并的结果与直接从秒级数据汇聚一致。
+    
+    默认按与时钟对齐的时段汇聚（整分钟、整刻钟、整点）；一个时段的数据分布在多个文件中时，
+    每个文件结束调用 flush_all() 各输出一条部分结果，可按时段累加合并。
     """
     
-    def __init__(self):
+    def __init__(self, align_to_clock: bool = True):
+        """
+        Args:
+            align_to_clock: 是否按与时钟对齐的时段汇聚
+        """
+        self.align_to_clock = align_to_clock
         self.levels: Dict[AggregationLevel, SummaryProcessor] = {}
+        self._callbacks: Dict[AggregationLevel, Optional[Callable[[AggregatedMetrics], None]]] = {}
+        self._results: Dict[AggregationLevel, List[AggregatedMetrics]] = {}
         self._current_level = AggregationLevel.SECOND
     
     def add_level(self, level: AggregationLevel, 
                   callback: Optional[Callable[[AggregatedMetrics], None]] = None):
         """
-        添加汇聚级别
+        添加汇聚级别（按从低到高的顺序添加，时段长度须为上一级别的整数倍）
         
         Args:
             level: 汇聚级别
             callback: 该级别汇聚完成后的回调函数
         """
-        processor = SummaryProcessor(aggregation_seconds=level.value)
-        if callback:
-            processor.set_callback(callback)
+        if self.levels:
+            top = list(self.levels)[-1]
+            if level.value <= top.value or level.value % top.value:
+                raise ValueError(f"Aggregation level {level.name} must be a multiple of {top.name}")
+        
+        processor = SummaryProcessor(aggregation_seconds=level.value, align_to_clock=self.align_to_clock)
+        processor.set_callback(lambda metrics, level=level: self._on_aggregated(level, metrics))
         self.levels[level] = processor
+        self._callbacks[level] = callback
         
         logger.info(f"Added aggregation level: {level.name} ({level.value}s)")
     
-    def process_second(self, metrics: SecondMetrics) -> Dict[AggregationLevel, Optional[AggregatedMetrics]]:
+    def _on_aggregated(self, level: AggregationLevel, metrics: AggregatedMetrics):
+        """某一级别完成一个时段：回调并交给上一级别"""
+        self._results.setdefault(level, []).append(metrics)
+        callback = self._callbacks.get(level)
+        if callback:
+            callback(metrics)
+        
+        levels = list(self.levels)
+        index = levels.index(level)
+        if index + 1 < len(levels):
+            self.levels[levels[index + 1]].add_aggregated_metrics(metrics)
+    
+    def process_second(self, metrics: SecondMetrics) -> Dict[AggregationLevel, List[AggregatedMetrics]]:
         """
-        处理单秒数据，触发所有级别的汇聚
+        处理单秒数据，逐级触发汇聚
         
         Args:
             metrics: 单秒指标
             
         Returns:
-            Dict: 各级别汇聚结果（如果该级别完成汇聚）
+            Dict: 本次完成汇聚的级别及其汇聚结果
         """
-        results = {}
-        
-        for level, processor in self.levels.items():
-            result = processor.add_second_metrics(metrics)
-            if result is not None:
-                results[level] = result
-        
-        return results
+        self._results = {}
+        if self.levels:
+            next(iter(self.levels.values())).add_second_metrics(metrics)
+        return self._results
     
-    def flush_all(self) -> Dict[AggregationLevel, Optional[AggregatedMetrics]]:
+    def flush_all(self) -> Dict[AggregationLevel, List[AggregatedMetrics]]:
         """
-        强制汇聚所有级别的剩余数据
+        强制汇聚所有级别的剩余数据（从低到高，较低级别的剩余数据先并入上一级别）
         
         Returns:
             Dict: 各级别汇聚结果
         """
-        results = {}
-        
-        for level, processor in self.levels.items():
-            result = processor.flush_remaining()
-            if result is not None:
-                results[level] = result
-        
-        return results
+        self._results = {}
+        for processor in self.levels.values():
+            processor.flush_remaining()
+        return self._results
 
 
 def aggregate_from_moment_blocks(blocks: List[Tuple[int, float, float, float, float]]) -> Optional[float]:
@@ -1,21 +1,320 @@
 """
 TDMS to WAV converter module
+Also provides streamed TDMS channel reading for direct processing without a temporary WAV
 """
 import numpy as np
 import soundfile as sf
 from nptdms import TdmsFile
 from pathlib import Path
-from typing import Union, Optional
+from typing import Iterator, List, Optional
 
 from app.utils import logger
 
 
+# Channel properties that may carry the sampling rate
+SAMPLE_RATE_PROPERTIES = ("SampleRate", "sample_rate")
+
+# Samples read from the TDMS file per request when scanning a channel
+SCAN_BLOCK_SAMPLES = 1 << 20
+
+
+def channel_sample_rate(channel, default: Optional[int]) -> Optional[int]:
+    """Sampling rate from the channel properties, or ``default``"""
+    try:
+        properties = getattr(channel, "properties", {})
+        for name in SAMPLE_RATE_PROPERTIES:
+            if name in properties:
+                return int(properties[name])
+    except Exception as e:
+        logger.warning(f"Could not extract sampling rate from TDMS file: {e}")
+    return int(default) if default is not None else None
+
+
+def fixed_scale(dtype) -> Optional[float]:
+    """Normalization factor known from the dtype alone, None if the data maximum is needed"""
+    if dtype == np.float32:
+        return 1.0
+    if dtype in [np.int16, np.int32]:
+        return 1.0 / np.iinfo(dtype).max
+    return None
+
+
+def max_abs_scale(data_max: float) -> float:
+    """Normalization factor from the absolute maximum of the data"""
+    return 1.0 / data_max if data_max > 0 else 1.0
+
+
+def normalize_block(block: np.ndarray, scale: float) -> np.ndarray:
+    """Apply the normalization factor and convert to float32"""
+    if block.dtype == np.float32:
+        return block
+    return (block.astype(np.float64) * scale).astype(np.float32)
+
+
+class TdmsChannelReader:
+    """Stream one TDMS channel as normalized float32 blocks
+    
+    The file is opened with ``TdmsFile.open`` and read in blocks, so the channel
+    is never fully loaded. Samples are scaled exactly as the former TDMS -> WAV
+    conversion did:
+    
+    - float32 data is used as is
+    - int16/int32 data is divided by the dtype maximum
+    - any other dtype is divided by the absolute maximum of the channel
+      (found by one extra streamed pass over the channel)
+    """
+    
+    def __init__(self, tdms_file_path: str, sampling_rate: int = 44100,
+                 group_index: int = 0, channel_index: int = 0, scale: Optional[float] = None):
+        """
+        Args:
+            tdms_file_path (str): Path to the TDMS file
+            sampling_rate (int): Sampling rate used when the channel has no rate property
+            group_index (int): Index of the group to read
+            channel_index (int): Index of the channel within the group
+            scale (float, optional): Known normalization factor (e.g. from another
+                reader of the same channel), skips the scan pass
+        """
+        self.tdms_file_path = str(tdms_file_path)
+        self.default_sampling_rate = sampling_rate
+        self.group_index = group_index
+        self.channel_index = channel_index
+        self._tdms_file = None
+        self._channel = None
+        self._scale: Optional[float] = scale
+    
+    def open(self) -> "TdmsChannelReader":
+        """Open the TDMS file and locate the channel"""
+        if self._tdms_file is not None:
+            return self
+        logger.info(f"Opening TDMS file: {self.tdms_file_path}")
+        self._tdms_file = TdmsFile.open(self.tdms_file_path)
+        try:
+            groups = self._tdms_file.groups()
+            if not groups:
+                raise ValueError("No groups found in TDMS file")
+            channels = groups[self.group_index].channels()
+            if not channels:
+                raise ValueError("No channels found in the first group")
+            self._channel = channels[self.channel_index]
+        except Exception:
+            self.close()
+            raise
+        return self
+    
+    def close(self):
+        """Close the TDMS file"""
+        if self._tdms_file is not None:
+            self._tdms_file.close()
+        self._tdms_file = None
+        self._channel = None
+    
+    def __enter__(self) -> "TdmsChannelReader":
+        return self.open()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    @property
+    def channel(self):
+        if self._channel is None:
+            raise RuntimeError("TdmsChannelReader is not open")
+        return self._channel
+    
+    @property
+    def sample_rate(self) -> int:
+        """Sampling rate from the channel properties, or the default"""
+        return channel_sample_rate(self.channel, self.default_sampling_rate)
+    
+    @property
+    def n_samples(self) -> int:
+        return len(self.channel)
+    
+    @property
+    def duration(self) -> float:
+        return self.n_samples / self.sample_rate
+    
+    @property
+    def scale(self) -> float:
+        """Factor applied to raw samples to get the normalized float32 signal"""
+        if self._scale is None:
+            self._scale = fixed_scale(self.channel.dtype)
+            if self._scale is None:
+                data_max = 0.0
+                for block in self._raw_blocks(SCAN_BLOCK_SAMPLES):
+                    data_max = max(data_max, float(np.max(np.abs(block))))
+                self._scale = max_abs_scale(data_max)
+        return self._scale
+    
+    def _raw_blocks(self, block_size: int, start: int = 0) -> Iterator[np.ndarray]:
+        channel = self.channel
+        for offset in range(int(start), len(channel), block_size):
+            yield channel.read_data(offset, block_size)
+    
+    def blocks(self, block_size: Optional[int] = None, start: int = 0) -> Iterator[np.ndarray]:
+        """Yield normalized float32 blocks of ``block_size`` samples (default 1 s)
+        
+        Reading begins at sample ``start``; the last block may be shorter.
+        """
+        block_size = int(block_size or self.sample_rate)
+        scale = self.scale
+        for block in self._raw_blocks(block_size, start):
+            yield normalize_block(block, scale)
+
+
+class TdmsGroupReader:
+    """Stream all channels of one TDMS group in a single pass over the file
+    
+    Raw data is read segment by segment with ``TdmsFile.data_chunks`` and
+    re-blocked per channel, so interleaved multi-channel files are read once
+    instead of once per channel. Each channel is normalized like
+    TdmsChannelReader; float64 (and other) channels need one extra scan pass
+    for their absolute maximum.
+    """
+    
+    def __init__(self, tdms_file_path: str, sampling_rate: int = 44100, group_index: int = 0):
+        """
+        Args:
+            tdms_file_path (str): Path to the TDMS file
+            sampling_rate (int): Sampling rate used when no channel has a rate property
+            group_index (int): Index of the group to read
+        """
+        self.tdms_file_path = str(tdms_file_path)
+        self.default_sampling_rate = sampling_rate
+        self.group_index = group_index
+        self._tdms_file = None
+        self._group = None
+        self._channels = []
+        self._scales: Optional[List[float]] = None
+    
+    def open(self) -> "TdmsGroupReader":
+        """Open the TDMS file and locate the group's channels"""
+        if self._tdms_file is not None:
+            return self
+        logger.info(f"Opening TDMS file: {self.tdms_file_path}")
+        self._tdms_file = TdmsFile.open(self.tdms_file_path)
+        try:
+            groups = self._tdms_file.groups()
+            if not groups:
+                raise ValueError("No groups found in TDMS file")
+            self._group = groups[self.group_index]
+            self._channels = self._group.channels()
+            if not self._channels:
+                raise ValueError("No channels found in the first group")
+        except Exception:
+            self.close()
+            raise
+        return self
+    
+    def close(self):
+        """Close the TDMS file"""
+        if self._tdms_file is not None:
+            self._tdms_file.close()
+        self._tdms_file = None
+        self._group = None
+        self._channels = []
+    
+    def __enter__(self) -> "TdmsGroupReader":
+        return self.open()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    @property
+    def channel_names(self) -> List[str]:
+        return [channel.name for channel in self._channels]
+    
+    @property
+    def sample_rate(self) -> int:
+        """Sampling rate of the group (all channels are processed at the first declared rate)"""
+        rates = [rate for rate in (channel_sample_rate(channel, None) for channel in self._channels)
+                 if rate is not None]
+        if not rates:
+            return int(self.default_sampling_rate)
+        if len(set(rates)) > 1:
+            logger.warning(f"TDMS channels have different sampling rates {sorted(set(rates))}, "
+                           f"using {rates[0]}")
+        return rates[0]
+    
+    @property
+    def n_samples(self) -> int:
+        """Length of the longest channel"""
+        return max(len(channel) for channel in self._channels)
+    
+    @property
+    def scales(self) -> List[float]:
+        """Normalization factor of each channel"""
+        if self._scales is None:
+            scales = [fixed_scale(channel.dtype) for channel in self._channels]
+            if any(scale is None for scale in scales):
+                data_max = [0.0] * len(scales)
+                for chunks in self._raw_chunks():
+                    for i, chunk in enumerate(chunks):
+                        if scales[i] is None and len(chunk):
+                            data_max[i] = max(data_max[i], float(np.max(np.abs(chunk))))
+                scales = [scale if scale is not None else max_abs_scale(data_max[i])
+                          for i, scale in enumerate(scales)]
+            self._scales = scales
+        return self._scales
+    
+    def _raw_chunks(self) -> Iterator[List[np.ndarray]]:
+        """Raw data of every channel, one TDMS segment at a time"""
+        for data_chunk in self._tdms_file.data_chunks():
+            group_chunk = data_chunk[self._group.name]
+            yield [group_chunk[channel.name][:] for channel in self._channels]
+    
+    def channel_blocks(self, block_size: Optional[int] = None) -> Iterator[List[np.ndarray]]:
+        """Yield one normalized float32 block per channel (default 1 s)
+        
+        All channels advance together; at the end of a shorter channel its
+        blocks are shorter or empty.
+        """
+        block_size = int(block_size or self.sample_rate)
+        scales = self.scales
+        n_channels = len(self._channels)
+        pending: List[List[np.ndarray]] = [[] for _ in range(n_channels)]
+        pending_len = [0] * n_channels
+        
+        def take(i: int, count: int) -> np.ndarray:
+            data = np.concatenate(pending[i]) if len(pending[i]) > 1 else (
+                pending[i][0] if pending[i] else np.zeros(0, dtype=np.float32))
+            pending[i] = [data[count:]] if len(data) > count else []
+            pending_len[i] = max(0, len(data) - count)
+            return data[:count]
+        
+        for chunks in self._raw_chunks():
+            for i, chunk in enumerate(chunks):
+                if len(chunk):
+                    pending[i].append(normalize_block(chunk, scales[i]))
+                    pending_len[i] += len(chunk)
+            while min(pending_len) >= block_size:
+                yield [take(i, block_size) for i in range(n_channels)]
+        
+        while max(pending_len) > 0:
+            yield [take(i, block_size) for i in range(n_channels)]
+
+
 class TDMSConverter:
     """Convert TDMS files to WAV format"""
     
     def __init__(self):
         pass
     
+    def open_channel(self, tdms_file_path: str, sampling_rate: int = 44100,
+                     group_index: int = 0, channel_index: int = 0) -> TdmsChannelReader:
+        """Open a TDMS channel for streamed processing (no temporary WAV file)
+        
+        Args:
+            tdms_file_path (str): Path to the TDMS file
+            sampling_rate (int): Sampling rate used when the channel has no rate property
+            group_index (int): Index of the group to read
+            channel_index (int): Index of the channel within the group
+            
+        Returns:
+            TdmsChannelReader: Opened reader, use as a context manager to close it
+        """
+        return TdmsChannelReader(tdms_file_path, sampling_rate, group_index, channel_index).open()
+    
     def convert_tdms_to_wav(self, tdms_file_path: str, wav_file_path: str = None, sampling_rate: int = 44100) -> str:
         """Convert a TDMS file to WAV format
         
@@ -32,49 +331,13 @@ class TDMSConverter:
             if wav_file_path is None:
                 tdms_path = Path(tdms_file_path)
                 wav_file_path = tdms_path.parent / f"temp_{tdms_path.stem}.wav"
-            # Read TDMS file
-            logger.info(f"Reading TDMS file: {tdms_file_path}")
-            tdms_file = TdmsFile.read(tdms_file_path)
-            # Extract data from the first channel (assuming single channel audio)
-            # You might need to adjust this based on your specific TDMS file structure
-            groups = tdms_file.groups()
-            if not groups:
-                raise ValueError("No groups found in TDMS file")
-            # Get the first group and channel
-            first_group = groups[0]
-            channels = first_group.channels()
-            if not channels:
-                raise ValueError("No channels found in the first group")
-            # Get data from the first channel
-            first_channel = channels[0]
-            data = first_channel[:]
-            # Get sampling rate if available
-            try:
-                # Try to get sampling rate from properties
-                if hasattr(first_channel, "properties"):
-                    if "SampleRate" in first_channel.properties:
-                        sampling_rate = first_channel.properties["SampleRate"]
-                    elif "sample_rate" in first_channel.properties:
-                        sampling_rate = first_channel.properties["sample_rate"]
-            except Exception as e:
-                logger.warning(f"Could not extract sampling rate from TDMS file: {e}")
-            # Convert to float32 if needed (soundfile works best with float32)
-            if data.dtype != np.float32:
-                # Normalize data to [-1, 1] range for audio
-                if data.dtype in [np.int16, np.int32]:
-                    data = data.astype(np.float32) / np.iinfo(data.dtype).max
-                else:
-                    # For other data types, normalize to [-1, 1]
-                    data_max = np.max(np.abs(data))
-                    if data_max > 0:
-                        data = data.astype(np.float32) / data_max
-                    else:
-                        data = data.astype(np.float32)
-            
-            # Ensure the data is in the proper format for librosa
-            # Write to WAV file with format that librosa can easily read
-            logger.info(f"Writing WAV file: {wav_file_path}")
-            sf.write(wav_file_path, data, sampling_rate, subtype='FLOAT')
+            # Stream the first channel of the first group (assuming single channel audio)
+            with TdmsChannelReader(tdms_file_path, sampling_rate) as reader:
+                logger.info(f"Writing WAV file: {wav_file_path}")
+                with sf.SoundFile(str(wav_file_path), "w", samplerate=reader.sample_rate,
+                                  channels=1, subtype='FLOAT') as wav_file:
+                    for block in reader.blocks():
+                        wav_file.write(block)
             logger.info(f"Successfully converted {tdms_file_path} to {wav_file_path}")
             return str(wav_file_path)
         except Exception as e:
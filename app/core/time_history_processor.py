@@ -9,26 +9,29 @@
         实现每秒数据处理并存储到TimeHistory表
 """
 
+import os
+import concurrent.futures
+import multiprocessing
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Callable
-from dataclasses import dataclass
+from typing import List, Dict, Iterable, Optional, Callable
+from dataclasses import dataclass, fields
 from acoustics import Signal
-from acoustics.standards.iec_61672_1_2013 import (
-    time_averaged_sound_level,
-    average
-)
-from acoustics.standards.iso_tr_25417_2007 import (
-    sound_pressure_level
-)
 from acoustics.standards.iso_tr_25417_2007 import (
     peak_sound_pressure_level,
     equivalent_sound_pressure_level
 )
 from scipy.stats import kurtosis
 
+from app.core.audio_source import SoundFileSource, TdmsSource, open_audio_source
 from app.core.dose_calculator import DoseCalculator, DoseStandard
+from app.core.filter_bank import (
+    get_filter_bank,
+    StreamingFilterBank,
+    BAND_NAMES,
+    BAND_FIELD_PREFIXES
+)
 from app.utils import logger
 
 
@@ -140,6 +143,13 @@ class SecondMetrics:
     beta_kurtosis: Optional[float] = None  # 基于原始矩计算的峰度 β
 
 
+# SecondMetrics 字段顺序，即批量处理结果 DataFrame 的列顺序
+SECOND_METRICS_FIELDS = [f.name for f in fields(SecondMetrics)]
+
+# 分片处理时每个分片的滤波器预热时长（秒）
+DEFAULT_SHARD_WARMUP_SECONDS = 2.0
+
+
 class TimeHistoryProcessor:
     """时间历程数据处理器 - 处理每秒音频数据"""
     
@@ -161,6 +171,8 @@ class TimeHistoryProcessor:
         self.reference_pressure = reference_pressure
         self.callback = callback
         self.dose_calculator = DoseCalculator()
+        # 流式滤波器组（跨秒保持滤波器状态），首次处理数据块时按采样率创建
+        self._stream: Optional[StreamingFilterBank] = None
     
     @staticmethod
     def calculate_kurtosis_from_moments(n: int, s1: float, s2: float, s3: float, s4: float) -> Optional[float]:
@@ -211,77 +223,101 @@ class TimeHistoryProcessor:
         """实例方法包装，调用静态方法"""
         return self.calculate_kurtosis_from_moments(n, s1, s2, s3, s4)
     
-    def _calculate_third_octave_metrics(self, signal: Signal) -> tuple:
+    def _calculate_third_octave_metrics(self, band_data: List[Optional[np.ndarray]]) -> tuple:
         """
         计算1/3倍频程频段指标
         
+        Args:
+            band_data: FilterBank.filter_bands() 输出的9个频段信号，不可用频段为 None
+        
         返回:
             (freq_spl_dict, freq_moments_dict): 频段SPL和原始矩统计量字典
             freq_moments_dict格式: {频段名: (n, s1, s2, s3, s4)}
         """
-        try:
-            # 获取1/3倍频程数据
-            center_freqs, octaves = signal.third_octaves()
-            
-            # 定义关心的频段索引（对应63Hz-16kHz）
-            # third_octaves()返回的索引：8=63Hz, 11=125Hz, 14=250Hz, 17=500Hz
-            # 20=1kHz, 23=2kHz, 26=4kHz, 29=8kHz, 32=16kHz
-            freq_indices = [8, 11, 14, 17, 20, 23, 26, 29, 32]
-            freq_names = ['63Hz', '125Hz', '250Hz', '500Hz', '1kHz', '2kHz', '4kHz', '8kHz', '16kHz']
-            
-            freq_spl_dict = {}
-            freq_moments_dict = {}
-            
-            for idx, name in zip(freq_indices, freq_names):
-                if idx < len(octaves):
-                    s_octave = octaves[idx]
-                    octave_data = s_octave.values
-                    
-                    # 计算频段SPL（1秒平均）
-                    try:
-                        _, spl = time_averaged_sound_level(
-                            pressure=octave_data,
-                            sample_frequency=signal.fs,
-                            averaging_time=1.0,  # 1秒平均
-                            reference_pressure=self.reference_pressure
-                        )
-                        freq_spl_dict[name] = round(spl, 2)
-                    except Exception as e:
-                        logger.warning(f"Failed to calculate SPL for {name}: {e}")
-                        freq_spl_dict[name] = None
-                    
-                    # 计算频段原始矩统计量 S1-S4（用于后续精确合成频段峰度）
-                    try:
-                        n = len(octave_data)
-                        s1 = np.sum(octave_data)
-                        s2 = np.sum(octave_data ** 2)
-                        s3 = np.sum(octave_data ** 3)
-                        s4 = np.sum(octave_data ** 4)
-                        freq_moments_dict[name] = (n, s1, s2, s3, s4)
-                    except Exception as e:
-                        logger.warning(f"Failed to calculate moments for {name}: {e}")
-                        freq_moments_dict[name] = (0, 0.0, 0.0, 0.0, 0.0)
-                else:
-                    freq_spl_dict[name] = None
-                    freq_moments_dict[name] = (0, 0.0, 0.0, 0.0, 0.0)
+        freq_spl_dict = {}
+        freq_moments_dict = {}
+        
+        for name, octave_data in zip(BAND_NAMES, band_data):
+            if octave_data is None or len(octave_data) == 0:
+                freq_spl_dict[name] = None
+                freq_moments_dict[name] = (0, 0.0, 0.0, 0.0, 0.0)
+                continue
             
-            return freq_spl_dict, freq_moments_dict
+            # 计算频段SPL（整段即1秒的等效声压级）
+            try:
+                spl = equivalent_sound_pressure_level(
+                    octave_data, reference_pressure=self.reference_pressure)
+                freq_spl_dict[name] = round(float(spl), 2)
+            except Exception as e:
+                logger.warning(f"Failed to calculate SPL for {name}: {e}")
+                freq_spl_dict[name] = None
             
-        except Exception as e:
-            logger.error(f"Error calculating third octave metrics: {e}")
-            # 返回空字典，使用默认值
-            freq_names = ['63Hz', '125Hz', '250Hz', '500Hz', '1kHz', '2kHz', '4kHz', '8kHz', '16kHz']
-            return {name: None for name in freq_names}, {name: (0, 0.0, 0.0, 0.0, 0.0) for name in freq_names}
+            # 计算频段原始矩统计量 S1-S4（用于后续精确合成频段峰度）
+            try:
+                x2 = octave_data * octave_data
+                freq_moments_dict[name] = (
+                    len(octave_data),
+                    float(np.sum(octave_data)),
+                    float(np.sum(x2)),
+                    float(np.sum(x2 * octave_data)),
+                    float(np.sum(x2 * x2)),
+                )
+            except Exception as e:
+                logger.warning(f"Failed to calculate moments for {name}: {e}")
+                freq_moments_dict[name] = (0, 0.0, 0.0, 0.0, 0.0)
+        
+        return freq_spl_dict, freq_moments_dict
+    
+    def _calculate_fast_max_level(self, a_weighted: np.ndarray, sr: int) -> Optional[float]:
+        """
+        计算 LAFmax：125ms 窗口内A计权等效声级的最大值
+        
+        数据不足一个窗口时返回 None
+        """
+        window = int(0.125 * sr)
+        n_windows = len(a_weighted) // window if window > 0 else 0
+        if n_windows == 0:
+            return None
+        
+        blocks = a_weighted[:n_windows * window].reshape(n_windows, window)
+        mean_square = np.mean(blocks * blocks, axis=1)
+        return float(10.0 * np.log10(np.max(mean_square) / self.reference_pressure ** 2))
     
     def process_signal_per_second(self, 
                                    signal: Signal, 
-                                   start_time: Optional[datetime] = None) -> List[SecondMetrics]:
+                                   start_time: Optional[datetime] = None,
+                                   accumulator=None) -> List[SecondMetrics]:
         """
         按秒处理音频信号
         
         Args:
             signal: acoustics.Signal 对象
             start_time: 开始时间，默认为当前时间
+            accumulator: 整文件指标累加器（如 WholeFileAccumulator），复用每秒已滤波的信号
+            
+        Returns:
+            List[SecondMetrics]: 每秒钟的指标列表
+        """
+        sr = signal.fs
+        samples_per_second = int(sr)
+        values = signal.values
+        blocks = (values[start:start + samples_per_second]
+                  for start in range(0, len(values), samples_per_second))
+        return self.process_blocks(blocks, sr, start_time, accumulator=accumulator)
+    
+    def process_blocks(self,
+                       blocks: Iterable[np.ndarray],
+                       sr: int,
+                       start_time: Optional[datetime] = None,
+                       accumulator=None) -> List[SecondMetrics]:
+        """
+        按秒处理连续的音频数据块（如 TDMS/音频文件的流式读取结果），整个文件无需载入内存
+        
+        Args:
+            blocks: 连续的1秒数据块，最后一块可不足1秒
+            sr: 采样率
+            start_time: 开始时间，默认为当前时间
+            accumulator: 整文件指标累加器（如 WholeFileAccumulator），复用每秒已滤波的信号
             
         Returns:
             List[SecondMetrics]: 每秒钟的指标列表
@@ -289,42 +325,280 @@ class TimeHistoryProcessor:
         if start_time is None:
             start_time = datetime.utcnow()
         
+        logger.info(f"Processing audio blocks at {sr}Hz")
+        
+        # 所有数据块视为一次连续流：每个样本只滤波一次，滤波器状态跨秒延续
+        self.reset_stream()
+        
         results = []
+        for second_idx, block in enumerate(blocks):
+            if len(block) == 0:
+                break
+            metrics = self.process_block(
+                block,
+                sr,
+                start_time + timedelta(seconds=second_idx),
+                accumulator=accumulator
+            )
+            results.append(metrics)
+        
+        logger.info(f"Processed {len(results)} seconds of time history data")
+        return results
+    
+    def process_signal_batch(self,
+                             signal: Signal,
+                             start_time: Optional[datetime] = None,
+                             chunk_seconds: int = 300,
+                             accumulator=None) -> pd.DataFrame:
+        """
+        批量（向量化）按秒处理音频信号，适用于离线文件重处理
+        
+        按 chunk_seconds 分块流式滤波（滤波器状态跨块延续，与整段滤波一致，同时限制内存占用），
+        每块重排为 (秒数, sr) 后通过轴向归约一次性计算全部秒级指标，
+        不再逐秒构造 SecondMetrics 对象。
+        
+        Args:
+            signal: acoustics.Signal 对象
+            start_time: 开始时间，默认为当前时间
+            chunk_seconds: 每次滤波处理的秒数
+            accumulator: 整文件指标累加器（如 WholeFileAccumulator），复用每块已滤波的信号
+            
+        Returns:
+            pd.DataFrame: 每行一秒，列名与 SecondMetrics 字段一致
+        """
         sr = signal.fs
-        total_samples = len(signal.values)
+        values = signal.values
+        chunk_samples = int(sr) * max(1, int(chunk_seconds))
+        chunks = (values[start:start + chunk_samples]
+                  for start in range(0, len(values), chunk_samples))
+        return self.process_chunks_batch(chunks, sr, start_time, accumulator=accumulator)
+    
+    def process_chunks_batch(self,
+                             chunks: Iterable[np.ndarray],
+                             sr: int,
+                             start_time: Optional[datetime] = None,
+                             accumulator=None,
+                             warmup: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        批量（向量化）处理连续的数据块，数据块可来自流式音频数据源
+        
+        Args:
+            chunks: 连续的数据块，除最后一块外长度须为 sr 的整数倍
+            sr: 采样率
+            start_time: 开始时间，默认为当前时间
+            accumulator: 整文件指标累加器（如 WholeFileAccumulator），复用每块已滤波的信号
+            warmup: chunks 之前紧邻的音频，只用于建立滤波器状态，不计算指标（分片处理时使用）
+            
+        Returns:
+            pd.DataFrame: 每行一秒，列名与 SecondMetrics 字段一致
+        """
+        if start_time is None:
+            start_time = datetime.utcnow()
+        
         samples_per_second = int(sr)
+        logger.info(f"Batch processing audio at {sr}Hz")
         
-        # 计算总秒数
-        total_seconds = int(np.ceil(total_samples / samples_per_second))
+        stream = StreamingFilterBank(sr)
+        if warmup is not None and len(warmup):
+            stream.process(np.asarray(warmup, dtype=np.float64))
+        parts = []
+        for chunk in chunks:
+            chunk = np.asarray(chunk, dtype=np.float64)
+            a_weighted, c_weighted, band_data = stream.process(chunk)
+            if accumulator is not None:
+                accumulator.update(chunk, a_weighted, c_weighted, band_data)
+            
+            n_full = len(chunk) // samples_per_second
+            split = n_full * samples_per_second
+            if n_full > 0:
+                shape = (n_full, samples_per_second)
+                parts.append(self._calculate_block_columns(
+                    chunk[:split].reshape(shape),
+                    a_weighted[:split].reshape(shape),
+                    c_weighted[:split].reshape(shape),
+                    [b[:split].reshape(shape) if b is not None else None for b in band_data],
+                    sr
+                ))
+            # 末尾不足一秒的部分单独作为一行
+            if split < len(chunk):
+                parts.append(self._calculate_block_columns(
+                    chunk[split:][np.newaxis, :],
+                    a_weighted[split:][np.newaxis, :],
+                    c_weighted[split:][np.newaxis, :],
+                    [b[split:][np.newaxis, :] if b is not None else None for b in band_data],
+                    sr
+                ))
         
-        logger.info(f"Processing {total_seconds} seconds of audio at {sr}Hz")
+        if not parts:
+            return pd.DataFrame(columns=SECOND_METRICS_FIELDS)
         
-        for second_idx in range(total_seconds):
-            # 提取当前秒的样本
-            start_sample = second_idx * samples_per_second
-            end_sample = min((second_idx + 1) * samples_per_second, total_samples)
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        n_rows = len(columns['LAeq'])
+        columns['timestamp'] = pd.Timestamp(start_time) + pd.to_timedelta(np.arange(n_rows), unit='s')
+        
+        frame = pd.DataFrame(columns)[SECOND_METRICS_FIELDS]
+        logger.info(f"Batch processed {n_rows} seconds of time history data")
+        return frame
+    
+    def _calculate_block_columns(self,
+                                 data: np.ndarray,
+                                 a_weighted: np.ndarray,
+                                 c_weighted: np.ndarray,
+                                 band_data: List[Optional[np.ndarray]],
+                                 sr: int) -> Dict[str, np.ndarray]:
+        """
+        对形状为 (行数, 每行样本数) 的数据块按行计算秒级指标
+        
+        计算口径与 _build_second_metrics 完全一致，返回 {字段名: 列数组}
+        """
+        p0_sq = self.reference_pressure ** 2
+        n_rows, n = data.shape
+        columns = {}
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Equivalent sound levels
+            LAeq = 10.0 * np.log10(np.mean(a_weighted * a_weighted, axis=1) / p0_sq)
+            LCeq = 10.0 * np.log10(np.mean(c_weighted * c_weighted, axis=1) / p0_sq)
+            LZeq = 10.0 * np.log10(np.mean(data * data, axis=1) / p0_sq)
             
-            if start_sample >= total_samples:
-                break
+            # Peak levels
+            LZpeak = 20.0 * np.log10(np.max(np.abs(data), axis=1) / self.reference_pressure)
+            LCpeak = 20.0 * np.log10(np.max(np.abs(c_weighted), axis=1) / self.reference_pressure)
             
-            second_data = signal.values[start_sample:end_sample]
+            # LAFmax: 125ms 窗口A计权等效声级最大值，不足一个窗口时取 LAeq
+            window = int(0.125 * sr)
+            n_windows = n // window if window > 0 else 0
+            if n_windows > 0:
+                blocks = a_weighted[:, :n_windows * window].reshape(n_rows, n_windows, window)
+                LAFmax = 10.0 * np.log10(np.max(np.mean(blocks * blocks, axis=2), axis=1) / p0_sq)
+            else:
+                LAFmax = LAeq.copy()
             
-            # 计算当前秒的指标
-            metrics = self._calculate_second_metrics(
-                second_data, 
-                sr, 
-                start_time + timedelta(seconds=second_idx),
-                duration=(end_sample - start_sample) / sr
-            )
+            # Kurtosis (scipy, backward compatible)，无法计算时（如静音）取 3.0，与 _build_second_metrics 一致
+            kurtosis_total = np.nan_to_num(kurtosis(data, axis=1, fisher=False), nan=3.0, posinf=3.0, neginf=3.0)
+            kurtosis_a = np.nan_to_num(kurtosis(a_weighted, axis=1, fisher=False), nan=3.0, posinf=3.0, neginf=3.0)
+            kurtosis_c = np.nan_to_num(kurtosis(c_weighted, axis=1, fisher=False), nan=3.0, posinf=3.0, neginf=3.0)
             
-            results.append(metrics)
+            # Raw moments S1-S4 (规范 4.X.3)
+            x2 = data * data
+            sum_x = np.sum(data, axis=1)
+            sum_x2 = np.sum(x2, axis=1)
+            sum_x3 = np.sum(x2 * data, axis=1)
+            sum_x4 = np.sum(x2 * x2, axis=1)
+            beta_kurtosis = self._calculate_kurtosis_from_moment_arrays(n, sum_x, sum_x2, sum_x3, sum_x4)
             
-            # 调用回调函数
-            if self.callback:
-                self.callback(metrics)
+            # 1/3倍频程频段SPL及原始矩
+            for prefix, band in zip(BAND_FIELD_PREFIXES, band_data):
+                if band is None:
+                    columns[f'{prefix}_spl'] = np.full(n_rows, np.nan)
+                    columns[f'{prefix}_n'] = np.zeros(n_rows, dtype=np.int64)
+                    for k in ('s1', 's2', 's3', 's4'):
+                        columns[f'{prefix}_{k}'] = np.zeros(n_rows)
+                    continue
+                b2 = band * band
+                columns[f'{prefix}_spl'] = np.round(10.0 * np.log10(np.mean(b2, axis=1) / p0_sq), 2)
+                columns[f'{prefix}_n'] = np.full(n_rows, n, dtype=np.int64)
+                columns[f'{prefix}_s1'] = np.sum(band, axis=1)
+                columns[f'{prefix}_s2'] = np.sum(b2, axis=1)
+                columns[f'{prefix}_s3'] = np.sum(b2 * band, axis=1)
+                columns[f'{prefix}_s4'] = np.sum(b2 * b2, axis=1)
         
-        logger.info(f"Processed {len(results)} seconds of time history data")
-        return results
+        # Dose increments (每行按1秒计)
+        columns['dose_frac_niosh'] = np.round(
+            self.dose_calculator.calculate_dose_increments(LAeq, 1.0, DoseStandard.NIOSH), 6)
+        columns['dose_frac_osha_pel'] = np.round(
+            self.dose_calculator.calculate_dose_increments(LAeq, 1.0, DoseStandard.OSHA_PEL), 6)
+        columns['dose_frac_osha_hca'] = np.round(
+            self.dose_calculator.calculate_dose_increments(LAeq, 1.0, DoseStandard.OSHA_HCA), 6)
+        columns['dose_frac_eu_iso'] = np.round(
+            self.dose_calculator.calculate_dose_increments(LAeq, 1.0, DoseStandard.EU_ISO), 6)
+        
+        columns['duration_s'] = np.full(n_rows, n / sr)
+        columns['LAeq'] = np.round(LAeq, 2)
+        columns['LCeq'] = np.round(LCeq, 2)
+        columns['LZeq'] = np.round(LZeq, 2)
+        columns['LAFmax'] = np.round(LAFmax, 2)
+        columns['LZpeak'] = np.round(LZpeak, 2)
+        columns['LCpeak'] = np.round(LCpeak, 2)
+        
+        # Quality control
+        columns['overload_flag'] = LZpeak > self.OVERLOAD_THRESHOLD
+        columns['underrange_flag'] = LAeq < self.UNDERRANGE_THRESHOLD
+        columns['wearing_state'] = LAeq > 40.0
+        
+        columns['kurtosis_total'] = np.round(kurtosis_total, 2)
+        columns['kurtosis_a_weighted'] = np.round(kurtosis_a, 2)
+        columns['kurtosis_c_weighted'] = np.round(kurtosis_c, 2)
+        columns['n_samples'] = np.full(n_rows, n, dtype=np.int64)
+        columns['sum_x'] = sum_x
+        columns['sum_x2'] = sum_x2
+        columns['sum_x3'] = sum_x3
+        columns['sum_x4'] = sum_x4
+        columns['beta_kurtosis'] = np.round(beta_kurtosis, 4)
+        
+        return columns
+    
+    @staticmethod
+    def _calculate_kurtosis_from_moment_arrays(n: int,
+                                               s1: np.ndarray,
+                                               s2: np.ndarray,
+                                               s3: np.ndarray,
+                                               s4: np.ndarray) -> np.ndarray:
+        """calculate_kurtosis_from_moments 的向量化版本，无效值为 NaN"""
+        mu = s1 / n
+        m2 = s2 / n - mu ** 2
+        m4 = (s4 / n
+              - 4 * mu * (s3 / n)
+              + 6 * (mu ** 2) * (s2 / n)
+              - 3 * (mu ** 4))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(m2 > 0, m4 / (m2 ** 2), np.nan)
+    
+    def reset_stream(self):
+        """重置流式滤波器状态（开始处理新的不连续信号时调用）"""
+        if self._stream is not None:
+            self._stream.reset()
+    
+    def process_block(self,
+                      data: np.ndarray,
+                      sr: int,
+                      timestamp: datetime,
+                      duration: Optional[float] = None,
+                      accumulator=None) -> SecondMetrics:
+        """
+        流式处理一个数据块（通常为1秒）
+        
+        A/C计权及频段滤波器的状态在连续调用之间保持，数据块可来自文件、socket或实时设备，
+        结果与整段信号一次性滤波完全一致。
+        
+        Args:
+            data: 音频样本
+            sr: 采样率
+            timestamp: 数据块起始时间戳
+            duration: 实际时长（秒），默认为 len(data) / sr
+            accumulator: 整文件指标累加器，提供 update(data, a_weighted, c_weighted, band_data)
+            
+        Returns:
+            SecondMetrics: 该数据块的指标
+        """
+        data = np.asarray(data, dtype=np.float64)
+        if duration is None:
+            duration = len(data) / sr
+        
+        if self._stream is None or self._stream.sample_rate != int(sr):
+            self._stream = StreamingFilterBank(sr)
+        
+        a_weighted, c_weighted, band_data = self._stream.process(data)
+        if accumulator is not None:
+            accumulator.update(data, a_weighted, c_weighted, band_data)
+        metrics = self._build_second_metrics(
+            data, a_weighted, c_weighted, band_data, sr, timestamp, duration)
+        
+        # 调用回调函数
+        if self.callback:
+            self.callback(metrics)
+        
+        return metrics
     
     def _calculate_second_metrics(self, 
                                    data: np.ndarray, 
@@ -343,22 +617,57 @@ class TimeHistoryProcessor:
         Returns:
             SecondMetrics: 单秒钟的指标
         """
-        s = Signal(data, sr)
+        data = np.asarray(data, dtype=np.float64)
+        bank = get_filter_bank(sr)
         
+        # 每秒仅进行一次A计权、一次C计权以及9个频段的滤波
+        return self._build_second_metrics(
+            data,
+            bank.weigh_a(data),
+            bank.weigh_c(data),
+            bank.filter_bands(data),
+            sr,
+            timestamp,
+            duration
+        )
+    
+    def _build_second_metrics(self,
+                              data: np.ndarray,
+                              a_weighted: np.ndarray,
+                              c_weighted: np.ndarray,
+                              band_data: List[Optional[np.ndarray]],
+                              sr: int,
+                              timestamp: datetime,
+                              duration: float) -> SecondMetrics:
+        """
+        根据已滤波的信号计算单秒钟指标
+        
+        Args:
+            data: Z计权（原始）音频样本
+            a_weighted: A计权信号
+            c_weighted: C计权信号
+            band_data: 9个频段的带通信号
+            sr: 采样率
+            timestamp: 时间戳
+            duration: 实际时长（秒）
+            
+        Returns:
+            SecondMetrics: 单秒钟的指标
+        """
         # Calculate equivalent sound levels
         LAeq = equivalent_sound_pressure_level(
-            s.weigh("A").values, reference_pressure=self.reference_pressure)
+            a_weighted, reference_pressure=self.reference_pressure)
         LCeq = equivalent_sound_pressure_level(
-            s.weigh("C").values, reference_pressure=self.reference_pressure)
+            c_weighted, reference_pressure=self.reference_pressure)
         LZeq = equivalent_sound_pressure_level(
-            s.values, reference_pressure=self.reference_pressure)
+            data, reference_pressure=self.reference_pressure)
         
         # Calculate peak levels
         try:
             LZpeak = peak_sound_pressure_level(
-                s.values, reference_pressure=self.reference_pressure)
+                data, reference_pressure=self.reference_pressure)
             LCpeak = peak_sound_pressure_level(
-                s.weigh("C").values, reference_pressure=self.reference_pressure)
+                c_weighted, reference_pressure=self.reference_pressure)
         except Exception as e:
             logger.warning(f"Failed to calculate peak levels: {e}")
             LZpeak = LZeq + 10.0  # Estimate
@@ -366,21 +675,18 @@ class TimeHistoryProcessor:
         
         # Calculate LAFmax (fast time-weighted max)
         try:
-            fast_avg = average(
-                data=s.weigh("A").values,
-                sample_frequency=sr,
-                averaging_time=0.125  # 125ms fast
-            )
-            LAFmax = np.max(fast_avg) if len(fast_avg) > 0 else LAeq
+            LAFmax = self._calculate_fast_max_level(a_weighted, sr)
+            if LAFmax is None:
+                LAFmax = LAeq
         except Exception as e:
             logger.warning(f"Failed to calculate LAFmax: {e}")
             LAFmax = LAeq
         
-        # Calculate kurtosis using scipy (backward compatible)
+        # Calculate kurtosis using scipy (backward compatible)，无法计算时（如静音）取 3.0
         try:
-            kurtosis_total = kurtosis(s.values, fisher=False)
-            kurtosis_a = kurtosis(s.weigh("A").values, fisher=False)
-            kurtosis_c = kurtosis(s.weigh("C").values, fisher=False)
+            kurtosis_total, kurtosis_a, kurtosis_c = (
+                float(np.nan_to_num(kurtosis(x, fisher=False), nan=3.0, posinf=3.0, neginf=3.0))
+                for x in (data, a_weighted, c_weighted))
         except Exception:
             kurtosis_total = 3.0
             kurtosis_a = 3.0
@@ -388,11 +694,12 @@ class TimeHistoryProcessor:
         
         # Calculate raw moment statistics S1-S4 for aggregation (根据规范 4.X.3)
         # 使用 Z 加权（原始）信号进行计算，保证后续跨时段合成的一致性
-        n_samples = len(s.values)
-        sum_x = np.sum(s.values)           # S1 = Σx_k
-        sum_x2 = np.sum(s.values ** 2)     # S2 = Σx_k²
-        sum_x3 = np.sum(s.values ** 3)     # S3 = Σx_k³
-        sum_x4 = np.sum(s.values ** 4)     # S4 = Σx_k⁴
+        x2 = data * data
+        n_samples = len(data)
+        sum_x = np.sum(data)               # S1 = Σx_k
+        sum_x2 = np.sum(x2)                # S2 = Σx_k²
+        sum_x3 = np.sum(x2 * data)         # S3 = Σx_k³
+        sum_x4 = np.sum(x2 * x2)           # S4 = Σx_k⁴
         
         # 根据规范 4.X.3 计算峰度 β
         beta_kurtosis = self._calculate_kurtosis_from_moments(
@@ -411,7 +718,18 @@ class TimeHistoryProcessor:
             LAeq, 1.0, DoseStandard.EU_ISO)
         
         # Calculate 1/3 octave band metrics (频段分析)
-        freq_spl_dict, freq_moments_dict = self._calculate_third_octave_metrics(s)
+        freq_spl_dict, freq_moments_dict = self._calculate_third_octave_metrics(band_data)
+        
+        # 1/3倍频程频段SPL及原始矩统计量 S1-S4（用于精确合成频段峰度）
+        band_fields = {}
+        for name, prefix in zip(BAND_NAMES, BAND_FIELD_PREFIXES):
+            n, s1, s2, s3, s4 = freq_moments_dict.get(name, (0, 0.0, 0.0, 0.0, 0.0))
+            band_fields[f'{prefix}_spl'] = freq_spl_dict.get(name)
+            band_fields[f'{prefix}_n'] = n
+            band_fields[f'{prefix}_s1'] = s1
+            band_fields[f'{prefix}_s2'] = s2
+            band_fields[f'{prefix}_s3'] = s3
+            band_fields[f'{prefix}_s4'] = s4
         
         # Quality control checks
         overload_flag = LZpeak > self.OVERLOAD_THRESHOLD
@@ -446,104 +764,232 @@ class TimeHistoryProcessor:
             sum_x3=float(sum_x3),
             sum_x4=float(sum_x4),
             beta_kurtosis=round(beta_kurtosis, 4) if beta_kurtosis is not None else None,
-            # 1/3倍频程频段SPL
-            freq_63hz_spl=freq_spl_dict.get('63Hz'),
-            freq_125hz_spl=freq_spl_dict.get('125Hz'),
-            freq_250hz_spl=freq_spl_dict.get('250Hz'),
-            freq_500hz_spl=freq_spl_dict.get('500Hz'),
-            freq_1khz_spl=freq_spl_dict.get('1kHz'),
-            freq_2khz_spl=freq_spl_dict.get('2kHz'),
-            freq_4khz_spl=freq_spl_dict.get('4kHz'),
-            freq_8khz_spl=freq_spl_dict.get('8kHz'),
-            freq_16khz_spl=freq_spl_dict.get('16kHz'),
-            # 1/3倍频程频段原始矩统计量 S1-S4（用于精确合成频段峰度）
-            freq_63hz_n=freq_moments_dict.get('63Hz', (0, 0.0, 0.0, 0.0, 0.0))[0],
-            freq_63hz_s1=freq_moments_dict.get('63Hz', (0, 0.0, 0.0, 0.0, 0.0))[1],
-            freq_63hz_s2=freq_moments_dict.get('63Hz', (0, 0.0, 0.0, 0.0, 0.0))[2],
-            freq_63hz_s3=freq_moments_dict.get('63Hz', (0, 0.0, 0.0, 0.0, 0.0))[3],
-            freq_63hz_s4=freq_moments_dict.get('63Hz', (0, 0.0, 0.0, 0.0, 0.0))[4],
-            freq_125hz_n=freq_moments_dict.get('125Hz', (0, 0.0, 0.0, 0.0, 0.0))[0],
-            freq_125hz_s1=freq_moments_dict.get('125Hz', (0, 0.0, 0.0, 0.0, 0.0))[1],
-            freq_125hz_s2=freq_moments_dict.get('125Hz', (0, 0.0, 0.0, 0.0, 0.0))[2],
-            freq_125hz_s3=freq_moments_dict.get('125Hz', (0, 0.0, 0.0, 0.0, 0.0))[3],
-            freq_125hz_s4=freq_moments_dict.get('125Hz', (0, 0.0, 0.0, 0.0, 0.0))[4],
-            freq_250hz_n=freq_moments_dict.get('250Hz', (0, 0.0, 0.0, 0.0, 0.0))[0],
-            freq_250hz_s1=freq_moments_dict.get('250Hz', (0, 0.0, 0.0, 0.0, 0.0))[1],
-            freq_250hz_s2=freq_moments_dict.get('250Hz', (0, 0.0, 0.0, 0.0, 0.0))[2],
-            freq_250hz_s3=freq_moments_dict.get('250Hz', (0, 0.0, 0.0, 0.0, 0.0))[3],
-            freq_250hz_s4=freq_moments_dict.get('250Hz', (0, 0.0, 0.0, 0.0, 0.0))[4],
-            freq_500hz_n=freq_moments_dict.get('500Hz', (0, 0.0, 0.0, 0.0, 0.0))[0],
-            freq_500hz_s1=freq_moments_dict.get('500Hz', (0, 0.0, 0.0, 0.0, 0.0))[1],
-            freq_500hz_s2=freq_moments_dict.get('500Hz', (0, 0.0, 0.0, 0.0, 0.0))[2],
-            freq_500hz_s3=freq_moments_dict.get('500Hz', (0, 0.0, 0.0, 0.0, 0.0))[3],
-            freq_500hz_s4=freq_moments_dict.get('500Hz', (0, 0.0, 0.0, 0.0, 0.0))[4],
-            freq_1khz_n=freq_moments_dict.get('1kHz', (0, 0.0, 0.0, 0.0, 0.0))[0],
-            freq_1khz_s1=freq_moments_dict.get('1kHz', (0, 0.0, 0.0, 0.0, 0.0))[1],
-            freq_1khz_s2=freq_moments_dict.get('1kHz', (0, 0.0, 0.0, 0.0, 0.0))[2],
-            freq_1khz_s3=freq_moments_dict.get('1kHz', (0, 0.0, 0.0, 0.0, 0.0))[3],
-            freq_1khz_s4=freq_moments_dict.get('1kHz', (0, 0.0, 0.0, 0.0, 0.0))[4],
-            freq_2khz_n=freq_moments_dict.get('2kHz', (0, 0.0, 0.0, 0.0, 0.0))[0],
-            freq_2khz_s1=freq_moments_dict.get('2kHz', (0, 0.0, 0.0, 0.0, 0.0))[1],
-            freq_2khz_s2=freq_moments_dict.get('2kHz', (0, 0.0, 0.0, 0.0, 0.0))[2],
-            freq_2khz_s3=freq_moments_dict.get('2kHz', (0, 0.0, 0.0, 0.0, 0.0))[3],
-            freq_2khz_s4=freq_moments_dict.get('2kHz', (0, 0.0, 0.0, 0.0, 0.0))[4],
-            freq_4khz_n=freq_moments_dict.get('4kHz', (0, 0.0, 0.0, 0.0, 0.0))[0],
-            freq_4khz_s1=freq_moments_dict.get('4kHz', (0, 0.0, 0.0, 0.0, 0.0))[1],
-            freq_4khz_s2=freq_moments_dict.get('4kHz', (0, 0.0, 0.0, 0.0, 0.0))[2],
-            freq_4khz_s3=freq_moments_dict.get('4kHz', (0, 0.0, 0.0, 0.0, 0.0))[3],
-            freq_4khz_s4=freq_moments_dict.get('4kHz', (0, 0.0, 0.0, 0.0, 0.0))[4],
-            freq_8khz_n=freq_moments_dict.get('8kHz', (0, 0.0, 0.0, 0.0, 0.0))[0],
-            freq_8khz_s1=freq_moments_dict.get('8kHz', (0, 0.0, 0.0, 0.0, 0.0))[1],
-            freq_8khz_s2=freq_moments_dict.get('8kHz', (0, 0.0, 0.0, 0.0, 0.0))[2],
-            freq_8khz_s3=freq_moments_dict.get('8kHz', (0, 0.0, 0.0, 0.0, 0.0))[3],
-            freq_8khz_s4=freq_moments_dict.get('8kHz', (0, 0.0, 0.0, 0.0, 0.0))[4],
-            freq_16khz_n=freq_moments_dict.get('16kHz', (0, 0.0, 0.0, 0.0, 0.0))[0],
-            freq_16khz_s1=freq_moments_dict.get('16kHz', (0, 0.0, 0.0, 0.0, 0.0))[1],
-            freq_16khz_s2=freq_moments_dict.get('16kHz', (0, 0.0, 0.0, 0.0, 0.0))[2],
-            freq_16khz_s3=freq_moments_dict.get('16kHz', (0, 0.0, 0.0, 0.0, 0.0))[3],
-            freq_16khz_s4=freq_moments_dict.get('16kHz', (0, 0.0, 0.0, 0.0, 0.0))[4],
+            **band_fields
         )
     
     def process_wav_file(self, 
                          file_path: str, 
                          start_time: Optional[datetime] = None) -> List[SecondMetrics]:
         """
-        处理WAV文件并按秒返回指标
+        处理音频文件并按秒返回指标（按1秒数据块流式读取，内存占用与文件时长无关）
         
         Args:
-            file_path: WAV文件路径
+            file_path: 音频文件路径（WAV/FLAC/TDMS 等）
             start_time: 开始时间
             
         Returns:
             List[SecondMetrics]: 每秒钟的指标列表
         """
-        import librosa
-        import warnings
+        with open_audio_source(file_path) as source:
+            return self.process_blocks(source.blocks(), source.sample_rate, start_time)
+    
+    def process_wav_file_batch(self,
+                               file_path: str,
+                               start_time: Optional[datetime] = None,
+                               chunk_seconds: int = 300) -> pd.DataFrame:
+        """
+        批量处理音频文件，返回列式的秒级指标（按 chunk_seconds 分块流式读取）
         
-        try:
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", UserWarning)
-                y, sr = librosa.load(file_path, sr=None)
-        except Exception as e:
-            raise RuntimeError(f"Failed to load audio file {file_path}: {str(e)}")
+        Args:
+            file_path: 音频文件路径（WAV/FLAC/TDMS 等）
+            start_time: 开始时间
+            chunk_seconds: 每次读取及滤波处理的秒数
+            
+        Returns:
+            pd.DataFrame: 每行一秒，列名与 SecondMetrics 字段一致
+        """
+        with open_audio_source(file_path) as source:
+            chunk_samples = source.sample_rate * max(1, int(chunk_seconds))
+            return self.process_chunks_batch(
+                source.blocks(chunk_samples), source.sample_rate, start_time)
+    
+    def process_wav_file_sharded(self,
+                                 file_path: str,
+                                 start_time: Optional[datetime] = None,
+                                 n_shards: Optional[int] = None,
+                                 warmup_seconds: float = DEFAULT_SHARD_WARMUP_SECONDS,
+                                 min_shard_seconds: int = 60,
+                                 chunk_seconds: int = 300,
+                                 max_workers: Optional[int] = None,
+                                 mp_context: Optional[str] = "spawn") -> pd.DataFrame:
+        """
+        将长音频文件按时间切分为多个分片，在多个进程中并行批量处理
+        
+        每个分片从 start_second - warmup_seconds 处开始读取，预热段只用于建立滤波器状态
+        （A/C计权及1/3倍频程均为 IIR 滤波器，初始状态的影响按指数衰减），分片结果按时间顺序拼接。
+        秒级指标只依赖本秒数据及滤波器状态，S1-S4 原始矩逐秒独立，
+        因此拼接结果与 process_wav_file_batch 串行处理一致（预热段足够长时仅有浮点舍入级差异）。
         
-        signal = Signal(y, sr)
-        return self.process_signal_per_second(signal, start_time)
+        Args:
+            file_path: 音频文件路径（WAV/FLAC/TDMS 等）
+            start_time: 开始时间
+            n_shards: 分片数，默认 min(工作进程数, 文件秒数 / min_shard_seconds)
+            warmup_seconds: 每个分片的滤波器预热时长（秒）
+            min_shard_seconds: 自动确定分片数时每个分片的最短时长（秒）
+            chunk_seconds: 分片内每次读取及滤波处理的秒数
+            max_workers: 工作进程数，默认 CPU 核数
+            mp_context: 进程启动方式
+            
+        Returns:
+            pd.DataFrame: 每行一秒，列名与 SecondMetrics 字段一致
+        """
+        if start_time is None:
+            start_time = datetime.utcnow()
+        max_workers = max_workers or os.cpu_count() or 1
+        
+        with open_audio_source(file_path) as source:
+            sr = source.sample_rate
+            total_seconds = int(np.ceil(source.n_samples / sr)) if sr else 0
+            # 浮点 TDMS 通道的归一化系数需要扫描整个通道，只在主进程中计算一次
+            scale = source.scale if isinstance(source, TdmsSource) else None
+            # 无法按位置读取的数据源（librosa 整体解码）不分片
+            seekable = isinstance(source, (SoundFileSource, TdmsSource))
+        
+        if n_shards is None:
+            n_shards = min(max_workers, total_seconds // max(1, int(min_shard_seconds)))
+        if not seekable:
+            n_shards = 1
+        shards = plan_time_shards(total_seconds, n_shards, warmup_seconds)
+        logger.info(f"Processing {file_path} ({total_seconds}s) in {len(shards)} shards")
+        
+        args = (file_path, sr, scale, start_time, chunk_seconds)
+        if len(shards) <= 1:
+            frames = [_process_time_shard(shard, *args) for shard in shards]
+        else:
+            context = multiprocessing.get_context(mp_context) if mp_context else None
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=min(max_workers, len(shards)), mp_context=context) as executor:
+                frames = list(executor.map(_process_time_shard, shards, *[[arg] * len(shards) for arg in args]))
+        
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return pd.DataFrame(columns=SECOND_METRICS_FIELDS)
+        return pd.concat(frames, ignore_index=True)
+
+
+@dataclass
+class TimeShard:
+    """
+    文件的一个时间分片
+    
+    处理 [start_second, start_second + n_seconds) 内的数据，
+    之前 warmup_seconds 秒的数据只用于预热滤波器
+    """
+    index: int
+    start_second: int
+    n_seconds: int
+    warmup_seconds: float = 0.0
 
 
-def aggregate_session_metrics(time_history: List[SecondMetrics], 
+def plan_time_shards(total_seconds: int,
+                     n_shards: int,
+                     warmup_seconds: float = DEFAULT_SHARD_WARMUP_SECONDS) -> List[TimeShard]:
+    """
+    将文件按整秒均匀切分为分片
+    
+    Args:
+        total_seconds: 文件秒数（最后不足一秒的部分计为一秒）
+        n_shards: 分片数（不超过文件秒数）
+        warmup_seconds: 每个分片的预热时长，第一个分片从文件开头开始，不需要预热
+        
+    Returns:
+        List[TimeShard]: 按时间顺序排列的分片
+    """
+    total_seconds = int(total_seconds)
+    n_shards = max(1, min(int(n_shards), total_seconds))
+    if total_seconds <= 0:
+        return []
+    
+    bounds = np.linspace(0, total_seconds, n_shards + 1).round().astype(int)
+    return [
+        TimeShard(index=i, start_second=int(start), n_seconds=int(stop - start),
+                  warmup_seconds=min(float(warmup_seconds), float(start)))
+        for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:]))
+    ]
+
+
+def _read_range(source, start: int, stop: int, block_size: int) -> Iterable[np.ndarray]:
+    """读取 [start, stop) 范围内的样本，按 block_size 分块"""
+    remaining = stop - start
+    for block in source.blocks(block_size, start=start):
+        if remaining <= 0:
+            break
+        block = block[:remaining]
+        remaining -= len(block)
+        yield block
+
+
+def _process_time_shard(shard: TimeShard,
+                        file_path: str,
+                        sr: int,
+                        scale: Optional[float],
+                        start_time: datetime,
+                        chunk_seconds: int) -> pd.DataFrame:
+    """在工作进程中批量处理一个分片（模块级函数，供进程池调用）"""
+    if scale is not None:
+        source = TdmsSource(file_path, sr, scale=scale)
+    else:
+        source = open_audio_source(file_path, sr)
+    
+    with source:
+        start = shard.start_second * sr
+        stop = min((shard.start_second + shard.n_seconds) * sr, source.n_samples)
+        warmup_start = max(0, start - int(round(shard.warmup_seconds * sr)))
+        
+        warmup = None
+        if warmup_start < start:
+            warmup = np.concatenate(list(_read_range(source, warmup_start, start, start - warmup_start)))
+        
+        chunk_samples = sr * max(1, int(chunk_seconds))
+        return TimeHistoryProcessor().process_chunks_batch(
+            _read_range(source, start, stop, chunk_samples),
+            sr,
+            start_time + timedelta(seconds=shard.start_second),
+            warmup=warmup
+        )
+
+
+def second_metrics_from_frame(frame: pd.DataFrame) -> List[SecondMetrics]:
+    """
+    将批量处理得到的列式结果转换为 SecondMetrics 列表（兼容逐秒接口的调用方）
+    
+    NaN 转换为 None
+    """
+    records = frame[SECOND_METRICS_FIELDS].astype(object).where(frame.notna(), None)
+    results = []
+    for row in records.itertuples(index=False, name=None):
+        values = dict(zip(SECOND_METRICS_FIELDS, row))
+        values['timestamp'] = pd.Timestamp(values['timestamp']).to_pydatetime()
+        results.append(SecondMetrics(**values))
+    return results
+
+
+def _metrics_column(time_history, name: str) -> np.ndarray:
+    """
+    从时间历程中取出单列数据
+    
+    支持 List[SecondMetrics]、DataFrame（批量处理结果）以及提供 column() 的列式存储
+    """
+    if isinstance(time_history, pd.DataFrame):
+        return pd.to_numeric(time_history[name], errors='coerce').to_numpy(dtype=np.float64)
+    if hasattr(time_history, 'column'):
+        return np.asarray(time_history.column(name), dtype=np.float64)
+    return np.array([getattr(m, name, None) for m in time_history], dtype=np.float64)
+
+
+def aggregate_session_metrics(time_history, 
                                profile: DoseStandard = DoseStandard.NIOSH) -> Dict:
     """
     聚合会话级指标
     
     Args:
-        time_history: 时间历程数据列表
+        time_history: 时间历程数据（List[SecondMetrics]、SecondMetricsStore 或批量处理的 DataFrame）
         profile: 剂量计算标准
         
     Returns:
         Dict: 会话汇总指标
     """
-    if not time_history:
+    if time_history is None or len(time_history) == 0:
         return {}
     
     # Get dose column based on profile
@@ -556,18 +1002,15 @@ def aggregate_session_metrics(time_history: List[SecondMetrics],
     dose_attr = dose_map.get(profile, 'dose_frac_niosh')
     
     # Calculate total duration
-    total_duration_h = sum(m.duration_s for m in time_history) / 3600.0
+    total_duration_h = float(np.sum(_metrics_column(time_history, 'duration_s'))) / 3600.0
     
     # Calculate total dose
-    total_dose = sum(getattr(m, dose_attr, 0.0) for m in time_history)
+    total_dose = float(np.nansum(_metrics_column(time_history, dose_attr)))
     
     # Calculate overall LAeq
     # LAeq_total = 10 * log10( (1/n) * sum(10^(LAeq_i/10)) )
-    laeq_values = [m.LAeq for m in time_history]
-    if laeq_values:
-        laeq_total = 10 * np.log10(np.mean([10**(la/10) for la in laeq_values]))
-    else:
-        laeq_total = 0.0
+    laeq_values = _metrics_column(time_history, 'LAeq')
+    laeq_total = float(10 * np.log10(np.mean(10 ** (laeq_values / 10))))
     
     # Calculate TWA and LEX,8h
     calculator = DoseCalculator()
@@ -575,12 +1018,13 @@ def aggregate_session_metrics(time_history: List[SecondMetrics],
     lex_8h = calculator.calculate_lex(total_dose, profile)
     
     # Find peak max
-    peak_values = [m.LZpeak for m in time_history if m.LZpeak is not None]
-    peak_max = max(peak_values) if peak_values else 0.0
+    peak_values = _metrics_column(time_history, 'LZpeak')
+    peak_values = peak_values[~np.isnan(peak_values)]
+    peak_max = float(np.max(peak_values)) if len(peak_values) else 0.0
     
     # Count events (overloads)
-    overload_count = sum(1 for m in time_history if m.overload_flag)
-    underrange_count = sum(1 for m in time_history if m.underrange_flag)
+    overload_count = int(np.sum(_metrics_column(time_history, 'overload_flag') > 0))
+    underrange_count = int(np.sum(_metrics_column(time_history, 'underrange_flag') > 0))
     
     return {
         'total_duration_h': round(total_duration_h, 4),
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+持久化文件入库队列
+文件监控只负责将已写完的文件路径加入队列（生产者），消费者线程独立取出处理；
+队列保存在数据库 ingestion_queue 表中，服务重启后未完成的文件会重新处理
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from app.utils import logger
+
+
+@dataclass
+class WorkItem:
+    """队列中的一个文件"""
+    id: int
+    file_path: str
+    attempts: int = 1
+
+
+class DurableWorkQueue:
+    """
+    基于数据库的持久化工作队列
+
+    - put() 写入数据库后唤醒等待的消费者，同一文件在待处理/处理中时不重复加入
+    - get() 按加入顺序取出文件并标记为处理中；处理完成调用 done()，失败调用 failed()
+    - recover() 将上次运行中断时处于处理中的文件恢复为待处理
+    """
+
+    def __init__(self, db_manager, poll_interval: float = 1.0):
+        """
+        Args:
+            db_manager: DatabaseManager 实例
+            poll_interval: 消费者等待时检查数据库的间隔（秒），用于发现其他进程加入的文件
+        """
+        self.db_manager = db_manager
+        self.poll_interval = poll_interval
+        self._available = threading.Condition()
+
+    def put(self, file_path: str) -> bool:
+        """
+        加入文件
+
+        Returns:
+            bool: 是否新加入（文件已在队列中时为 False）
+        """
+        item_id = self.db_manager.enqueue_ingestion_file(str(file_path))
+        if item_id is None:
+            logger.info(f"File already queued: {file_path}")
+            return False
+        logger.info(f"Queued file for ingestion: {file_path}")
+        with self._available:
+            self._available.notify()
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[WorkItem]:
+        """
+        取出最早加入的待处理文件
+
+        Args:
+            timeout: 队列为空时最多等待的秒数，None 表示一直等待
+
+        Returns:
+            Optional[WorkItem]: 超时时返回 None
+        """
+        remaining = timeout
+        while True:
+            claimed = self.db_manager.claim_ingestion_file()
+            if claimed is not None:
+                return WorkItem(**claimed)
+            if remaining is not None and remaining <= 0:
+                return None
+
+            wait = self.poll_interval if remaining is None else min(self.poll_interval, remaining)
+            with self._available:
+                self._available.wait(wait)
+            if remaining is not None:
+                remaining -= wait
+
+    def done(self, item: WorkItem):
+        """文件处理完成"""
+        self.db_manager.complete_ingestion_file(item.id)
+
+    def failed(self, item: WorkItem, error: BaseException):
+        """文件处理失败（保留在队列中，状态为 failed）"""
+        logger.error(f"Ingestion failed for {item.file_path}: {error}")
+        self.db_manager.fail_ingestion_file(item.id, str(error))
+
+    def recover(self) -> int:
+        """
+        恢复上次运行中断的文件
+
+        Returns:
+            int: 恢复为待处理的文件数
+        """
+        count = self.db_manager.reset_ingestion_claims()
+        if count:
+            logger.info(f"Recovered {count} interrupted files in the ingestion queue")
+        return count
+
+    def qsize(self) -> int:
+        """待处理的文件数"""
+        return self.db_manager.count_ingestion_files("pending")
+
+    def wake(self):
+        """唤醒所有等待中的消费者（停止消费时调用）"""
+        with self._available:
+            self._available.notify_all()
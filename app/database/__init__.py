@@ -1,5 +1,5 @@
 """
 Database module for noise info toolkit
 """
-from .database import DatabaseManager
-from .models import ProcessingMetric, ProcessingResult, SpectrumData, Config
\ No newline at end of file
+from .database import DatabaseManager, parse_time_resolution
+from .models import ProcessingMetric, ProcessingResult, SpectrumData, Config, ROLLUP_MODELS
\ No newline at end of file
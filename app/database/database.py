@@ -2,38 +2,180 @@
 Database operations for noise info toolkit
 """
 import os
+import re
 import json
+import math
 import uuid
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
-from sqlalchemy import create_engine, func, and_, Integer
-from sqlalchemy.orm import sessionmaker
+from types import SimpleNamespace
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, event, func, and_, or_, case, cast, inspect, Integer
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import selectinload, sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.database.models import (
     Base, ProcessingResult, ProcessingMetric, SpectrumData, Config,
-    DoseProfile, TimeHistory, EventLog, SessionSummary, Metadata
+    DoseProfile, TimeHistory, EventLog, SessionSummary, Metadata, IngestionQueue,
+    IngestionLedger, ROLLUP_MODELS
 )
+from app.database.write_buffer import WriteBehindBuffer
 from app.utils import logger
 
 
+# 未指定 database_url 时数据库文件所在目录
+DEFAULT_DATABASE_DIR = "./Database"
+
+
+# SQLite 连接参数（WAL 模式）：读写互不阻塞，提交时不逐次 fsync
+SQLITE_WAL_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,       # 64 MiB（负数单位为 KiB）
+    "mmap_size": 268435456,     # 256 MiB
+    "temp_store": "MEMORY",
+}
+
+
+def _sqlite_pragma_listener(pragmas: Dict[str, Any]):
+    """创建在每个新连接上执行 PRAGMA 的 connect 事件监听函数"""
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def _sqlite_register_functions(dbapi_connection, connection_record):
+    """注册降采样查询使用的数学函数（部分 SQLite 编译版本不含内置数学函数）"""
+    dbapi_connection.create_function("power", 2, math.pow, deterministic=True)
+
+
+# 时间历程中的 1/3 倍频程频段（列名前缀 freq_<band>_）
+TIME_HISTORY_BANDS = ("63hz", "125hz", "250hz", "500hz", "1khz", "2khz", "4khz", "8khz", "16khz")
+
+_MOMENT_COLUMNS = ("n_samples", "sum_x", "sum_x2", "sum_x3", "sum_x4")
+# 降采样时间段中取最大值的列（其余列为累加量）
+_BUCKET_MAX_COLUMNS = ("LAFmax_dB", "LZpeak_dB", "LCpeak_dB")
+_BAND_MOMENTS = ("n", "s1", "s2", "s3", "s4")
+
+# 汇总表各列的合并方式
+_ROLLUP_SUM_COLUMNS = (
+    ["duration_s", "sample_count", "LAeq_energy", "LCeq_energy", "LZeq_energy",
+     "dose_frac_niosh", "dose_frac_osha_pel", "dose_frac_osha_hca", "dose_frac_eu_iso",
+     "overload_count", "underrange_count", "valid_seconds"]
+    + list(_MOMENT_COLUMNS)
+    + [f"freq_{band}_{m}" for band in TIME_HISTORY_BANDS for m in ("energy",) + _BAND_MOMENTS]
+)
+_ROLLUP_MAX_COLUMNS = ["LAFmax", "LZpeak", "LCpeak"]
+_ROLLUP_STORED_COLUMNS = (["period_start", "start_time", "end_time", "artifact_flag"]
+                          + _ROLLUP_SUM_COLUMNS + _ROLLUP_MAX_COLUMNS)
+_ROLLUP_DERIVED_COLUMNS = (["LAeq", "LCeq", "LZeq", "beta_kurtosis", "valid_flag"]
+                           + [f"freq_{band}_{m}" for band in TIME_HISTORY_BANDS for m in ("spl", "kurtosis")])
+
+
+def _kurtosis_from_moments(n, s1, s2, s3, s4) -> Optional[float]:
+    """由合并后的原始矩统计量计算峰度 β（保留 4 位小数）"""
+    from app.core.time_history_processor import TimeHistoryProcessor
+
+    beta = TimeHistoryProcessor.calculate_kurtosis_from_moments(
+        n or 0, s1 or 0.0, s2 or 0.0, s3 or 0.0, s4 or 0.0)
+    return round(beta, 4) if beta is not None else None
+
+_RESOLUTION_UNITS = {"": 1, "s": 1, "sec": 1, "m": 60, "min": 60, "h": 3600, "hour": 3600}
+
+
+def parse_time_resolution(value) -> int:
+    """
+    解析时间历程的降采样分辨率
+
+    Args:
+        value: 秒数，或带单位的字符串，如 "10s"、"1min"、"5min"、"1h"
+
+    Returns:
+        int: 分辨率（秒）
+
+    Raises:
+        ValueError: 格式无效或不为正数
+    """
+    if isinstance(value, (int, float)):
+        seconds = value
+    else:
+        match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-z]*)\s*", str(value).lower())
+        if match is None or match.group(2) not in _RESOLUTION_UNITS:
+            raise ValueError(f"Invalid resolution: {value!r}")
+        seconds = float(match.group(1)) * _RESOLUTION_UNITS[match.group(2)]
+    if seconds < 1 or seconds != int(seconds):
+        raise ValueError(f"Resolution must be a whole number of seconds >= 1: {value!r}")
+    return int(seconds)
+
+
 class DatabaseManager:
-    """Database manager for noise info toolkit"""
+    """
+    Database manager for noise info toolkit
     
-    def __init__(self, database_url: str = None):
-        # Create Database directory if it doesn't exist
-        db_dir = "./Database"
-        if not os.path.exists(db_dir):
-            os.makedirs(db_dir)
-        
+    SQLite 文件数据库使用两个连接池：
+    - 写连接（SessionLocal / engine）：只有一个连接，所有写入在该连接上串行进行，
+      进程内不会出现 "database is locked"
+    - 读连接池（ReadSessionLocal / read_engine）：多个只读连接，WAL 模式下读取不阻塞写入，
+      查询接口（get_* / list_*）均使用读连接
+    """
+    
+    def __init__(self, database_url: str = None,
+                 time_history_batch_size: int = 500,
+                 time_history_flush_ms: float = 1000.0,
+                 wal: bool = True,
+                 read_pool_size: int = 5,
+                 busy_timeout_ms: int = 30000):
+        """
+        Args:
+            database_url: 数据库地址，默认 DEFAULT_DATABASE_DIR 下的 noise_info.db
+            time_history_batch_size: 时间历程写缓冲满多少行时批量写入
+            time_history_flush_ms: 时间历程写缓冲中的记录最多等待多少毫秒后写入
+            wal: SQLite 使用 WAL 日志模式及 SQLITE_WAL_PRAGMAS（False 时保持默认的回滚日志模式）
+            read_pool_size: 读连接池大小
+            busy_timeout_ms: 等待其他进程释放数据库锁（及等待写连接）的最长时间
+        """
         if database_url is None:
-            database_url = f"sqlite:///{db_dir}/noise_info.db"
+            # Create Database directory if it doesn't exist
+            if not os.path.exists(DEFAULT_DATABASE_DIR):
+                os.makedirs(DEFAULT_DATABASE_DIR)
+            database_url = f"sqlite:///{DEFAULT_DATABASE_DIR}/noise_info.db"
         
         self.database_url = database_url
-        self.engine = create_engine(database_url, connect_args={"check_same_thread": False})
+        url = make_url(database_url)
+        connect_args = {"check_same_thread": False}
+        if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+            pragmas = dict(SQLITE_WAL_PRAGMAS) if wal else {}
+            pragmas["busy_timeout"] = int(busy_timeout_ms)
+            # 单一写连接：写入在连接池中排队，串行执行
+            self.engine = create_engine(database_url, connect_args=connect_args,
+                                        pool_size=1, max_overflow=0, pool_timeout=busy_timeout_ms / 1000)
+            self.read_engine = create_engine(database_url, connect_args=connect_args,
+                                             pool_size=read_pool_size, max_overflow=read_pool_size)
+            event.listen(self.engine, "connect", _sqlite_pragma_listener(pragmas))
+            event.listen(self.read_engine, "connect",
+                         _sqlite_pragma_listener({**pragmas, "query_only": "ON"}))
+        else:
+            # 其他数据库（及 SQLite 内存数据库）读写共用同一个连接池
+            self.engine = create_engine(database_url, connect_args=connect_args)
+            self.read_engine = self.engine
+        if url.get_backend_name() == "sqlite":
+            event.listen(self.engine, "connect", _sqlite_register_functions)
+            if self.read_engine is not self.engine:
+                event.listen(self.read_engine, "connect", _sqlite_register_functions)
         Base.metadata.create_all(bind=self.engine)
+        self._upgrade_schema()
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.read_engine)
+        # 逐秒时间历程的写缓冲（批量插入，避免每秒一次提交）
+        self.time_history_buffer = WriteBehindBuffer(
+            self.engine, TimeHistory.__table__,
+            max_rows=time_history_batch_size, max_delay_ms=time_history_flush_ms)
         
         # Initialize default dose profiles
         self._init_dose_profiles()
@@ -90,9 +232,31 @@ class DatabaseManager:
         finally:
             db.close()
     
+    def _upgrade_schema(self):
+        """为旧数据库中已存在的表补充新增的列及索引（create_all 不修改已有的表）"""
+        with self.engine.begin() as conn:
+            inspector = inspect(conn)
+            for table in Base.metadata.sorted_tables:
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        column_type = column.type.compile(dialect=self.engine.dialect)
+                        conn.exec_driver_sql(
+                            f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                        logger.info(f"Added column {table.name}.{column.name}")
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+    
+    def dispose(self):
+        """写入缓冲中的记录并关闭所有连接"""
+        self.time_history_buffer.close()
+        self.engine.dispose()
+        if self.read_engine is not self.engine:
+            self.read_engine.dispose()
+    
     def get_db(self):
-        """Get database session"""
-        db = self.SessionLocal()
+        """Get database session (read-only, for queries)"""
+        db = self.ReadSessionLocal()
         try:
             yield db
         finally:
@@ -100,7 +264,7 @@ class DatabaseManager:
     
     def get_dose_profiles(self) -> List[Dict[str, Any]]:
         """Get all dose profiles"""
-        db = self.SessionLocal()
+        db = self.ReadSessionLocal()
         try:
             profiles = db.query(DoseProfile).all()
             return [
@@ -123,7 +287,7 @@ class DatabaseManager:
     
     def get_dose_profile(self, profile_name: str) -> Optional[Dict[str, Any]]:
         """Get a specific dose profile by name"""
-        db = self.SessionLocal()
+        db = self.ReadSessionLocal()
         try:
             profile = db.query(DoseProfile).filter(DoseProfile.profile_name == profile_name).first()
             if profile:
@@ -143,71 +307,56 @@ class DatabaseManager:
         finally:
             db.close()
     
+    @staticmethod
+    def _scalar(value) -> Optional[float]:
+        """指标值转为 float（数组取第一个元素，None 表示无数据，如高于奈奎斯特频率的频段）"""
+        if hasattr(value, '__len__') and not isinstance(value, str):
+            return float(value[0]) if len(value) > 0 else 0.0
+        return float(value) if value is not None else None
+    
+    @classmethod
+    def pack_metrics(cls, metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        将指标字典打包为 ProcessingResult.metrics_json
+        
+        数值指标保存为 {name: value}；频谱指标（{"frequency_bands": {band: value}} 或 {band: value}）
+        保存为频段名及数值两个数组
+        """
+        numeric = {}
+        spectrum = {}
+        for metric_name, metric_value in metrics.items():
+            if isinstance(metric_value, dict):
+                bands = metric_value.get("frequency_bands", metric_value)
+                spectrum[metric_name] = {
+                    "bands": [str(freq) for freq in bands],
+                    "values": [cls._scalar(value) for value in bands.values()],
+                }
+            else:
+                numeric[metric_name] = cls._scalar(metric_value)
+        return {"numeric": numeric, "spectrum": spectrum}
+    
     def save_processing_result(self, file_path: str, metrics: Dict[str, Any], 
-                               session_id: str = None) -> int:
-        """Save processing result to database"""
+                               session_id: str = None, device_id: str = None) -> int:
+        """
+        Save processing result to database (device_id: channel name for multi-channel files)
+        
+        全部指标保存在同一行的 metrics_json 列中，一次插入、一次提交
+        """
         db = self.SessionLocal()
         try:
-            # Create processing result
             db_result = ProcessingResult(
                 file_path=file_path,
                 file_dir=str(Path(file_path).parent),
                 file_name=str(Path(file_path).name),
                 timestamp=datetime.now(),
                 session_id=session_id or str(uuid.uuid4()),
+                device_id=device_id,
+                metrics_json=self.pack_metrics(metrics),
             )
             db.add(db_result)
             db.commit()
-            db.refresh(db_result)
             
             result_id = db_result.id
-            
-            # Save metrics
-            for metric_name, metric_value in metrics.items():
-                if isinstance(metric_value, dict):
-                    # This is spectrum data
-                    db_metric = ProcessingMetric(
-                        result_id=result_id,
-                        metric_name=metric_name,
-                        metric_type="spectrum"
-                    )
-                    db.add(db_metric)
-                    db.commit()
-                    db.refresh(db_metric)
-                    
-                    # Save spectrum data
-                    for freq, value in metric_value["frequency_bands"].items():
-                        # Ensure value is a scalar
-                        if hasattr(value, '__len__') and not isinstance(value, str):
-                            # If it's an array, take the first element
-                            scalar_value = float(value[0]) if len(value) > 0 else 0.0
-                        else:
-                            scalar_value = float(value)
-                            
-                        spectrum_data = SpectrumData(
-                            metric_id=db_metric.id,
-                            frequency=str(freq),
-                            value=scalar_value
-                        )
-                        db.add(spectrum_data)
-                else:
-                    # This is numeric data
-                    # Ensure metric_value is a scalar
-                    if hasattr(metric_value, '__len__') and not isinstance(metric_value, str):
-                        # If it's an array, take the first element
-                        scalar_value = float(metric_value[0]) if len(metric_value) > 0 else 0.0
-                    else:
-                        scalar_value = float(metric_value)
-                        
-                    db_metric = ProcessingMetric(
-                        result_id=result_id,
-                        metric_name=metric_name,
-                        metric_value=scalar_value,
-                        metric_type="numeric"
-                    )
-                    db.add(db_metric)
-            
-            db.commit()
             logger.info(f"Saved processing result for {file_path} with ID {result_id}")
             return result_id
         except Exception as e:
@@ -218,97 +367,105 @@ class DatabaseManager:
         finally:
             db.close()
     
-    def save_time_history(self, session_id: str, timestamp_utc: datetime,
-                          laeq: float, lceq: float, lzpeak: float, lcpeak: float,
-                          dose_fracs: Dict[str, float], duration_s: float = 1.0,
-                          device_id: str = None,
-                          # Kurtosis metrics
-                          kurtosis_total: float = None,
-                          kurtosis_a_weighted: float = None,
-                          kurtosis_c_weighted: float = None,
-                          beta_kurtosis: float = None,
-                          # Raw moment statistics for aggregation
-                          n_samples: int = 0,
-                          sum_x: float = 0.0,
-                          sum_x2: float = 0.0,
-                          sum_x3: float = 0.0,
-                          sum_x4: float = 0.0,
-                          # Validity flags
-                          valid_flag: bool = True,
-                          artifact_flag: bool = False,
-                          # 1/3倍频程频段SPL
-                          freq_63hz_spl: float = None,
-                          freq_125hz_spl: float = None,
-                          freq_250hz_spl: float = None,
-                          freq_500hz_spl: float = None,
-                          freq_1khz_spl: float = None,
-                          freq_2khz_spl: float = None,
-                          freq_4khz_spl: float = None,
-                          freq_8khz_spl: float = None,
-                          freq_16khz_spl: float = None,
-                          # 1/3倍频程频段原始矩统计量 S1-S4
-                          freq_63hz_n: int = 0, freq_63hz_s1: float = 0.0, freq_63hz_s2: float = 0.0, freq_63hz_s3: float = 0.0, freq_63hz_s4: float = 0.0,
-                          freq_125hz_n: int = 0, freq_125hz_s1: float = 0.0, freq_125hz_s2: float = 0.0, freq_125hz_s3: float = 0.0, freq_125hz_s4: float = 0.0,
-                          freq_250hz_n: int = 0, freq_250hz_s1: float = 0.0, freq_250hz_s2: float = 0.0, freq_250hz_s3: float = 0.0, freq_250hz_s4: float = 0.0,
-                          freq_500hz_n: int = 0, freq_500hz_s1: float = 0.0, freq_500hz_s2: float = 0.0, freq_500hz_s3: float = 0.0, freq_500hz_s4: float = 0.0,
-                          freq_1khz_n: int = 0, freq_1khz_s1: float = 0.0, freq_1khz_s2: float = 0.0, freq_1khz_s3: float = 0.0, freq_1khz_s4: float = 0.0,
-                          freq_2khz_n: int = 0, freq_2khz_s1: float = 0.0, freq_2khz_s2: float = 0.0, freq_2khz_s3: float = 0.0, freq_2khz_s4: float = 0.0,
-                          freq_4khz_n: int = 0, freq_4khz_s1: float = 0.0, freq_4khz_s2: float = 0.0, freq_4khz_s3: float = 0.0, freq_4khz_s4: float = 0.0,
-                          freq_8khz_n: int = 0, freq_8khz_s1: float = 0.0, freq_8khz_s2: float = 0.0, freq_8khz_s3: float = 0.0, freq_8khz_s4: float = 0.0,
-                          freq_16khz_n: int = 0, freq_16khz_s1: float = 0.0, freq_16khz_s2: float = 0.0, freq_16khz_s3: float = 0.0, freq_16khz_s4: float = 0.0,
-                          **kwargs) -> int:
-        """Save time history record with kurtosis aggregation support"""
+    @staticmethod
+    def _time_history_values(session_id: str, timestamp_utc: datetime,
+                             laeq: float, lceq: float, lzpeak: float, lcpeak: float,
+                             dose_fracs: Dict[str, float], duration_s: float = 1.0,
+                             device_id: str = None,
+                             lzeq: float = None, lafmax: float = None,
+                             # Kurtosis metrics
+                             kurtosis_total: float = None,
+                             kurtosis_a_weighted: float = None,
+                             kurtosis_c_weighted: float = None,
+                             beta_kurtosis: float = None,
+                             # Raw moment statistics for aggregation
+                             n_samples: int = 0,
+                             sum_x: float = 0.0,
+                             sum_x2: float = 0.0,
+                             sum_x3: float = 0.0,
+                             sum_x4: float = 0.0,
+                             # Validity flags
+                             valid_flag: bool = True,
+                             artifact_flag: bool = False,
+                             # 1/3倍频程频段SPL
+                             freq_63hz_spl: float = None,
+                             freq_125hz_spl: float = None,
+                             freq_250hz_spl: float = None,
+                             freq_500hz_spl: float = None,
+                             freq_1khz_spl: float = None,
+                             freq_2khz_spl: float = None,
+                             freq_4khz_spl: float = None,
+                             freq_8khz_spl: float = None,
+                             freq_16khz_spl: float = None,
+                             # 1/3倍频程频段原始矩统计量 S1-S4
+                             freq_63hz_n: int = 0, freq_63hz_s1: float = 0.0, freq_63hz_s2: float = 0.0, freq_63hz_s3: float = 0.0, freq_63hz_s4: float = 0.0,
+                             freq_125hz_n: int = 0, freq_125hz_s1: float = 0.0, freq_125hz_s2: float = 0.0, freq_125hz_s3: float = 0.0, freq_125hz_s4: float = 0.0,
+                             freq_250hz_n: int = 0, freq_250hz_s1: float = 0.0, freq_250hz_s2: float = 0.0, freq_250hz_s3: float = 0.0, freq_250hz_s4: float = 0.0,
+                             freq_500hz_n: int = 0, freq_500hz_s1: float = 0.0, freq_500hz_s2: float = 0.0, freq_500hz_s3: float = 0.0, freq_500hz_s4: float = 0.0,
+                             freq_1khz_n: int = 0, freq_1khz_s1: float = 0.0, freq_1khz_s2: float = 0.0, freq_1khz_s3: float = 0.0, freq_1khz_s4: float = 0.0,
+                             freq_2khz_n: int = 0, freq_2khz_s1: float = 0.0, freq_2khz_s2: float = 0.0, freq_2khz_s3: float = 0.0, freq_2khz_s4: float = 0.0,
+                             freq_4khz_n: int = 0, freq_4khz_s1: float = 0.0, freq_4khz_s2: float = 0.0, freq_4khz_s3: float = 0.0, freq_4khz_s4: float = 0.0,
+                             freq_8khz_n: int = 0, freq_8khz_s1: float = 0.0, freq_8khz_s2: float = 0.0, freq_8khz_s3: float = 0.0, freq_8khz_s4: float = 0.0,
+                             freq_16khz_n: int = 0, freq_16khz_s1: float = 0.0, freq_16khz_s2: float = 0.0, freq_16khz_s3: float = 0.0, freq_16khz_s4: float = 0.0,
+                             **kwargs) -> Dict[str, Any]:
+        """TimeHistory 行的列值（save_time_history / append_time_history 共用）"""
+        return dict(
+            session_id=session_id,
+            device_id=device_id,
+            timestamp_utc=timestamp_utc,
+            duration_s=duration_s,
+            LAeq_dB=laeq,
+            LCeq_dB=lceq,
+            LZeq_dB=lzeq,
+            LAFmax_dB=lafmax,
+            LZpeak_dB=lzpeak,
+            LCpeak_dB=lcpeak,
+            dose_frac_niosh=dose_fracs.get("NIOSH", 0.0),
+            dose_frac_osha_pel=dose_fracs.get("OSHA_PEL", 0.0),
+            dose_frac_osha_hca=dose_fracs.get("OSHA_HCA", 0.0),
+            dose_frac_eu_iso=dose_fracs.get("EU_ISO", 0.0),
+            # Kurtosis metrics
+            kurtosis_total=kurtosis_total,
+            kurtosis_a_weighted=kurtosis_a_weighted,
+            kurtosis_c_weighted=kurtosis_c_weighted,
+            beta_kurtosis=beta_kurtosis,
+            # Raw moment statistics
+            n_samples=n_samples,
+            sum_x=sum_x,
+            sum_x2=sum_x2,
+            sum_x3=sum_x3,
+            sum_x4=sum_x4,
+            # Validity flags
+            valid_flag=valid_flag,
+            artifact_flag=artifact_flag,
+            # 1/3倍频程频段SPL
+            freq_63hz_spl=freq_63hz_spl,
+            freq_125hz_spl=freq_125hz_spl,
+            freq_250hz_spl=freq_250hz_spl,
+            freq_500hz_spl=freq_500hz_spl,
+            freq_1khz_spl=freq_1khz_spl,
+            freq_2khz_spl=freq_2khz_spl,
+            freq_4khz_spl=freq_4khz_spl,
+            freq_8khz_spl=freq_8khz_spl,
+            freq_16khz_spl=freq_16khz_spl,
+            # 1/3倍频程频段原始矩统计量 S1-S4
+            freq_63hz_n=freq_63hz_n, freq_63hz_s1=freq_63hz_s1, freq_63hz_s2=freq_63hz_s2, freq_63hz_s3=freq_63hz_s3, freq_63hz_s4=freq_63hz_s4,
+            freq_125hz_n=freq_125hz_n, freq_125hz_s1=freq_125hz_s1, freq_125hz_s2=freq_125hz_s2, freq_125hz_s3=freq_125hz_s3, freq_125hz_s4=freq_125hz_s4,
+            freq_250hz_n=freq_250hz_n, freq_250hz_s1=freq_250hz_s1, freq_250hz_s2=freq_250hz_s2, freq_250hz_s3=freq_250hz_s3, freq_250hz_s4=freq_250hz_s4,
+            freq_500hz_n=freq_500hz_n, freq_500hz_s1=freq_500hz_s1, freq_500hz_s2=freq_500hz_s2, freq_500hz_s3=freq_500hz_s3, freq_500hz_s4=freq_500hz_s4,
+            freq_1khz_n=freq_1khz_n, freq_1khz_s1=freq_1khz_s1, freq_1khz_s2=freq_1khz_s2, freq_1khz_s3=freq_1khz_s3, freq_1khz_s4=freq_1khz_s4,
+            freq_2khz_n=freq_2khz_n, freq_2khz_s1=freq_2khz_s1, freq_2khz_s2=freq_2khz_s2, freq_2khz_s3=freq_2khz_s3, freq_2khz_s4=freq_2khz_s4,
+            freq_4khz_n=freq_4khz_n, freq_4khz_s1=freq_4khz_s1, freq_4khz_s2=freq_4khz_s2, freq_4khz_s3=freq_4khz_s3, freq_4khz_s4=freq_4khz_s4,
+            freq_8khz_n=freq_8khz_n, freq_8khz_s1=freq_8khz_s1, freq_8khz_s2=freq_8khz_s2, freq_8khz_s3=freq_8khz_s3, freq_8khz_s4=freq_8khz_s4,
+            freq_16khz_n=freq_16khz_n, freq_16khz_s1=freq_16khz_s1, freq_16khz_s2=freq_16khz_s2, freq_16khz_s3=freq_16khz_s3, freq_16khz_s4=freq_16khz_s4,
+            **kwargs
+        )
+    
+    def save_time_history(self, *args, **kwargs) -> int:
+        """Save time history record with kurtosis aggregation support (参数同 _time_history_values)"""
         db = self.SessionLocal()
         try:
-            record = TimeHistory(
-                session_id=session_id,
-                device_id=device_id,
-                timestamp_utc=timestamp_utc,
-                duration_s=duration_s,
-                LAeq_dB=laeq,
-                LCeq_dB=lceq,
-                LZpeak_dB=lzpeak,
-                LCpeak_dB=lcpeak,
-                dose_frac_niosh=dose_fracs.get("NIOSH", 0.0),
-                dose_frac_osha_pel=dose_fracs.get("OSHA_PEL", 0.0),
-                dose_frac_osha_hca=dose_fracs.get("OSHA_HCA", 0.0),
-                dose_frac_eu_iso=dose_fracs.get("EU_ISO", 0.0),
-                # Kurtosis metrics
-                kurtosis_total=kurtosis_total,
-                kurtosis_a_weighted=kurtosis_a_weighted,
-                kurtosis_c_weighted=kurtosis_c_weighted,
-                beta_kurtosis=beta_kurtosis,
-                # Raw moment statistics
-                n_samples=n_samples,
-                sum_x=sum_x,
-                sum_x2=sum_x2,
-                sum_x3=sum_x3,
-                sum_x4=sum_x4,
-                # Validity flags
-                valid_flag=valid_flag,
-                artifact_flag=artifact_flag,
-                # 1/3倍频程频段SPL
-                freq_63hz_spl=freq_63hz_spl,
-                freq_125hz_spl=freq_125hz_spl,
-                freq_250hz_spl=freq_250hz_spl,
-                freq_500hz_spl=freq_500hz_spl,
-                freq_1khz_spl=freq_1khz_spl,
-                freq_2khz_spl=freq_2khz_spl,
-                freq_4khz_spl=freq_4khz_spl,
-                freq_8khz_spl=freq_8khz_spl,
-                freq_16khz_spl=freq_16khz_spl,
-                # 1/3倍频程频段原始矩统计量 S1-S4
-                freq_63hz_n=freq_63hz_n, freq_63hz_s1=freq_63hz_s1, freq_63hz_s2=freq_63hz_s2, freq_63hz_s3=freq_63hz_s3, freq_63hz_s4=freq_63hz_s4,
-                freq_125hz_n=freq_125hz_n, freq_125hz_s1=freq_125hz_s1, freq_125hz_s2=freq_125hz_s2, freq_125hz_s3=freq_125hz_s3, freq_125hz_s4=freq_125hz_s4,
-                freq_250hz_n=freq_250hz_n, freq_250hz_s1=freq_250hz_s1, freq_250hz_s2=freq_250hz_s2, freq_250hz_s3=freq_250hz_s3, freq_250hz_s4=freq_250hz_s4,
-                freq_500hz_n=freq_500hz_n, freq_500hz_s1=freq_500hz_s1, freq_500hz_s2=freq_500hz_s2, freq_500hz_s3=freq_500hz_s3, freq_500hz_s4=freq_500hz_s4,
-                freq_1khz_n=freq_1khz_n, freq_1khz_s1=freq_1khz_s1, freq_1khz_s2=freq_1khz_s2, freq_1khz_s3=freq_1khz_s3, freq_1khz_s4=freq_1khz_s4,
-                freq_2khz_n=freq_2khz_n, freq_2khz_s1=freq_2khz_s1, freq_2khz_s2=freq_2khz_s2, freq_2khz_s3=freq_2khz_s3, freq_2khz_s4=freq_2khz_s4,
-                freq_4khz_n=freq_4khz_n, freq_4khz_s1=freq_4khz_s1, freq_4khz_s2=freq_4khz_s2, freq_4khz_s3=freq_4khz_s3, freq_4khz_s4=freq_4khz_s4,
-                freq_8khz_n=freq_8khz_n, freq_8khz_s1=freq_8khz_s1, freq_8khz_s2=freq_8khz_s2, freq_8khz_s3=freq_8khz_s3, freq_8khz_s4=freq_8khz_s4,
-                freq_16khz_n=freq_16khz_n, freq_16khz_s1=freq_16khz_s1, freq_16khz_s2=freq_16khz_s2, freq_16khz_s3=freq_16khz_s3, freq_16khz_s4=freq_16khz_s4,
-                **kwargs
-            )
+            record = TimeHistory(**self._time_history_values(*args, **kwargs))
             db.add(record)
             db.commit()
             db.refresh(record)
@@ -320,9 +477,27 @@ class DatabaseManager:
         finally:
             db.close()
     
+    def append_time_history(self, *args, **kwargs):
+        """
+        将时间历程记录加入写缓冲（参数同 _time_history_values）
+        
+        缓冲满 time_history_batch_size 行或 time_history_flush_ms 毫秒后在一个事务中批量写入；
+        文件或会话结束时调用 flush_time_history() 立即写入
+        """
+        self.time_history_buffer.append(self._time_history_values(*args, **kwargs))
+    
+    def flush_time_history(self) -> int:
+        """
+        立即写入缓冲中的时间历程记录
+        
+        Returns:
+            int: 写入的记录数
+        """
+        return self.time_history_buffer.flush()
+    
     def get_session_dose_summary(self, session_id: str) -> Dict[str, Any]:
         """Get cumulative dose summary for a session"""
-        db = self.SessionLocal()
+        db = self.ReadSessionLocal()
         try:
             # Calculate total dose for each standard
             result = db.query(
@@ -371,7 +546,7 @@ class DatabaseManager:
     
     def get_latest_result(self) -> Optional[Dict[str, Any]]:
         """Get the latest processing result"""
-        db = self.SessionLocal()
+        db = self.ReadSessionLocal()
         try:
             # Get the latest result
             latest_result = db.query(ProcessingResult).order_by(ProcessingResult.timestamp.desc()).first()
@@ -379,15 +554,12 @@ class DatabaseManager:
             if not latest_result:
                 return None
             
-            # Get metrics for this result
-            metrics_data = self._get_metrics_for_result(db, latest_result.id)
-            
             return {
                 "id": latest_result.id,
                 "file_path": latest_result.file_path,
                 "session_id": latest_result.session_id,
                 "timestamp": latest_result.timestamp.isoformat(),
-                "metrics": metrics_data
+                "metrics": latest_result.metrics_dict()
             }
         except Exception as e:
             logger.error(f"Error getting latest result: {e}")
@@ -397,7 +569,7 @@ class DatabaseManager:
     
     def get_history_results(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
         """Get history processing results"""
-        db = self.SessionLocal()
+        db = self.ReadSessionLocal()
         try:
             # Get history results
             history_results = db.query(ProcessingResult).order_by(
@@ -405,13 +577,12 @@ class DatabaseManager:
             
             results = []
             for result in history_results:
-                metrics_data = self._get_metrics_for_result(db, result.id)
                 results.append({
                     "id": result.id,
                     "file_path": result.file_path,
                     "session_id": result.session_id,
                     "timestamp": result.timestamp.isoformat(),
-                    "metrics": metrics_data
+                    "metrics": result.metrics_dict()
                 })
             
             return results
@@ -421,23 +592,72 @@ class DatabaseManager:
         finally:
             db.close()
     
-    def _get_metrics_for_result(self, db, result_id: int) -> Dict[str, Any]:
-        """Get metrics for a specific result"""
-        metrics = {}
-        
-        # Get all metrics for this result
-        db_metrics = db.query(ProcessingMetric).filter(ProcessingMetric.result_id == result_id).all()
+    @staticmethod
+    def encode_result_cursor(timestamp: datetime, result_id: int) -> str:
+        """处理结果的分页游标（timestamp + id）"""
+        return f"{timestamp.isoformat()}_{result_id}"
+    
+    @staticmethod
+    def decode_result_cursor(cursor: str) -> Tuple[datetime, int]:
+        """解析分页游标（格式错误时抛出 ValueError）"""
+        timestamp, result_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(timestamp), int(result_id)
+    
+    def iter_processing_results(self, file_name_prefix: Optional[str] = None,
+                                start_time: Optional[datetime] = None,
+                                cursor: Optional[str] = None,
+                                limit: Optional[int] = None,
+                                batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        按 (timestamp, id) 升序逐批读取处理结果
         
-        for metric in db_metrics:
-            if metric.metric_type == "numeric":
-                metrics[metric.metric_name] = metric.metric_value
-            elif metric.metric_type == "spectrum":
-                # Get spectrum data
-                spectrum_data = db.query(SpectrumData).filter(SpectrumData.metric_id == metric.id).all()
-                spectrum_dict = {data.frequency: data.value for data in spectrum_data}
-                metrics[metric.metric_name] = spectrum_dict
+        每批一次查询（按 (timestamp, id) 键集分页，旧格式结果的指标以 selectinload 一并加载），
+        批与批之间释放读连接，适合流式输出
         
-        return metrics
+        Args:
+            file_name_prefix: 文件名前缀（通道）
+            start_time: 只返回该时间之后的结果
+            cursor: 从该游标之后开始（上次返回结果的 cursor）
+            limit: 最多返回的结果数，None 表示全部
+            batch_size: 每批读取的结果数
+            
+        Yields:
+            Dict[str, Any]: id, file_path, timestamp, metrics, cursor
+        """
+        after = self.decode_result_cursor(cursor) if cursor else None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            db = self.ReadSessionLocal()
+            try:
+                query = db.query(ProcessingResult).options(
+                    selectinload(ProcessingResult.metrics).selectinload(ProcessingMetric.spectrum_data))
+                if file_name_prefix:
+                    query = query.filter(ProcessingResult.file_name.startswith(file_name_prefix))
+                if start_time:
+                    query = query.filter(ProcessingResult.timestamp >= start_time)
+                if after:
+                    query = query.filter(or_(
+                        ProcessingResult.timestamp > after[0],
+                        and_(ProcessingResult.timestamp == after[0], ProcessingResult.id > after[1])
+                    ))
+                rows = query.order_by(ProcessingResult.timestamp, ProcessingResult.id).limit(size).all()
+                batch = [{
+                    "id": result.id,
+                    "file_path": result.file_path,
+                    "timestamp": result.timestamp.isoformat(),
+                    "metrics": result.metrics_dict(),
+                    "cursor": self.encode_result_cursor(result.timestamp, result.id),
+                } for result in rows]
+            finally:
+                db.close()
+            
+            yield from batch
+            if len(rows) < size:
+                return
+            after = (rows[-1].timestamp, rows[-1].id)
+            if remaining is not None:
+                remaining -= len(rows)
     
     def cleanup_history(self, days_old: int = 30) -> int:
         """Clean up old history data"""
@@ -533,7 +753,8 @@ class DatabaseManager:
     def get_time_history(self, session_id: str, 
                          start_time: Optional[datetime] = None,
                          end_time: Optional[datetime] = None,
-                         limit: int = 10000) -> List[Dict[str, Any]]:
+                         limit: int = 10000,
+                         resolution_s: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         获取时间历程数据
         
@@ -542,11 +763,17 @@ class DatabaseManager:
             start_time: 开始时间
             end_time: 结束时间
             limit: 最大返回记录数
+            resolution_s: 降采样分辨率（秒），大于 1 时返回按时间段汇聚的记录
+                （见 get_time_history_downsampled）
             
         Returns:
             List[Dict]: 时间历程数据列表
         """
-        db = self.SessionLocal()
+        if resolution_s is not None and resolution_s > 1:
+            return self.get_time_history_downsampled(
+                session_id, resolution_s, start_time=start_time, end_time=end_time, limit=limit)
+
+        db = self.ReadSessionLocal()
         try:
             query = db.query(TimeHistory).filter(TimeHistory.session_id == session_id)
             
@@ -618,6 +845,373 @@ class DatabaseManager:
         finally:
             db.close()
     
+    def _time_bucket_expr(self, column, resolution_s: int):
+        """时间段编号：Unix 时间戳整除分辨率（时间段与整分钟、整点对齐）"""
+        if self.read_engine.dialect.name == "sqlite":
+            epoch = cast(func.strftime('%s', column), Integer)
+            return epoch // resolution_s
+        return func.floor(func.extract('epoch', column) / resolution_s)
+
+    @staticmethod
+    def _energy_sum_columns(name: str, level, duration):
+        """能量平均所需的两列：Σ(d·10^(L/10)) 及 L 非空的 Σd"""
+        energy = func.sum(case((level.isnot(None), duration * func.power(10.0, level / 10.0))))
+        weight = func.sum(case((level.isnot(None), duration)))
+        return [energy.label(f"{name}__e"), weight.label(f"{name}__w")]
+
+    @staticmethod
+    def _energy_level(row, name: str) -> Optional[float]:
+        energy = getattr(row, f"{name}__e")
+        weight = getattr(row, f"{name}__w")
+        if not energy or not weight or energy <= 0:
+            return None
+        return round(10 * math.log10(energy / weight), 2)
+
+    def _rollup_level_for(self, session_id: str, resolution_s: int) -> Optional[Tuple[int, datetime]]:
+        """
+        可用于该分辨率的最大汇总级别（时段长度整除分辨率且会话已有汇总记录）
+
+        Returns:
+            Optional[Tuple[int, datetime]]: (时段长度, 该级别已写入数据的最后时间)，没有可用级别时为 None
+        """
+        db = self.ReadSessionLocal()
+        try:
+            for level_s in sorted(ROLLUP_MODELS, reverse=True):
+                if resolution_s % level_s:
+                    continue
+                model = ROLLUP_MODELS[level_s]
+                last = db.query(func.max(model.end_time)).filter(model.session_id == session_id).scalar()
+                if last is not None:
+                    return level_s, last
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _epoch(value: datetime) -> float:
+        """无时区的 UTC 时间 -> Unix 时间"""
+        return value.replace(tzinfo=timezone.utc).timestamp() if value.tzinfo is None else value.timestamp()
+
+    @staticmethod
+    def _from_epoch(seconds: float) -> datetime:
+        return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+    def get_time_history_downsampled(self, session_id: str, resolution_s: int,
+                                     start_time: Optional[datetime] = None,
+                                     end_time: Optional[datetime] = None,
+                                     limit: int = 10000) -> List[Dict[str, Any]]:
+        """
+        按时间段汇聚的时间历程（在数据库中 GROUP BY，只返回汇聚后的记录）
+
+        汇聚规则与 SummaryProcessor 一致：
+        - 等效声级（LAeq/LCeq/LZeq 及频段 SPL）按时长加权能量平均
+        - LAFmax / LZpeak / LCpeak 取最大值
+        - 剂量增量求和
+        - 原始矩 n、S1-S4 求和后重新计算峰度 β（根据规范 4.X.6）
+
+        分辨率为 1 分钟、15 分钟或 1 小时的整数倍且会话已有汇总记录时，完全位于查询范围内、
+        且在汇总表已写入数据的最后时间之前结束的时段读取汇总表（time_history_1min / _15min / _1h）；
+        其余部分（查询范围首尾不完整的时段、入库中尚未写入汇总表的当前时段）从逐秒记录汇聚，
+        两部分按时间段合并。12 小时的逐秒记录在 1 分钟分辨率下为 720 条。
+
+        Args:
+            session_id: 会话ID
+            resolution_s: 时间段长度（秒）
+            start_time: 开始时间
+            end_time: 结束时间
+            limit: 最大返回时间段数
+
+        Returns:
+            List[Dict]: 每个时间段一条记录，timestamp 为时间段起点
+        """
+        resolution_s = int(resolution_s)
+
+        # 汇总表覆盖的时段范围 [rollup_from, rollup_to)，按时段边界对齐
+        rollup_from = rollup_to = None
+        coverage = self._rollup_level_for(session_id, resolution_s)
+        if coverage is not None:
+            level_s, last = coverage
+            lo = math.ceil(self._epoch(start_time) / level_s) * level_s if start_time else None
+            # 最后一秒的时间 + 1 秒之前结束的时段已完整写入汇总表
+            hi = math.floor((self._epoch(last) + 1) / level_s) * level_s
+            if end_time:
+                hi = min(hi, math.floor(self._epoch(end_time) / level_s) * level_s)
+            if lo is None or hi > lo:
+                rollup_from = self._from_epoch(lo) if lo is not None else None
+                rollup_to = self._from_epoch(hi)
+
+        db = self.ReadSessionLocal()
+        try:
+            rows = []
+            if rollup_to is not None:
+                model = ROLLUP_MODELS[level_s]
+                bucket = self._time_bucket_expr(model.period_start, resolution_s).label('bucket')
+                query = db.query(bucket, *self._rollup_bucket_columns(model)).filter(
+                    model.session_id == session_id,
+                    model.period_start <= rollup_to - timedelta(seconds=level_s))
+                if rollup_from is not None:
+                    query = query.filter(model.period_start >= rollup_from)
+                rows += query.group_by(bucket).order_by(bucket.asc()).limit(limit).all()
+
+            bucket = self._time_bucket_expr(TimeHistory.timestamp_utc, resolution_s).label('bucket')
+            query = db.query(bucket, *self._time_history_bucket_columns()).filter(
+                TimeHistory.session_id == session_id)
+            if start_time:
+                query = query.filter(TimeHistory.timestamp_utc >= start_time)
+            if end_time:
+                query = query.filter(TimeHistory.timestamp_utc <= end_time)
+            if rollup_to is not None:
+                outside = TimeHistory.timestamp_utc >= rollup_to
+                if rollup_from is not None:
+                    outside = or_(TimeHistory.timestamp_utc < rollup_from, outside)
+                query = query.filter(outside)
+            rows += query.group_by(bucket).order_by(bucket.asc()).limit(limit).all()
+        except Exception as e:
+            logger.error(f"Error getting downsampled time history: {e}")
+            return []
+        finally:
+            db.close()
+
+        merged = self._merge_bucket_rows(rows)
+        return [self._downsampled_record(row, resolution_s) for row in merged[:limit]]
+
+    @staticmethod
+    def _merge_bucket_rows(rows) -> list:
+        """合并同一时间段的部分结果（汇总表与逐秒记录）：最大值列取最大，其余累加"""
+        merged: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            values = row._asdict()
+            key = int(values['bucket'])
+            current = merged.get(key)
+            if current is None:
+                merged[key] = values
+                continue
+            for name, value in values.items():
+                if name == 'bucket' or value is None:
+                    continue
+                if current[name] is None:
+                    current[name] = value
+                elif name in _BUCKET_MAX_COLUMNS:
+                    current[name] = max(current[name], value)
+                else:
+                    current[name] += value
+        return [SimpleNamespace(**merged[key]) for key in sorted(merged)]
+
+    def _time_history_bucket_columns(self) -> list:
+        """从逐秒记录汇聚的列"""
+        duration = func.coalesce(TimeHistory.duration_s, 1.0)
+        columns = [
+            func.count(TimeHistory.id).label('record_count'),
+            func.sum(duration).label('duration_s'),
+            func.max(TimeHistory.LAFmax_dB).label('LAFmax_dB'),
+            func.max(TimeHistory.LZpeak_dB).label('LZpeak_dB'),
+            func.max(TimeHistory.LCpeak_dB).label('LCpeak_dB'),
+            func.sum(TimeHistory.dose_frac_niosh).label('dose_frac_niosh'),
+            func.sum(TimeHistory.dose_frac_osha_pel).label('dose_frac_osha_pel'),
+            func.sum(TimeHistory.dose_frac_osha_hca).label('dose_frac_osha_hca'),
+            func.sum(TimeHistory.dose_frac_eu_iso).label('dose_frac_eu_iso'),
+            func.sum(TimeHistory.overload_flag.cast(Integer)).label('overload_count'),
+            func.sum(TimeHistory.underrange_flag.cast(Integer)).label('underrange_count'),
+            func.sum(TimeHistory.wearing_state.cast(Integer)).label('valid_seconds'),
+        ]
+        columns += [func.sum(getattr(TimeHistory, m)).label(m) for m in _MOMENT_COLUMNS]
+        for name in ('LAeq_dB', 'LCeq_dB', 'LZeq_dB'):
+            columns += self._energy_sum_columns(name, getattr(TimeHistory, name), duration)
+        for band in TIME_HISTORY_BANDS:
+            prefix = f"freq_{band}"
+            columns += self._energy_sum_columns(f"{prefix}_spl", getattr(TimeHistory, f"{prefix}_spl"), duration)
+            columns += [func.sum(getattr(TimeHistory, f"{prefix}_{m}")).label(f"{prefix}_{m}")
+                        for m in _BAND_MOMENTS]
+        return columns
+
+    @staticmethod
+    def _rollup_bucket_columns(model) -> list:
+        """从汇总表合并的列（能量和及原始矩直接求和，不需要逐行计算）"""
+        duration = func.sum(model.duration_s)
+        columns = [
+            func.sum(model.sample_count).label('record_count'),
+            duration.label('duration_s'),
+            func.max(model.LAFmax).label('LAFmax_dB'),
+            func.max(model.LZpeak).label('LZpeak_dB'),
+            func.max(model.LCpeak).label('LCpeak_dB'),
+            func.sum(model.dose_frac_niosh).label('dose_frac_niosh'),
+            func.sum(model.dose_frac_osha_pel).label('dose_frac_osha_pel'),
+            func.sum(model.dose_frac_osha_hca).label('dose_frac_osha_hca'),
+            func.sum(model.dose_frac_eu_iso).label('dose_frac_eu_iso'),
+            func.sum(model.overload_count).label('overload_count'),
+            func.sum(model.underrange_count).label('underrange_count'),
+            func.sum(model.valid_seconds).label('valid_seconds'),
+        ]
+        columns += [func.sum(getattr(model, m)).label(m) for m in _MOMENT_COLUMNS]
+        for name, energy in (('LAeq_dB', model.LAeq_energy), ('LCeq_dB', model.LCeq_energy),
+                             ('LZeq_dB', model.LZeq_energy)):
+            columns += [func.sum(energy).label(f"{name}__e"), duration.label(f"{name}__w")]
+        for band in TIME_HISTORY_BANDS:
+            prefix = f"freq_{band}"
+            columns += [func.sum(getattr(model, f"{prefix}_energy")).label(f"{prefix}_spl__e"),
+                        duration.label(f"{prefix}_spl__w")]
+            columns += [func.sum(getattr(model, f"{prefix}_{m}")).label(f"{prefix}_{m}")
+                        for m in _BAND_MOMENTS]
+        return columns
+
+    def _downsampled_record(self, row, resolution_s: int) -> Dict[str, Any]:
+        """一个时间段的汇聚记录（由能量和计算声级，由合并后的原始矩计算峰度）"""
+        start = datetime.fromtimestamp(int(row.bucket) * resolution_s, tz=timezone.utc).replace(tzinfo=None)
+        moments = [getattr(row, m) for m in _MOMENT_COLUMNS]
+        beta = _kurtosis_from_moments(*moments)
+        record = {
+            'timestamp': start.isoformat(),
+            'end_timestamp': (start + timedelta(seconds=resolution_s)).isoformat(),
+            'resolution_s': resolution_s,
+            'record_count': row.record_count,
+            'duration_s': row.duration_s,
+            'LAeq_dB': self._energy_level(row, 'LAeq_dB'),
+            'LCeq_dB': self._energy_level(row, 'LCeq_dB'),
+            'LZeq_dB': self._energy_level(row, 'LZeq_dB'),
+            'LAFmax_dB': row.LAFmax_dB,
+            'LZpeak_dB': row.LZpeak_dB,
+            'LCpeak_dB': row.LCpeak_dB,
+            'dose_frac_niosh': round(row.dose_frac_niosh or 0.0, 6),
+            'dose_frac_osha_pel': round(row.dose_frac_osha_pel or 0.0, 6),
+            'dose_frac_osha_hca': round(row.dose_frac_osha_hca or 0.0, 6),
+            'dose_frac_eu_iso': round(row.dose_frac_eu_iso or 0.0, 6),
+            'overload_count': row.overload_count or 0,
+            'underrange_count': row.underrange_count or 0,
+            'valid_seconds': row.valid_seconds or 0,
+            # 原始矩为 Z 计权信号的统计量，合成峰度同时作为 kurtosis_total；
+            # A/C 计权峰度没有保存原始矩，无法精确合成，汇聚记录中不提供
+            'beta_kurtosis': beta,
+            'kurtosis_total': beta,
+        }
+        record.update({m: value or 0 for m, value in zip(_MOMENT_COLUMNS, moments)})
+        for band in TIME_HISTORY_BANDS:
+            prefix = f"freq_{band}"
+            band_moments = [getattr(row, f"{prefix}_{m}") for m in _BAND_MOMENTS]
+            record[f"{prefix}_spl"] = self._energy_level(row, f"{prefix}_spl")
+            record[f"{prefix}_kurtosis"] = _kurtosis_from_moments(*band_moments)
+            record.update({f"{prefix}_{m}": value or 0 for m, value in zip(_BAND_MOMENTS, band_moments)})
+        return record
+
+    # ==================== Time History Rollup Operations ====================
+
+    def save_rollup(self, level_s: int, session_id: str, metrics,
+                    device_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        保存一个时段的汇总（同一会话、设备及时段已有记录时合并）
+
+        多个文件覆盖同一时段时各写入一次部分结果：能量和、原始矩、剂量及计数累加，
+        最大值取最大，声级与峰度由合并后的累加量重新计算
+
+        Args:
+            level_s: 汇总级别（时段长度，秒），60 / 900 / 3600
+            session_id: 会话ID
+            metrics: AggregatedMetrics（需设置 period_start）
+            device_id: 设备ID（多通道文件的通道名）
+
+        Returns:
+            Dict: 合并后的记录
+        """
+        model = ROLLUP_MODELS[level_s]
+        values = {name: getattr(metrics, name, None) for name in _ROLLUP_STORED_COLUMNS}
+        if values['period_start'] is None:
+            raise ValueError("Rollup metrics need a clock-aligned period_start")
+
+        db = self.SessionLocal()
+        try:
+            query = db.query(model).filter(model.session_id == session_id,
+                                           model.period_start == values['period_start'])
+            query = query.filter(model.device_id.is_(None) if device_id is None else model.device_id == device_id)
+            row = query.first()
+            if row is None:
+                row = model(session_id=session_id, device_id=device_id,
+                            **{name: values[name] for name in _ROLLUP_STORED_COLUMNS})
+                db.add(row)
+            else:
+                for name in _ROLLUP_SUM_COLUMNS:
+                    setattr(row, name, (getattr(row, name) or 0) + (values[name] or 0))
+                for name in _ROLLUP_MAX_COLUMNS:
+                    existing = [v for v in (getattr(row, name), values[name]) if v is not None]
+                    setattr(row, name, max(existing) if existing else None)
+                row.start_time = min(row.start_time, values['start_time'])
+                row.end_time = max(row.end_time, values['end_time'])
+                row.artifact_flag = bool(row.artifact_flag or values['artifact_flag'])
+            self._finalize_rollup(row)
+            db.commit()
+            return self._rollup_to_dict(row)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error saving {model.__tablename__} rollup: {e}")
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _finalize_rollup(row):
+        """由累加量计算声级、峰度及有效性"""
+        def level(energy):
+            if not energy or not row.duration_s or energy <= 0:
+                return None
+            return round(10 * math.log10(energy / row.duration_s), 2)
+
+        row.LAeq = level(row.LAeq_energy)
+        row.LCeq = level(row.LCeq_energy)
+        row.LZeq = level(row.LZeq_energy)
+        row.beta_kurtosis = _kurtosis_from_moments(*(getattr(row, m) for m in _MOMENT_COLUMNS))
+        for band in TIME_HISTORY_BANDS:
+            prefix = f"freq_{band}"
+            setattr(row, f"{prefix}_spl", level(getattr(row, f"{prefix}_energy")))
+            setattr(row, f"{prefix}_kurtosis",
+                    _kurtosis_from_moments(*(getattr(row, f"{prefix}_{m}") for m in _BAND_MOMENTS)))
+        row.valid_flag = (row.valid_seconds or 0) >= (row.sample_count or 0) * 0.5
+
+    @staticmethod
+    def _rollup_to_dict(row) -> Dict[str, Any]:
+        record = {'level_s': row.level_s, 'session_id': row.session_id, 'device_id': row.device_id}
+        for name in _ROLLUP_STORED_COLUMNS + _ROLLUP_DERIVED_COLUMNS:
+            value = getattr(row, name)
+            record[name] = value.isoformat() if isinstance(value, datetime) else value
+        return record
+
+    def get_rollups(self, level_s: int,
+                    session_id: Optional[str] = None,
+                    device_id: Optional[str] = None,
+                    start_time: Optional[datetime] = None,
+                    end_time: Optional[datetime] = None,
+                    limit: int = 10000) -> List[Dict[str, Any]]:
+        """
+        读取汇总记录（按时段起点排序），用于仪表盘及跨会话的长期报告
+
+        Args:
+            level_s: 汇总级别（时段长度，秒），60 / 900 / 3600
+            session_id: 会话ID，None 表示所有会话
+            device_id: 设备ID，None 表示所有设备
+            start_time: 时段起点不早于该时间
+            end_time: 时段起点不晚于该时间
+            limit: 最大返回记录数
+
+        Returns:
+            List[Dict]: 汇总记录
+        """
+        model = ROLLUP_MODELS[level_s]
+        db = self.ReadSessionLocal()
+        try:
+            query = db.query(model)
+            if session_id is not None:
+                query = query.filter(model.session_id == session_id)
+            if device_id is not None:
+                query = query.filter(model.device_id == device_id)
+            if start_time:
+                query = query.filter(model.period_start >= start_time)
+            if end_time:
+                query = query.filter(model.period_start <= end_time)
+            rows = query.order_by(model.period_start.asc(), model.id.asc()).limit(limit).all()
+            return [self._rollup_to_dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error getting {model.__tablename__} rollups: {e}")
+            return []
+        finally:
+            db.close()
+
     def get_time_history_summary(self, session_id: str) -> Dict[str, Any]:
         """
         获取时间历程汇总统计
@@ -628,7 +1222,7 @@ class DatabaseManager:
         Returns:
             Dict: 汇总统计信息
         """
-        db = self.SessionLocal()
+        db = self.ReadSessionLocal()
         try:
             result = db.query(
                 func.count(TimeHistory.id).label('count'),
@@ -749,7 +1343,7 @@ class DatabaseManager:
     
     def get_session_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
         """获取会话摘要"""
-        db = self.SessionLocal()
+        db = self.ReadSessionLocal()
         try:
             summary = db.query(SessionSummary).filter(
                 SessionSummary.session_id == session_id).first()
@@ -780,7 +1374,7 @@ class DatabaseManager:
     
     def list_sessions(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
         """列出所有会话摘要"""
-        db = self.SessionLocal()
+        db = self.ReadSessionLocal()
         try:
             summaries = db.query(SessionSummary).order_by(
                 SessionSummary.start_time_utc.desc()).offset(offset).limit(limit).all()
@@ -871,7 +1465,7 @@ class DatabaseManager:
         """
         from app.database.models import EventLog
         
-        db = self.SessionLocal()
+        db = self.ReadSessionLocal()
         try:
             query = db.query(EventLog)
             
@@ -921,7 +1515,7 @@ class DatabaseManager:
         from app.database.models import EventLog
         from sqlalchemy import func
         
-        db = self.SessionLocal()
+        db = self.ReadSessionLocal()
         try:
             result = db.query(
                 func.count(EventLog.id).label('count'),
@@ -957,3 +1551,226 @@ class DatabaseManager:
             return {'session_id': session_id, 'error': str(e)}
         finally:
             db.close()
+    
+    # ==================== Ingestion Queue Operations ====================
+    
+    def enqueue_ingestion_file(self, file_path: str) -> Optional[int]:
+        """
+        将待处理文件加入入库队列
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            Optional[int]: 队列记录ID，文件已在队列中（待处理或处理中）时返回 None
+        """
+        db = self.SessionLocal()
+        try:
+            exists = db.query(IngestionQueue.id).filter(
+                IngestionQueue.file_path == file_path,
+                IngestionQueue.status.in_(["pending", "processing"])
+            ).first()
+            if exists:
+                return None
+            
+            item = IngestionQueue(file_path=file_path, status="pending")
+            db.add(item)
+            db.commit()
+            db.refresh(item)
+            return item.id
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error enqueueing file {file_path}: {e}")
+            raise
+        finally:
+            db.close()
+    
+    def claim_ingestion_file(self) -> Optional[Dict[str, Any]]:
+        """
+        取出最早加入队列的待处理文件并标记为处理中
+        
+        Returns:
+            Optional[Dict]: {'id', 'file_path', 'attempts'}，队列为空时返回 None
+        """
+        db = self.SessionLocal()
+        try:
+            while True:
+                item = db.query(IngestionQueue).filter(
+                    IngestionQueue.status == "pending"
+                ).order_by(IngestionQueue.id).first()
+                if item is None:
+                    return None
+                claimed_item = {'id': item.id, 'file_path': item.file_path, 'attempts': (item.attempts or 0) + 1}
+                
+                # 条件更新，保证同一记录只被一个消费者取出
+                claimed = db.query(IngestionQueue).filter(
+                    IngestionQueue.id == item.id,
+                    IngestionQueue.status == "pending"
+                ).update({
+                    IngestionQueue.status: "processing",
+                    IngestionQueue.started_at: datetime.utcnow(),
+                    IngestionQueue.attempts: IngestionQueue.attempts + 1
+                }, synchronize_session=False)
+                db.commit()
+                if claimed:
+                    return claimed_item
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error claiming ingestion file: {e}")
+            raise
+        finally:
+            db.close()
+    
+    def complete_ingestion_file(self, item_id: int):
+        """处理完成，从队列中删除"""
+        db = self.SessionLocal()
+        try:
+            db.query(IngestionQueue).filter(IngestionQueue.id == item_id).delete()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error completing ingestion item {item_id}: {e}")
+            raise
+        finally:
+            db.close()
+    
+    def fail_ingestion_file(self, item_id: int, error: str):
+        """处理失败，保留记录及错误信息"""
+        db = self.SessionLocal()
+        try:
+            db.query(IngestionQueue).filter(IngestionQueue.id == item_id).update({
+                IngestionQueue.status: "failed",
+                IngestionQueue.error: error
+            }, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error failing ingestion item {item_id}: {e}")
+            raise
+        finally:
+            db.close()
+    
+    def reset_ingestion_claims(self) -> int:
+        """
+        将处理中的记录恢复为待处理（服务重启后重新处理上次未完成的文件）
+        
+        Returns:
+            int: 恢复的记录数
+        """
+        db = self.SessionLocal()
+        try:
+            count = db.query(IngestionQueue).filter(
+                IngestionQueue.status == "processing"
+            ).update({IngestionQueue.status: "pending"}, synchronize_session=False)
+            db.commit()
+            return count
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error resetting ingestion claims: {e}")
+            raise
+        finally:
+            db.close()
+    
+    def count_ingestion_files(self, status: str = "pending") -> int:
+        """统计队列中指定状态的记录数"""
+        db = self.ReadSessionLocal()
+        try:
+            return db.query(IngestionQueue).filter(IngestionQueue.status == status).count()
+        finally:
+            db.close()
+    
+    # ==================== Ingestion Ledger Operations ====================
+    
+    @staticmethod
+    def _ledger_to_dict(entry: IngestionLedger) -> Dict[str, Any]:
+        return {
+            'id': entry.id,
+            'file_path': entry.file_path,
+            'file_size': entry.file_size,
+            'file_mtime': entry.file_mtime,
+            'fingerprint': entry.fingerprint,
+            'content_hash': entry.content_hash,
+            'status': entry.status,
+            'session_id': entry.session_id,
+            'error': entry.error,
+            'queued_at': entry.queued_at.isoformat() if entry.queued_at else None,
+            'started_at': entry.started_at.isoformat() if entry.started_at else None,
+            'finished_at': entry.finished_at.isoformat() if entry.finished_at else None,
+            'audio_duration_s': entry.audio_duration_s,
+            'processing_s': entry.processing_s,
+            'realtime_factor': entry.realtime_factor,
+            'mb_per_s': entry.mb_per_s,
+        }
+    
+    def get_ledger_entry(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """获取文件的入库记录"""
+        db = self.ReadSessionLocal()
+        try:
+            entry = db.query(IngestionLedger).filter(IngestionLedger.file_path == file_path).first()
+            return self._ledger_to_dict(entry) if entry else None
+        finally:
+            db.close()
+    
+    def update_ledger_entry(self, file_path: str, **fields) -> Dict[str, Any]:
+        """
+        更新文件的入库记录（不存在时创建）
+        
+        Args:
+            file_path: 文件路径
+            **fields: IngestionLedger 的列
+        """
+        db = self.SessionLocal()
+        try:
+            entry = db.query(IngestionLedger).filter(IngestionLedger.file_path == file_path).first()
+            if entry is None:
+                entry = IngestionLedger(file_path=file_path)
+                db.add(entry)
+            for key, value in fields.items():
+                setattr(entry, key, value)
+            db.commit()
+            db.refresh(entry)
+            return self._ledger_to_dict(entry)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error updating ingestion ledger for {file_path}: {e}")
+            raise
+        finally:
+            db.close()
+    
+    def list_ledger_entries(self, status: Optional[str] = None,
+                            limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """获取入库记录列表（最近处理的在前）"""
+        db = self.ReadSessionLocal()
+        try:
+            query = db.query(IngestionLedger)
+            if status:
+                query = query.filter(IngestionLedger.status == status)
+            entries = query.order_by(IngestionLedger.id.desc()).offset(offset).limit(limit).all()
+            return [self._ledger_to_dict(entry) for entry in entries]
+        finally:
+            db.close()
+    
+    def get_ledger_summary(self) -> Dict[str, Any]:
+        """
+        入库记录统计：各状态文件数及已完成文件的总吞吐量
+        """
+        db = self.ReadSessionLocal()
+        try:
+            counts = dict(db.query(IngestionLedger.status, func.count(IngestionLedger.id)).group_by(
+                IngestionLedger.status).all())
+            totals = db.query(
+                func.sum(IngestionLedger.audio_duration_s),
+                func.sum(IngestionLedger.processing_s),
+                func.sum(IngestionLedger.file_size)
+            ).filter(IngestionLedger.status == "done").first()
+            audio_s, processing_s, total_bytes = (value or 0 for value in totals)
+            return {
+                'status_counts': counts,
+                'total_audio_s': audio_s,
+                'total_processing_s': processing_s,
+                'total_bytes': total_bytes,
+                'realtime_factor': audio_s / processing_s if processing_s else None,
+                'mb_per_s': total_bytes / 1e6 / processing_s if processing_s else None,
+            }
+        finally:
+            db.close()
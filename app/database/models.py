@@ -1,9 +1,9 @@
 """
 Database models for noise info toolkit
 """
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, declared_attr
 import json
 from datetime import datetime
 from typing import Dict, Any, Optional
@@ -28,6 +28,10 @@ class DoseProfile(Base):
 class ProcessingResult(Base):
     """Processing result model"""
     __tablename__ = "processing_result"
+    __table_args__ = (
+        # Keyset pagination in (timestamp, id) order
+        Index("ix_processing_result_timestamp_id", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     file_path = Column(String, index=True)
@@ -39,8 +43,28 @@ class ProcessingResult(Base):
     session_id = Column(String(100), index=True, nullable=True)
     device_id = Column(String(100), nullable=True)
     
-    # Relationship with metrics
+    # All metrics of the result in one column:
+    # {"numeric": {name: value}, "spectrum": {name: {"bands": [...], "values": [...]}}}
+    metrics_json = Column(JSON, nullable=True)
+    
+    # Relationship with metrics (one row per metric, results saved before metrics_json existed)
     metrics = relationship("ProcessingMetric", back_populates="result")
+    
+    def metrics_dict(self) -> Dict[str, Any]:
+        """Metrics as {name: value} with spectra as {band: value} (API layout)"""
+        if self.metrics_json is not None:
+            metrics = dict(self.metrics_json.get("numeric", {}))
+            for name, spectrum in self.metrics_json.get("spectrum", {}).items():
+                metrics[name] = dict(zip(spectrum["bands"], spectrum["values"]))
+            return metrics
+        
+        metrics = {}
+        for metric in self.metrics:
+            if metric.metric_type == "numeric":
+                metrics[metric.metric_name] = metric.metric_value
+            elif metric.metric_type == "spectrum":
+                metrics[metric.metric_name] = {data.frequency: data.value for data in metric.spectrum_data}
+        return metrics
 
 
 class ProcessingMetric(Base):
@@ -195,6 +219,172 @@ class TimeHistory(Base):
     pressure_hPa = Column(Float, nullable=True)
 
 
+class TimeHistoryRollupMixin:
+    """
+    Time history rollup columns - one row per session, device and clock-aligned period
+
+    Rows are written by the cascading MultiLevelAggregator during ingestion. Each row
+    carries energy sums (E = Σ d·10^(L/10)) and raw moment blocks (n, S1-S4), so rows of
+    a period written by several files, and rows of a lower level, can be merged exactly.
+    """
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(100))
+    device_id = Column(String(100), nullable=True)
+    period_start = Column(DateTime, index=True)   # 时段起点（UTC，与时钟对齐）
+    
+    # 时段内实际数据的时间范围
+    start_time = Column(DateTime)
+    end_time = Column(DateTime)
+    duration_s = Column(Float, default=0.0)
+    sample_count = Column(Integer, default=0)     # 包含的秒数
+    
+    # 声级（由能量和计算）及能量和
+    LAeq = Column(Float, nullable=True)
+    LCeq = Column(Float, nullable=True)
+    LZeq = Column(Float, nullable=True)
+    LAeq_energy = Column(Float, default=0.0)
+    LCeq_energy = Column(Float, default=0.0)
+    LZeq_energy = Column(Float, default=0.0)
+    
+    # 最大值
+    LAFmax = Column(Float, nullable=True)
+    LZpeak = Column(Float, nullable=True)
+    LCpeak = Column(Float, nullable=True)
+    
+    # 剂量累计
+    dose_frac_niosh = Column(Float, default=0.0)
+    dose_frac_osha_pel = Column(Float, default=0.0)
+    dose_frac_osha_hca = Column(Float, default=0.0)
+    dose_frac_eu_iso = Column(Float, default=0.0)
+    
+    # 峰度及原始矩统计量 (根据规范 4.X.6)
+    beta_kurtosis = Column(Float, nullable=True)
+    n_samples = Column(Integer, default=0)
+    sum_x = Column(Float, default=0.0)
+    sum_x2 = Column(Float, default=0.0)
+    sum_x3 = Column(Float, default=0.0)
+    sum_x4 = Column(Float, default=0.0)
+    
+    # 1/3倍频程频段：SPL、峰度、能量和及原始矩统计量 S1-S4
+    # 63Hz频段
+    freq_63hz_spl = Column(Float, nullable=True)
+    freq_63hz_kurtosis = Column(Float, nullable=True)
+    freq_63hz_energy = Column(Float, default=0.0)
+    freq_63hz_n = Column(Integer, default=0)
+    freq_63hz_s1 = Column(Float, default=0.0)
+    freq_63hz_s2 = Column(Float, default=0.0)
+    freq_63hz_s3 = Column(Float, default=0.0)
+    freq_63hz_s4 = Column(Float, default=0.0)
+    # 125Hz频段
+    freq_125hz_spl = Column(Float, nullable=True)
+    freq_125hz_kurtosis = Column(Float, nullable=True)
+    freq_125hz_energy = Column(Float, default=0.0)
+    freq_125hz_n = Column(Integer, default=0)
+    freq_125hz_s1 = Column(Float, default=0.0)
+    freq_125hz_s2 = Column(Float, default=0.0)
+    freq_125hz_s3 = Column(Float, default=0.0)
+    freq_125hz_s4 = Column(Float, default=0.0)
+    # 250Hz频段
+    freq_250hz_spl = Column(Float, nullable=True)
+    freq_250hz_kurtosis = Column(Float, nullable=True)
+    freq_250hz_energy = Column(Float, default=0.0)
+    freq_250hz_n = Column(Integer, default=0)
+    freq_250hz_s1 = Column(Float, default=0.0)
+    freq_250hz_s2 = Column(Float, default=0.0)
+    freq_250hz_s3 = Column(Float, default=0.0)
+    freq_250hz_s4 = Column(Float, default=0.0)
+    # 500Hz频段
+    freq_500hz_spl = Column(Float, nullable=True)
+    freq_500hz_kurtosis = Column(Float, nullable=True)
+    freq_500hz_energy = Column(Float, default=0.0)
+    freq_500hz_n = Column(Integer, default=0)
+    freq_500hz_s1 = Column(Float, default=0.0)
+    freq_500hz_s2 = Column(Float, default=0.0)
+    freq_500hz_s3 = Column(Float, default=0.0)
+    freq_500hz_s4 = Column(Float, default=0.0)
+    # 1kHz频段
+    freq_1khz_spl = Column(Float, nullable=True)
+    freq_1khz_kurtosis = Column(Float, nullable=True)
+    freq_1khz_energy = Column(Float, default=0.0)
+    freq_1khz_n = Column(Integer, default=0)
+    freq_1khz_s1 = Column(Float, default=0.0)
+    freq_1khz_s2 = Column(Float, default=0.0)
+    freq_1khz_s3 = Column(Float, default=0.0)
+    freq_1khz_s4 = Column(Float, default=0.0)
+    # 2kHz频段
+    freq_2khz_spl = Column(Float, nullable=True)
+    freq_2khz_kurtosis = Column(Float, nullable=True)
+    freq_2khz_energy = Column(Float, default=0.0)
+    freq_2khz_n = Column(Integer, default=0)
+    freq_2khz_s1 = Column(Float, default=0.0)
+    freq_2khz_s2 = Column(Float, default=0.0)
+    freq_2khz_s3 = Column(Float, default=0.0)
+    freq_2khz_s4 = Column(Float, default=0.0)
+    # 4kHz频段
+    freq_4khz_spl = Column(Float, nullable=True)
+    freq_4khz_kurtosis = Column(Float, nullable=True)
+    freq_4khz_energy = Column(Float, default=0.0)
+    freq_4khz_n = Column(Integer, default=0)
+    freq_4khz_s1 = Column(Float, default=0.0)
+    freq_4khz_s2 = Column(Float, default=0.0)
+    freq_4khz_s3 = Column(Float, default=0.0)
+    freq_4khz_s4 = Column(Float, default=0.0)
+    # 8kHz频段
+    freq_8khz_spl = Column(Float, nullable=True)
+    freq_8khz_kurtosis = Column(Float, nullable=True)
+    freq_8khz_energy = Column(Float, default=0.0)
+    freq_8khz_n = Column(Integer, default=0)
+    freq_8khz_s1 = Column(Float, default=0.0)
+    freq_8khz_s2 = Column(Float, default=0.0)
+    freq_8khz_s3 = Column(Float, default=0.0)
+    freq_8khz_s4 = Column(Float, default=0.0)
+    # 16kHz频段
+    freq_16khz_spl = Column(Float, nullable=True)
+    freq_16khz_kurtosis = Column(Float, nullable=True)
+    freq_16khz_energy = Column(Float, default=0.0)
+    freq_16khz_n = Column(Integer, default=0)
+    freq_16khz_s1 = Column(Float, default=0.0)
+    freq_16khz_s2 = Column(Float, default=0.0)
+    freq_16khz_s3 = Column(Float, default=0.0)
+    freq_16khz_s4 = Column(Float, default=0.0)
+    
+    # 质量控制
+    valid_flag = Column(Boolean, default=True)
+    artifact_flag = Column(Boolean, default=False)
+    overload_count = Column(Integer, default=0)
+    underrange_count = Column(Integer, default=0)
+    valid_seconds = Column(Integer, default=0)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (Index(f"ix_{cls.__tablename__}_session_period", "session_id", "period_start"),)
+
+
+class TimeHistoryRollup1Min(TimeHistoryRollupMixin, Base):
+    """1-minute time history rollup"""
+    __tablename__ = "time_history_1min"
+    level_s = 60
+
+
+class TimeHistoryRollup15Min(TimeHistoryRollupMixin, Base):
+    """15-minute time history rollup"""
+    __tablename__ = "time_history_15min"
+    level_s = 900
+
+
+class TimeHistoryRollup1Hour(TimeHistoryRollupMixin, Base):
+    """1-hour time history rollup"""
+    __tablename__ = "time_history_1h"
+    level_s = 3600
+
+
+# 时段长度（秒） -> 汇总表
+ROLLUP_MODELS = {
+    model.level_s: model
+    for model in (TimeHistoryRollup1Min, TimeHistoryRollup15Min, TimeHistoryRollup1Hour)
+}
+
+
 class EventLog(Base):
     """Event log model - stores impulsive noise events"""
     __tablename__ = "event_log"
@@ -229,6 +419,47 @@ class EventLog(Base):
     notes = Column(Text, nullable=True)
 
 
+class IngestionQueue(Base):
+    """Ingestion queue model - durable queue of detected files waiting to be processed"""
+    __tablename__ = "ingestion_queue"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    file_path = Column(String(500), index=True)
+    status = Column(String(20), index=True, default="pending")  # 'pending', 'processing', 'failed'
+    attempts = Column(Integer, default=0)
+    enqueued_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)
+
+
+class IngestionLedger(Base):
+    """Ingestion ledger model - one row per ingested file, used to skip files already processed"""
+    __tablename__ = "ingestion_ledger"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    file_path = Column(String(500), index=True, unique=True)
+    
+    # File identity at ingestion time
+    file_size = Column(Integer)
+    file_mtime = Column(Float)  # st_mtime (s)
+    fingerprint = Column(String(64), index=True, nullable=True)  # BLAKE2b of size + head + tail (change hint, not an identity)
+    content_hash = Column(String(64), index=True, nullable=True)  # BLAKE2b of the whole file, set once processed
+    
+    # Status
+    status = Column(String(20), index=True)  # 'queued', 'processing', 'done', 'failed'
+    session_id = Column(String(100), nullable=True)
+    error = Column(Text, nullable=True)
+    
+    # Timings and throughput
+    queued_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    audio_duration_s = Column(Float, nullable=True)
+    processing_s = Column(Float, nullable=True)
+    realtime_factor = Column(Float, nullable=True)  # audio seconds per processing second
+    mb_per_s = Column(Float, nullable=True)
+
+
 class SessionSummary(Base):
     """Session summary model - stores aggregated data per session"""
     __tablename__ = "session_summary"
@@ -0,0 +1,123 @@
+"""
+Write-behind buffer for high-rate inserts (per-second time history)
+
+Rows are collected in memory and inserted in one transaction with a single
+executemany when ``max_rows`` rows are pending or ``max_delay_ms`` after the
+first pending row, whichever comes first. Call ``flush()`` at the end of a
+file / session so the rows are visible to readers immediately.
+
+A batch that fails to insert (e.g. the writer pool timed out or the database
+was locked) is put back at the head of the buffer and retried by the next
+flush; nothing is dropped. Failures of timer and size-triggered flushes are
+kept in ``last_error`` and retried ``max_delay_ms`` later, so ``append()``
+never raises into the caller; an explicit ``flush()`` that still fails raises.
+"""
+import threading
+from itertools import groupby
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Table
+from sqlalchemy.engine import Engine
+
+from app.utils import logger
+
+
+class WriteBehindBuffer:
+    """Buffered Core bulk insert into one table"""
+
+    def __init__(self, engine: Engine, table: Table,
+                 max_rows: int = 500, max_delay_ms: float = 1000.0):
+        """
+        Args:
+            engine: SQLAlchemy engine
+            table: Target table (e.g. ``TimeHistory.__table__``)
+            max_rows: Flush when this many rows are pending
+            max_delay_ms: Flush at most this long after the first pending row
+        """
+        self.engine = engine
+        self.table = table
+        self.max_rows = max(1, int(max_rows))
+        self.max_delay_ms = max_delay_ms
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # Serializes flushes so rows are inserted in append order
+        self._flush_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self.rows_written = 0
+        self.flushes = 0
+        self.last_error: Optional[BaseException] = None
+
+    @property
+    def pending(self) -> int:
+        """Number of rows not written yet"""
+        with self._lock:
+            return len(self._rows)
+
+    def append(self, row: Dict[str, Any]):
+        """Queue one row (column name -> value)"""
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+            if not full:
+                self._arm_timer()
+        if full:
+            self._flush_or_retry()
+
+    def _arm_timer(self):
+        """Start the delayed flush unless one is pending (caller holds ``_lock``)"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_delay_ms / 1000.0, self._flush_on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_or_retry(self):
+        try:
+            self.flush()
+        except Exception:
+            # Already logged by flush(); the batch is back in the buffer, retry later
+            with self._lock:
+                if self._rows:
+                    self._arm_timer()
+
+    def _flush_on_timer(self):
+        self._flush_or_retry()
+
+    def flush(self) -> int:
+        """
+        Write all pending rows in one transaction
+
+        Returns:
+            int: Number of rows written
+
+        Raises:
+            Exception: The insert failed; the rows stay buffered for the next flush
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not rows:
+                return 0
+
+            try:
+                with self.engine.begin() as conn:
+                    # executemany needs the same columns in every row
+                    for _, group in groupby(rows, key=lambda row: tuple(row)):
+                        conn.execute(self.table.insert(), list(group))
+            except Exception as e:
+                logger.error(f"Error writing {len(rows)} rows to {self.table.name}, will retry: {e}")
+                with self._lock:
+                    self._rows[:0] = rows
+                self.last_error = e
+                raise
+
+            self.last_error = None
+            self.rows_written += len(rows)
+            self.flushes += 1
+            return len(rows)
+
+    def close(self):
+        """Flush pending rows and stop the timer"""
+        self.flush()
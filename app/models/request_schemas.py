@@ -34,6 +34,12 @@ class MetricsRequest(BaseModel):
     """
     microphone_channel: str = "CH1"
     start_time: Union[str, None] = None
+    # 分页：从 cursor（上次返回的 next_cursor 或结果的 cursor）之后最多返回 limit 条，
+    # limit 为空时流式返回，单次最多 ALL_METRICS_MAX_LIMIT 条（见 main.py）
+    limit: Union[int, None] = None
+    cursor: Union[str, None] = None
+    # 返回格式："json" 或 "ndjson"（每行一条结果，流式返回）
+    format: str = "json"
 
 
 class MetricsResponse(BaseModel):
@@ -42,4 +48,5 @@ class MetricsResponse(BaseModel):
     """
     code: int
     message: str
-    data: Union[List[dict],Dict[str, Any]]
\ No newline at end of file
+    data: Union[List[dict],Dict[str, Any]]
+    next_cursor: Union[str, None] = None
\ No newline at end of file
@@ -1,16 +1,18 @@
 import json
 import asyncio
+import itertools
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any
 from sqlalchemy import and_
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
 
 from app.models import WatchDirectoryRequest, WatchDirectoryResponse, MetricsRequest, MetricsResponse
 from app.core import AudioProcessingTaskManager
-from app.database import DatabaseManager, ProcessingResult
+from app.database import DatabaseManager, ProcessingResult, ROLLUP_MODELS, parse_time_resolution
 from app.utils import logger
 
 
@@ -30,6 +32,9 @@ def convert_to_serializable(obj):
     return obj
 
 
+# /all_metrics 单次请求最多返回的结果数：不指定 limit 或超过时按此返回，其余结果通过 next_cursor 继续获取
+ALL_METRICS_MAX_LIMIT = 1000
+
 # Global variables for background tasks
 task_manager = None
 current_watch_directory = "./audio_files"  # 默认目录
@@ -131,19 +136,8 @@ async def get_latest_metrics(request_channel: MetricsRequest):
                 "id": latest_result.id,
                 "file_path": latest_result.file_path,
                 "timestamp": latest_result.timestamp.isoformat(),
-                "metrics": {}
+                "metrics": latest_result.metrics_dict()
             }
-
-            # Add metrics to result
-            for metric in latest_result.metrics:
-                if metric.metric_type == "numeric":
-                    result_dict["metrics"][metric.metric_name] = metric.metric_value
-                elif metric.metric_type == "spectrum":
-                    # Reconstruct spectrum data
-                    spectrum_data = {}
-                    for data_point in metric.spectrum_data:
-                        spectrum_data[data_point.frequency] = data_point.value
-                    result_dict["metrics"][metric.metric_name] = spectrum_data
             return MetricsResponse(code=200, data=result_dict, message="成功获取最新处理结果")
     except Exception as e:
         return MetricsResponse(code=500, data={}, message=f"获取最新处理结果失败: {str(e)}")
@@ -153,52 +147,86 @@ async def get_latest_metrics(request_channel: MetricsRequest):
 
 @app.post("/all_metrics", response_model=MetricsResponse)
 async def get_all_metrics(request_channel: MetricsRequest):
-    """获取所有处理结果"""
-    db = next(db_manager.get_db())
+    """
+    获取所有处理结果（按时间升序）
+
+    - 指定 limit 时分页返回，next_cursor 为下一页的 cursor（没有更多结果时为空）
+    - 不指定 limit 时流式返回 JSON（字段与分页前一致），code / message / next_cursor 在 data 之后；
+      读取中途出错时 code 为 500，next_cursor 为最后一条已返回结果的 cursor
+    - format="ndjson" 时每行一条结果，每条结果包含可用于续传的 cursor；达到单次上限时末行为
+      {"next_cursor": ...}，读取中途出错时末行为 {"error": ..., "next_cursor": ...}
+    - 单次最多返回 ALL_METRICS_MAX_LIMIT 条（limit 为空或更大时同样适用）
+    """
     try:
-        # 构建查询条件
-        query_conditions = [
-            ProcessingResult.file_name.startswith(request_channel.microphone_channel)
-        ]
-        
-        # 如果提供了开始时间，则添加时间过滤条件
+        start_time = None
         if request_channel.start_time:
-            query_conditions.append(
-                ProcessingResult.timestamp >= request_channel.start_time
-            )
-            
-        results = db.query(ProcessingResult).where(
-            and_(*query_conditions)
-        ).order_by(
-            ProcessingResult.timestamp.asc()
-        ).all()
-
-        results_list = []
-        for result in results:
-            result_dict = {
-                "id": result.id,
-                "file_path": result.file_path,
-                "timestamp": result.timestamp.isoformat(),
-                "metrics": {}
-            }
+            start_time = datetime.fromisoformat(request_channel.start_time)
+        if request_channel.cursor:
+            db_manager.decode_result_cursor(request_channel.cursor)
+    except ValueError as e:
+        return MetricsResponse(code=400, data=[], message=f"无效的 start_time 或 cursor: {e}")
+    if request_channel.format not in ("json", "ndjson"):
+        return MetricsResponse(code=400, data=[], message=f"无效的格式: {request_channel.format}")
+
+    limit = ALL_METRICS_MAX_LIMIT
+    if request_channel.limit is not None:
+        limit = min(request_channel.limit, ALL_METRICS_MAX_LIMIT)
+    results = db_manager.iter_processing_results(
+        file_name_prefix=request_channel.microphone_channel,
+        start_time=start_time,
+        cursor=request_channel.cursor,
+        limit=limit
+    )
+
+    if request_channel.limit is not None and request_channel.format == "json":
+        try:
+            page = list(results)
+        except Exception as e:
+            return MetricsResponse(code=500, data=[], message=f"获取所有处理结果失败:{e}")
+        next_cursor = page[-1]["cursor"] if page and len(page) == limit else None
+        return MetricsResponse(code=200, data=page, message="成功获取处理结果", next_cursor=next_cursor)
 
-            # Add metrics to result
-            for metric in result.metrics:
-                if metric.metric_type == "numeric":
-                    result_dict["metrics"][metric.metric_name] = metric.metric_value
-                elif metric.metric_type == "spectrum":
-                    # Reconstruct spectrum data
-                    spectrum_data = {}
-                    for data_point in metric.spectrum_data:
-                        spectrum_data[data_point.frequency] = data_point.value
-                    result_dict["metrics"][metric.metric_name] = spectrum_data
-
-            results_list.append(result_dict)
-        return MetricsResponse(code=200, data=results_list, message="成功获取所有处理结果")
+    # 流式返回前先读取第一批：查询失败时在开始发送响应之前返回错误
+    try:
+        first = next(results, None)
     except Exception as e:
         return MetricsResponse(code=500, data=[], message=f"获取所有处理结果失败:{e}")
-    finally:
-        db.close()
+    results = itertools.chain([first], results) if first is not None else iter(())
+    state = {"count": 0, "cursor": request_channel.cursor, "error": None}
+
+    def stream_results():
+        """逐条产生结果，记录已返回的条数及最后一条的 cursor；中途出错时记录错误并结束"""
+        try:
+            for result in results:
+                yield result
+                state["count"] += 1
+                state["cursor"] = result["cursor"]
+        except Exception as e:
+            logger.error(f"Error streaming processing results: {e}")
+            state["error"] = f"获取所有处理结果失败:{e}"
+
+    def next_cursor():
+        return state["cursor"] if state["error"] or state["count"] == limit else None
+
+    if request_channel.format == "ndjson":
+        def ndjson_lines():
+            for result in stream_results():
+                yield json.dumps(convert_to_serializable(result), ensure_ascii=False) + "\n"
+            if state["error"]:
+                yield json.dumps({"error": state["error"], "next_cursor": next_cursor()}, ensure_ascii=False) + "\n"
+            elif next_cursor():
+                yield json.dumps({"next_cursor": next_cursor()}) + "\n"
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    def json_chunks():
+        yield '{"data": ['
+        for index, result in enumerate(stream_results()):
+            yield ("," if index else "") + json.dumps(convert_to_serializable(result), ensure_ascii=False)
+        # 响应已开始发送：结果之后再给出 code / message，客户端据此判断结果是否完整
+        status = {"code": 500, "message": state["error"]} if state["error"] else \
+            {"code": 200, "message": "成功获取所有处理结果"}
+        yield "], " + json.dumps({**status, "next_cursor": next_cursor()}, ensure_ascii=False)[1:]
+    return StreamingResponse(json_chunks(), media_type="application/json")
 
 
 @app.get("/status")
@@ -351,25 +379,37 @@ async def get_time_history(
     session_id: str,
     start_time: Optional[str] = None,
     end_time: Optional[str] = None,
-    limit: int = 10000
+    limit: int = 10000,
+    resolution: Optional[str] = None
 ):
-    """获取指定会话的时间历程数据"""
+    """
+    获取指定会话的时间历程数据
+
+    resolution 为降采样分辨率（如 10s、1min、5min 或秒数），指定时在数据库中按时间段汇聚：
+    声级能量平均、峰值取最大、剂量求和、S1-S4 合成峰度
+    """
     try:
         # Parse time strings if provided
         start_dt = dt.fromisoformat(start_time) if start_time else None
         end_dt = dt.fromisoformat(end_time) if end_time else None
-        
+        resolution_s = parse_time_resolution(resolution) if resolution else None
+    except ValueError as e:
+        return SessionResponse(code=400, message=f"参数无效: {str(e)}")
+
+    try:
         records = db_manager.get_time_history(
             session_id=session_id,
             start_time=start_dt,
             end_time=end_dt,
-            limit=limit
+            limit=limit,
+            resolution_s=resolution_s
         )
         
         return SessionResponse(
             code=200,
             data={
                 "session_id": session_id,
+                "resolution_s": resolution_s or 1,
                 "record_count": len(records),
                 "records": records
             },
@@ -395,6 +435,43 @@ async def get_time_history_summary(session_id: str):
         return SessionResponse(code=500, message=f"获取时间历程汇总失败: {str(e)}")
 
 
+@app.get("/rollups", response_model=SessionResponse)
+async def get_rollups(
+    level: str = "1h",
+    session_id: Optional[str] = None,
+    device_id: Optional[str] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    limit: int = 10000
+):
+    """
+    获取时间历程汇总记录（1min / 15min / 1h），可跨会话按时间范围查询，用于仪表盘及长期报告
+
+    每条记录包含能量和及 S1-S4，可在客户端继续合并
+    """
+    try:
+        level_s = parse_time_resolution(level)
+        if level_s not in ROLLUP_MODELS:
+            raise ValueError(f"Rollup level must be one of 1min, 15min, 1h: {level!r}")
+        start_dt = dt.fromisoformat(start_time) if start_time else None
+        end_dt = dt.fromisoformat(end_time) if end_time else None
+    except ValueError as e:
+        return SessionResponse(code=400, message=f"参数无效: {str(e)}")
+
+    try:
+        rollups = db_manager.get_rollups(
+            level_s, session_id=session_id, device_id=device_id,
+            start_time=start_dt, end_time=end_dt, limit=limit)
+        return SessionResponse(
+            code=200,
+            data={"level_s": level_s, "record_count": len(rollups), "records": rollups},
+            message="获取汇总记录成功"
+        )
+    except Exception as e:
+        logger.error(f"Error getting rollups: {e}")
+        return SessionResponse(code=500, message=f"获取汇总记录失败: {str(e)}")
+
+
 # ==================== Dose Profile APIs ====================
 
 @app.get("/dose_profiles", response_model=SessionResponse)
@@ -481,3 +558,26 @@ async def get_all_events(
     except Exception as e:
         logger.error(f"Error getting all events: {e}")
         return SessionResponse(code=500, message=f"获取事件列表失败: {str(e)}")
+
+
+@app.get("/ingestion/ledger", response_model=SessionResponse)
+async def get_ingestion_ledger(
+    status: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0
+):
+    """获取文件入库记录及处理吞吐量统计"""
+    try:
+        entries = db_manager.list_ledger_entries(status=status, limit=limit, offset=offset)
+        
+        return SessionResponse(
+            code=200,
+            data={
+                "summary": db_manager.get_ledger_summary(),
+                "entries": entries
+            },
+            message="获取入库记录成功"
+        )
+    except Exception as e:
+        logger.error(f"Error getting ingestion ledger: {e}")
+        return SessionResponse(code=500, message=f"获取入库记录失败: {str(e)}")
@@ -257,11 +257,15 @@ def fetch_session_list(backend_url: str, limit: int = 50) -> list:
         return []
 
 
-def fetch_session_time_history(backend_url: str, session_id: str, limit: int = 10000) -> list:
-    """Fetch time history data for a session"""
+def fetch_session_time_history(backend_url: str, session_id: str, limit: int = 10000,
+                               resolution: str = None) -> list:
+    """Fetch time history data for a session (resolution e.g. "1min": aggregated on the server)"""
     try:
         url = f"{backend_url}/session/{session_id}/time_history"
-        response = requests.get(url, params={"limit": limit}, timeout=10)
+        params = {"limit": limit}
+        if resolution:
+            params["resolution"] = resolution
+        response = requests.get(url, params=params, timeout=10)
         if response.status_code == 200:
             result = response.json()
             return result.get("data", {}).get("records", [])
@@ -843,8 +847,17 @@ def render_sessions_tab(backend_url: str):
             format_func=lambda x: x[:16] + "..." if len(x) > 16 else x
         )
         
+        resolution_labels = {"1s": "每秒", "10s": "每10秒", "1min": "每分钟", "5min": "每5分钟"}
+        resolution = st.selectbox(
+            "时间分辨率 (服务器端汇聚):",
+            options=list(resolution_labels),
+            index=2,
+            format_func=lambda x: resolution_labels[x]
+        )
+        
         if selected_full_id:
-            th_data = fetch_session_time_history(backend_url, selected_full_id, limit=10000)
+            th_data = fetch_session_time_history(backend_url, selected_full_id, limit=10000,
+                                                 resolution=resolution)
             if th_data:
                 th_detail_df = pd.DataFrame(th_data)
                 th_detail_df['timestamp'] = pd.to_datetime(th_detail_df['timestamp'])
@@ -870,7 +883,7 @@ def render_sessions_tab(backend_url: str):
                     th_detail_df,
                     x="timestamp",
                     y=["LAeq_dB", "LCeq_dB"],
-                    title="声级时间历程 (每秒)",
+                    title=f"声级时间历程 ({resolution_labels[resolution]})",
                     labels={"timestamp": "时间", "value": "声级 (dB)", "variable": "指标"}
                 )
                 st.plotly_chart(fig_th, use_container_width=True)
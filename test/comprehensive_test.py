@@ -83,7 +83,7 @@ def test_task_manager():
     db_manager = DatabaseManager()
     
     # Create task manager
-    task_manager = AudioProcessingTaskManager("./test_audio_files", db_manager)
+    task_manager = AudioProcessingTaskManager("./test_audio_files", db_manager=db_manager)
     
     print(f"Task manager created with watch directory: {task_manager.watch_directory}")
     print(f"Audio monitor extensions: {task_manager.audio_monitor.file_extensions}")
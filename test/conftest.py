@@ -0,0 +1,12 @@
+"""
+pytest 公共配置：测试期间不使用 ./Database 下的正式数据库
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import database
+
+# 未指定 database_url 的 DatabaseManager()（包括 import main 时创建的全局实例）写入临时目录
+database.DEFAULT_DATABASE_DIR = tempfile.mkdtemp(prefix="noise_toolkit_test_db_")
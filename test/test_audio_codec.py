@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+事件音频编码器单元测试
+"""
+
+import os
+import numpy as np
+import pytest
+import soundfile as sf
+
+from app.core.audio_codec import AudioCodec, EncodeBudget, get_audio_codec
+from app.core.ring_buffer import write_event_audio_file
+
+
+class TestAudioCodec:
+    """测试编码器"""
+
+    @pytest.mark.parametrize("name,extension,subtype", [
+        ("wav", ".wav", "PCM_16"),
+        ("wav_pcm24", ".wav", "PCM_24"),
+        ("flac", ".flac", "PCM_24"),
+    ])
+    def test_write_event_audio(self, tmp_path, name, extension, subtype):
+        """测试按编码器写入事件音频"""
+        sr = 8000
+        audio = (np.sin(2 * np.pi * 440 * np.arange(sr) / sr) * 0.5).astype(np.float32)
+
+        path = write_event_audio_file("EVT-CODEC", audio, sr, str(tmp_path), codec=name)
+        assert path.endswith(extension)
+
+        info = sf.info(path)
+        assert info.subtype == subtype
+        assert info.frames == sr
+
+        decoded, _ = sf.read(path, dtype='float32')
+        # 24-bit 量化误差约 1e-7，16-bit 约 3e-5
+        tolerance = 1e-4 if subtype == "PCM_16" else 1e-6
+        assert np.max(np.abs(decoded - audio)) < tolerance
+
+    def test_flac_smaller_than_wav(self, tmp_path):
+        """测试 FLAC 体积小于同位深 WAV"""
+        sr = 48000
+        audio = (np.random.randn(sr) * 0.01).astype(np.float32)
+        wav = write_event_audio_file("EVT-WAV", audio, sr, str(tmp_path), codec="wav_pcm24")
+        flac = write_event_audio_file("EVT-FLAC", audio, sr, str(tmp_path), codec="flac")
+        assert os.path.getsize(flac) < os.path.getsize(wav)
+
+    def test_unknown_codec(self):
+        """测试未注册的编码器"""
+        with pytest.raises(ValueError):
+            get_audio_codec("mp3")
+        codec = AudioCodec("custom", "WAV", "PCM_16", ".wav")
+        assert get_audio_codec(codec) is codec
+
+
+class TestEncodeBudget:
+    """测试编码耗时预算"""
+
+    def test_fallback_and_probe(self):
+        """测试超出预算后切换备用编码器，并在 probe_interval 段后重新尝试"""
+        budget = EncodeBudget("flac", "wav_pcm24", budget_ms=10, probe_interval=2)
+        flac, wav = get_audio_codec("flac"), get_audio_codec("wav_pcm24")
+
+        assert budget.select() is flac
+        budget.record(flac, 0.005)
+        assert budget.select() is flac
+        budget.record(flac, 0.050)
+
+        assert budget.select() is wav
+        budget.record(wav, 0.001)
+        assert budget.select() is wav
+        budget.record(wav, 0.001)
+        assert budget.select() is flac
+
+        stats = budget.get_stats()
+        assert stats['over_budget'] == 1
+        assert stats['encoded'] == {'flac': 2, 'wav_pcm24': 2}
+
+    def test_no_budget(self):
+        """测试未设置预算时始终使用主编码器"""
+        budget = EncodeBudget("flac")
+        budget.record(budget.select(), 10.0)
+        assert budget.select().name == "flac"
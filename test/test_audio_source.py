@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+流式音频数据源单元测试
+"""
+
+import pytest
+import numpy as np
+import soundfile as sf
+import librosa
+from datetime import datetime
+from nptdms import TdmsWriter, ChannelObject
+from acoustics import Signal
+
+from app.core.audio_source import (
+    AudioSource,
+    ArraySource,
+    SoundFileSource,
+    TdmsSource,
+    TdmsGroupSource,
+    audio_duration,
+    open_audio_source
+)
+from app.core.event_processor import BatchEventProcessor
+from app.core.time_history_processor import (
+    TimeHistoryProcessor,
+    SECOND_METRICS_FIELDS,
+    plan_time_shards
+)
+
+
+class TestAudioSource:
+    """测试音频数据源"""
+
+    def test_soundfile_blocks_match_librosa(self, tmp_path):
+        """测试 WAV/FLAC 分块读取结果与 librosa.load 一致"""
+        sr = 8000
+        x = (np.random.randn(2 * sr + 123) * 0.1).astype(np.float32)
+        for name, subtype in (("a.wav", "FLOAT"), ("a.flac", "PCM_24")):
+            path = str(tmp_path / name)
+            sf.write(path, x, sr, subtype=subtype)
+            expected, _ = librosa.load(path, sr=None)
+
+            with open_audio_source(path) as source:
+                assert isinstance(source, SoundFileSource)
+                assert source.sample_rate == sr
+                assert source.n_samples == len(x)
+                blocks = list(source.blocks())
+            assert [len(b) for b in blocks] == [sr, sr, 123]
+            assert np.array_equal(np.concatenate(blocks), expected)
+
+    def test_stereo_downmix(self, tmp_path):
+        """测试多声道取平均混为单声道"""
+        sr = 8000
+        x = (np.random.randn(sr, 2) * 0.1).astype(np.float32)
+        path = str(tmp_path / "stereo.wav")
+        sf.write(path, x, sr, subtype="FLOAT")
+
+        expected, _ = librosa.load(path, sr=None)
+        with open_audio_source(path) as source:
+            assert np.allclose(source.read_all(), expected, atol=1e-7)
+
+    def test_tdms_source(self, tmp_path):
+        """测试 TDMS 文件按扩展名使用 TdmsSource"""
+        path = str(tmp_path / "a.tdms")
+        data = np.random.randn(1500).astype(np.float32)
+        with TdmsWriter(path) as writer:
+            writer.write_segment([ChannelObject("Group", "CH1", data, properties={"SampleRate": 1000})])
+
+        with open_audio_source(path) as source:
+            assert isinstance(source, TdmsSource)
+            assert source.duration == 1.5
+            assert np.array_equal(source.read_all(), data)
+
+    def test_audio_duration(self, tmp_path):
+        """测试只读取文件头得到音频时长"""
+        wav_path = str(tmp_path / "a.wav")
+        sf.write(wav_path, np.zeros(2500, dtype=np.float32), 1000, subtype="FLOAT")
+        tdms_path = str(tmp_path / "a.tdms")
+        with TdmsWriter(tdms_path) as writer:
+            writer.write_segment([ChannelObject("Group", name, np.zeros(n), properties={"SampleRate": 1000})
+                                  for name, n in (("CH1", 1500), ("CH2", 1800))])
+
+        assert audio_duration(wav_path) == 2.5
+        assert audio_duration(tdms_path) == 1.8
+
+    def test_array_source(self):
+        """测试内存数组分块"""
+        source = ArraySource(np.arange(10), 4)
+        assert [list(b) for b in source.blocks()] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+    def test_base_class_is_abstract(self):
+        """测试未实现 blocks() 的数据源不能实例化"""
+        with pytest.raises(TypeError):
+            AudioSource()
+
+        class EmptySource(AudioSource):
+            pass
+
+        with pytest.raises(TypeError):
+            EmptySource()
+
+    def test_blocks_from_offset(self, tmp_path):
+        """测试各数据源从指定样本位置开始分块读取"""
+        data = (np.random.randn(2500) * 0.1).astype(np.float32)
+        wav_path = str(tmp_path / "offset.wav")
+        sf.write(wav_path, data, 1000, subtype="FLOAT")
+        tdms_path = str(tmp_path / "offset.tdms")
+        with TdmsWriter(tdms_path) as writer:
+            for part in np.array_split(data, 3):
+                writer.write_segment([
+                    ChannelObject("Group", name, part, properties={"SampleRate": 1000})
+                    for name in ("CH1", "CH2")
+                ])
+
+        sources = [ArraySource(data, 1000), SoundFileSource(wav_path),
+                   TdmsSource(tdms_path), TdmsGroupSource(tdms_path)]
+        for source in sources:
+            with source:
+                blocks = list(source.blocks(start=1300))
+            assert [len(b) for b in blocks] == [1000, 200]
+            assert np.array_equal(np.concatenate(blocks), data[1300:])
+
+
+class TestStreamedFileProcessing:
+    """测试按数据块处理文件"""
+
+    def test_process_wav_file_streams(self, tmp_path):
+        """测试流式处理文件与整段信号处理结果一致"""
+        sr = 48000
+        x = (np.random.randn(3 * sr + 500) * 0.1).astype(np.float32)
+        path = str(tmp_path / "th.wav")
+        sf.write(path, x, sr, subtype="FLOAT")
+        start = datetime(2026, 1, 1)
+
+        processor = TimeHistoryProcessor()
+        expected = processor.process_signal_per_second(Signal(x, sr), start)
+        assert processor.process_wav_file(path, start) == expected
+
+        frame = processor.process_wav_file_batch(path, start, chunk_seconds=2)
+        assert list(frame['LAeq']) == [m.LAeq for m in expected]
+
+    def test_batch_event_processor_file(self, tmp_path):
+        """测试批量事件处理器按数据块读取文件"""
+        sr = 48000
+        x = np.zeros(3 * sr, dtype=np.float32)
+        x[sr + 100:sr + 200] = 0.9
+        path = str(tmp_path / "events.wav")
+        sf.write(path, x, sr, subtype="FLOAT")
+
+        processor = BatchEventProcessor(leq_threshold=60.0, peak_threshold=80.0)
+        events = processor.process_file(path, session_id="stream")
+        assert len(events) == 1
+        assert events[0].session_id == "stream"
+
+
+class TestShardedProcessing:
+    """测试长文件分片并行处理"""
+
+    def test_plan_time_shards(self):
+        """测试分片覆盖整个文件且第一个分片不预热"""
+        shards = plan_time_shards(10, 3, warmup_seconds=2.0)
+        assert [(s.start_second, s.n_seconds) for s in shards] == [(0, 3), (3, 4), (7, 3)]
+        assert [s.warmup_seconds for s in shards] == [0.0, 2.0, 2.0]
+        assert len(plan_time_shards(2, 8)) == 2
+        assert plan_time_shards(0, 4) == []
+
+    def test_sharded_matches_serial(self, tmp_path):
+        """测试分片并行处理与串行处理结果一致"""
+        sr = 48000
+        t = np.arange(12 * sr + 700) / sr
+        x = (np.random.randn(len(t)) * 0.1 + 0.3 * np.sin(2 * np.pi * 50 * t)).astype(np.float32)
+        path = str(tmp_path / "long.wav")
+        sf.write(path, x, sr, subtype="FLOAT")
+        start = datetime(2026, 1, 1)
+
+        processor = TimeHistoryProcessor()
+        serial = processor.process_wav_file_batch(path, start)
+        sharded = processor.process_wav_file_sharded(path, start, n_shards=3, max_workers=2)
+
+        assert len(sharded) == len(serial) == 13
+        assert list(sharded['timestamp']) == list(serial['timestamp'])
+        for name in SECOND_METRICS_FIELDS:
+            if name == 'timestamp':
+                continue
+            expected = serial[name].to_numpy(dtype=np.float64)
+            actual = sharded[name].to_numpy(dtype=np.float64)
+            # S1/S3 接近零，按同列最大值确定容差
+            scale = np.nanmax(np.abs(expected)) if np.any(np.isfinite(expected)) else 1.0
+            assert np.allclose(actual, expected, rtol=1e-9, atol=1e-7 * scale, equal_nan=True), name
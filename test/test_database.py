@@ -6,8 +6,16 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database.database import DatabaseManager
+from app.database.models import ProcessingMetric, ProcessingResult, SpectrumData, TimeHistory
 from datetime import datetime, timedelta
+import asyncio
 import json
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy.exc import OperationalError
 
 def test_database():
     """Test database functionality"""
@@ -69,5 +77,522 @@ def test_database():
     
     print("Database test completed successfully!")
 
+def _append_seconds(db_manager, n, start=datetime(2026, 1, 1)):
+    for i in range(n):
+        db_manager.append_time_history(
+            session_id="S1", timestamp_utc=start + timedelta(seconds=i),
+            laeq=80.0 + i, lceq=82.0, lzpeak=100.0, lcpeak=98.0,
+            dose_fracs={"NIOSH": 0.001}, wearing_state=True)
+
+
+class TestTimeHistoryWriteBuffer:
+    """测试时间历程写缓冲（批量写入）"""
+
+    def test_flush_by_rows_and_explicit(self, tmp_path):
+        """测试缓冲满时批量写入，剩余记录显式写入"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'th.db'}",
+                                     time_history_batch_size=4, time_history_flush_ms=60000)
+        _append_seconds(db_manager, 10)
+        buffer = db_manager.time_history_buffer
+        assert (buffer.flushes, buffer.pending) == (2, 2)
+        assert len(db_manager.get_time_history("S1")) == 8
+
+        assert db_manager.flush_time_history() == 2
+        rows = db_manager.get_time_history("S1")
+        assert [r['LAeq_dB'] for r in rows] == [80.0 + i for i in range(10)]
+        assert rows[0]['dose_frac_niosh'] == 0.001
+        assert db_manager.flush_time_history() == 0
+
+    def test_flush_after_delay(self, tmp_path):
+        """测试未满的缓冲在 time_history_flush_ms 后写入"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'th.db'}",
+                                     time_history_batch_size=1000, time_history_flush_ms=50)
+        _append_seconds(db_manager, 3)
+        deadline = time.monotonic() + 5
+        while db_manager.time_history_buffer.pending and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert len(db_manager.get_time_history("S1")) == 3
+
+    def test_failed_batch_kept_for_retry(self, tmp_path):
+        """测试写入失败（写连接被占用超时）的记录保留在缓冲中，下次写入时重试"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'th.db'}", busy_timeout_ms=100,
+                                     time_history_batch_size=1000, time_history_flush_ms=20)
+        buffer = db_manager.time_history_buffer
+        with db_manager.engine.connect():
+            _append_seconds(db_manager, 3)
+            deadline = time.monotonic() + 5
+            while buffer.last_error is None and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert buffer.last_error is not None
+            assert buffer.pending == 3
+            with pytest.raises(Exception):
+                db_manager.flush_time_history()
+            assert buffer.pending == 3
+
+        _append_seconds(db_manager, 2, start=datetime(2026, 1, 1, 0, 0, 3))
+        db_manager.flush_time_history()
+        assert buffer.pending == 0 and buffer.last_error is None
+        assert [r['LAeq_dB'] for r in db_manager.get_time_history("S1")] == [80.0, 81.0, 82.0, 80.0, 81.0]
+
+
+    def test_failed_size_flush_does_not_raise(self, tmp_path):
+        """测试缓冲满时写入失败不抛给 append() 的调用方，并由定时器重试"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'th.db'}", busy_timeout_ms=100,
+                                     time_history_batch_size=2, time_history_flush_ms=50)
+        buffer = db_manager.time_history_buffer
+        with db_manager.engine.connect():
+            _append_seconds(db_manager, 3)
+            assert buffer.last_error is not None
+            assert buffer.pending == 3
+
+        deadline = time.monotonic() + 5
+        while buffer.pending and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert buffer.pending == 0 and buffer.last_error is None
+        assert [r['LAeq_dB'] for r in db_manager.get_time_history("S1")] == [80.0, 81.0, 82.0]
+
+
+class TestSqliteStorageMode:
+    """测试 SQLite WAL 模式及读写连接分离"""
+
+    def test_wal_and_read_only_pool(self, tmp_path):
+        """测试写连接为 WAL 模式，读连接池只读"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'wal.db'}")
+        with db_manager.engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        with db_manager.read_engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.exec_driver_sql("DELETE FROM time_history")
+        db_manager.dispose()
+
+    def test_open_reader_does_not_block_writer(self, tmp_path):
+        """测试读事务未结束时写入不被阻塞，读事务看到的是开始时的快照"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'wal.db'}", busy_timeout_ms=500)
+        _append_seconds(db_manager, 1)
+        db_manager.flush_time_history()
+
+        with db_manager.read_engine.connect() as reader:
+            reader.exec_driver_sql("BEGIN")
+            count = "SELECT COUNT(*) FROM time_history"
+            assert reader.exec_driver_sql(count).scalar() == 1
+
+            _append_seconds(db_manager, 3, start=datetime(2026, 1, 2))
+            assert db_manager.flush_time_history() == 3
+            assert reader.exec_driver_sql(count).scalar() == 1
+            reader.exec_driver_sql("COMMIT")
+            assert reader.exec_driver_sql(count).scalar() == 4
+        db_manager.dispose()
+
+
+class TestPackedProcessingResult:
+    """测试处理结果保存为单行（metrics_json）"""
+
+    METRICS = {
+        "laeq": 63.8,
+        "peak_spl": np.array([78.5]),
+        "total_kurtosis": None,
+        "frequency_spl": {"frequency_bands": {"63": 55.2, "16000": None}},
+    }
+
+    def test_one_row_and_api_layout(self, tmp_path):
+        """测试一次保存为一行，读取时恢复为原有的指标字典格式"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'results.db'}")
+        result_id = db_manager.save_processing_result("a/b.tdms", self.METRICS, session_id="S1")
+
+        db = db_manager.ReadSessionLocal()
+        try:
+            assert db.query(ProcessingMetric).count() == 0
+            assert db.query(SpectrumData).count() == 0
+            packed = db.get(ProcessingResult, result_id).metrics_json
+        finally:
+            db.close()
+        assert packed["spectrum"]["frequency_spl"] == {"bands": ["63", "16000"], "values": [55.2, None]}
+
+        latest = db_manager.get_latest_result()
+        assert latest["metrics"] == {
+            "laeq": 63.8, "peak_spl": 78.5, "total_kurtosis": None,
+            "frequency_spl": {"63": 55.2, "16000": None},
+        }
+
+    def test_legacy_rows_and_schema_upgrade(self, tmp_path):
+        """测试旧数据库补充 metrics_json 列，按指标逐行保存的旧结果仍可读取"""
+        path = tmp_path / "legacy.db"
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE processing_result (id INTEGER PRIMARY KEY, file_path VARCHAR, "
+                         "file_dir VARCHAR, file_name VARCHAR, timestamp DATETIME, "
+                         "session_id VARCHAR(100), device_id VARCHAR(100))")
+            conn.execute("INSERT INTO processing_result (id, file_path, timestamp) "
+                         "VALUES (1, 'old.tdms', '2026-01-01 00:00:00')")
+
+        db_manager = DatabaseManager(f"sqlite:///{path}")
+        db = db_manager.SessionLocal()
+        try:
+            db.add(ProcessingMetric(id=1, result_id=1, metric_name="laeq", metric_value=70.0,
+                                    metric_type="numeric"))
+            db.add(ProcessingMetric(id=2, result_id=1, metric_name="frequency_spl", metric_type="spectrum"))
+            db.add(SpectrumData(metric_id=2, frequency="63", value=50.0))
+            db.commit()
+        finally:
+            db.close()
+
+        assert db_manager.get_latest_result()["metrics"] == {"laeq": 70.0, "frequency_spl": {"63": 50.0}}
+
+
+class TestProcessingResultPagination:
+    """测试处理结果键集分页及流式返回"""
+
+    @pytest.fixture
+    def db_manager(self, tmp_path):
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'results.db'}")
+        db = db_manager.SessionLocal()
+        try:
+            # 相同时间戳的结果按 id 排序
+            for i in range(7):
+                db.add(ProcessingResult(
+                    file_path=f"CH{1 + i % 2}_{i}.tdms", file_name=f"CH{1 + i % 2}_{i}.tdms",
+                    timestamp=datetime(2026, 1, 1, 0, i // 2), metrics_json={"numeric": {"laeq": float(i)}}))
+            db.commit()
+        finally:
+            db.close()
+        return db_manager
+
+    def test_keyset_pages(self, db_manager):
+        """测试按游标逐页读取，结果不重复不遗漏"""
+        pages, cursor = [], None
+        while True:
+            page = list(db_manager.iter_processing_results(cursor=cursor, limit=3, batch_size=2))
+            pages.append([r["metrics"]["laeq"] for r in page])
+            if len(page) < 3:
+                break
+            cursor = page[-1]["cursor"]
+        assert pages == [[0.0, 1.0, 2.0], [3.0, 4.0, 5.0], [6.0]]
+
+        channel = list(db_manager.iter_processing_results(
+            file_name_prefix="CH2", start_time=datetime(2026, 1, 1, 0, 1)))
+        assert [r["metrics"]["laeq"] for r in channel] == [3.0, 5.0]
+
+    def test_all_metrics_endpoint(self, db_manager, monkeypatch):
+        """测试 /all_metrics 分页、NDJSON 及不分页时的流式 JSON"""
+        import main
+        from app.models import MetricsRequest
+        monkeypatch.setattr(main, "db_manager", db_manager)
+
+        page = asyncio.run(main.get_all_metrics(MetricsRequest(microphone_channel="CH1", limit=2)))
+        assert [r["metrics"]["laeq"] for r in page.data] == [0.0, 2.0]
+        rest = asyncio.run(main.get_all_metrics(MetricsRequest(
+            microphone_channel="CH1", limit=2, cursor=page.next_cursor)))
+        assert [r["metrics"]["laeq"] for r in rest.data] == [4.0, 6.0]
+
+        response = asyncio.run(main.get_all_metrics(MetricsRequest(microphone_channel="CH1", format="ndjson")))
+        lines = asyncio.run(self._body(response)).splitlines()
+        assert [json.loads(line)["metrics"]["laeq"] for line in lines] == [0.0, 2.0, 4.0, 6.0]
+
+        response = asyncio.run(main.get_all_metrics(MetricsRequest(microphone_channel="CH2")))
+        legacy = json.loads(asyncio.run(self._body(response)))
+        assert legacy["code"] == 200
+        assert [r["metrics"]["laeq"] for r in legacy["data"]] == [1.0, 3.0, 5.0]
+
+        bad = asyncio.run(main.get_all_metrics(MetricsRequest(cursor="not-a-cursor")))
+        assert bad.code == 400
+
+    def test_all_metrics_max_limit(self, db_manager, monkeypatch):
+        """测试不指定 limit（或超过上限）时单次最多返回 ALL_METRICS_MAX_LIMIT 条"""
+        import main
+        from app.models import MetricsRequest
+        monkeypatch.setattr(main, "db_manager", db_manager)
+        monkeypatch.setattr(main, "ALL_METRICS_MAX_LIMIT", 3)
+
+        page = asyncio.run(main.get_all_metrics(MetricsRequest(microphone_channel="CH1", limit=100)))
+        assert len(page.data) == 3 and page.next_cursor == page.data[-1]["cursor"]
+
+        response = asyncio.run(main.get_all_metrics(MetricsRequest(microphone_channel="CH1")))
+        streamed = json.loads(asyncio.run(self._body(response)))
+        assert streamed["code"] == 200
+        assert [r["metrics"]["laeq"] for r in streamed["data"]] == [0.0, 2.0, 4.0]
+        response = asyncio.run(main.get_all_metrics(MetricsRequest(
+            microphone_channel="CH1", cursor=streamed["next_cursor"])))
+        rest = json.loads(asyncio.run(self._body(response)))
+        assert [r["metrics"]["laeq"] for r in rest["data"]] == [6.0]
+        assert rest["next_cursor"] is None
+
+        response = asyncio.run(main.get_all_metrics(MetricsRequest(microphone_channel="CH1", format="ndjson")))
+        lines = [json.loads(line) for line in asyncio.run(self._body(response)).splitlines()]
+        assert lines[-1] == {"next_cursor": lines[2]["cursor"]}
+
+    def test_all_metrics_stream_error(self, db_manager, monkeypatch):
+        """测试读取出错：发送前出错返回 500，发送中途出错在末尾给出错误标记"""
+        import main
+        from app.models import MetricsRequest
+        monkeypatch.setattr(main, "db_manager", db_manager)
+        first = next(db_manager.iter_processing_results(file_name_prefix="CH1"))
+
+        def failing(fail_after):
+            def iter_processing_results(**kwargs):
+                if fail_after:
+                    yield first
+                raise OperationalError("SELECT", {}, Exception("database is locked"))
+            return iter_processing_results
+
+        monkeypatch.setattr(db_manager, "iter_processing_results", failing(False))
+        response = asyncio.run(main.get_all_metrics(MetricsRequest(microphone_channel="CH1")))
+        assert response.code == 500
+
+        monkeypatch.setattr(db_manager, "iter_processing_results", failing(True))
+        response = asyncio.run(main.get_all_metrics(MetricsRequest(microphone_channel="CH1")))
+        truncated = json.loads(asyncio.run(self._body(response)))
+        assert truncated["code"] == 500 and "database is locked" in truncated["message"]
+        assert len(truncated["data"]) == 1 and truncated["next_cursor"] == first["cursor"]
+
+        response = asyncio.run(main.get_all_metrics(MetricsRequest(microphone_channel="CH1", format="ndjson")))
+        lines = [json.loads(line) for line in asyncio.run(self._body(response)).splitlines()]
+        assert len(lines) == 2
+        assert "error" in lines[-1] and lines[-1]["next_cursor"] == first["cursor"]
+
+    @staticmethod
+    async def _body(response):
+        return "".join([chunk if isinstance(chunk, str) else chunk.decode()
+                        async for chunk in response.body_iterator])
+
+
+
+class TestTimeHistoryResolution:
+    """测试时间历程降采样（数据库中按时间段汇聚）"""
+
+    @pytest.fixture
+    def db_manager(self, tmp_path):
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'th.db'}")
+        rng = np.random.default_rng(0)
+        start = datetime(2026, 1, 1, 8, 0, 0)
+        for i in range(180):
+            x = rng.standard_normal(100) * (1 + i % 7)
+            db_manager.append_time_history(
+                session_id="S1", timestamp_utc=start + timedelta(seconds=i),
+                laeq=70.0 + (i % 20), lceq=75.0, lzpeak=100.0 + (i % 60), lcpeak=98.0,
+                dose_fracs={"NIOSH": 0.001, "OSHA_PEL": 0.002}, wearing_state=True,
+                n_samples=len(x), sum_x=float(x.sum()), sum_x2=float((x ** 2).sum()),
+                sum_x3=float((x ** 3).sum()), sum_x4=float((x ** 4).sum()),
+                freq_1khz_spl=60.0 + (i % 10),
+                freq_1khz_n=len(x), freq_1khz_s1=float(x.sum()), freq_1khz_s2=float((x ** 2).sum()),
+                freq_1khz_s3=float((x ** 3).sum()), freq_1khz_s4=float((x ** 4).sum()))
+        db_manager.flush_time_history()
+        return db_manager
+
+    def test_parse_resolution(self):
+        """测试分辨率解析"""
+        from app.database import parse_time_resolution
+        assert parse_time_resolution("10s") == 10
+        assert parse_time_resolution("1min") == 60
+        assert parse_time_resolution("5min") == 300
+        assert parse_time_resolution("1h") == 3600
+        assert parse_time_resolution("30") == 30
+        assert parse_time_resolution(60) == 60
+        for value in ("fast", "0s", "1.5s", "10 parsecs"):
+            with pytest.raises(ValueError):
+                parse_time_resolution(value)
+
+    def test_matches_summary_processor_rules(self, db_manager):
+        """测试汇聚结果与逐秒记录按规范合成的结果一致"""
+        from app.core.summary_processor import SummaryProcessor, aggregate_from_moment_blocks
+
+        raw = db_manager.get_time_history("S1")
+        buckets = db_manager.get_time_history("S1", resolution_s=60)
+        assert [b['timestamp'] for b in buckets] == [
+            "2026-01-01T08:00:00", "2026-01-01T08:01:00", "2026-01-01T08:02:00"]
+
+        for k, bucket in enumerate(buckets):
+            rows = raw[k * 60:(k + 1) * 60]
+            assert bucket['record_count'] == 60
+            assert bucket['duration_s'] == 60.0
+            assert bucket['LAeq_dB'] == round(SummaryProcessor._energy_average([r['LAeq_dB'] for r in rows]), 2)
+            assert bucket['freq_1khz_spl'] == round(
+                SummaryProcessor._energy_average([r['freq_1khz_spl'] for r in rows]), 2)
+            assert bucket['LZpeak_dB'] == max(r['LZpeak_dB'] for r in rows)
+            assert bucket['dose_frac_niosh'] == pytest.approx(0.06)
+            assert bucket['dose_frac_osha_pel'] == pytest.approx(0.12)
+
+            beta = aggregate_from_moment_blocks(
+                [(r['n_samples'], r['sum_x'], r['sum_x2'], r['sum_x3'], r['sum_x4']) for r in rows])
+            assert bucket['beta_kurtosis'] == pytest.approx(beta, abs=1e-4)
+            assert bucket['freq_1khz_kurtosis'] == pytest.approx(beta, abs=1e-4)
+            assert bucket['freq_63hz_spl'] is None
+
+    def test_time_range_and_limit(self, db_manager):
+        """测试时间范围与最大时间段数"""
+        buckets = db_manager.get_time_history(
+            "S1", start_time=datetime(2026, 1, 1, 8, 0, 5), resolution_s=10)
+        assert len(buckets) == 18
+        assert buckets[0]['timestamp'] == "2026-01-01T08:00:00"
+        assert buckets[0]['record_count'] == 5
+        assert len(db_manager.get_time_history("S1", limit=4, resolution_s=10)) == 4
+
+    def test_time_history_endpoint(self, db_manager, monkeypatch):
+        """测试 /session/{id}/time_history 的 resolution 参数"""
+        import main
+        monkeypatch.setattr(main, "db_manager", db_manager)
+
+        response = asyncio.run(main.get_time_history("S1", resolution="1min"))
+        assert response.code == 200
+        assert response.data["resolution_s"] == 60
+        assert response.data["record_count"] == 3
+
+        raw = asyncio.run(main.get_time_history("S1"))
+        assert raw.data["record_count"] == 180
+
+        bad = asyncio.run(main.get_time_history("S1", resolution="often"))
+        assert bad.code == 400
+
+
+
+class TestTimeHistoryRollup:
+    """测试时间历程汇总表（1 分钟 / 15 分钟 / 1 小时）"""
+
+    @staticmethod
+    def _seconds(n, start):
+        from app.core.time_history_processor import SecondMetrics
+        rng = np.random.default_rng(1)
+        seconds = []
+        for i in range(n):
+            x = rng.standard_normal(100) * (1 + i % 5)
+            seconds.append(SecondMetrics(
+                timestamp=start + timedelta(seconds=i), duration_s=1.0,
+                LAeq=70.0 + i % 20, LCeq=75.0, LZeq=78.0, LAFmax=90.0 + i % 9,
+                LZpeak=100.0 + i % 30, LCpeak=98.0, dose_frac_niosh=0.001,
+                n_samples=len(x), sum_x=float(x.sum()), sum_x2=float((x ** 2).sum()),
+                sum_x3=float((x ** 3).sum()), sum_x4=float((x ** 4).sum())))
+        return seconds
+
+    def test_partial_periods_merged(self, tmp_path):
+        """测试同一时段分两次写入的部分结果合并后与一次汇聚一致"""
+        from app.core.summary_processor import SummaryProcessor
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'rollup.db'}")
+        seconds = self._seconds(60, datetime(2026, 1, 1, 8, 0))
+
+        processor = SummaryProcessor(aggregation_seconds=60, align_to_clock=True)
+        for part in (seconds[:25], seconds[25:]):
+            for metrics in part:
+                processor.add_second_metrics(metrics)
+            db_manager.save_rollup(60, "S1", processor.flush_remaining(), device_id="CH1")
+
+        rows = db_manager.get_rollups(60, session_id="S1")
+        direct = SummaryProcessor()._aggregate_metrics(seconds)
+        assert len(rows) == 1
+        row = rows[0]
+        assert row['period_start'] == "2026-01-01T08:00:00"
+        assert row['device_id'] == "CH1"
+        assert row['sample_count'] == 60
+        assert row['LAeq'] == direct.LAeq
+        assert row['LAFmax'] == 98.0
+        assert row['LZpeak'] == direct.LZpeak
+        assert row['dose_frac_niosh'] == pytest.approx(0.06)
+        assert row['beta_kurtosis'] == pytest.approx(direct.beta_kurtosis, abs=1e-4)
+        assert row['start_time'] == "2026-01-01T08:00:00"
+        assert row['end_time'] == "2026-01-01T08:00:59"
+
+        with pytest.raises(ValueError):
+            db_manager.save_rollup(60, "S1", direct)
+
+    def test_rollups_endpoint(self, tmp_path, monkeypatch):
+        """测试 /rollups 按级别及时间范围查询"""
+        import main
+        from app.core.summary_processor import SummaryProcessor
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'rollup.db'}")
+        monkeypatch.setattr(main, "db_manager", db_manager)
+        processor = SummaryProcessor(aggregation_seconds=3600, align_to_clock=True)
+        processor.set_callback(lambda m: db_manager.save_rollup(3600, "S1", m))
+        for metrics in self._seconds(2 * 3600, datetime(2026, 1, 1, 8, 0)):
+            processor.add_second_metrics(metrics)
+        processor.flush_remaining()
+
+        response = asyncio.run(main.get_rollups(level="1h", start_time="2026-01-01T09:00:00"))
+        assert response.code == 200
+        assert response.data["level_s"] == 3600
+        assert [r['period_start'] for r in response.data["records"]] == ["2026-01-01T09:00:00"]
+        assert asyncio.run(main.get_rollups(level="5min")).code == 400
+
+    def _ingest(self, db_manager, seconds, flush=True):
+        """逐秒写入时间历程并经 MultiLevelAggregator 写入汇总表；flush=False 模拟入库进行中"""
+        from app.core.background_tasks import ROLLUP_LEVELS
+        from app.core.summary_processor import MultiLevelAggregator
+        aggregator = MultiLevelAggregator()
+        for level in ROLLUP_LEVELS:
+            aggregator.add_level(level, callback=lambda m, level=level: db_manager.save_rollup(level.value, "S1", m))
+        for metrics in seconds:
+            aggregator.process_second(metrics)
+            db_manager.append_time_history(
+                session_id="S1", timestamp_utc=metrics.timestamp, laeq=metrics.LAeq, lceq=metrics.LCeq,
+                lzpeak=metrics.LZpeak, lcpeak=metrics.LCpeak, dose_fracs={"NIOSH": metrics.dose_frac_niosh},
+                n_samples=metrics.n_samples, sum_x=metrics.sum_x,
+                sum_x2=metrics.sum_x2, sum_x3=metrics.sum_x3, sum_x4=metrics.sum_x4)
+        if flush:
+            aggregator.flush_all()
+        db_manager.flush_time_history()
+
+    @staticmethod
+    def _assert_matches_seconds(db_manager, resolution_s, start_time=None, end_time=None):
+        """降采样结果与完全从逐秒记录汇聚的结果一致"""
+        result = db_manager.get_time_history("S1", start_time=start_time, end_time=end_time,
+                                             resolution_s=resolution_s)
+        query = db_manager.ReadSessionLocal().query(
+            db_manager._time_bucket_expr(TimeHistory.timestamp_utc, resolution_s).label('bucket'),
+            *db_manager._time_history_bucket_columns()).filter(TimeHistory.session_id == "S1")
+        if start_time:
+            query = query.filter(TimeHistory.timestamp_utc >= start_time)
+        if end_time:
+            query = query.filter(TimeHistory.timestamp_utc <= end_time)
+        expected = [db_manager._downsampled_record(row, resolution_s)
+                    for row in query.group_by('bucket').order_by('bucket').all()]
+        assert len(result) == len(expected)
+        for a, b in zip(result, expected):
+            assert (a['timestamp'], a['record_count'], a['LZpeak_dB']) == (b['timestamp'], b['record_count'], b['LZpeak_dB'])
+            assert a['LAeq_dB'] == pytest.approx(b['LAeq_dB'], abs=1e-9)
+            assert a['LCeq_dB'] == pytest.approx(b['LCeq_dB'], abs=1e-9)
+            assert a['dose_frac_niosh'] == pytest.approx(b['dose_frac_niosh'])
+            assert a['beta_kurtosis'] == pytest.approx(b['beta_kurtosis'], abs=1e-4)
+        return result
+
+    def test_downsampled_reads_rollups(self, tmp_path):
+        """测试分辨率为汇总级别整数倍时读取汇总表，结果与从逐秒记录汇聚一致"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'rollup.db'}")
+        self._ingest(db_manager, self._seconds(1900, datetime(2026, 1, 1, 7, 55, 10)))
+
+        assert [r['period_start'] for r in db_manager.get_rollups(3600, session_id="S1")] == [
+            "2026-01-01T07:00:00", "2026-01-01T08:00:00"]
+        assert len(db_manager.get_rollups(900)) == 3
+        assert sum(r['sample_count'] for r in db_manager.get_rollups(60, session_id="S1")) == 1900
+
+        last = datetime(2026, 1, 1, 8, 26, 49)
+        assert db_manager._rollup_level_for("S1", 300) == (60, last)
+        assert db_manager._rollup_level_for("S1", 1800) == (900, last)
+        assert db_manager._rollup_level_for("S1", 45) is None
+        for resolution_s in (300, 1800):
+            self._assert_matches_seconds(db_manager, resolution_s)
+
+    def test_downsampled_during_ingestion(self, tmp_path):
+        """测试入库进行中（当前时段尚未写入汇总表）时，未汇总的部分从逐秒记录补齐"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'rollup.db'}")
+        self._ingest(db_manager, self._seconds(1900, datetime(2026, 1, 1, 7, 55, 10)), flush=False)
+
+        # 1 分钟级别只写入到 08:25:59，15 分钟级别只写入到 08:14:59
+        assert db_manager._rollup_level_for("S1", 300)[1] == datetime(2026, 1, 1, 8, 25, 59)
+        assert db_manager._rollup_level_for("S1", 1800)[1] == datetime(2026, 1, 1, 8, 14, 59)
+        for resolution_s in (300, 1800):
+            result = self._assert_matches_seconds(db_manager, resolution_s)
+            assert sum(r['record_count'] for r in result) == 1900
+
+    def test_downsampled_range_inside_period(self, tmp_path):
+        """测试查询范围首尾落在时段中间时，不完整的时段从逐秒记录汇聚"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'rollup.db'}")
+        self._ingest(db_manager, self._seconds(1900, datetime(2026, 1, 1, 7, 55, 10)))
+
+        start, end = datetime(2026, 1, 1, 7, 57, 30), datetime(2026, 1, 1, 8, 20, 15)
+        for resolution_s in (60, 300, 900):
+            result = self._assert_matches_seconds(db_manager, resolution_s, start_time=start, end_time=end)
+            assert sum(r['record_count'] for r in result) == int((end - start).total_seconds()) + 1
+        # 范围短于一个时段
+        self._assert_matches_seconds(db_manager, 900, start_time=datetime(2026, 1, 1, 8, 1),
+                                     end_time=datetime(2026, 1, 1, 8, 9))
+
+
 if __name__ == "__main__":
     test_database()
\ No newline at end of file
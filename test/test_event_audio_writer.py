@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+事件音频异步写入器单元测试
+"""
+
+import threading
+import numpy as np
+import pytest
+from datetime import datetime
+
+from app.core import event_audio_writer
+from app.core.event_audio_writer import EventAudioWriter
+from app.core.event_detector import EventInfo
+
+
+def _event(i: int = 0) -> EventInfo:
+    return EventInfo(event_id=f"EVT-TEST{i:04d}", session_id="test", start_time=datetime.now())
+
+
+class TestEventAudioWriter:
+    """测试事件音频异步写入器"""
+
+    def test_path_resolved_after_write(self, tmp_path):
+        """测试写入完成后回调中可得到文件路径"""
+        writer = EventAudioWriter(max_queue_size=4)
+        writer.start()
+
+        done = []
+        event_info = _event()
+        assert writer.submit(event_info, np.zeros(1000, dtype=np.float32), 1000, str(tmp_path),
+                             on_done=lambda e: done.append(e.audio_file_path))
+        writer.stop()
+
+        assert done == [event_info.audio_file_path]
+        assert event_info.audio_file_path.endswith(".flac")
+        assert writer.get_stats()['written'] == 1
+
+    def test_invalid_policy(self):
+        """测试无效的溢出策略"""
+        with pytest.raises(ValueError):
+            EventAudioWriter(overflow_policy="block")
+
+    @pytest.mark.parametrize("policy", ["drop", "spill"])
+    def test_overflow_policy(self, tmp_path, monkeypatch, policy):
+        """测试队列满时的丢弃/同步写入策略"""
+        release = threading.Event()
+        original = event_audio_writer.write_event_audio_file
+
+        def slow_write(*args, **kwargs):
+            # 仅阻塞后台线程，模拟慢速磁盘
+            if threading.current_thread().name == "EventAudioWriter":
+                release.wait(5)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(event_audio_writer, "write_event_audio_file", slow_write)
+
+        writer = EventAudioWriter(max_queue_size=1, overflow_policy=policy)
+        writer.start()
+        events = [_event(i) for i in range(4)]
+        results = [writer.submit(e, np.zeros(100, dtype=np.float32), 1000, str(tmp_path)) for e in events]
+        release.set()
+        writer.stop()
+
+        stats = writer.get_stats()
+        assert stats['submitted'] == 4
+        if policy == "drop":
+            assert stats['dropped'] >= 1
+            assert False in results
+        else:
+            assert stats['spilled'] >= 1
+            assert all(results)
+            assert all(e.audio_file_path for e in events)
+        assert stats['high_watermark'] <= 1
+
+    def test_stop_timeout_keeps_thread(self, tmp_path, monkeypatch):
+        """测试 stop() 超时后仍保留写入线程，不会启动第二个写入线程"""
+        release = threading.Event()
+        original = event_audio_writer.write_event_audio_file
+
+        def slow_write(*args, **kwargs):
+            release.wait(5)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(event_audio_writer, "write_event_audio_file", slow_write)
+
+        writer = EventAudioWriter(max_queue_size=4)
+        writer.start()
+        thread = writer._thread
+        event_info = _event()
+        writer.submit(event_info, np.zeros(100, dtype=np.float32), 1000, str(tmp_path))
+
+        assert writer.stop(timeout=0.05) is False
+        assert writer.is_running
+        writer.start()
+        assert writer._thread is thread
+
+        release.set()
+        assert writer.stop() is True
+        assert not writer.is_running
+        assert event_info.audio_file_path
+        assert writer._queue.qsize() == 0
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+滤波器组单元测试
+"""
+
+import numpy as np
+import soundfile as sf
+from datetime import datetime
+from acoustics import Signal
+
+from app.core.filter_bank import FilterBank, StreamingFilterBank, get_filter_bank, BAND_NAMES
+from app.core.audio_processor import AudioProcessor, WholeFileAccumulator
+from app.core.dose_calculator import DoseCalculator, DoseStandard
+from app.core.time_history_processor import (
+    TimeHistoryProcessor,
+    SECOND_METRICS_FIELDS,
+    second_metrics_from_frame
+)
+
+
+class TestFilterBank:
+    """测试滤波器组"""
+
+    def test_cached_per_sample_rate(self):
+        """测试同一采样率只设计一次"""
+        assert get_filter_bank(48000) is get_filter_bank(48000)
+        assert get_filter_bank(48000) is not get_filter_bank(44100)
+
+    def test_matches_acoustics(self):
+        """测试滤波结果与 acoustics.Signal 一致"""
+        sr = 48000
+        x = np.random.randn(sr) * 0.1
+        s = Signal(x, sr)
+        bank = FilterBank.for_sample_rate(sr)
+
+        assert np.array_equal(bank.weigh_a(x), s.weigh("A").values)
+        assert np.array_equal(bank.weigh_c(x), s.weigh("C").values)
+
+        _, octaves = s.third_octaves()
+        bands = bank.filter_bands(x)
+        assert len(bands) == len(BAND_NAMES)
+        for band, idx in zip(bands, range(8, 35, 3)):
+            assert np.array_equal(band, octaves[idx].values)
+
+    def test_bands_above_nyquist(self):
+        """测试超过奈奎斯特频率的频段不可用"""
+        bank = get_filter_bank(32000)
+        assert bank.band_sos[-1] is None
+        assert bank.filter_bands(np.zeros(100))[-1] is None
+
+
+class TestStreamingFilterBank:
+    """测试流式滤波器组"""
+
+    def test_blocks_bit_identical_to_whole_signal(self):
+        """测试逐块滤波与整段滤波逐位一致"""
+        sr = 48000
+        x = np.random.randn(3 * sr + 1234) * 0.1
+        bank = get_filter_bank(sr)
+        stream = StreamingFilterBank(sr)
+
+        a_blocks, c_blocks, band_blocks = [], [], []
+        for start in range(0, len(x), sr):
+            a_w, c_w, bands = stream.process(x[start:start + sr])
+            a_blocks.append(a_w)
+            c_blocks.append(c_w)
+            band_blocks.append(bands)
+
+        assert stream.samples_processed == len(x)
+        assert np.array_equal(np.concatenate(a_blocks), bank.weigh_a(x))
+        assert np.array_equal(np.concatenate(c_blocks), bank.weigh_c(x))
+        whole_bands = bank.filter_bands(x)
+        for i, whole in enumerate(whole_bands):
+            assert np.array_equal(np.concatenate([b[i] for b in band_blocks]), whole)
+
+    def test_reset(self):
+        """测试重置后从零状态开始"""
+        sr = 48000
+        x = np.random.randn(sr) * 0.1
+        stream = StreamingFilterBank(sr)
+        first, _, _ = stream.process(x)
+        stream.reset()
+        again, _, _ = stream.process(x)
+        assert np.array_equal(first, again)
+        assert stream.samples_processed == sr
+
+    def test_process_block_matches_per_second(self):
+        """测试 process_block 流式接口与整段按秒处理结果一致"""
+        sr = 48000
+        x = np.random.randn(3 * sr) * 0.1
+        start = datetime(2026, 1, 1)
+
+        processor = TimeHistoryProcessor()
+        expected = processor.process_signal_per_second(Signal(x, sr), start)
+
+        streaming = TimeHistoryProcessor()
+        received = []
+        streaming.callback = received.append
+        for i in range(3):
+            streaming.process_block(x[i * sr:(i + 1) * sr], sr, expected[i].timestamp)
+
+        assert received == expected
+
+
+class TestSecondMetricsWithFilterBank:
+    """测试使用滤波器组的秒级指标"""
+
+    def test_band_spl_and_lafmax(self):
+        """测试频段SPL与LAFmax为有效的dB值"""
+        sr = 48000
+        t = np.arange(sr) / sr
+        data = 0.2 * np.sin(2 * np.pi * 1000 * t)
+
+        processor = TimeHistoryProcessor()
+        metrics = processor._calculate_second_metrics(data, sr, datetime.utcnow(), 1.0)
+
+        # 1kHz正弦信号能量集中在1kHz频段
+        assert metrics.freq_1khz_spl is not None
+        assert abs(metrics.freq_1khz_spl - metrics.LZeq) < 1.0
+        assert metrics.freq_63hz_spl < metrics.freq_1khz_spl
+
+        # 稳态信号 LAFmax 约等于 LAeq
+        assert abs(metrics.LAFmax - metrics.LAeq) < 0.5
+
+
+class TestBatchProcessing:
+    """测试向量化批量处理"""
+
+    def test_batch_matches_per_second(self):
+        """测试批量结果与逐秒处理一致（含末尾不足一秒的数据）"""
+        sr = 48000
+        x = np.random.randn(5 * sr + 1000) * 0.1
+        start = datetime(2026, 1, 1)
+        processor = TimeHistoryProcessor()
+
+        expected = processor.process_signal_per_second(Signal(x, sr), start)
+        frame = processor.process_signal_batch(Signal(x, sr), start, chunk_seconds=2)
+
+        assert list(frame.columns) == SECOND_METRICS_FIELDS
+        assert len(frame) == len(expected) == 6
+        assert frame['duration_s'].iloc[-1] == 1000 / sr
+
+        for exp, got in zip(expected, second_metrics_from_frame(frame)):
+            assert got.timestamp == exp.timestamp
+            for name in ('LAeq', 'LCeq', 'LZeq', 'LAFmax', 'LZpeak', 'LCpeak',
+                         'kurtosis_total', 'dose_frac_niosh', 'freq_1khz_spl', 'n_samples',
+                         'overload_flag', 'wearing_state'):
+                assert getattr(got, name) == getattr(exp, name)
+            assert np.isclose(got.sum_x4, exp.sum_x4)
+            assert np.isclose(got.freq_8khz_s2, exp.freq_8khz_s2)
+
+    def test_silent_seconds_kurtosis(self):
+        """测试静音秒的峰度在批量与逐秒处理中均取 3.0"""
+        sr = 8000
+        x = np.concatenate([np.zeros(sr), np.random.randn(sr) * 0.1])
+        processor = TimeHistoryProcessor()
+
+        expected = processor.process_signal_per_second(Signal(x, sr), datetime(2026, 1, 1))
+        frame = processor.process_signal_batch(Signal(x, sr), datetime(2026, 1, 1))
+        for name in ('kurtosis_total', 'kurtosis_a_weighted', 'kurtosis_c_weighted'):
+            assert frame[name].iloc[0] == getattr(expected[0], name) == 3.0
+            assert frame[name].iloc[1] == getattr(expected[1], name)
+
+    def test_empty_signal(self):
+        """测试空信号返回空表"""
+        frame = TimeHistoryProcessor().process_signal_batch(Signal(np.zeros(0), 48000))
+        assert frame.empty
+        assert list(frame.columns) == SECOND_METRICS_FIELDS
+
+    def test_vectorized_dose(self):
+        """测试向量化剂量计算与逐值计算一致"""
+        laeq = np.array([70.0, 85.0, 91.5, 100.0])
+        doses = DoseCalculator.calculate_dose_increments(laeq, 1.0, DoseStandard.OSHA_PEL)
+        for level, dose in zip(laeq, doses):
+            assert dose == DoseCalculator.calculate_dose_increment(level, 1.0, DoseStandard.OSHA_PEL)
+
+
+class TestWholeFileAccumulator:
+    """测试单次解码的整文件指标"""
+
+    def test_matches_legacy_audio_processor(self, tmp_path):
+        """测试逐秒处理累加的整文件指标与原 AudioProcessor 一致"""
+        sr = 48000
+        x = (np.random.randn(sr + sr // 2) * 0.2).astype(np.float32)
+        x[sr // 3] += 3.0
+        path = tmp_path / "whole_file.wav"
+        sf.write(str(path), x, sr, subtype='FLOAT')
+
+        legacy = AudioProcessor().process_wav_file(str(path))
+
+        accumulator = WholeFileAccumulator(sr)
+        batch_accumulator = WholeFileAccumulator(sr)
+        processor = TimeHistoryProcessor()
+        signal = Signal(x, sr)
+        processor.process_signal_per_second(signal, datetime(2026, 1, 1), accumulator=accumulator)
+        processor.process_signal_batch(signal, datetime(2026, 1, 1), chunk_seconds=1,
+                                       accumulator=batch_accumulator)
+        results = accumulator.get_results()
+
+        for key in ('leq', 'laeq', 'lceq', 'peak_spl', 'peak_aspl', 'peak_cspl',
+                    'total_kurtosis', 'a_weighted_kurtosis', 'c_weighted_kurtosis',
+                    'duration', 'dose_niosh', 'twa_osha_pel', 'lex_eu_iso'):
+            assert np.isclose(results[key], legacy[key], rtol=1e-6), key
+            assert np.isclose(batch_accumulator.get_results()[key], results[key]), key
+        assert results['frequency_kurtosis'].to_dict('records') == legacy['frequency_kurtosis'].to_dict('records')
+
+        # 频段SPL为整文件等效声级
+        spl_1k = 10 * np.log10(np.mean(get_filter_bank(sr).filter_bands(x.astype(np.float64))[4] ** 2) / 20e-6 ** 2)
+        assert np.isclose(results['frequency_spl']['1000 Hz'][0], spl_1k)
@@ -0,0 +1,503 @@
+# -*- coding: utf-8 -*-
+"""
+文件入库流程（AudioProcessingTaskManager）单元测试
+"""
+
+import asyncio
+import pickle
+import time
+import numpy as np
+import pytest
+import soundfile as sf
+from datetime import datetime, timedelta
+from nptdms import TdmsWriter, ChannelObject
+from acoustics import Signal
+
+from app.core.audio_source import open_audio_source
+from app.core.background_tasks import AudioProcessingTaskManager
+from app.core.file_monitor import FileSettleTracker
+from app.core.work_queue import DurableWorkQueue
+from app.core.ingestion_ledger import IngestionLedger, file_fingerprint
+from app.core.ingestion import ChannelOutput, IngestionScheduler, analyze_file
+from app.core.result_cache import ResultCache, file_content_hash
+from app.core.tdms_converter import TdmsGroupReader, TdmsChannelReader
+from app.core.time_history_processor import TimeHistoryProcessor
+from app.database import DatabaseManager
+from app.database.models import ProcessingResult, TimeHistory
+
+
+SR = 8000
+
+
+def _sleep_and_return(value, delay):
+    """工作函数：延迟后返回输入值"""
+    time.sleep(delay)
+    return value
+
+
+def _fail(message):
+    raise ValueError(message)
+
+
+def _write_multichannel_tdms(path, channels, segment_samples=3000):
+    """按 segment 交替写入多通道 TDMS 文件"""
+    n = len(next(iter(channels.values())))
+    with TdmsWriter(str(path)) as writer:
+        for start in range(0, n, segment_samples):
+            writer.write_segment([
+                ChannelObject("Group", name, data[start:start + segment_samples],
+                              properties={"SampleRate": SR})
+                for name, data in channels.items()
+            ])
+
+
+@pytest.fixture
+def manager(tmp_path):
+    task_manager = AudioProcessingTaskManager(watch_directory=str(tmp_path), cache_dir=str(tmp_path / "cache"),
+                                              db_manager=DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}"))
+    task_manager.enable_event_detection = False
+    return task_manager
+
+
+class TestTdmsGroupReader:
+    """测试一次读取TDMS组内全部通道"""
+
+    def test_matches_single_channel_reader(self, tmp_path):
+        """测试各通道数据块与逐通道读取结果一致"""
+        path = tmp_path / "multi.tdms"
+        channels = {
+            "CH1": np.random.randn(2 * SR + 700),
+            "CH2": (np.random.randn(2 * SR + 700) * 1000).astype(np.int16),
+        }
+        _write_multichannel_tdms(path, channels)
+
+        with TdmsGroupReader(str(path)) as reader:
+            assert reader.channel_names == ["CH1", "CH2"]
+            assert reader.sample_rate == SR
+            blocks = list(reader.channel_blocks())
+
+        assert [[len(b) for b in blk] for blk in blocks] == [[SR, SR], [SR, SR], [700, 700]]
+        for index in range(2):
+            with TdmsChannelReader(str(path), channel_index=index) as single:
+                expected = np.concatenate(list(single.blocks()))
+            assert np.array_equal(np.concatenate([blk[index] for blk in blocks]), expected)
+
+
+class TestMultiChannelIngestion:
+    """测试多通道文件入库"""
+
+    def test_each_channel_processed(self, tmp_path, manager):
+        """测试每个通道独立生成时间历程及整文件结果"""
+        path = tmp_path / "two_channels.tdms"
+        ch1 = np.random.randn(3 * SR) * 0.5
+        ch2 = np.random.randn(3 * SR) * 0.05
+        _write_multichannel_tdms(path, {"CH1": ch1, "CH2": ch2})
+
+        asyncio.run(manager._process_audio_file(str(path)))
+
+        db = manager.db_manager.ReadSessionLocal()
+        try:
+            results = {r.device_id: r.session_id for r in db.query(ProcessingResult).all()}
+            assert set(results) == {"CH1", "CH2"}
+            assert results["CH1"] == manager.current_session.session_id
+            assert results["CH2"] == manager.channel_sessions["CH2"].session_id
+
+            rows = db.query(TimeHistory).filter(TimeHistory.device_id == "CH2").all()
+            assert len(rows) == 3
+        finally:
+            db.close()
+
+        # 与单独处理该通道（同样的归一化）结果一致
+        expected = TimeHistoryProcessor().process_signal_per_second(
+            Signal((ch2 / np.max(np.abs(ch2))).astype(np.float32), SR), datetime(2026, 1, 1))
+        assert sorted(r.LAeq_dB for r in rows) == sorted(m.LAeq for m in expected)
+
+        # 每个通道的逐级汇总已写入汇总表
+        for channel, session_id in results.items():
+            for level_s in (60, 900, 3600):
+                rollups = manager.db_manager.get_rollups(level_s, session_id=session_id)
+                assert {r['device_id'] for r in rollups} == {channel}
+                assert sum(r['sample_count'] for r in rollups) == 3
+        hour = manager.db_manager.get_rollups(3600, session_id=results["CH2"])
+        if len(hour) == 1:
+            energy = sum(10 ** (r.LAeq_dB / 10) for r in rows)
+            assert hour[0]['LAeq'] == pytest.approx(10 * np.log10(energy / 3), abs=0.01)
+
+        manager.stop_current_session()
+        assert manager.channel_sessions == {}
+
+    def test_live_rows_downsample_all_levels(self, tmp_path, manager):
+        """测试入库写入的逐秒记录包含 LZeq/LAFmax，降采样结果中均不为空"""
+        path = tmp_path / "one_channel.tdms"
+        ch1 = np.random.randn(3 * SR) * 0.5
+        _write_multichannel_tdms(path, {"CH1": ch1})
+
+        asyncio.run(manager._process_audio_file(str(path)))
+        session_id = manager.current_session.session_id
+
+        expected = TimeHistoryProcessor().process_signal_per_second(
+            Signal((ch1 / np.max(np.abs(ch1))).astype(np.float32), SR), datetime(2026, 1, 1))
+        rows = manager.db_manager.get_time_history(session_id)
+        assert [r['LZeq_dB'] for r in rows] == [m.LZeq for m in expected]
+        assert [r['LAFmax_dB'] for r in rows] == [m.LAFmax for m in expected]
+
+        buckets = manager.db_manager.get_time_history(session_id, resolution_s=3)
+        assert sum(b['record_count'] for b in buckets) == 3
+        for bucket in buckets:
+            for name in ('LAeq_dB', 'LCeq_dB', 'LZeq_dB', 'LAFmax_dB', 'LZpeak_dB', 'LCpeak_dB'):
+                assert bucket[name] is not None
+        assert max(b['LAFmax_dB'] for b in buckets) == max(m.LAFmax for m in expected)
+        manager.stop_current_session()
+
+
+class TestIngestionScheduler:
+    """测试文件入库调度器"""
+
+    def test_results_ordered_per_key(self):
+        """测试同一会话的结果按提交顺序处理，不同会话互不阻塞"""
+        applied = []
+        scheduler = IngestionScheduler(max_workers=3, use_processes=False)
+        try:
+            scheduler.submit("A", _sleep_and_return, "A1", 0.3, on_result=applied.append)
+            scheduler.submit("A", _sleep_and_return, "A2", 0.0, on_result=applied.append)
+            scheduler.submit("B", _sleep_and_return, "B1", 0.0, on_result=applied.append)
+            assert scheduler.wait(timeout=10)
+        finally:
+            scheduler.shutdown()
+
+        assert applied.index("A1") < applied.index("A2")
+        assert applied.index("B1") < applied.index("A1")
+        assert scheduler.get_stats()['completed'] == 3
+
+    def test_error_does_not_block_key(self):
+        """测试失败的任务交给 on_error，不阻塞同一会话的后续结果"""
+        applied, errors = [], []
+        scheduler = IngestionScheduler(max_workers=2, use_processes=False)
+        try:
+            scheduler.submit("A", _fail, "boom", on_result=applied.append, on_error=errors.append)
+            scheduler.submit("A", _sleep_and_return, "A2", 0.0, on_result=applied.append)
+            assert scheduler.wait(timeout=10)
+        finally:
+            scheduler.shutdown()
+
+        assert applied == ["A2"]
+        assert isinstance(errors[0], ValueError)
+        assert scheduler.get_stats()['failed'] == 1
+
+    def test_channel_output_pickles(self, tmp_path):
+        """测试记录型输出可跨进程传输并回放"""
+        path = tmp_path / "a.wav"
+        sf.write(str(path), (np.random.randn(2 * SR + 100) * 0.1).astype(np.float32), SR, subtype="FLOAT")
+
+        analysis = analyze_file(str(path), enable_event_detection=False)
+        output = pickle.loads(pickle.dumps(analysis.channels[0]))
+        assert isinstance(output, ChannelOutput)
+        assert len(output.seconds) == 3
+        assert output.results["duration"] == analysis.channels[0].results["duration"]
+
+        replayed = ChannelOutput()
+        output.replay(replayed)
+        assert [m.LAeq for m in replayed.seconds] == [m.LAeq for m in analysis.channels[0].seconds]
+        assert len(replayed.minutes) == 1
+
+    def test_process_pool_ingestion(self, tmp_path, manager):
+        """测试进程池并行处理多个文件，结果与逐个处理一致且按提交顺序保存，逐秒时间戳前后衔接"""
+        paths = []
+        for index, seconds in enumerate((3, 1, 2)):
+            path = tmp_path / f"file_{index}.wav"
+            sf.write(str(path), (np.random.randn(seconds * SR) * 0.1).astype(np.float32), SR, subtype="FLOAT")
+            paths.append(str(path))
+
+        manager.scheduler = IngestionScheduler(max_workers=2)
+        try:
+            for path in paths:
+                manager._on_audio_file_detected(path)
+            assert manager.wait_for_ingestion(timeout=120)
+        finally:
+            manager.scheduler.shutdown()
+
+        db = manager.db_manager.ReadSessionLocal()
+        try:
+            results = db.query(ProcessingResult).order_by(ProcessingResult.id).all()
+            assert [r.file_path for r in results] == paths
+            rows = db.query(TimeHistory).order_by(TimeHistory.id).all()
+            assert len(rows) == 6
+            # 第一秒时间戳在提交时按顺序分配，并行计算的文件互不重叠
+            assert [r.timestamp_utc for r in rows] == [rows[0].timestamp_utc + timedelta(seconds=i) for i in range(6)]
+        finally:
+            db.close()
+        assert manager.current_session.metrics.total_duration_s == 6
+
+
+class TestFileSettleTracker:
+    """测试文件写完判断"""
+
+    def test_reported_after_stable(self, tmp_path):
+        """测试大小及修改时间稳定 settle_seconds 后才报告"""
+        settled = []
+        tracker = FileSettleTracker(settled.append, settle_seconds=0.3)
+        path = str(tmp_path / "growing.tdms")
+        with open(path, "wb") as f:
+            f.write(b"x" * 100)
+        tracker.touch(path)
+
+        assert tracker.poll() == []
+        with open(path, "ab") as f:
+            f.write(b"x" * 100)
+        assert tracker.poll() == []
+        time.sleep(0.4)
+        assert tracker.poll() == [path]
+        assert settled == [path]
+        assert tracker.pending == 0
+
+    def test_close_write_reported_immediately(self, tmp_path):
+        """测试写入关闭事件后立即报告，文件被删除时不报告"""
+        settled = []
+        tracker = FileSettleTracker(settled.append, settle_seconds=60)
+        closed = tmp_path / "closed.tdms"
+        closed.write_bytes(b"x")
+        removed = tmp_path / "removed.tdms"
+        removed.write_bytes(b"x")
+
+        tracker.mark_closed(str(closed))
+        tracker.touch(str(removed))
+        removed.unlink()
+        tracker.poll()
+        assert settled == [str(closed)]
+        assert tracker.pending == 0
+
+
+class TestDurableWorkQueue:
+    """测试持久化入库队列"""
+
+    def test_order_dedupe_and_recover(self, tmp_path):
+        """测试按加入顺序取出、重复加入被忽略、中断后恢复"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'queue.db'}")
+        queue = DurableWorkQueue(db_manager, poll_interval=0.05)
+
+        assert queue.put("a.tdms")
+        assert queue.put("b.tdms")
+        assert not queue.put("a.tdms")
+        assert queue.qsize() == 2
+
+        first = queue.get(timeout=0)
+        assert first.file_path == "a.tdms"
+        queue.done(first)
+        second = queue.get(timeout=0)
+        assert second.file_path == "b.tdms"
+        assert queue.get(timeout=0.1) is None
+
+        # 模拟服务重启：处理中的文件恢复为待处理
+        restarted = DurableWorkQueue(DatabaseManager(f"sqlite:///{tmp_path / 'queue.db'}"))
+        assert restarted.recover() == 1
+        retried = restarted.get(timeout=0)
+        assert (retried.file_path, retried.attempts) == ("b.tdms", 2)
+        restarted.failed(retried, RuntimeError("bad file"))
+        assert restarted.qsize() == 0
+        assert db_manager.count_ingestion_files("failed") == 1
+
+
+class TestIngestionLedger:
+    """测试文件入库记录及启动时目录扫描"""
+
+    def test_fingerprint_is_change_hint_only(self, tmp_path):
+        """测试首尾指纹只随首尾内容及大小变化，完整内容哈希随任意字节变化"""
+        data = bytearray(np.random.bytes(3000))
+        path = tmp_path / "a.tdms"
+        path.write_bytes(bytes(data))
+        reference = file_fingerprint(str(path), sample_bytes=1000)
+        full_reference = file_content_hash(str(path), block_size=512)
+
+        data[1500] ^= 0xFF  # 只修改未采样的中间部分
+        path.write_bytes(bytes(data))
+        assert file_fingerprint(str(path), sample_bytes=1000) == reference
+        assert file_content_hash(str(path), block_size=512) != full_reference
+        data[-1] ^= 0xFF
+        path.write_bytes(bytes(data))
+        assert file_fingerprint(str(path), sample_bytes=1000) != reference
+
+    def test_scan_skips_ingested_files(self, tmp_path):
+        """测试扫描跳过已处理的文件及临时文件，内容变化后重新处理"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'ledger.db'}")
+        ledger = IngestionLedger(db_manager)
+        for name in ("a.tdms", "b.tdms", "temp_c.tdms"):
+            (tmp_path / name).write_bytes(np.random.bytes(1000))
+        a, b = str(tmp_path / "a.tdms"), str(tmp_path / "b.tdms")
+
+        assert sorted(ledger.scan_directory(str(tmp_path), [".tdms"])) == [a, b]
+        for path in (a, b):
+            ledger.mark_queued(path)
+            ledger.mark_started(path)
+        ledger.mark_finished(a, audio_duration_s=60.0, session_id="S1")
+        ledger.mark_failed(b, RuntimeError("bad file"))
+
+        entry = db_manager.get_ledger_entry(a)
+        assert entry['status'] == "done"
+        assert entry['processing_s'] > 0
+        assert entry['realtime_factor'] == pytest.approx(60.0 / entry['processing_s'])
+        assert entry['mb_per_s'] > 0
+
+        # 重启后扫描：已处理及失败的文件均跳过
+        restarted = IngestionLedger(DatabaseManager(f"sqlite:///{tmp_path / 'ledger.db'}"))
+        assert restarted.scan_directory(str(tmp_path), [".tdms"]) == []
+
+        # 已记录的内容哈希在文件未变化时可直接使用
+        restarted.record_content_hash(b, "b" * 64)
+        assert restarted.known_content_hash(b) == "b" * 64
+
+        # 内容变化的文件重新处理；其他路径下内容相同的文件照常入库（由结果缓存回放）
+        (tmp_path / "b.tdms").write_bytes(np.random.bytes(2000))
+        assert restarted.known_content_hash(b) is None
+        copy = tmp_path / "a_copy.tdms"
+        copy.write_bytes((tmp_path / "a.tdms").read_bytes())
+        assert restarted.scan_directory(str(tmp_path), [".tdms"]) == [b, str(copy)]
+        assert db_manager.get_ledger_entry(str(copy))['fingerprint'] == entry['fingerprint']
+        assert db_manager.get_ledger_entry(b)['content_hash'] is None
+
+        summary = db_manager.get_ledger_summary()
+        assert summary['status_counts']['done'] == 1
+        assert summary['total_audio_s'] == 60.0
+
+
+class TestResultCache:
+    """测试按内容寻址的计算结果缓存"""
+
+    def test_identical_recording_replayed(self, tmp_path):
+        """测试内容相同的文件命中缓存，结果一致且时间戳对齐到本次处理"""
+        cache = ResultCache(str(tmp_path / "cache"))
+        signal = (np.random.randn(3 * SR) * 0.1).astype(np.float32)
+        first_path, copy_path = tmp_path / "a.wav", tmp_path / "copy.wav"
+        sf.write(str(first_path), signal, SR, subtype="FLOAT")
+        copy_path.write_bytes(first_path.read_bytes())
+
+        first = analyze_file(str(first_path), enable_event_detection=False, result_cache=cache)
+        start_time = first.channels[0].start_time + timedelta(hours=1)
+        replayed = analyze_file(str(copy_path), session_id="S2", enable_event_detection=False,
+                                result_cache=cache, start_time=start_time)
+
+        assert not first.cached and replayed.cached
+        original, cached = first.channels[0], replayed.channels[0]
+        assert cached.session_id == "S2"
+        assert [m.LAeq for m in cached.seconds] == [m.LAeq for m in original.seconds]
+        assert cached.results["laeq"] == original.results["laeq"]
+        assert cached.start_time == start_time > original.start_time
+        assert cached.minutes[0].start_time == cached.start_time
+
+        # 启用事件检测时结果不同，不使用同一缓存
+        assert not analyze_file(str(copy_path), event_output_dir=str(tmp_path / "events"),
+                                result_cache=cache).cached
+
+    def test_middle_only_difference_not_replayed(self, tmp_path):
+        """测试只有中间部分不同（首尾指纹相同）的录音不命中缓存"""
+        cache = ResultCache(str(tmp_path / "cache"))
+        signal = (np.random.randn(80 * SR) * 0.1).astype(np.float32)  # 约 2.5 MiB，超过首尾采样范围
+        signal[0] = 1.0  # 峰值（写入 WAV 头部）在开头，两文件相同
+        first_path, other_path = tmp_path / "a.wav", tmp_path / "b.wav"
+        sf.write(str(first_path), signal, SR, subtype="FLOAT")
+        signal[40 * SR:41 * SR] *= 0.1
+        sf.write(str(other_path), signal, SR, subtype="FLOAT")
+        assert file_fingerprint(str(first_path)) == file_fingerprint(str(other_path))
+
+        first = analyze_file(str(first_path), enable_event_detection=False, result_cache=cache)
+        other = analyze_file(str(other_path), enable_event_detection=False, result_cache=cache)
+
+        assert not other.cached
+        assert other.channels[0].seconds[40].LAeq < first.channels[0].seconds[40].LAeq - 10
+
+    def test_hash_before_decoding(self, tmp_path, monkeypatch):
+        """测试内容哈希在打开解码器之前计算，已知哈希时不再读取文件计算"""
+        import app.core.ingestion as ingestion
+        cache = ResultCache(str(tmp_path / "cache"))
+        path = str(tmp_path / "a.wav")
+        sf.write(path, (np.random.randn(2 * SR) * 0.1).astype(np.float32), SR, subtype="FLOAT")
+
+        calls = []
+        monkeypatch.setattr(ingestion, "file_content_hash",
+                            lambda p: calls.append("hash") or file_content_hash(p))
+        monkeypatch.setattr(ingestion, "open_audio_source",
+                            lambda *args, **kwargs: calls.append("open") or open_audio_source(*args, **kwargs))
+        first = analyze_file(path, enable_event_detection=False, result_cache=cache)
+        assert calls == ["hash", "open"]
+        assert first.content_hash == file_content_hash(path)
+
+        calls.clear()
+        replayed = analyze_file(path, enable_event_detection=False, result_cache=cache,
+                                content_hash=first.content_hash)
+        assert calls == ["open"] and replayed.cached
+
+    def test_manager_replays_into_session(self, tmp_path, manager):
+        """测试再次放入的相同录音直接回放到会话并保存"""
+        path = tmp_path / "a.tdms"
+        _write_multichannel_tdms(path, {"CH1": np.random.randn(2 * SR), "CH2": np.random.randn(2 * SR)})
+        copy = tmp_path / "copy.tdms"
+        copy.write_bytes(path.read_bytes())
+
+        asyncio.run(manager._process_audio_file(str(path)))
+        asyncio.run(manager._process_audio_file(str(copy)))
+
+        db = manager.db_manager.ReadSessionLocal()
+        try:
+            results = db.query(ProcessingResult).order_by(ProcessingResult.id).all()
+            assert [r.file_path for r in results] == [str(path)] * 2 + [str(copy)] * 2
+            rows = db.query(TimeHistory).order_by(TimeHistory.id).all()
+            assert len(rows) == 8
+            assert sorted(r.LAeq_dB for r in rows[4:]) == sorted(r.LAeq_dB for r in rows[:4])
+            # 回放的结果接在前一个文件之后
+            assert rows[4].timestamp_utc >= rows[0].timestamp_utc + timedelta(seconds=2)
+        finally:
+            db.close()
+        assert manager.current_session.metrics.total_duration_s == 4
+
+
+class TestMonitoredIngestion:
+    """测试文件监控 -> 队列 -> 消费线程"""
+
+    def test_file_processed_from_queue(self, tmp_path, manager):
+        """测试监控目录中的新文件写完后经队列处理"""
+        manager.max_workers = 0
+        manager.audio_monitor.settle_seconds = 0.2
+        manager.audio_monitor.poll_interval = 0.05
+        asyncio.run(manager.start_monitoring())
+        try:
+            _write_multichannel_tdms(tmp_path / "new.tdms", {"CH1": np.random.randn(2 * SR)})
+            deadline = time.monotonic() + 30
+            db = manager.db_manager.ReadSessionLocal()
+            try:
+                while db.query(ProcessingResult).count() == 0 and time.monotonic() < deadline:
+                    time.sleep(0.1)
+                assert db.query(ProcessingResult).count() == 1
+            finally:
+                db.close()
+        finally:
+            asyncio.run(manager.stop_monitoring())
+
+        assert manager.db_manager.count_ingestion_files("pending") == 0
+        assert manager.db_manager.count_ingestion_files("processing") == 0
+
+    def test_backlog_processed_once(self, tmp_path, manager):
+        """测试启动时处理服务停止期间写入的文件，再次启动时不重复处理"""
+        manager.max_workers = 0
+        _write_multichannel_tdms(tmp_path / "offline.tdms", {"CH1": np.random.randn(2 * SR)})
+
+        for _ in range(2):
+            asyncio.run(manager.start_monitoring())
+            try:
+                deadline = time.monotonic() + 30
+                while (manager.db_manager.count_ingestion_files("pending")
+                       + manager.db_manager.count_ingestion_files("processing")) and time.monotonic() < deadline:
+                    time.sleep(0.1)
+            finally:
+                asyncio.run(manager.stop_monitoring())
+
+        db = manager.db_manager.ReadSessionLocal()
+        try:
+            assert db.query(ProcessingResult).count() == 1
+        finally:
+            db.close()
+        entry = manager.db_manager.get_ledger_entry(str(tmp_path / "offline.tdms"))
+        assert entry['status'] == "done"
+        # 工作进程计算的内容哈希保存到入库记录，文件未变化时再次处理不必重新计算
+        assert entry['content_hash'] == file_content_hash(str(tmp_path / "offline.tdms"))
+        assert manager._known_content_hash(str(tmp_path / "offline.tdms")) == entry['content_hash']
+        assert entry['audio_duration_s'] == pytest.approx(2.0)
+        assert entry['realtime_factor'] > 0
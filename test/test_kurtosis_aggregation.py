@@ -23,6 +23,8 @@ import warnings
 from app.core.time_history_processor import TimeHistoryProcessor, SecondMetrics
 from app.core.summary_processor import (
     SummaryProcessor, 
+    MultiLevelAggregator,
+    AggregationLevel,
     aggregate_from_moment_blocks,
     compare_kurtosis_methods
 )
@@ -223,10 +225,80 @@ def test_summary_processor():
     print()
 
 
+def test_multi_level_aggregation():
+    """测试逐级汇聚（1 分钟 -> 15 分钟 -> 1 小时）与直接从秒级数据汇聚一致"""
+    print("=" * 60)
+    print("测试 5: 多级逐级汇聚测试")
+    print("=" * 60)
+    
+    from datetime import datetime, timedelta
+    
+    np.random.seed(7)
+    base_time = datetime(2026, 1, 1, 7, 50, 30)
+    seconds = []
+    for i in range(5000):
+        second_data = np.random.laplace(0, 1 + i % 5, 4800)
+        seconds.append(SecondMetrics(
+            timestamp=base_time + timedelta(seconds=i),
+            duration_s=1.0,
+            LAeq=60.0 + i % 30,
+            LCeq=70.0,
+            LZeq=75.0,
+            LZpeak=90.0 + i % 40,
+            LCpeak=80.0,
+            dose_frac_niosh=0.001,
+            freq_1khz_spl=50.0 + i % 7,
+            n_samples=len(second_data),
+            sum_x=np.sum(second_data),
+            sum_x2=np.sum(second_data ** 2),
+            sum_x3=np.sum(second_data ** 3),
+            sum_x4=np.sum(second_data ** 4),
+            freq_1khz_n=len(second_data),
+            freq_1khz_s1=np.sum(second_data),
+            freq_1khz_s2=np.sum(second_data ** 2),
+            freq_1khz_s3=np.sum(second_data ** 3),
+            freq_1khz_s4=np.sum(second_data ** 4),
+        ))
+    
+    outputs = {}
+    aggregator = MultiLevelAggregator(align_to_clock=True)
+    for level in (AggregationLevel.MINUTE, AggregationLevel.FIFTEEN_MINUTES, AggregationLevel.HOUR):
+        aggregator.add_level(level, callback=lambda m, level=level: outputs.setdefault(level, []).append(m))
+    
+    # 模拟两个文件：第一个文件结束时输出未完成时段的部分结果
+    for metrics in seconds[:2000]:
+        aggregator.process_second(metrics)
+    aggregator.flush_all()
+    for metrics in seconds[2000:]:
+        aggregator.process_second(metrics)
+    aggregator.flush_all()
+    
+    hours = outputs[AggregationLevel.HOUR]
+    print(f"小时汇聚: {[(h.period_start, h.sample_count) for h in hours]}")
+    assert [h.period_start for h in hours] == [
+        datetime(2026, 1, 1, 7), datetime(2026, 1, 1, 8), datetime(2026, 1, 1, 8), datetime(2026, 1, 1, 9)]
+    assert sum(h.sample_count for h in hours) == 5000
+    assert all(m.period_start.minute % 15 == 0 for m in outputs[AggregationLevel.FIFTEEN_MINUTES])
+    
+    # 8 点的两条部分结果合并后与直接从 3600 秒数据汇聚一致
+    merged = SummaryProcessor.merge_aggregated(hours[1:3])
+    direct = SummaryProcessor()._aggregate_metrics([s for s in seconds if s.timestamp.hour == 8])
+    assert merged.sample_count == direct.sample_count == 3600
+    assert merged.LAeq == direct.LAeq
+    assert merged.LZpeak == direct.LZpeak
+    assert merged.freq_1khz_spl == direct.freq_1khz_spl
+    assert abs(merged.dose_frac_niosh - direct.dose_frac_niosh) < 1e-9
+    assert abs(merged.beta_kurtosis - direct.beta_kurtosis) < 1e-4
+    assert abs(merged.freq_1khz_kurtosis - direct.freq_1khz_kurtosis) < 1e-2
+    print(f"合并峰度: {merged.beta_kurtosis:.4f}, 直接汇聚峰度: {direct.beta_kurtosis:.4f}")
+    print("[PASS] 测试通过: 逐级汇聚与直接汇聚一致")
+    print()
+
+
 def test_edge_cases():
     """测试边界条件"""
     print("=" * 60)
-    print("测试 5: 边界条件测试")
+    print("测试 6: 边界条件测试")
     print("=" * 60)
     
     # 测试 1：零样本
@@ -271,6 +343,7 @@ def main():
     test_kurtosis_from_moments()
     test_moment_aggregation()
     test_summary_processor()
+    test_multi_level_aggregation()
     test_edge_cases()
     
     # 测试真实音频文件
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+秒级指标列式存储单元测试
+"""
+
+import numpy as np
+from datetime import datetime, timedelta
+from acoustics import Signal
+
+from app.core.metrics_store import SecondMetricsStore
+from app.core.session_manager import SessionManager
+from app.core.time_history_processor import (
+    TimeHistoryProcessor,
+    SecondMetrics,
+    aggregate_session_metrics
+)
+
+
+def _make_metrics(i: int) -> SecondMetrics:
+    return SecondMetrics(
+        timestamp=datetime(2026, 1, 1) + timedelta(seconds=i),
+        duration_s=1.0,
+        LAeq=80.0 + i,
+        LCeq=82.0 + i,
+        LZeq=85.0 + i,
+        LZpeak=100.0 + i if i % 2 == 0 else None,
+        dose_frac_niosh=0.01 * i,
+        overload_flag=(i == 3),
+        n_samples=48000,
+    )
+
+
+class TestSecondMetricsStore:
+    """测试列式存储"""
+
+    def test_append_and_read_back(self):
+        """测试追加后读取与原对象一致（跨多个分块）"""
+        store = SecondMetricsStore(chunk_size=2)
+        expected = [_make_metrics(i) for i in range(5)]
+        store.extend(expected)
+
+        assert len(store) == 5
+        assert list(store) == expected
+        assert store[-1] == expected[-1]
+        assert store[1].LZpeak is None
+
+    def test_zero_copy_export(self):
+        """测试 DataFrame 导出为存储数组视图"""
+        store = SecondMetricsStore(chunk_size=4)
+        store.extend(_make_metrics(i) for i in range(6))
+
+        frame = store.to_frame(['timestamp', 'LAeq'])
+        assert list(frame['LAeq']) == [80.0, 81.0, 82.0, 83.0, 84.0, 85.0]
+        assert np.shares_memory(frame['LAeq'].to_numpy(), store.column('LAeq'))
+
+        table = store.to_arrow(['LAeq', 'LZpeak'])
+        assert table.num_rows == 6
+        assert table.column('LAeq').to_pylist() == list(frame['LAeq'])
+
+    def test_constant_memory_per_second(self):
+        """测试每秒内存占用固定"""
+        store = SecondMetricsStore(chunk_size=100)
+        store.append(_make_metrics(0))
+        one_chunk = store.nbytes
+        store.extend(_make_metrics(i) for i in range(1, 250))
+        assert store.nbytes == 3 * one_chunk
+
+    def test_append_frame(self):
+        """测试追加批量处理结果"""
+        sr = 8000
+        x = np.random.randn(3 * sr + 100) * 0.1
+        processor = TimeHistoryProcessor()
+        frame = processor.process_signal_batch(Signal(x, sr), datetime(2026, 1, 1))
+
+        store = SecondMetricsStore(chunk_size=2)
+        store.append_frame(frame)
+        assert len(store) == 4
+        assert np.array_equal(store.column('LAeq'), frame['LAeq'].to_numpy())
+        assert store[0].timestamp == datetime(2026, 1, 1)
+        assert store[3].freq_16khz_spl is None
+
+    def test_aggregate_accepts_store(self):
+        """测试会话聚合对列表与列式存储结果一致"""
+        metrics = [_make_metrics(i) for i in range(5)]
+        store = SecondMetricsStore()
+        store.extend(metrics)
+        assert aggregate_session_metrics(store) == aggregate_session_metrics(metrics)
+
+
+class TestSessionManagerStore:
+    """测试会话使用列式存储"""
+
+    def test_time_history_df(self):
+        """测试会话时间历程导出"""
+        session = SessionManager().start()
+        for i in range(3):
+            session.process_second(_make_metrics(i))
+
+        df = session.get_time_history_df()
+        assert len(df) == 3
+        assert 'dose_niosh' in df.columns
+        assert list(df['LAeq']) == [80.0, 81.0, 82.0]
+        assert session.get_summary()['total_seconds_processed'] == 3
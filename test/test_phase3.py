@@ -10,7 +10,7 @@
 
 import pytest
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import tempfile
 import os
 
@@ -67,6 +67,48 @@ class TestSlidingWindowCalculator:
         result = calc.add_sample(1.0)
         assert result is None
 
+    def test_running_sum_matches_direct(self):
+        """测试滑动平方和与直接计算窗口均方一致"""
+        calc = SlidingWindowCalculator(window_duration_s=0.125, sample_rate=800)
+        samples = np.random.randn(1000)
+
+        for i, sample in enumerate(samples):
+            result = calc.add_sample(sample)
+
+        window = samples[-100:]
+        expected = 20 * np.log10(np.sqrt(np.mean(window ** 2)) / 20e-6)
+        assert abs(result - expected) < 1e-9
+
+    def test_process_block_matches_add_sample(self):
+        """测试块接口与逐样本接口结果一致"""
+        samples = np.random.randn(5000)
+
+        calc = SlidingWindowCalculator(window_duration_s=0.125, sample_rate=8000)
+        expected = np.array([
+            np.nan if (r := calc.add_sample(s)) is None else r for s in samples
+        ])
+
+        calc.reset()
+        levels = np.concatenate([
+            calc.process_block(samples[:300]),
+            calc.process_block(samples[300:3200]),
+            calc.process_block(samples[3200:]),
+        ])
+
+        assert np.array_equal(np.isnan(levels), np.isnan(expected))
+        assert np.nanmax(np.abs(levels - expected)) < 1e-9
+
+    def test_window_shorter_than_one_sample(self):
+        """测试窗口时长不足一个样本时按 1 个样本计算"""
+        calc = SlidingWindowCalculator(window_duration_s=0.125, sample_rate=4)
+        assert calc.window_samples == 1
+
+        samples = np.array([0.02, 0.2, 2.0])
+        expected = [calc.add_sample(s) for s in samples]
+        assert expected == pytest.approx([60.0, 80.0, 100.0])
+        calc.reset()
+        assert np.allclose(calc.process_block(samples), expected)
+
 
 class TestEventDetector:
     """测试事件检测器"""
@@ -158,6 +200,38 @@ class TestEventDetector:
         assert 'is_in_event' in stats
         assert 'thresholds' in stats
 
+    def test_process_block_matches_process_sample(self):
+        """测试块检测与逐样本检测得到相同事件"""
+        sr = 8000
+        rng = np.random.default_rng(0)
+        samples = rng.standard_normal(sr * 6) * 0.02
+        for start_s in (1.0, 1.3, 4.0):
+            start = int(start_s * sr)
+            samples[start:start + sr // 4] += rng.standard_normal(sr // 4) * 2.0
+        samples[int(5.5 * sr)] = 80.0
+        start_time = datetime(2026, 1, 1)
+
+        def key(event):
+            return (event.start_time, event.end_time, event.trigger_type, event.lzpeak_db, event.lcpeak_db)
+
+        detector = EventDetector(sample_rate=sr)
+        expected = []
+        for i, sample in enumerate(samples):
+            event_info = detector.process_sample(
+                sample, sample, start_time + timedelta(seconds=i / sr), "test_session")
+            if event_info:
+                expected.append(key(event_info))
+
+        detector = EventDetector(sample_rate=sr)
+        events = []
+        for i in range(0, len(samples), 3000):
+            chunk = samples[i:i + 3000]
+            events += detector.process_block(
+                chunk, chunk, start_time + timedelta(seconds=i / sr), "test_session")
+
+        assert len(expected) > 0
+        assert [key(e) for e in events] == expected
+
 
 class TestRingBuffer:
     """测试环形缓冲区"""
@@ -262,6 +336,21 @@ class TestRingBuffer:
             assert os.path.exists(filepath)
             assert filepath.endswith(".wav")
     
+    def test_event_capture_buffer(self):
+        """测试预分配事件缓冲区"""
+        buffer = RingBuffer(sample_rate=1000, buffer_duration_s=3.0, pretrigger_s=0.5, posttrigger_s=1.0)
+        buffer.write(np.arange(800, dtype=np.float32))
+
+        # 触发点在最新写入位置之前100个样本
+        buffer.begin_capture(trigger_offset=100)
+        buffer.capture.write(np.arange(700, 800, dtype=np.float32))
+        buffer.capture.write(np.arange(800, 2000, dtype=np.float32))
+
+        assert buffer.capture.is_complete
+        data = buffer.capture.view()
+        assert len(data) == 1500
+        assert np.array_equal(data, np.arange(200, 1700, dtype=np.float32))
+
     def test_clear(self):
         """测试清空缓冲区"""
         buffer = RingBuffer(sample_rate=48000, buffer_duration_s=1.0)
@@ -346,6 +435,84 @@ class TestEventProcessor:
         processor.add_event_callback(test_callback)
         assert len(processor.event_callbacks) == 1
 
+    def test_process_audio_chunk_collects_events(self, tmp_path):
+        """测试整块处理能检测并收集事件"""
+        sr = 8000
+        processor = EventProcessor(sample_rate=sr, peak_threshold=100.0,
+                                   output_dir=str(tmp_path), enable_audio_save=False)
+        processor.start("test_session")
+
+        start_time = datetime(2026, 1, 1)
+        for second in range(3):
+            chunk = np.full(sr, 0.001)
+            if second == 1:
+                chunk[100] = 5.0
+            processor.process_audio_chunk(chunk, start_time + timedelta(seconds=second))
+
+        events = processor.stop()
+        assert len(events) == 1
+        assert events[0].trigger_type == TriggerType.PEAK
+        assert events[0].start_time == start_time + timedelta(seconds=1 + 100 / sr)
+
+    def test_event_audio_capture(self, tmp_path):
+        """测试事件音频：触发点位于 pre-trigger 之后，总长为 pre + post"""
+        import soundfile as sf
+
+        sr = 1000
+        processor = EventProcessor(sample_rate=sr, peak_threshold=100.0, output_dir=str(tmp_path))
+        processor.start("test_session")
+
+        start_time = datetime(2026, 1, 1)
+        saved = []
+        processor.add_event_callback(saved.append)
+        for second in range(12):
+            chunk = np.full(sr, 0.001)
+            if second == 3:
+                chunk[250] = 5.0
+            processor.process_audio_chunk(chunk, start_time + timedelta(seconds=second))
+
+        assert processor.ring_buffer.capture.active is False
+        processor.stop()  # 等待异步写入完成
+
+        assert len(saved) == 1
+        audio, file_sr = sf.read(saved[0].audio_file_path)
+        assert file_sr == sr
+        assert len(audio) == processor.ring_buffer.pretrigger_samples + processor.ring_buffer.posttrigger_samples
+        assert int(np.argmax(np.abs(audio))) == processor.ring_buffer.pretrigger_samples
+
+    def test_peak_trigger_uses_c_weighting(self, tmp_path):
+        """测试LCpeak触发使用C计权信号：低频信号被C计权衰减后不触发"""
+        sr = 8000
+        t = np.arange(sr) / sr
+
+        def count_events(frequency):
+            processor = EventProcessor(sample_rate=sr, leq_threshold=200.0, peak_threshold=120.0,
+                                       output_dir=str(tmp_path), enable_audio_save=False)
+            processor.event_detector.slope_threshold = 1000.0
+            processor.start("test_session")
+            signal = 25.0 * np.sin(2 * np.pi * frequency * t)  # LZpeak ≈ 122 dB
+            start_time = datetime(2026, 1, 1)
+            for second in range(2):
+                processor.process_audio_chunk(signal, start_time + timedelta(seconds=second))
+            return processor.event_detector.event_counter
+
+        assert count_events(10.0) == 0    # C计权在10Hz约衰减14dB
+        assert count_events(1000.0) > 0
+
+    def test_c_weighting_state_across_chunks(self, tmp_path):
+        """测试C计权逐块滤波（状态跨块保持）与整段信号一次性滤波一致，start() 时重置"""
+        from app.core.filter_bank import FilterBank
+        sr = 8000
+        x = np.random.randn(3 * sr)
+        processor = EventProcessor(sample_rate=sr, output_dir=str(tmp_path), enable_audio_save=False)
+        processor.start("test_session")
+
+        chunked = np.concatenate([processor._weigh_c(x[:1000]), processor._weigh_c(x[1000:])])
+        assert np.array_equal(chunked, FilterBank.for_sample_rate(sr).weigh_c(x))
+
+        processor.start("test_session")
+        assert np.array_equal(processor._weigh_c(x[:1000]), chunked[:1000])
+
 
 class TestBatchEventProcessor:
     """测试批量事件处理器"""
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+TDMS 流式读取单元测试
+"""
+
+import numpy as np
+import soundfile as sf
+from datetime import datetime
+from nptdms import TdmsWriter, ChannelObject
+from acoustics import Signal
+
+from app.core.tdms_converter import TDMSConverter, TdmsChannelReader
+from app.core.time_history_processor import TimeHistoryProcessor
+
+
+def _write_tdms(path, data, properties=None, segments=3):
+    """分多个 segment 写入单通道 TDMS 文件"""
+    with TdmsWriter(str(path)) as writer:
+        for part in np.array_split(data, segments):
+            writer.write_segment([ChannelObject("Group", "CH1", part, properties=properties or {})])
+
+
+class TestTdmsChannelReader:
+    """测试 TDMS 通道流式读取"""
+
+    def test_float64_normalized_blocks(self, tmp_path):
+        """测试浮点数据按整通道最大值归一化，按秒分块"""
+        sr = 8000
+        data = np.random.randn(3 * sr + 500) * 5.0
+        path = tmp_path / "float.tdms"
+        _write_tdms(path, data, {"SampleRate": sr})
+
+        with TdmsChannelReader(str(path)) as reader:
+            assert reader.sample_rate == sr
+            assert reader.n_samples == len(data)
+            blocks = list(reader.blocks())
+
+        assert [len(b) for b in blocks] == [sr, sr, sr, 500]
+        assert all(b.dtype == np.float32 for b in blocks)
+        expected = (data / np.max(np.abs(data))).astype(np.float32)
+        assert np.allclose(np.concatenate(blocks), expected, atol=1e-7)
+
+    def test_int16_scaling_and_default_rate(self, tmp_path):
+        """测试整型数据按类型最大值缩放，无采样率属性时使用默认值"""
+        data = np.array([0, 16384, -32767, 32767], dtype=np.int16)
+        path = tmp_path / "int.tdms"
+        _write_tdms(path, data, segments=1)
+
+        with TdmsChannelReader(str(path), sampling_rate=44100) as reader:
+            assert reader.sample_rate == 44100
+            block = np.concatenate(list(reader.blocks()))
+        assert np.allclose(block, data / 32767.0)
+
+    def test_convert_matches_stream(self, tmp_path):
+        """测试转换的WAV文件与流式读取结果一致"""
+        sr = 8000
+        data = np.random.randn(2 * sr + 10)
+        path = tmp_path / "conv.tdms"
+        _write_tdms(path, data, {"SampleRate": sr})
+
+        converter = TDMSConverter()
+        wav_path = converter.convert_tdms_to_wav(str(path), str(tmp_path / "conv.wav"))
+        wav, wav_sr = sf.read(wav_path, dtype='float32')
+
+        with converter.open_channel(str(path)) as reader:
+            assert wav_sr == reader.sample_rate
+            assert np.array_equal(wav, np.concatenate(list(reader.blocks())))
+
+    def test_process_blocks_matches_signal(self, tmp_path):
+        """测试直接处理TDMS数据块与处理整段信号结果一致"""
+        sr = 48000
+        data = np.random.randn(2 * sr + 300) * 0.1
+        path = tmp_path / "th.tdms"
+        _write_tdms(path, data, {"SampleRate": sr})
+
+        processor = TimeHistoryProcessor()
+        start = datetime(2026, 1, 1)
+        with TdmsChannelReader(str(path)) as reader:
+            streamed = processor.process_blocks(reader.blocks(), reader.sample_rate, start)
+            signal = Signal(np.concatenate(list(reader.blocks())), sr)
+        expected = processor.process_signal_per_second(signal, start)
+
+        assert streamed == expected